@@ -0,0 +1,243 @@
+"""
+Cold archive for Repairs_Lead_Log items.
+
+scripts/archive_leads.py moves items older than a cutoff into gzip NDJSON
+objects partitioned by UTC date (created_at; last_updated for chat logs):
+
+    leads/dt=YYYY-MM-DD/part-<run>-<segment>-<sequence>.ndjson.gz
+
+then sets a TTL on the live items so DynamoDB deletes them. Two stores
+share one interface:
+  - local: a directory tree, the offline stand-in for object storage (default)
+  - s3:    a bucket/prefix in S3
+
+Select with ARCHIVE_STORE=local|s3 (ARCHIVE_PATH for local, ARCHIVE_BUCKET and
+ARCHIVE_PREFIX for s3), or call set_store() from tests. find_archived_lead()
+reads a lead back: ULID and dashboard lead IDs carry their creation time, so
+only that day's partition (and its neighbours) is read; chat logs
+(CHATLOG-<session>) carry none and fall back to reading every partition.
+"""
+
+import os
+import re
+import gzip
+import json
+import logging
+from datetime import datetime, date as date_cls, timedelta, timezone
+from pathlib import Path
+
+import boto3
+from botocore.exceptions import ClientError
+
+from lead_ids import lead_id_created_at
+from tenancy import split_tenant_key
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+ARCHIVE_PREFIX = os.environ.get('ARCHIVE_PREFIX', 'linda-archive/')
+# Attribute the leads table's TTL is configured on (epoch seconds)
+ARCHIVE_TTL_ATTRIBUTE = os.environ.get('ARCHIVE_TTL_ATTRIBUTE', 'expires_at')
+LEADS_DATASET = 'leads'
+
+# Dashboard-created IDs embed epoch seconds: LEAD-1760000000-k3j9x1, CALLBACK-..., ONSITE-...
+_EPOCH_ID = re.compile(r'^[A-Z]+-(\d{9,10})-')
+
+
+class ArchiveStore:
+    """Object storage for archive parts: whole-object put/get and prefix listing."""
+
+    name = 'base'
+
+    def put_object(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def get_object(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def list_keys(self, prefix: str) -> list[str]:
+        raise NotImplementedError
+
+
+class LocalArchiveStore(ArchiveStore):
+    """Directory tree stand-in for a bucket; writes are atomic renames."""
+
+    name = 'local'
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def put_object(self, key: str, data: bytes) -> None:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def get_object(self, key: str) -> bytes | None:
+        path = self.root / key
+        return path.read_bytes() if path.is_file() else None
+
+    def list_keys(self, prefix: str) -> list[str]:
+        base = self.root / prefix
+        directory = base if prefix.endswith('/') else base.parent
+        if not directory.is_dir():
+            return []
+        keys = []
+        for path in directory.rglob('*'):
+            key = path.relative_to(self.root).as_posix()
+            if path.is_file() and not key.endswith('.tmp') and key.startswith(prefix):
+                keys.append(key)
+        return sorted(keys)
+
+
+class S3ArchiveStore(ArchiveStore):
+    """Objects under bucket/prefix in S3."""
+
+    name = 's3'
+
+    def __init__(self, bucket: str, prefix: str = ARCHIVE_PREFIX, client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or boto3.client('s3')
+
+    def put_object(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def get_object(self, key: str) -> bytes | None:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+        return response['Body'].read()
+
+    def list_keys(self, prefix: str) -> list[str]:
+        keys = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            keys.extend(entry['Key'][len(self.prefix):] for entry in page.get('Contents', []))
+        return sorted(keys)
+
+
+# ---------------------------------------------------------------------------
+# Layout
+# ---------------------------------------------------------------------------
+
+def item_epoch(item: dict) -> int:
+    """
+    When an item was last live: a chat log's last_updated, else created_at,
+    else the timestamp sort key (chat logs use a fixed 0 there).
+    """
+    for name in ('last_updated', 'created_at', 'timestamp'):
+        value = item.get(name)
+        if isinstance(value, (int, float)) and value > 0:
+            return int(value)
+    return 0
+
+
+def item_date(item: dict) -> date_cls:
+    """UTC date partition an item is archived under."""
+    return datetime.fromtimestamp(item_epoch(item), tz=timezone.utc).date()
+
+
+def partition_prefix(day: date_cls, dataset: str = LEADS_DATASET) -> str:
+    return f"{dataset}/dt={day.isoformat()}/"
+
+
+def part_key(day: date_cls, run_id: str, segment: int, sequence: int, dataset: str = LEADS_DATASET) -> str:
+    return f"{partition_prefix(day, dataset)}part-{run_id}-{segment:04d}-{sequence:04d}.ndjson.gz"
+
+
+def encode_part(items: list[dict]) -> bytes:
+    lines = ''.join(json.dumps(item, separators=(',', ':')) + '\n' for item in items)
+    return gzip.compress(lines.encode('utf-8'), compresslevel=6)
+
+
+def decode_part(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in gzip.decompress(data).decode('utf-8').splitlines() if line]
+
+
+def read_partition(store: ArchiveStore, day: date_cls, dataset: str = LEADS_DATASET) -> list[dict]:
+    """Every archived item for one day, deduplicated on (lead_id, timestamp)."""
+    items: dict[tuple, dict] = {}
+    for key in store.list_keys(partition_prefix(day, dataset)):
+        data = store.get_object(key)
+        if data is None:
+            continue
+        for item in decode_part(data):
+            items[(item.get('lead_id'), item.get('timestamp'))] = item
+    return list(items.values())
+
+
+def _candidate_days(lead_id: str, created_at: int | None) -> list[date_cls] | None:
+    if isinstance(created_at, (int, float)):
+        day = datetime.fromtimestamp(created_at, tz=timezone.utc).date()
+        return [day]
+    # Stored IDs of non-default tenants carry a '<tenant>#' prefix
+    _, lead_id = split_tenant_key(lead_id)
+    prefix = lead_id.split('-', 1)[0] + '-'
+    embedded = lead_id_created_at(lead_id, prefix=prefix)
+    if embedded is not None:
+        day = embedded.date()
+    else:
+        match = _EPOCH_ID.match(lead_id)
+        if not match:
+            return None
+        day = datetime.fromtimestamp(int(match.group(1)), tz=timezone.utc).date()
+    # The ID is minted just before created_at is stamped, so midnight can separate them
+    return [day, day + timedelta(days=1), day - timedelta(days=1)]
+
+
+def find_archived_lead(lead_id: str, created_at: int | None = None, store: ArchiveStore | None = None) -> list[dict]:
+    """
+    Archived items for lead_id, oldest first. created_at narrows the search
+    to one partition; without it the ID's embedded date is used, and only IDs
+    with no date at all fall back to reading every partition.
+    """
+    store = store or get_store()
+    days = _candidate_days(lead_id, created_at)
+    if days is None:
+        logger.warning(f"Lead ID {lead_id} has no embedded date; reading every archive partition")
+        prefixes = sorted({key.rsplit('/', 1)[0] for key in store.list_keys(f"{LEADS_DATASET}/dt=")}, reverse=True)
+        days = [date_cls.fromisoformat(prefix.rsplit('=', 1)[1]) for prefix in prefixes]
+
+    for day in days:
+        matches = [item for item in read_partition(store, day) if item.get('lead_id') == lead_id]
+        if matches:
+            return sorted(matches, key=lambda item: item.get('timestamp', 0))
+    return []
+
+
+# ---------------------------------------------------------------------------
+# Selection
+# ---------------------------------------------------------------------------
+
+_store: ArchiveStore | None = None
+
+
+def create_store(kind: str) -> ArchiveStore:
+    kind = kind.lower()
+    if kind == 'local':
+        return LocalArchiveStore(os.environ.get('ARCHIVE_PATH', 'archive'))
+    if kind == 's3':
+        bucket = os.environ.get('ARCHIVE_BUCKET')
+        if not bucket:
+            raise ValueError("ARCHIVE_STORE=s3 needs ARCHIVE_BUCKET")
+        return S3ArchiveStore(bucket)
+    raise ValueError(f"Unknown archive store: {kind}")
+
+
+def get_store() -> ArchiveStore:
+    """Return the active store, creating it from ARCHIVE_STORE on first use."""
+    global _store
+    if _store is None:
+        _store = create_store(os.environ.get('ARCHIVE_STORE', 'local'))
+    return _store
+
+
+def set_store(store: ArchiveStore | None) -> None:
+    """Swap the active store (None re-reads ARCHIVE_STORE on next use)."""
+    global _store
+    _store = store
@@ -0,0 +1,97 @@
+"""
+Last-known availability for LINDA Lambda functions.
+
+Every successful schedule read records the date's slot rows here, keyed by
+the stored (tenant-scoped) schedule key. When storage fails, utils serves
+availability from the snapshot instead of offering every default slot,
+flagged stale with the time it was captured. Rows are kept rather than the
+available list so holds that lapsed since the capture count as free again.
+
+Snapshots live in the container; set AVAILABILITY_SNAPSHOT_PATH (e.g.
+/tmp/linda_availability.json) to also mirror them to a file, so a container
+that starts during an outage can still serve them.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+AVAILABILITY_SNAPSHOT_PATH = os.environ.get('AVAILABILITY_SNAPSHOT_PATH', '')
+# Dates kept per container; the least recently captured are dropped first
+MAX_SNAPSHOT_DATES = int(os.environ.get('MAX_SNAPSHOT_DATES', '120'))
+# How long after a failed read prompts keep calling availability tentative
+OUTAGE_NOTICE_SECONDS = int(os.environ.get('OUTAGE_NOTICE_SECONDS', '300'))
+
+
+class AvailabilitySnapshots:
+    """Per-date schedule rows from the last successful read, optionally mirrored to a JSON file."""
+
+    def __init__(self, path: str | None = AVAILABILITY_SNAPSHOT_PATH, max_dates: int = MAX_SNAPSHOT_DATES):
+        self.path = path or None
+        self.max_dates = max_dates
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}  # schedule key -> {'rows', 'captured_at'}
+        self._file_loaded = False
+        self.last_outage_at: float | None = None
+
+    def _load_file(self) -> None:
+        if self._file_loaded or not self.path:
+            return
+        self._file_loaded = True
+        try:
+            with open(self.path) as handle:
+                stored = json.load(handle)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable availability snapshot file {self.path}: {e}")
+            return
+        for key, entry in stored.items():
+            self._entries.setdefault(key, entry)
+
+    def _write_file(self) -> None:
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w') as handle:
+                json.dump(self._entries, handle)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write availability snapshot file {self.path}: {e}")
+
+    def save(self, key: str, rows: list[dict], now: float | None = None) -> None:
+        """Record a successful read; the file is rewritten only when the rows changed."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._load_file()
+            previous = self._entries.pop(key, None)
+            self._entries[key] = {'rows': rows, 'captured_at': int(now)}
+            while len(self._entries) > self.max_dates:
+                del self._entries[next(iter(self._entries))]
+            if self.path and (previous is None or previous['rows'] != rows):
+                self._write_file()
+
+    def load(self, key: str) -> tuple[list[dict], int] | None:
+        """(rows, captured_at) from the last successful read of key, or None."""
+        with self._lock:
+            self._load_file()
+            entry = self._entries.get(key)
+            return (entry['rows'], entry['captured_at']) if entry else None
+
+    def record_outage(self, now: float | None = None) -> None:
+        self.last_outage_at = time.time() if now is None else now
+
+    def outage_recent(self, now: float | None = None) -> bool:
+        """True while a failed read is recent enough that availability should be called tentative."""
+        now = time.time() if now is None else now
+        return self.last_outage_at is not None and now - self.last_outage_at < OUTAGE_NOTICE_SECONDS
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._file_loaded = False
+            self.last_outage_at = None
@@ -0,0 +1,188 @@
+"""
+DynamoDB consumed-capacity accounting for LINDA Lambda functions.
+
+instrument_client() makes every data call on a low-level client request
+ReturnConsumedCapacity=TOTAL and records the RCU/WCU it reports (1 WCU for
+a failed conditional write, which reports none) against the current route
+(set per invocation by metered_handler / set_route) and the innermost
+@tracked helper. At the end of each invocation the totals are
+printed as CloudWatch Embedded Metric Format lines (namespace LINDA,
+dimensions Route+Helper and Route), one per route/helper pair.
+"""
+
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from contextvars import ContextVar
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CAPACITY_METRICS_NAMESPACE = os.environ.get('CAPACITY_METRICS_NAMESPACE', 'LINDA')
+CAPACITY_METRICS_ENABLED = os.environ.get('CAPACITY_METRICS', 'on').lower() != 'off'
+
+READ_OPERATIONS = frozenset({'GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems'})
+WRITE_OPERATIONS = frozenset({'PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'})
+
+_route: ContextVar[str] = ContextVar('capacity_route', default='unrouted')
+_helper: ContextVar[str] = ContextVar('capacity_helper', default='direct')
+
+
+class CapacityMeter:
+    """Consumed capacity per (route, helper), with a per-table breakdown."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.usage: dict[tuple[str, str], dict] = {}
+
+    def record(self, route: str, helper: str, table: str, rcu: float, wcu: float) -> None:
+        with self._lock:
+            entry = self.usage.setdefault((route, helper), {'rcu': 0.0, 'wcu': 0.0, 'calls': 0, 'tables': {}})
+            entry['rcu'] += rcu
+            entry['wcu'] += wcu
+            entry['calls'] += 1
+            per_table = entry['tables'].setdefault(table, {'rcu': 0.0, 'wcu': 0.0})
+            per_table['rcu'] += rcu
+            per_table['wcu'] += wcu
+
+    def snapshot(self) -> list[dict]:
+        """Rows of {route, helper, rcu, wcu, calls, tables}, most expensive first."""
+        with self._lock:
+            rows = [
+                {'route': route, 'helper': helper, **json.loads(json.dumps(entry))}
+                for (route, helper), entry in self.usage.items()
+            ]
+        return sorted(rows, key=lambda row: row['rcu'] + row['wcu'], reverse=True)
+
+    def totals(self) -> dict:
+        rows = self.snapshot()
+        return {
+            'rcu': sum(row['rcu'] for row in rows),
+            'wcu': sum(row['wcu'] for row in rows),
+            'calls': sum(row['calls'] for row in rows),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.usage.clear()
+
+
+meter = CapacityMeter()
+
+
+def _request_capacity(params, model, context=None, **kwargs):
+    if model.name in READ_OPERATIONS or model.name in WRITE_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+        if context is not None:
+            context['capacity_table'] = params.get('TableName', '?')
+
+
+def _record_capacity(parsed, model, context=None, **kwargs):
+    if not isinstance(parsed, dict):
+        return
+    error_code = parsed.get('Error', {}).get('Code')
+    if error_code == 'ConditionalCheckFailedException':
+        # Failed conditional writes report no capacity but are billed at least 1 WCU
+        meter.record(_route.get(), _helper.get(), (context or {}).get('capacity_table', '?'), 0.0, 1.0)
+        return
+    consumed = parsed.get('ConsumedCapacity')
+    if not consumed:
+        return
+    is_write = model.name in WRITE_OPERATIONS
+    for entry in consumed if isinstance(consumed, list) else [consumed]:
+        units = float(entry.get('CapacityUnits', 0))
+        rcu = entry.get('ReadCapacityUnits')
+        wcu = entry.get('WriteCapacityUnits')
+        if rcu is None and wcu is None:
+            rcu, wcu = (0.0, units) if is_write else (units, 0.0)
+        meter.record(_route.get(), _helper.get(), entry.get('TableName', '?'), float(rcu or 0), float(wcu or 0))
+
+
+def instrument_client(client):
+    """Request and record consumed capacity on every data call of a low-level DynamoDB client."""
+    if CAPACITY_METRICS_ENABLED and not getattr(client, '_linda_capacity', False):
+        client.meta.events.register('provide-client-params.dynamodb.*', _request_capacity)
+        client.meta.events.register('after-call.dynamodb.*', _record_capacity)
+        client._linda_capacity = True
+    return client
+
+
+def set_route(route: str) -> None:
+    """Name the route for the rest of this invocation (e.g. 'scheduler POST booking')."""
+    _route.set(route)
+
+
+def tracked(helper: str | None = None):
+    """Attribute DynamoDB calls made inside the decorated function to it (innermost wins)."""
+    def decorate(func):
+        name = helper or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _helper.set(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _helper.reset(token)
+        return wrapper
+    return decorate
+
+
+def emit_metrics() -> list[dict]:
+    """Print one EMF line per route/helper recorded since the last reset; returns the rows."""
+    rows = meter.snapshot()
+    if not CAPACITY_METRICS_ENABLED:
+        return rows
+    timestamp = int(time.time() * 1000)
+    for row in rows:
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': CAPACITY_METRICS_NAMESPACE,
+                    'Dimensions': [['Route', 'Helper'], ['Route']],
+                    'Metrics': [
+                        {'Name': 'ConsumedRCU', 'Unit': 'Count'},
+                        {'Name': 'ConsumedWCU', 'Unit': 'Count'},
+                        {'Name': 'DynamoDBCalls', 'Unit': 'Count'},
+                    ],
+                }],
+            },
+            'Route': row['route'],
+            'Helper': row['helper'],
+            'ConsumedRCU': row['rcu'],
+            'ConsumedWCU': row['wcu'],
+            'DynamoDBCalls': row['calls'],
+            'Tables': row['tables'],
+        }))
+    if rows:
+        totals = meter.totals()
+        logger.info(f"Consumed capacity: {totals['rcu']:.1f} RCU, {totals['wcu']:.1f} WCU in {totals['calls']} calls")
+    return rows
+
+
+def metered_handler(function_name: str):
+    """
+    Wrap a Lambda handler: capacity is reset per invocation, attributed to
+    '<function> <METHOD>' unless the handler calls set_route(), and emitted on exit.
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            meter.reset()
+            method = ((event or {}).get('requestContext', {}).get('http', {}).get('method')
+                      or (event or {}).get('httpMethod') or '')
+            token = _route.set(f"{function_name} {method.upper()}".strip())
+            try:
+                return handler(event, context)
+            finally:
+                try:
+                    emit_metrics()
+                except Exception as e:
+                    logger.warning(f"Capacity metrics emit failed: {e}")
+                _route.reset(token)
+        return wrapper
+    return decorate
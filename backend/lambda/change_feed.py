@@ -0,0 +1,366 @@
+"""
+Change feed for invalidating warm-container caches in LINDA Lambda functions.
+
+Every write to a cached item bumps a tiny per-key counter in the feed; the
+compact event is (table, key, version), where key is the item's partition key.
+Readers hold a WarmCache with a long TTL and, at most once per check interval,
+compare the counters of everything they cache in a single BatchGetItem.
+
+Feeds:
+  - dynamodb: LINDA_Change_Feed table, fed by stream_handler from the DynamoDB
+              Streams of the source tables (so dashboard and frontend writes
+              that bypass these Lambdas are seen too)
+  - memory / sqlite: local stand-ins; utils writers publish directly, since
+              there is no stream to emulate
+Select with CHANGE_FEED=dynamodb|memory|sqlite|off (default follows STORAGE_BACKEND).
+
+Tables in AGGREGATE_TABLES also bump one per-tenant aggregate key (ANY_KEY)
+with every change, so wait_for_change() can long-poll "anything new in the
+schedule or the leads?" with a single tiny read per tick.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+import boto3
+
+from capacity import instrument_client, metered_handler, tracked
+from ddb_codec import ItemCodec, decode_value
+from storage import REGION, REPAIRS_LEAD_LOG_TABLE, BRANDON_STATE_LOG_TABLE, SCHEDULE_TABLE
+from tenancy import split_tenant_key, tenant_key
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CHANGE_FEED_TABLE = os.environ.get('CHANGE_FEED_TABLE', 'LINDA_Change_Feed')
+# Same as deploy_all.py sets; WARM_CACHE_TTL_SECONDS=0 turns the warm cache off
+WARM_CACHE_TTL_SECONDS = int(os.environ.get('WARM_CACHE_TTL_SECONDS', '300'))
+WARM_CACHE_CHECK_SECONDS = float(os.environ.get('WARM_CACHE_CHECK_SECONDS', '1'))
+# Version reads per second while a long-poll waits (one BatchGetItem each)
+WATCH_POLL_SECONDS = float(os.environ.get('WATCH_POLL_SECONDS', '0.5'))
+
+# Partition key per source table; cache granularity is one partition
+PARTITION_KEYS = {
+    BRANDON_STATE_LOG_TABLE: 'state_id',
+    SCHEDULE_TABLE: 'schedule_date',
+    REPAIRS_LEAD_LOG_TABLE: 'lead_id',
+}
+
+# Tables whose changes also bump the owning tenant's aggregate key
+AGGREGATE_TABLES = {SCHEDULE_TABLE, REPAIRS_LEAD_LOG_TABLE}
+ANY_KEY = '*'
+
+FEED_CODEC = ItemCodec(string_fields=('feed_key', 'table', 'key'), int_fields=('version', 'changed_at'))
+
+
+def feed_key(table: str, key: str) -> str:
+    return f"{table}|{key}"
+
+
+def with_aggregates(table: str, keys: list[str]) -> list[str]:
+    """keys plus, for AGGREGATE_TABLES, the aggregate key of each tenant that owns one."""
+    if table not in AGGREGATE_TABLES:
+        return keys
+    return keys + sorted({tenant_key(ANY_KEY, split_tenant_key(key)[0]) for key in keys})
+
+
+class ChangeFeed:
+    """Interface implemented by every feed."""
+
+    name = 'base'
+    # Whether utils writers publish directly (True for local stand-ins)
+    publishes_on_write = False
+
+    def publish(self, table: str, keys: list[str]) -> dict[str, int]:
+        """Bump the version of each (table, key); returns {feed_key: new_version}."""
+        raise NotImplementedError
+
+    def current_versions(self, feed_keys: list[str]) -> dict[str, int]:
+        """Current version per feed key; keys never published are omitted (version 0)."""
+        raise NotImplementedError
+
+
+class DynamoDBChangeFeed(ChangeFeed):
+    """LINDA_Change_Feed table: feed_key (HASH), version (N), changed_at (N)."""
+
+    name = 'dynamodb'
+
+    def __init__(self, client=None):
+        self.client = instrument_client(client or boto3.client('dynamodb', region_name=REGION))
+
+    @tracked('change_feed')
+    def publish(self, table: str, keys: list[str]) -> dict[str, int]:
+        versions = {}
+        now_ts = int(time.time())
+        for key in dict.fromkeys(keys):
+            response = self.client.update_item(
+                TableName=CHANGE_FEED_TABLE,
+                Key={'feed_key': {'S': feed_key(table, key)}},
+                UpdateExpression='ADD version :one SET changed_at = :now, #table = :table, #key = :key',
+                ExpressionAttributeNames={'#table': 'table', '#key': 'key'},
+                ExpressionAttributeValues={
+                    ':one': {'N': '1'},
+                    ':now': {'N': str(now_ts)},
+                    ':table': {'S': table},
+                    ':key': {'S': key},
+                },
+                ReturnValues='UPDATED_NEW',
+            )
+            versions[feed_key(table, key)] = int(response['Attributes']['version']['N'])
+        return versions
+
+    @tracked('change_feed')
+    def current_versions(self, feed_keys: list[str]) -> dict[str, int]:
+        versions = {}
+        # BatchGetItem takes up to 100 keys per request
+        for start in range(0, len(feed_keys), 100):
+            request = {
+                CHANGE_FEED_TABLE: {
+                    'Keys': [{'feed_key': {'S': key}} for key in feed_keys[start:start + 100]],
+                    'ProjectionExpression': 'feed_key, version',
+                }
+            }
+            while request:
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in FEED_CODEC.decode_many(response.get('Responses', {}).get(CHANGE_FEED_TABLE, [])):
+                    versions[item['feed_key']] = item['version']
+                request = response.get('UnprocessedKeys') or None
+        return versions
+
+
+class MemoryChangeFeed(ChangeFeed):
+    """Process-local stand-in."""
+
+    name = 'memory'
+    publishes_on_write = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.versions: dict[str, int] = {}
+
+    def publish(self, table: str, keys: list[str]) -> dict[str, int]:
+        with self._lock:
+            published = {}
+            for key in dict.fromkeys(keys):
+                name = feed_key(table, key)
+                self.versions[name] = self.versions.get(name, 0) + 1
+                published[name] = self.versions[name]
+            return published
+
+    def current_versions(self, feed_keys: list[str]) -> dict[str, int]:
+        with self._lock:
+            return {key: self.versions[key] for key in feed_keys if key in self.versions}
+
+
+class SQLiteChangeFeed(ChangeFeed):
+    """File-backed stand-in, shared by local processes (e.g. alongside the sqlite storage engine)."""
+
+    name = 'sqlite'
+    publishes_on_write = True
+
+    def __init__(self, path: str = ':memory:'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS change_feed (feed_key TEXT PRIMARY KEY, version INTEGER NOT NULL, changed_at INTEGER NOT NULL)'
+        )
+
+    def publish(self, table: str, keys: list[str]) -> dict[str, int]:
+        now_ts = int(time.time())
+        published = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                name = feed_key(table, key)
+                self._conn.execute(
+                    'INSERT INTO change_feed (feed_key, version, changed_at) VALUES (?, 1, ?) '
+                    'ON CONFLICT(feed_key) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at',
+                    (name, now_ts),
+                )
+                published[name] = self._conn.execute('SELECT version FROM change_feed WHERE feed_key = ?', (name,)).fetchone()[0]
+        return published
+
+    def current_versions(self, feed_keys: list[str]) -> dict[str, int]:
+        if not feed_keys:
+            return {}
+        placeholders = ', '.join('?' for _ in feed_keys)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT feed_key, version FROM change_feed WHERE feed_key IN ({placeholders})',
+                tuple(feed_keys),
+            ).fetchall()
+        return dict(rows)
+
+
+# ---------------------------------------------------------------------------
+# Selection
+# ---------------------------------------------------------------------------
+
+_feed: ChangeFeed | None = None
+_feed_configured = False
+
+
+def create_feed(kind: str) -> ChangeFeed | None:
+    kind = kind.lower()
+    if kind == 'off':
+        return None
+    if kind == 'dynamodb':
+        return DynamoDBChangeFeed()
+    if kind == 'memory':
+        return MemoryChangeFeed()
+    if kind == 'sqlite':
+        return SQLiteChangeFeed(os.environ.get('SQLITE_PATH', ':memory:'))
+    raise ValueError(f"Unknown change feed: {kind}")
+
+
+def get_feed() -> ChangeFeed | None:
+    """Active feed (None when disabled), created from CHANGE_FEED on first use."""
+    global _feed, _feed_configured
+    if not _feed_configured:
+        default = os.environ.get('STORAGE_BACKEND', 'dynamodb')
+        _feed = create_feed(os.environ.get('CHANGE_FEED', default))
+        _feed_configured = True
+    return _feed
+
+
+def set_feed(feed: ChangeFeed | None) -> None:
+    global _feed, _feed_configured
+    _feed = feed
+    _feed_configured = True
+
+
+def record_write(table: str, key: str) -> None:
+    """
+    Called by utils writers after a successful write. Local feeds publish here;
+    the DynamoDB feed is fed by stream_handler instead. Never fails the write.
+    """
+    feed = get_feed()
+    if feed is None or not feed.publishes_on_write:
+        return
+    try:
+        feed.publish(table, with_aggregates(table, [key]))
+    except Exception as e:
+        logger.warning(f"Change feed publish failed for {table}/{key}: {e}")
+
+
+def wait_for_change(feed_keys: list[str], since: dict[str, int] | None, timeout_seconds: float,
+                    poll_seconds: float = WATCH_POLL_SECONDS) -> dict[str, int]:
+    """
+    Long-poll: current versions of feed_keys (0 if never published) once any
+    differs from since, or when timeout_seconds pass. since=None returns at
+    once. Each tick is one current_versions() read, never the items
+    themselves. Raises RuntimeError when the feed is off.
+    """
+    feed = get_feed()
+    if feed is None:
+        raise RuntimeError("Change feed is off; nothing to wait on")
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        versions = feed.current_versions(feed_keys)
+        current = {key: versions.get(key, 0) for key in feed_keys}
+        remaining = deadline - time.monotonic()
+        if since is None or current != since or remaining <= 0:
+            return current
+        time.sleep(min(poll_seconds, remaining))
+
+
+# ---------------------------------------------------------------------------
+# Warm cache
+# ---------------------------------------------------------------------------
+
+class WarmCache:
+    """
+    Per-container cache keyed by (table, partition key).
+    Entries live up to ttl_seconds but are dropped as soon as a version check
+    (at most every check_seconds, one batched read for all entries) shows a change.
+    Any feed error bypasses the cache rather than serving possibly stale data.
+    """
+
+    def __init__(self, ttl_seconds: float = WARM_CACHE_TTL_SECONDS, check_seconds: float = WARM_CACHE_CHECK_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple] = {}  # feed_key -> (value, loaded_at, version)
+        self._last_check = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _copy(self, value):
+        return json.loads(json.dumps(value))
+
+    def _check_versions(self, feed: ChangeFeed, now: float) -> None:
+        if now - self._last_check < self.check_seconds or not self._entries:
+            return
+        keys = list(self._entries)
+        versions = feed.current_versions(keys)
+        self._last_check = now
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and versions.get(key, 0) != entry[2]:
+                del self._entries[key]
+
+    def get(self, table: str, key: str, loader):
+        feed = get_feed()
+        if feed is None or self.ttl_seconds <= 0:
+            return loader()
+
+        name = feed_key(table, key)
+        now = time.monotonic()
+        try:
+            with self._lock:
+                self._check_versions(feed, now)
+                entry = self._entries.get(name)
+                if entry is not None and now - entry[1] < self.ttl_seconds:
+                    self.hits += 1
+                    return self._copy(entry[0])
+            # Read the version before loading so a concurrent write is never masked
+            version = feed.current_versions([name]).get(name, 0)
+        except Exception as e:
+            logger.warning(f"Change feed check failed, bypassing cache: {e}")
+            return loader()
+
+        value = loader()
+        with self._lock:
+            self.misses += 1
+            self._entries[name] = (self._copy(value), now, version)
+        return value
+
+    def invalidate(self, table: str, key: str) -> None:
+        with self._lock:
+            self._entries.pop(feed_key(table, key), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._last_check = 0.0
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB Streams consumer
+# ---------------------------------------------------------------------------
+
+@metered_handler('change-feed')
+def stream_handler(event, context):
+    """
+    Lambda for DynamoDB Streams (KEYS_ONLY is enough) on the state, schedule
+    and leads tables. Collapses each batch to one feed bump per changed partition.
+    """
+    changed: dict[str, list[str]] = {}
+    for record in event.get('Records', []):
+        table = record.get('eventSourceARN', '').split(':table/')[-1].split('/')[0]
+        partition_key = PARTITION_KEYS.get(table)
+        keys = record.get('dynamodb', {}).get('Keys', {})
+        if not partition_key or partition_key not in keys:
+            continue
+        changed.setdefault(table, []).append(str(decode_value(keys[partition_key])))
+
+    feed = get_feed() or DynamoDBChangeFeed()
+    published = {}
+    for table, keys in changed.items():
+        published.update(feed.publish(table, with_aggregates(table, keys)))
+
+    logger.info(f"Published {len(published)} change events")
+    return {'published': len(published)}
@@ -0,0 +1,178 @@
+"""
+Low-level DynamoDB attribute codec for LINDA Lambda functions.
+Converts wire-format attribute values ({'S': ...}, {'N': ...}) straight to
+JSON-ready Python types and back, skipping the resource layer's Decimals.
+"""
+
+import math
+import base64
+
+from lead_format import unpack_lead
+
+
+def _decode_number(text: str):
+    """Decode a DynamoDB number string to int when integral, else float."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _decode_int(text: str) -> int:
+    """Decode a number attribute known to hold an integer (epoch seconds, counters)."""
+    try:
+        return int(text)
+    except ValueError:
+        return int(float(text))
+
+
+def _encode_number(value) -> str:
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            raise ValueError(f"DynamoDB cannot store non-finite number: {value}")
+        if value.is_integer():
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+def _decode_binary(raw) -> str:
+    """Binary attribute -> base64 text, so decoded items stay JSON-serializable."""
+    return base64.b64encode(raw).decode('ascii')
+
+
+def decode_value(attr: dict):
+    """
+    Decode one wire-format attribute value to a JSON-ready Python value.
+    B/BS come back as base64 strings; base64.b64decode() recovers the bytes.
+    """
+    (type_code, raw), = attr.items()
+    if type_code == 'S':
+        return raw
+    if type_code == 'N':
+        return _decode_number(raw)
+    if type_code == 'BOOL':
+        return raw
+    if type_code == 'NULL':
+        return None
+    if type_code == 'M':
+        return {key: decode_value(value) for key, value in raw.items()}
+    if type_code == 'L':
+        return [decode_value(value) for value in raw]
+    if type_code == 'SS':
+        return list(raw)
+    if type_code == 'NS':
+        return [_decode_number(value) for value in raw]
+    if type_code == 'B':
+        return _decode_binary(raw)
+    if type_code == 'BS':
+        return [_decode_binary(value) for value in raw]
+    raise ValueError(f"Unsupported DynamoDB attribute type: {type_code}")
+
+
+def encode_value(value) -> dict:
+    """Encode a plain Python value to a wire-format attribute value."""
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float)):
+        return {'N': _encode_number(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, dict):
+        return {'M': {key: encode_value(item) for key, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [encode_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(item, str) for item in value):
+            return {'SS': sorted(value)}
+        return {'NS': [_encode_number(item) for item in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    # Decimal and other numeric types fall through to their string form
+    return {'N': str(value)}
+
+
+class ItemCodec:
+    """
+    Codec for a known item schema.
+    Attributes listed in string_fields / int_fields are decoded without
+    type dispatch; everything else goes through the generic decoder.
+    unpack, when given, maps each decoded item to its application shape.
+    """
+
+    def __init__(self, string_fields: tuple = (), int_fields: tuple = (), unpack=None):
+        self.string_fields = frozenset(string_fields)
+        self.int_fields = frozenset(int_fields)
+        self.unpack = unpack
+
+    def decode(self, item: dict) -> dict:
+        """Wire item -> JSON-ready dict."""
+        decoded = {}
+        for name, attr in item.items():
+            if name in self.string_fields and 'S' in attr:
+                decoded[name] = attr['S']
+            elif name in self.int_fields and 'N' in attr:
+                decoded[name] = _decode_int(attr['N'])
+            else:
+                decoded[name] = decode_value(attr)
+        return self.unpack(decoded) if self.unpack else decoded
+
+    def decode_many(self, items: list) -> list:
+        decode = self.decode
+        return [decode(item) for item in items]
+
+    def encode(self, item: dict) -> dict:
+        """Plain dict -> wire item. None values are dropped, matching put_item usage."""
+        encoded = {}
+        for name, value in item.items():
+            if value is None:
+                continue
+            if name in self.string_fields and isinstance(value, str):
+                encoded[name] = {'S': value}
+            elif name in self.int_fields and isinstance(value, int) and not isinstance(value, bool):
+                encoded[name] = {'N': str(value)}
+            else:
+                encoded[name] = encode_value(value)
+        return encoded
+
+
+# Reads both lead formats (see lead_format.py); writes pack explicitly
+LEAD_CODEC = ItemCodec(
+    string_fields=('lead_id', 'phone', 'repair_type', 'device', 'appointment_date', 'appointment_time', 'status', 'lead_type',
+                   'rt', 'dv', 'st', 'lt', 'ap', 'open_queue', 'open_at'),
+    int_fields=('timestamp', 'created_at', 'status_updated_at'),
+    unpack=unpack_lead,
+)
+
+SCHEDULE_CODEC = ItemCodec(
+    string_fields=('schedule_date', 'slot_time', 'status', 'lead_id', 'phone', 'repair_type', 'device', 'hold_id',
+                   'taken_queue', 'slot_at'),
+    int_fields=('created_at', 'updated_at', 'hold_expires_at'),
+)
+
+STATE_CODEC = ItemCodec(
+    string_fields=('state_id', 'status', 'location', 'notes', 'special_info', 'voice', 'greeting'),
+    int_fields=('updated_at', 'version'),
+)
+
+EVENT_CODEC = ItemCodec(
+    string_fields=('event_id', 'event_type', 'event_date', 'phone', 'upsell_item', 'reason', 'lead_id'),
+    int_fields=('timestamp', 'created_at'),
+)
+
+COUNTER_CODEC = ItemCodec(
+    string_fields=('counter_key', 'counter_date', 'dimension', 'name'),
+    int_fields=('updated_at', 'upsell_offered', 'upsell_accepted', 'discount_requested', 'discount_approved'),
+)
+
+PROFILE_CODEC = ItemCodec(
+    string_fields=('phone', 'last_device', 'last_repair_type', 'last_visit_date'),
+    int_fields=('updated_at', 'visit_count', 'upsell_offered', 'upsell_accepted', 'discount_requested', 'discount_approved'),
+)
+
+OUTBOX_CODEC = ItemCodec(
+    string_fields=('outbox_id', 'effect', 'tenant', 'lead_id', 'outbox_queue', 'last_error'),
+    int_fields=('created_at', 'next_attempt_at', 'attempts', 'failed_at'),
+)
@@ -6,16 +6,31 @@ Routes messages to OpenAI with function calling.
 import os
 import json
 import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import parse_qs
 from twilio.twiml.messaging_response import MessagingResponse
 from openai import OpenAI
 
+from capacity import metered_handler
+from tenancy import set_tenant, tenant_config, tenant_for_number
 from utils import (
     create_lambda_response,
     get_brandon_state,
+    get_customer_profile,
+    get_availability,
+    availability_snapshots,
+    preferred_profile_times,
     create_booking,
     get_available_slots,
+    hold_slot,
+    next_available,
+    normalize_phone,
     query_leads_for_date,
+    record_discount,
+    record_upsell,
+    flush_sales_events,
+    SLOT_HOLD_SECONDS,
     DecimalEncoder
 )
 
@@ -25,6 +40,17 @@ logger.setLevel(logging.INFO)
 # Initialize OpenAI client
 openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
 
+DEFAULT_SHOP_NAME = 'EmperorLinda Cell Phone Repairs'
+
+TENTATIVE_AVAILABILITY_NOTICE = """
+--- AVAILABILITY IS TENTATIVE ---
+The booking system is having trouble. Slot lists come from the last known schedule and may be out of date.
+Tell the customer any time you offer is tentative until the booking is confirmed; if booking fails, offer another time.
+--- END NOTICE ---"""
+
+# Reused across warm invocations to read Brandon's state alongside the customer profile
+context_pool = ThreadPoolExecutor(max_workers=1)
+
 # Load function schemas inline
 FUNCTION_SCHEMAS = [
     {
@@ -43,6 +69,50 @@ FUNCTION_SCHEMAS = [
             "additionalProperties": False
         }
     },
+    {
+        "type": "function",
+        "name": "next_available",
+        "description": "Find the earliest open repair slots across upcoming days in one call. Use this for 'when is your next opening?' instead of checking dates one by one.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "after_date": {
+                    "type": "string",
+                    "description": "First date to consider, in YYYY-MM-DD format (defaults to today)"
+                },
+                "after_time": {
+                    "type": "string",
+                    "description": "Earliest time on after_date (e.g., '2:00 PM'); omit to start at opening"
+                },
+                "count": {
+                    "type": "integer",
+                    "description": "How many openings to return (1-5, default 3)"
+                }
+            },
+            "required": [],
+            "additionalProperties": False
+        }
+    },
+    {
+        "type": "function",
+        "name": "hold_slot",
+        "description": f"Hold a specific time slot for this customer for {SLOT_HOLD_SECONDS // 60} minutes while they confirm. Call this when offering a specific time so nobody else takes it.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "date": {
+                    "type": "string",
+                    "description": "Appointment date in YYYY-MM-DD format"
+                },
+                "time": {
+                    "type": "string",
+                    "description": "Appointment time exactly as returned by check_availability (e.g., '2:00 PM')"
+                }
+            },
+            "required": ["date", "time"],
+            "additionalProperties": False
+        }
+    },
     {
         "type": "function",
         "name": "book_slot",
@@ -69,6 +139,10 @@ FUNCTION_SCHEMAS = [
                 "device": {
                     "type": "string",
                     "description": "Device model (e.g., 'iPhone 14 Pro', 'Samsung Galaxy S23')"
+                },
+                "quoted_price": {
+                    "type": "number",
+                    "description": "Repair price quoted to the customer in dollars, if one was given"
                 }
             },
             "required": ["date", "time", "phone", "repair_type"],
@@ -114,6 +188,10 @@ FUNCTION_SCHEMAS = [
                     "type": "boolean",
                     "description": "Whether customer accepted the upsell"
                 },
+                "price": {
+                    "type": "number",
+                    "description": "Price of the item in dollars, if known"
+                },
                 "phone": {
                     "type": "string",
                     "description": "Customer phone number"
@@ -126,20 +204,67 @@ FUNCTION_SCHEMAS = [
 ]
 
 
-def execute_function(function_name: str, arguments: dict) -> dict:
-    """Execute a function based on name and arguments"""
+def execute_function(function_name: str, arguments: dict, caller_phone: str | None = None) -> dict:
+    """
+    Execute a function based on name and arguments.
+    caller_phone identifies the conversation; slot holds are keyed on it.
+    """
     logger.info(f"Executing function: {function_name} with args: {arguments}")
+    holder = normalize_phone(caller_phone or arguments.get("phone") or "") or None
     
     try:
         if function_name == "check_availability":
             date = arguments.get("date")
-            slots = get_available_slots(date)
-            return {
+            availability = get_availability(date, holder=holder)
+            slots = availability["slots"]
+            result = {
                 "success": True,
                 "date": date,
                 "available_slots": slots,
                 "message": f"Available slots on {date}: {', '.join(slots)}"
             }
+            if availability["stale"]:
+                # Storage is failing: these come from the last known schedule (or the default list)
+                result["tentative"] = True
+                result["as_of"] = availability["as_of"]
+                result["message"] += ". Tentative: the live schedule is unavailable, so confirm the time when booking."
+            return result
+        
+        elif function_name == "next_available":
+            count = min(max(int(arguments.get("count") or 3), 1), 5)
+            openings = next_available(count, arguments.get("after_date"), arguments.get("after_time"), holder=holder)
+            return {
+                "success": True,
+                "openings": openings,
+                "message": "Next openings: " + ", ".join(f"{opening['date']} at {opening['time']}" for opening in openings)
+                if openings else "No openings in the booking window"
+            }
+        
+        elif function_name == "hold_slot":
+            date = arguments.get("date")
+            time = arguments.get("time")
+            if not holder:
+                return {
+                    "success": False,
+                    "message": "Cannot hold a slot without the customer's phone number"
+                }
+
+            hold = hold_slot(date, time, holder)
+            if hold["held"]:
+                return {
+                    "success": True,
+                    "date": date,
+                    "time": time,
+                    "hold_seconds": SLOT_HOLD_SECONDS,
+                    "message": f"{date} at {time} is held for this customer for {SLOT_HOLD_SECONDS // 60} minutes"
+                }
+            return {
+                "success": False,
+                "date": date,
+                "time": time,
+                "available_slots": get_available_slots(date, holder=holder),
+                "message": f"{date} at {time} was just taken. Offer one of the available slots instead."
+            }
         
         elif function_name == "book_slot":
             date = arguments.get("date")
@@ -148,7 +273,8 @@ def execute_function(function_name: str, arguments: dict) -> dict:
             repair_type = arguments.get("repair_type")
             device = arguments.get("device", "Unknown Device")
 
-            lead_id = create_booking(phone, repair_type, device, date, time)
+            lead_id = create_booking(phone, repair_type, device, date, time, holder=holder,
+                                     quoted_price=arguments.get("quoted_price"))
             return {
                 "success": True,
                 "lead_id": lead_id,
@@ -164,7 +290,9 @@ def execute_function(function_name: str, arguments: dict) -> dict:
             phone = arguments.get("phone")
             
             # For demo: approve discounts <= 15%, ask Brandon for > 15%
-            if discount_percent <= 15:
+            approved = discount_percent <= 15
+            record_discount(discount_percent, reason, approved, phone or holder)
+            if approved:
                 return {
                     "success": True,
                     "approved": True,
@@ -184,6 +312,7 @@ def execute_function(function_name: str, arguments: dict) -> dict:
             accepted = arguments.get("accepted")
             phone = arguments.get("phone")
             
+            record_upsell(upsell_item, accepted, phone or holder, price=arguments.get("price"))
             return {
                 "success": True,
                 "upsell_item": upsell_item,
@@ -206,6 +335,40 @@ def execute_function(function_name: str, arguments: dict) -> dict:
         }
 
 
+def load_prompt_context(phone: str) -> tuple[dict, dict | None]:
+    """Brandon's state and the texter's profile, read concurrently (one GetItem each)."""
+    state_future = context_pool.submit(contextvars.copy_context().run, get_brandon_state)
+    profile = get_customer_profile(phone)
+    return state_future.result(), profile
+
+
+def render_profile_block(profile: dict | None) -> str:
+    """Compact prompt block describing the texter from their materialized profile."""
+    visits = (profile or {}).get('visit_count', 0)
+    if not visits:
+        return "Customer profile: new customer (no previous bookings). Ask which device they have."
+
+    lines = [f"Returning customer: {visits} previous booking{'s' if visits != 1 else ''}"
+             + (f", last on {profile['last_visit_date']}" if profile.get('last_visit_date') else '')]
+    if profile.get('last_device'):
+        last_repair = f" ({profile['last_repair_type']})" if profile.get('last_repair_type') else ''
+        lines.append(f"Last device: {profile['last_device']}{last_repair}")
+    slot, day = preferred_profile_times(profile)
+    if slot or day:
+        lines.append(f"Usually books: {' '.join(part for part in (day, slot) if part)}")
+    if profile.get('lifetime_value'):
+        lines.append(f"Lifetime value: ${profile['lifetime_value']:,.0f}")
+    if profile.get('upsell_offered'):
+        lines.append(f"Upsells accepted: {profile.get('upsell_accepted', 0)}/{profile['upsell_offered']}")
+    if profile.get('discount_requested'):
+        lines.append(f"Discounts requested: {profile['discount_requested']}")
+    return f"""--- CUSTOMER PROFILE ---
+{chr(10).join(lines)}
+--- END PROFILE ---
+Greet them as a returning customer. Confirm the device above instead of asking for it, and offer their usual time first when it is free."""
+
+
+@metered_handler('dispatcher')
 def handler(event, context):
     """
     Main Lambda handler for Twilio webhook.
@@ -223,6 +386,7 @@ def handler(event, context):
         
         twilio_params = parse_qs(body)
         from_phone = twilio_params.get('From', [''])[0]
+        to_phone = twilio_params.get('To', [''])[0]
         message_body = twilio_params.get('Body', [''])[0]
         message_sid = twilio_params.get('MessageSid', [''])[0]
         
@@ -232,9 +396,15 @@ def handler(event, context):
             logger.error("Missing From or Body in Twilio webhook")
             return create_lambda_response(400, {'error': 'Missing required parameters'})
         
-        # Fetch Brandon's current state for context
-        brandon_state = get_brandon_state()
+        # The number the customer texted picks the shop; everything below is scoped to it
+        set_tenant(tenant_for_number(to_phone))
+        shop_name = tenant_config().get('name', DEFAULT_SHOP_NAME)
+
+        # Fetch Brandon's current state and the customer's profile for context
+        brandon_state, profile = load_prompt_context(from_phone)
         logger.info(f"Brandon state: {brandon_state}")
+        profile_block = render_profile_block(profile)
+        availability_notice = TENTATIVE_AVAILABILITY_NOTICE if availability_snapshots.outage_recent() else ''
         
         # Prepare context for OpenAI
         special_info = brandon_state.get('special_info', '').strip()
@@ -248,18 +418,19 @@ def handler(event, context):
 Weave the above info into conversations when relevant. Don't read it verbatim — reference deals, events, or updates naturally when the topic fits. If a bulletin mentions a closure or schedule change, proactively inform the customer."""
 
         context_prompt = f"""
-You are LINDA, an AI assistant for EmperorLinda Cell Phone Repairs.
+You are LINDA, an AI assistant for {shop_name}.
 Brandon's current status: {brandon_state.get('status', 'available')}
 Brandon's location: {brandon_state.get('location', 'shop')}
 Brandon's notes: {brandon_state.get('notes', 'None')}
-{special_info_block}
+{special_info_block}{availability_notice}
 
 Customer message: {message_body}
 Customer phone: {from_phone}
+{profile_block}
 
 Use available functions to:
 1. Check booking availability
-2. Book appointments
+2. Hold the specific slot you offer, then book it once the customer confirms
 3. Offer upsells (screen protectors, cases)
 4. Log upsells and requests
 
@@ -292,13 +463,16 @@ Respond naturally and helpfully. If booking, always confirm the details.
             for fc in function_calls:
                 func_name = fc.name
                 args = json.loads(fc.arguments) if isinstance(fc.arguments, str) else fc.arguments
-                func_result = execute_function(func_name, args)
+                func_result = execute_function(func_name, args, caller_phone=from_phone)
                 logger.info(f"Function {func_name} result: {func_result}")
                 function_results.append({
                     "type": "function_call_output",
                     "call_id": fc.call_id,
                     "output": json.dumps(func_result, cls=DecimalEncoder)
                 })
+                if func_result.get("tentative") and not availability_notice:
+                    availability_notice = TENTATIVE_AVAILABILITY_NOTICE
+                    context_prompt += availability_notice
             
             # Send function results back to get the final response
             response = openai_client.responses.create(
@@ -341,3 +515,7 @@ Respond naturally and helpfully. If booking, always confirm the details.
                 'Content-Type': 'text/xml'
             }
         }
+    
+    finally:
+        # Persist upsell/discount events logged by tool calls in one batch
+        flush_sales_events()
@@ -0,0 +1,118 @@
+"""
+Compact on-disk format for Repairs_Lead_Log items.
+
+Format 2 items (marked fv=2) store descriptive attributes under short names
+and pack appointment_date/appointment_time into one 'ap' value
+("YYYY-MM-DD h:MM AM"). Key and index attributes (lead_id, timestamp, phone,
+created_at) keep their names: the table key and the phone GSI are defined
+on them. Items without fv are the original long-named format 1.
+
+Application code never sees the short names: LEAD_CODEC unpacks on every
+DynamoDB read, DynamoDBBackend.put_lead packs on write, and Lead gives typed
+access to either format. LEAD_ITEM_FORMAT=legacy turns compact writes off.
+"""
+
+import os
+from dataclasses import dataclass, field, fields
+
+LEAD_FORMAT_VERSION = 2
+FORMAT_ATTRIBUTE = 'fv'
+APPOINTMENT_ATTRIBUTE = 'ap'
+COMPACT_LEAD_WRITES = os.environ.get('LEAD_ITEM_FORMAT', 'compact').lower() != 'legacy'
+
+# Long name -> short name for attributes that are renamed as-is
+COMPACT_NAMES = {
+    'repair_type': 'rt',
+    'device': 'dv',
+    'status': 'st',
+    'lead_type': 'lt',
+    'customer_name': 'cn',
+    'source': 'src',
+    'notes': 'nt',
+}
+EXPANDED_NAMES = {short: long for long, short in COMPACT_NAMES.items()}
+
+
+def pack_appointment(date: str | None, time: str | None) -> str | None:
+    if not date:
+        return None
+    return f"{date} {time}" if time else date
+
+
+def unpack_appointment(value: str) -> tuple[str, str | None]:
+    date, _, time = value.partition(' ')
+    return date, time or None
+
+
+def pack_lead(lead: dict) -> dict:
+    """Long-named lead dict -> format 2 item (plain values; encode with LEAD_CODEC)."""
+    if FORMAT_ATTRIBUTE in lead:
+        return dict(lead)
+    packed = {FORMAT_ATTRIBUTE: LEAD_FORMAT_VERSION}
+    for name, value in lead.items():
+        if name in ('appointment_date', 'appointment_time'):
+            continue
+        packed[COMPACT_NAMES.get(name, name)] = value
+    appointment = pack_appointment(lead.get('appointment_date'), lead.get('appointment_time'))
+    if appointment is not None:
+        packed[APPOINTMENT_ATTRIBUTE] = appointment
+    elif lead.get('appointment_time') is not None:
+        packed['appointment_time'] = lead['appointment_time']
+    return packed
+
+
+def unpack_lead(item: dict) -> dict:
+    """Item in either format -> long-named lead dict."""
+    if FORMAT_ATTRIBUTE not in item:
+        return item
+    lead = {}
+    for name, value in item.items():
+        if name == FORMAT_ATTRIBUTE:
+            continue
+        if name == APPOINTMENT_ATTRIBUTE and isinstance(value, str):
+            lead['appointment_date'], time = unpack_appointment(value)
+            if time is not None:
+                lead['appointment_time'] = time
+            continue
+        lead[EXPANDED_NAMES.get(name, name)] = value
+    return lead
+
+
+@dataclass
+class Lead:
+    """Typed view of a lead; from_item() accepts either stored format."""
+
+    lead_id: str
+    timestamp: int
+    phone: str | None = None
+    repair_type: str | None = None
+    device: str | None = None
+    appointment_date: str | None = None
+    appointment_time: str | None = None
+    status: str | None = None
+    lead_type: str | None = None
+    created_at: int | None = None
+    status_updated_at: int | None = None
+    # Present only while the lead is open; they key the sparse open-leads index
+    open_queue: str | None = None
+    open_at: str | None = None
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_item(cls, item: dict) -> 'Lead':
+        lead = unpack_lead(item)
+        known = {spec.name for spec in fields(cls)} - {'extra'}
+        return cls(
+            **{name: value for name, value in lead.items() if name in known},
+            extra={name: value for name, value in lead.items() if name not in known},
+        )
+
+    def to_item(self) -> dict:
+        """Long-named dict without unset attributes (what storage backends accept)."""
+        item = {spec.name: getattr(self, spec.name) for spec in fields(self) if spec.name != 'extra'}
+        item = {name: value for name, value in item.items() if value is not None}
+        item.update(self.extra)
+        return item
+
+    def to_compact_item(self) -> dict:
+        return pack_lead(self.to_item())
@@ -0,0 +1,98 @@
+"""
+Time-sortable, collision-resistant lead identifiers for LINDA.
+
+IDs follow the ULID layout (48-bit millisecond timestamp + 80 random bits,
+Crockford base32) behind a readable prefix, e.g. LEAD-01KAB3Q0M8Z7W2XJ4N5RTY6V9C.
+IDs sort lexicographically by creation time and are strictly increasing
+within a process; the random component keeps separate containers apart.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+LEAD_ID_PREFIX = 'LEAD-'
+
+_CROCKFORD = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_DECODE = {char: index for index, char in enumerate(_CROCKFORD)}
+_ULID_LENGTH = 26
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _reset_after_fork() -> None:
+    """Forked children must not continue the parent's monotonic sequence."""
+    global _lock, _last_ms, _last_random
+    _lock = threading.Lock()
+    _last_ms = -1
+    _last_random = 0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _encode(value: int) -> str:
+    chars = [''] * _ULID_LENGTH
+    for index in range(_ULID_LENGTH - 1, -1, -1):
+        chars[index] = _CROCKFORD[value & 31]
+        value >>= 5
+    return ''.join(chars)
+
+
+def _decode(text: str) -> int:
+    value = 0
+    for char in text:
+        value = (value << 5) | _DECODE[char]
+    return value
+
+
+def new_lead_id(prefix: str = LEAD_ID_PREFIX) -> str:
+    """Generate a new monotonic ULID-style ID with the given prefix."""
+    global _last_ms, _last_random
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms <= _last_ms:
+            # Same millisecond (or clock stepped back): increment to stay monotonic
+            now_ms = _last_ms
+            random_part = _last_random + 1
+            if random_part > _RANDOM_MAX:
+                now_ms += 1
+                random_part = int.from_bytes(os.urandom(10), 'big') >> 1
+        else:
+            random_part = int.from_bytes(os.urandom(10), 'big')
+        _last_ms = now_ms
+        _last_random = random_part
+    return prefix + _encode((now_ms << _RANDOM_BITS) | random_part)
+
+
+def lead_id_created_at(lead_id: str, prefix: str = LEAD_ID_PREFIX) -> datetime | None:
+    """Return the creation time embedded in a ULID-style ID, or None for legacy IDs."""
+    if not lead_id.startswith(prefix):
+        return None
+    body = lead_id[len(prefix):]
+    if len(body) != _ULID_LENGTH or any(char not in _DECODE for char in body):
+        return None
+    timestamp_ms = _decode(body) >> _RANDOM_BITS
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+
+
+def lead_id_bounds(start: datetime, end: datetime, prefix: str = LEAD_ID_PREFIX) -> tuple[str, str]:
+    """
+    Inclusive lexicographic bounds covering every ID created in [start, end].
+    Use with BETWEEN on a lead_id sort key, or begins_with/>=/<= filters on scans.
+    Naive datetimes are treated as UTC, matching datetime.utcnow() elsewhere.
+    """
+    def to_ms(value: datetime) -> int:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+
+    low = prefix + _encode(to_ms(start) << _RANDOM_BITS)
+    high = prefix + _encode((to_ms(end) << _RANDOM_BITS) | _RANDOM_MAX)
+    return low, high
@@ -0,0 +1,179 @@
+"""
+Transactional outbox for side effects of LINDA bookings.
+
+create_booking writes the lead and one outbox record per side effect in a
+single transaction (StorageBackend.put_lead_with_outbox), then returns: the
+SMS/API response never waits on a side effect, and a side effect is never
+lost because its record commits with the lead. drain_outbox() delivers
+records later, in batches:
+
+  1. find due records (the sparse PENDING index) or take the IDs a stream
+     batch names
+  2. claim each one with a conditional lease, so concurrent drainers never
+     deliver the same record at once
+  3. run the effect's handler inside the tenant that wrote it; success
+     deletes the record, failure schedules a retry with exponential backoff
+     until OUTBOX_MAX_ATTEMPTS, after which the record is kept off the queue
+     with its last error for inspection
+
+Delivery is at-least-once: a handler can run again if the drainer dies (or
+the delete fails) between delivering and deleting, so each handler gets the
+record's outbox_id and must make a repeat a no-op; customer_profile writes
+the ID into the profile in the same conditional update as its deltas.
+
+On DynamoDB, drain_handler is fed by the outbox table's stream (new records
+go out within seconds) and by a once-a-minute schedule (retries and expired
+leases). Local engines have no stream: call drain_outbox() directly.
+"""
+
+import os
+import time
+import uuid
+import logging
+
+from capacity import metered_handler, set_route, tracked
+from storage import OUTBOX_QUEUE, get_backend, get_engine
+from tenancy import DEFAULT_TENANT, tenant_scope
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '25'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+# A claimed record becomes due again after this long if its drainer never reports back
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '120'))
+OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', '30'))
+OUTBOX_RETRY_MAX_SECONDS = int(os.environ.get('OUTBOX_RETRY_MAX_SECONDS', '3600'))
+# Sweeps per scheduled invocation, so a backlog drains without one batch per minute
+OUTBOX_MAX_BATCHES = int(os.environ.get('OUTBOX_MAX_BATCHES', '20'))
+
+# effect name -> handler(payload, outbox_id); handlers raise to request a retry
+_effects: dict = {}
+
+
+def effect(name: str):
+    """Register the decorated function as the handler for outbox records of this effect."""
+    def decorate(func):
+        _effects[name] = func
+        return func
+    return decorate
+
+
+def outbox_record(effect_name: str, payload: dict, lead_id: str | None = None, now_ts: int | None = None) -> dict:
+    """A new pending record, due immediately; pass it to put_lead_with_outbox."""
+    now_ts = int(time.time()) if now_ts is None else now_ts
+    record = {
+        'outbox_id': uuid.uuid4().hex,
+        'effect': effect_name,
+        'payload': payload,
+        'outbox_queue': OUTBOX_QUEUE,
+        'next_attempt_at': now_ts,
+        'attempts': 0,
+        'created_at': now_ts,
+    }
+    if lead_id:
+        record['lead_id'] = lead_id
+    return record
+
+
+def retry_delay(attempts: int) -> int:
+    """Seconds before attempt number attempts + 1: doubling from the base, capped."""
+    return min(OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), OUTBOX_RETRY_MAX_SECONDS)
+
+
+# ---------------------------------------------------------------------------
+# Effects
+# ---------------------------------------------------------------------------
+
+@effect('customer_profile')
+def _apply_profile_update(payload: dict, outbox_id: str) -> None:
+    """ADD/SET one booking's deltas on the customer's profile (utils._booking_profile_update), once."""
+    applied = get_backend().update_profile(
+        payload['phone'], payload['deltas'], payload['attributes'], int(time.time()), applied_id=outbox_id,
+    )
+    if not applied:
+        logger.info(f"Outbox customer_profile {outbox_id} already applied, skipping")
+
+
+# ---------------------------------------------------------------------------
+# Drainer
+# ---------------------------------------------------------------------------
+
+def _deliver(engine, record: dict, now_ts: int) -> str:
+    """Run one claimed record; returns 'delivered', 'retried' or 'failed'."""
+    try:
+        handler = _effects.get(record['effect'])
+        if handler is None:
+            raise LookupError(f"No handler for outbox effect {record['effect']!r}")
+        with tenant_scope(record.get('tenant', DEFAULT_TENANT)):
+            handler(record.get('payload') or {}, record['outbox_id'])
+    except Exception as e:
+        attempts = record.get('attempts', 0) + 1
+        retry_at = now_ts + retry_delay(attempts) if attempts < OUTBOX_MAX_ATTEMPTS else None
+        engine.fail_outbox(record['outbox_id'], f"{type(e).__name__}: {e}"[:500], retry_at, now_ts)
+        if retry_at is None:
+            logger.error(f"Outbox {record['effect']} {record['outbox_id']} failed for good after {attempts} attempts: {e}")
+            return 'failed'
+        logger.warning(f"Outbox {record['effect']} {record['outbox_id']} attempt {attempts} failed, retrying: {e}")
+        return 'retried'
+    try:
+        engine.complete_outbox(record['outbox_id'])
+    except Exception as e:
+        # The effect landed; the record comes back when its lease lapses and the repeat is a no-op
+        logger.error(f"Outbox {record['effect']} {record['outbox_id']} delivered but not completed: {e}")
+    return 'delivered'
+
+
+@tracked()
+def drain_outbox(outbox_ids: list[str] | None = None, limit: int = OUTBOX_BATCH_SIZE,
+                 now_ts: int | None = None) -> dict[str, int]:
+    """
+    Deliver one batch: the given record IDs, or up to limit due records.
+    Records another drainer holds (or already delivered) are skipped.
+    Returns counts of delivered / retried / failed / skipped records.
+    """
+    now_ts = int(time.time()) if now_ts is None else now_ts
+    engine = get_engine()
+    if outbox_ids is None:
+        outbox_ids = [record['outbox_id'] for record in engine.due_outbox(now_ts, limit)]
+
+    counts = {'delivered': 0, 'retried': 0, 'failed': 0, 'skipped': 0}
+    for outbox_id in outbox_ids:
+        record = engine.claim_outbox(outbox_id, now_ts, now_ts + OUTBOX_LEASE_SECONDS)
+        if record is None:
+            counts['skipped'] += 1
+            continue
+        counts[_deliver(engine, record, now_ts)] += 1
+    return counts
+
+
+def _stream_inserts(event: dict) -> list[str]:
+    """outbox_ids of records a DynamoDB Streams batch inserted (KEYS_ONLY is enough)."""
+    return [
+        record['dynamodb']['Keys']['outbox_id']['S']
+        for record in event.get('Records', [])
+        if record.get('eventName') == 'INSERT' and 'outbox_id' in record.get('dynamodb', {}).get('Keys', {})
+    ]
+
+
+@metered_handler('outbox')
+def drain_handler(event, context):
+    """
+    Lambda for the outbox table's stream (delivers the new records) and for a
+    scheduled rule (sweeps due records: retries and expired leases).
+    """
+    totals = {'delivered': 0, 'retried': 0, 'failed': 0, 'skipped': 0}
+    if (event or {}).get('Records'):
+        set_route('outbox stream')
+        totals = drain_outbox(_stream_inserts(event))
+    else:
+        set_route('outbox sweep')
+        for _ in range(OUTBOX_MAX_BATCHES):
+            counts = drain_outbox()
+            for name, count in counts.items():
+                totals[name] += count
+            if sum(counts.values()) < OUTBOX_BATCH_SIZE:
+                break
+
+    logger.info(f"Outbox drained: {totals}")
+    return totals
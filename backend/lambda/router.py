@@ -0,0 +1,102 @@
+"""
+Consolidated API Lambda: one function serves the dispatcher, scheduler and
+state-manager routes (scripts/deploy_all.py --layout single).
+
+Routes by the first path segment of the request:
+  /sms, /dispatcher  -> dispatcher.handler (Twilio webhook)
+  /scheduler         -> scheduler.handler
+  /state             -> state_manager.handler
+Route modules are imported on first use, so a container that only serves
+the scheduler never builds the OpenAI client, and every route in a warm
+container shares the same storage engine, change feed and warm caches
+(module globals in storage, change_feed and utils).
+
+Each invocation prints one EMF line (namespace LINDA, dimension Route) with
+ColdStart, RouteImportMs and DurationMs, which scripts/compare_layouts.py
+reads to compare this layout with one function per route.
+"""
+
+import os
+import json
+import time
+import logging
+import importlib
+
+from capacity import CAPACITY_METRICS_NAMESPACE
+from utils import create_lambda_response
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+ROUTER_METRICS_ENABLED = os.environ.get('ROUTER_METRICS', 'on').lower() != 'off'
+
+# First path segment -> module whose handler serves it
+ROUTES = {
+    'sms': 'dispatcher',
+    'dispatcher': 'dispatcher',
+    'scheduler': 'scheduler',
+    'state': 'state_manager',
+}
+
+_handlers: dict = {}  # module name -> handler, filled on first use
+_cold = True
+
+
+def route_for(event: dict) -> str:
+    """First path segment of a Function URL (rawPath) or API Gateway (path) event."""
+    path = (event or {}).get('rawPath') or (event or {}).get('path') or '/'
+    return path.strip('/').split('/')[0].lower()
+
+
+def load_route(module_name: str):
+    """The route module's handler, importing the module the first time."""
+    handler = _handlers.get(module_name)
+    if handler is None:
+        handler = _handlers[module_name] = importlib.import_module(module_name).handler
+    return handler
+
+
+def _emit(route: str, cold: bool, import_ms: float, duration_ms: float) -> None:
+    if not ROUTER_METRICS_ENABLED:
+        return
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': CAPACITY_METRICS_NAMESPACE,
+                'Dimensions': [['Route']],
+                'Metrics': [
+                    {'Name': 'ColdStart', 'Unit': 'Count'},
+                    {'Name': 'RouteImportMs', 'Unit': 'Milliseconds'},
+                    {'Name': 'DurationMs', 'Unit': 'Milliseconds'},
+                ],
+            }],
+        },
+        'Function': 'api',
+        'Route': route,
+        'ColdStart': int(cold),
+        'RouteImportMs': round(import_ms, 2),
+        'DurationMs': round(duration_ms, 2),
+    }))
+
+
+def handler(event, context):
+    """Lambda entry point for the consolidated layout: dispatch on the path's first segment."""
+    global _cold
+    cold, _cold = _cold, False
+    started = time.perf_counter()
+
+    route = route_for(event)
+    module_name = ROUTES.get(route)
+    if module_name is None:
+        return create_lambda_response(404, {
+            'status': 'error',
+            'message': f"No route for /{route}; use one of {', '.join('/' + name for name in ROUTES)}"
+        })
+
+    route_handler = load_route(module_name)
+    import_ms = (time.perf_counter() - started) * 1000
+    try:
+        return route_handler(event, context)
+    finally:
+        _emit(route, cold, import_ms, (time.perf_counter() - started) * 1000)
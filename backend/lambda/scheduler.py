@@ -1,6 +1,10 @@
 """
 Scheduler Lambda: Booking API for customer appointments.
-Handles GET (availability check) and POST (create booking).
+Handles GET (availability check, next openings) and POST (create one
+booking, or a batch with {"bookings": [...]}). This is a public URL, so it
+serves no lead data: the open work queue, lead status changes and a
+customer's past leads (GET ?phone=) are routes on the state manager, which
+requires the admin key.
 """
 
 import os
@@ -9,20 +13,47 @@ import logging
 from datetime import datetime
 from urllib.parse import parse_qs
 
+from capacity import metered_handler, set_route
+from tenancy import UnknownTenant, set_tenant, tenant_from_headers
 from utils import (
     create_lambda_response,
+    get_availability,
     get_available_slots,
+    next_available,
     query_leads_for_date,
     create_booking,
+    create_bookings,
+    MAX_BATCH_BOOKINGS,
     DecimalEncoder
 )
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+MAX_NEXT_OPENINGS = 20
 
-def check_availability(date: str) -> dict:
-    """GET: Check availability for a given date"""
+# Browsers/CDNs may reuse an availability answer this long, then revalidate with If-None-Match
+AVAILABILITY_MAX_AGE_SECONDS = int(os.environ.get('AVAILABILITY_MAX_AGE_SECONDS', '10'))
+
+
+def request_header(event: dict, name: str) -> str | None:
+    """Header value by case-insensitive name (Function URLs lowercase them, API Gateway may not)."""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match semantics: '*' or any listed tag, compared weakly (W/ prefixes ignored)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag.removeprefix('W/') for tag in tags)
+
+
+def check_availability(date: str, if_none_match: str | None = None) -> dict:
+    """GET: Check availability for a given date (304 without a body when the client's ETag is current)"""
     try:
         if not date:
             return create_lambda_response(400, {
@@ -39,16 +70,31 @@ def check_availability(date: str) -> dict:
                 'message': 'Invalid date format. Use YYYY-MM-DD'
             })
         
-        slots = get_available_slots(date)
+        availability = get_availability(date)
+        slots = availability['slots']
         
-        logger.info(f"Availability for {date}: {len(slots)} slots available")
+        # Degraded answers are never reused without asking again
+        cache_headers = {
+            'ETag': f'"{availability["version"]}"',
+            'Cache-Control': 'no-cache' if availability['stale'] else f'public, max-age={AVAILABILITY_MAX_AGE_SECONDS}',
+            'Vary': 'X-Linda-Tenant',
+        }
+        if etag_matches(if_none_match, cache_headers['ETag']):
+            logger.info(f"Availability for {date} unchanged ({cache_headers['ETag']})")
+            return create_lambda_response(304, None, headers=cache_headers)
         
+        logger.info(f"Availability for {date}: {len(slots)} slots available ({availability['source']})")
+        
+        # stale=True: storage is failing and the slots are last-known (or defaults), not live
         return create_lambda_response(200, {
             'status': 'success',
             'date': date,
             'available_slots': slots,
-            'available_count': len(slots)
-        })
+            'available_count': len(slots),
+            'stale': availability['stale'],
+            'as_of': availability['as_of'],
+            'source': availability['source']
+        }, headers=cache_headers)
     
     except Exception as e:
         logger.error(f"Error checking availability: {e}", exc_info=True)
@@ -58,6 +104,46 @@ def check_availability(date: str) -> dict:
         })
 
 
+def next_openings(date: str | None, time: str | None, count: str | None) -> dict:
+    """GET ?view=next: the earliest open slots from date (default today) and time, across days"""
+    try:
+        try:
+            if date:
+                datetime.strptime(date, '%Y-%m-%d')
+            if time:
+                datetime.strptime(time.strip(), '%I:%M %p')
+        except ValueError:
+            return create_lambda_response(400, {
+                'status': 'error',
+                'message': 'Invalid date or time. Use YYYY-MM-DD and e.g. 2:00 PM'
+            })
+        
+        try:
+            wanted = int(count) if count else 3
+        except ValueError:
+            wanted = 0
+        if not 1 <= wanted <= MAX_NEXT_OPENINGS:
+            return create_lambda_response(400, {
+                'status': 'error',
+                'message': f"count must be between 1 and {MAX_NEXT_OPENINGS}"
+            })
+        
+        openings = next_available(wanted, date, time)
+        
+        return create_lambda_response(200, {
+            'status': 'success',
+            'openings': openings,
+            'count': len(openings)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error finding next openings: {e}", exc_info=True)
+        return create_lambda_response(500, {
+            'status': 'error',
+            'message': f"Error finding next openings: {str(e)}"
+        })
+
+
 def book_appointment(booking_data: dict) -> dict:
     """POST: Create a new booking"""
     try:
@@ -76,6 +162,7 @@ def book_appointment(booking_data: dict) -> dict:
         repair_type = booking_data.get('repair_type')
         device = booking_data.get('device', 'Unknown Device')
         customer_name = booking_data.get('customer_name', 'Unknown')
+        hold_id = booking_data.get('hold_id')
         
         # Validate date format
         try:
@@ -87,7 +174,7 @@ def book_appointment(booking_data: dict) -> dict:
             })
         
         # Create booking with persistent slot reservation
-        lead_id = create_booking(phone, repair_type, device, date, time)
+        lead_id = create_booking(phone, repair_type, device, date, time, holder=hold_id)
         
         logger.info(f"Booking created: {lead_id} for {phone} on {date} at {time}")
         
@@ -118,10 +205,92 @@ def book_appointment(booking_data: dict) -> dict:
         })
 
 
+def _booking_error(booking: dict) -> str | None:
+    """Why a booking request can't be attempted, or None."""
+    for field in ('phone', 'date', 'time', 'repair_type'):
+        if not booking.get(field):
+            return f"Missing required field: {field}"
+    try:
+        datetime.strptime(booking['date'], '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return 'Invalid date format. Use YYYY-MM-DD'
+    return None
+
+
+def book_appointments(batch_data: dict) -> dict:
+    """
+    POST {"bookings": [...], "mode": "atomic" | "best_effort"}: several bookings
+    (e.g. one per device) in as few transactions as possible. atomic (default)
+    books all or none. Returns per-item results and, once for the whole batch,
+    the open slots on each date where an item failed.
+    """
+    bookings = batch_data.get('bookings')
+    mode = batch_data.get('mode', 'atomic')
+    if not isinstance(bookings, list) or not bookings or mode not in ('atomic', 'best_effort'):
+        return create_lambda_response(400, {
+            'status': 'error',
+            'message': 'bookings must be a non-empty list and mode "atomic" or "best_effort"'
+        })
+    if len(bookings) > MAX_BATCH_BOOKINGS:
+        return create_lambda_response(400, {
+            'status': 'error',
+            'message': f"At most {MAX_BATCH_BOOKINGS} bookings per batch"
+        })
+    
+    errors = [_booking_error(booking) if isinstance(booking, dict) else 'Each booking must be an object'
+              for booking in bookings]
+    if mode == 'atomic' and any(errors):
+        return create_lambda_response(400, {
+            'status': 'error',
+            'message': 'Invalid bookings; nothing was booked',
+            'results': [{'index': index, 'status': 'invalid' if error else 'not_booked', 'message': error}
+                        for index, error in enumerate(errors)]
+        })
+    
+    try:
+        valid = [index for index, error in enumerate(errors) if not error]
+        outcomes = create_bookings([
+            {
+                'phone': bookings[index]['phone'],
+                'repair_type': bookings[index]['repair_type'],
+                'device': bookings[index].get('device', 'Unknown Device'),
+                'date': bookings[index]['date'],
+                'time': bookings[index]['time'],
+                'holder': bookings[index].get('hold_id'),
+            }
+            for index in valid
+        ], atomic=mode == 'atomic')
+    except Exception as e:
+        logger.error(f"Error creating batch booking: {e}", exc_info=True)
+        return create_lambda_response(500, {
+            'status': 'error',
+            'message': f"Error creating bookings: {str(e)}"
+        })
+    
+    results = [{'index': index, 'status': 'invalid', 'message': error} for index, error in enumerate(errors)]
+    for index, outcome in zip(valid, outcomes):
+        results[index] = {'index': index, 'date': bookings[index]['date'], 'time': bookings[index]['time'], **outcome}
+    
+    booked = sum(1 for result in results if result['status'] == 'booked')
+    failed_dates = sorted({bookings[index]['date'] for index, outcome in zip(valid, outcomes) if outcome['status'] != 'booked'})
+    alternatives = {date: get_available_slots(date) for date in failed_dates}
+    logger.info(f"Batch booking ({mode}): {booked}/{len(bookings)} booked")
+    
+    return create_lambda_response(201 if booked else 409, {
+        'status': 'success' if booked == len(bookings) else 'partial' if booked else 'error',
+        'mode': mode,
+        'booked_count': booked,
+        'results': results,
+        'alternatives': alternatives
+    })
+
+
+@metered_handler('scheduler')
 def handler(event, context):
     """
     Main Lambda handler for scheduler API.
-    Supports GET (check availability) and POST (create booking).
+    Supports GET (check availability, next openings with ?view=next)
+    and POST (create booking; batch with a "bookings" list).
     """
     logger.info(f"Event: {json.dumps(event)}")
     
@@ -132,6 +301,12 @@ def handler(event, context):
         # Handle CORS preflight
         if method == 'OPTIONS':
             return create_lambda_response(200, {'status': 'ok'})
+
+        # Everything below reads and writes the shop named by X-Linda-Tenant
+        try:
+            set_tenant(tenant_from_headers(event.get('headers')))
+        except UnknownTenant as e:
+            return create_lambda_response(400, {'status': 'error', 'message': str(e)})
         
         # Parse query parameters
         query_params = event.get('queryStringParameters', {}) or {}
@@ -155,10 +330,18 @@ def handler(event, context):
         
         # Route by method
         if method == 'GET':
+            if query_params.get('view') == 'next':
+                set_route('scheduler GET next')
+                return next_openings(query_params.get('date'), query_params.get('time'), query_params.get('count'))
+            set_route('scheduler GET availability')
             date = query_params.get('date') or body_data.get('date')
-            return check_availability(date)
+            return check_availability(date, request_header(event, 'If-None-Match'))
         
         elif method == 'POST':
+            if 'bookings' in body_data:
+                set_route('scheduler POST batch')
+                return book_appointments(body_data)
+            set_route('scheduler POST booking')
             return book_appointment(body_data)
         
         else:
@@ -1,22 +1,57 @@
 """
 State Manager Lambda: Admin API for managing Brandon's status.
-Handles GET, POST/PUT, DELETE operations on Brandon_State_Log.
+Handles GET, POST/PUT, DELETE operations on Brandon_State_Log, plus a
+long-poll (GET ?watch=1) that answers when the state or bookings change,
+and the bench's lead routes: one lead (GET ?lead_id=), a customer's past
+leads (GET ?phone=), the open work queue (GET ?view=open) and status changes
+(PUT {"lead_id", "status"}).
+
+Its Function URL is public, so every request except the CORS preflight must
+carry the shared ADMIN_API_KEY in the X-Linda-Admin-Key header (the dashboard
+server holds it; browsers never see it). Without ADMIN_API_KEY configured
+the API refuses everything.
 """
 
 import os
+import hmac
 import json
 import logging
-from datetime import datetime
 from urllib.parse import parse_qs
 
-import boto3
+from capacity import metered_handler, set_route
+from tenancy import UnknownTenant, set_tenant, tenant_from_headers
+from utils import (
+    get_brandon_state,
+    update_brandon_state_fields,
+    get_sales_rollup,
+    get_lead,
+    get_customer_history,
+    get_open_leads,
+    transition_lead_status,
+    watch_dashboard,
+    DASHBOARD_WATCH_MAX_SECONDS,
+    VersionConflict,
+    LeadStatusConflict,
+    DecimalEncoder
+)
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# DynamoDB resource
-dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('DYNAMODB_REGION', 'us-east-1'))
-BRANDON_STATE_LOG_TABLE = os.environ.get('BRANDON_STATE_LOG_TABLE', 'Brandon_State_Log')
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY', '')
+ADMIN_KEY_HEADER = 'x-linda-admin-key'
+
+# Fields clients may set; anything else in the request body is ignored
+STATE_FIELDS = (
+    # Core state fields
+    'status', 'location', 'notes', 'special_info', 'voice',
+    # Assistant config fields
+    'greeting', 'max_discount', 'ai_answers_calls', 'ai_answers_sms', 'auto_upsell',
+)
+MAX_HISTORY_PAGE_SIZE = 50
+MAX_OPEN_LEADS_PAGE_SIZE = 100
+# What DELETE resets the state to
+DEFAULT_STATE_FIELDS = {'status': 'available', 'location': 'shop', 'notes': 'Reset to default'}
 
 
 def create_response(status_code: int, body: dict) -> dict:
@@ -27,37 +62,39 @@ def create_response(status_code: int, body: dict) -> dict:
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type'
+            'Access-Control-Allow-Headers': 'Content-Type, If-Match, X-Linda-Tenant, X-Linda-Admin-Key'
         },
-        'body': json.dumps(body)
+        'body': json.dumps(body, cls=DecimalEncoder)
     }
 
 
+def check_admin_key(headers: dict | None) -> dict | None:
+    """401 without an X-Linda-Admin-Key header, 403 when it is wrong (or no key is configured); None = allowed"""
+    presented = next((value for name, value in (headers or {}).items()
+                      if name.lower() == ADMIN_KEY_HEADER and value), None)
+    if presented is None:
+        return create_response(401, {
+            'status': 'error',
+            'message': 'X-Linda-Admin-Key header required'
+        })
+    if not ADMIN_API_KEY or not hmac.compare_digest(presented.encode('utf-8'), ADMIN_API_KEY.encode('utf-8')):
+        return create_response(403, {
+            'status': 'error',
+            'message': 'Invalid admin key'
+        })
+    return None
+
+
 def get_state() -> dict:
     """GET: Retrieve Brandon's current state"""
     try:
-        table = dynamodb.Table(BRANDON_STATE_LOG_TABLE)
-        response = table.get_item(Key={'state_id': 'CURRENT'})
-        
-        if 'Item' in response:
-            logger.info(f"Retrieved state: {response['Item']}")
-            return create_response(200, {
-                'status': 'success',
-                'state': response['Item']
-            })
-        else:
-            logger.warning("No state found, returning default")
-            default_state = {
-                'state_id': 'CURRENT',
-                'status': 'available',
-                'location': 'shop',
-                'notes': 'Default state',
-                'updated_at': int(datetime.utcnow().timestamp())
-            }
-            return create_response(200, {
-                'status': 'success',
-                'state': default_state
-            })
+        state = get_brandon_state()
+        # Items written before versioning are version 0
+        state.setdefault('version', 0)
+        return create_response(200, {
+            'status': 'success',
+            'state': state
+        })
     
     except Exception as e:
         logger.error(f"Error retrieving state: {e}", exc_info=True)
@@ -67,47 +104,253 @@ def get_state() -> dict:
         })
 
 
-def update_state(state_data: dict) -> dict:
-    """POST/PUT: Update Brandon's state"""
+def get_sales_metrics(params: dict) -> dict:
+    """GET ?metrics=sales&start=YYYY-MM-DD&end=YYYY-MM-DD[&breakdown=true]: upsell/discount rollup"""
+    start_date = params.get('start')
+    end_date = params.get('end') or start_date
+    if not start_date:
+        return create_response(400, {
+            'status': 'error',
+            'message': 'start query parameter is required (YYYY-MM-DD)'
+        })
+    breakdown = str(params.get('breakdown', '')).lower() in ('1', 'true', 'yes')
     try:
-        table = dynamodb.Table(BRANDON_STATE_LOG_TABLE)
-        
-        # Fetch current state
-        response = table.get_item(Key={'state_id': 'CURRENT'})
-        current_state = response.get('Item', {})
+        rollup = get_sales_rollup(start_date, end_date, breakdown=breakdown)
+    except ValueError as e:
+        return create_response(400, {
+            'status': 'error',
+            'message': str(e)
+        })
+    except Exception as e:
+        logger.error(f"Error retrieving sales metrics: {e}", exc_info=True)
+        return create_response(500, {
+            'status': 'error',
+            'message': f"Error retrieving sales metrics: {str(e)}"
+        })
+    return create_response(200, {
+        'status': 'success',
+        'metrics': rollup
+    })
+
+
+def watch_changes(params: dict, context) -> dict:
+    """
+    GET ?watch=1[&cursor=...&timeout=seconds]: long-poll instead of polling GET on a timer.
+    Without a cursor, answers at once with the current one; with it, holds the
+    request until the state or bookings move past it (changed lists which,
+    state comes along) or the timeout passes (changed is empty). Either way,
+    call again with the returned cursor.
+    """
+    try:
+        timeout = float(params['timeout']) if params.get('timeout') else DASHBOARD_WATCH_MAX_SECONDS
+    except ValueError:
+        return create_response(400, {
+            'status': 'error',
+            'message': 'timeout must be a number of seconds'
+        })
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        # Leave a second to respond before the function times out
+        timeout = min(timeout, context.get_remaining_time_in_millis() / 1000 - 1)
+    try:
+        result = watch_dashboard(params.get('cursor'), max(timeout, 0))
+    except ValueError as e:
+        return create_response(400, {
+            'status': 'error',
+            'message': str(e)
+        })
+    except Exception as e:
+        logger.error(f"Error watching for changes: {e}", exc_info=True)
+        return create_response(500, {
+            'status': 'error',
+            'message': f"Error watching for changes: {str(e)}"
+        })
+    if 'state' in result:
+        result['state'].setdefault('version', 0)
+    return create_response(200, {
+        'status': 'success',
+        **result
+    })
+
+
+def get_lead_record(params: dict) -> dict:
+    """GET ?lead_id=...[&created_at=epoch]: one lead, read through to the archive"""
+    try:
+        created_at = int(params['created_at']) if params.get('created_at') else None
+    except ValueError:
+        return create_response(400, {
+            'status': 'error',
+            'message': 'created_at must be epoch seconds'
+        })
+    try:
+        lead = get_lead(params['lead_id'], created_at)
+    except Exception as e:
+        logger.error(f"Error retrieving lead: {e}", exc_info=True)
+        return create_response(500, {
+            'status': 'error',
+            'message': f"Error retrieving lead: {str(e)}"
+        })
+    if lead is None:
+        return create_response(404, {
+            'status': 'error',
+            'message': f"Lead {params['lead_id']} not found"
+        })
+    return create_response(200, {
+        'status': 'success',
+        'lead': lead,
+        'archived': 'archived_at' in lead
+    })
+
+
+def customer_history(params: dict) -> dict:
+    """GET ?phone=...[&limit=&page_token=]: a customer's past leads, newest first, paginated"""
+    try:
+        try:
+            page_size = int(params['limit']) if params.get('limit') else 10
+        except ValueError:
+            page_size = 0
+        if not 1 <= page_size <= MAX_HISTORY_PAGE_SIZE:
+            return create_response(400, {
+                'status': 'error',
+                'message': f"limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}"
+            })
         
-        # Update with new values (preserve all fields)
-        current_state['state_id'] = 'CURRENT'
+        history = get_customer_history(params['phone'], limit=page_size, page_token=params.get('page_token'))
         
-        # Core state fields
-        if 'status' in state_data:
-            current_state['status'] = state_data['status']
-        if 'location' in state_data:
-            current_state['location'] = state_data['location']
-        if 'notes' in state_data:
-            current_state['notes'] = state_data['notes']
-        if 'special_info' in state_data:
-            current_state['special_info'] = state_data['special_info']
-        if 'voice' in state_data:
-            current_state['voice'] = state_data['voice']
+        return create_response(200, {
+            'status': 'success',
+            'phone': history['phone'],
+            'leads': history['leads'],
+            'count': len(history['leads']),
+            'next_page_token': history['next_page_token']
+        })
+    
+    except ValueError as e:
+        return create_response(400, {
+            'status': 'error',
+            'message': str(e)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error retrieving customer history: {e}", exc_info=True)
+        return create_response(500, {
+            'status': 'error',
+            'message': f"Error retrieving customer history: {str(e)}"
+        })
+
+
+def open_leads(params: dict) -> dict:
+    """GET ?view=open: open leads (the bench queue) in appointment order, paginated"""
+    try:
+        try:
+            page_size = int(params['limit']) if params.get('limit') else 50
+        except ValueError:
+            page_size = 0
+        if not 1 <= page_size <= MAX_OPEN_LEADS_PAGE_SIZE:
+            return create_response(400, {
+                'status': 'error',
+                'message': f"limit must be between 1 and {MAX_OPEN_LEADS_PAGE_SIZE}"
+            })
         
-        # Assistant config fields
-        if 'greeting' in state_data:
-            current_state['greeting'] = state_data['greeting']
-        if 'max_discount' in state_data:
-            current_state['max_discount'] = state_data['max_discount']
-        if 'ai_answers_calls' in state_data:
-            current_state['ai_answers_calls'] = state_data['ai_answers_calls']
-        if 'ai_answers_sms' in state_data:
-            current_state['ai_answers_sms'] = state_data['ai_answers_sms']
-        if 'auto_upsell' in state_data:
-            current_state['auto_upsell'] = state_data['auto_upsell']
+        queue = get_open_leads(limit=page_size, page_token=params.get('page_token'))
         
-        current_state['updated_at'] = int(datetime.utcnow().timestamp())
+        return create_response(200, {
+            'status': 'success',
+            'leads': queue['leads'],
+            'count': len(queue['leads']),
+            'next_page_token': queue['next_page_token']
+        })
+    
+    except ValueError as e:
+        return create_response(400, {
+            'status': 'error',
+            'message': str(e)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error retrieving open leads: {e}", exc_info=True)
+        return create_response(500, {
+            'status': 'error',
+            'message': f"Error retrieving open leads: {str(e)}"
+        })
+
+
+def update_lead_status(update_data: dict) -> dict:
+    """PUT {lead_id, status[, expected_status]}: Move a lead to a new status (cancelling frees its slot)"""
+    lead_id = update_data.get('lead_id')
+    to_status = update_data.get('status')
+    if not lead_id or not to_status:
+        return create_response(400, {
+            'status': 'error',
+            'message': 'lead_id and status are required'
+        })
+    try:
+        lead = transition_lead_status(lead_id, to_status, from_status=update_data.get('expected_status'))
+    except ValueError as e:
+        return create_response(400, {
+            'status': 'error',
+            'message': str(e)
+        })
+    except LeadStatusConflict as e:
+        return create_response(409, {
+            'status': 'error',
+            'message': str(e),
+            'lead': e.current
+        })
+    except Exception as e:
+        logger.error(f"Error updating lead status: {e}", exc_info=True)
+        return create_response(500, {
+            'status': 'error',
+            'message': f"Error updating lead status: {str(e)}"
+        })
+    if lead is None:
+        return create_response(404, {
+            'status': 'error',
+            'message': f"Lead {lead_id} not found"
+        })
+    return create_response(200, {
+        'status': 'success',
+        'lead': lead
+    })
+
+
+def parse_expected_version(state_data: dict, headers: dict) -> int | None:
+    """Version the client last read, from body 'version' or an If-Match header. None = unconditional."""
+    raw = state_data.get('version')
+    if raw is None:
+        raw = headers.get('if-match') or headers.get('If-Match')
+    if raw is None or raw == '':
+        return None
+    return int(str(raw).strip().strip('"'))
+
+
+def conflict_response(conflict: VersionConflict) -> dict:
+    """409 carrying the current state, for a write made against a stale version"""
+    current = conflict.current or {}
+    current.setdefault('version', 0)
+    return create_response(409, {
+        'status': 'error',
+        'message': 'State was changed by someone else. Review the current state and retry.',
+        'state': current
+    })
+
+
+def update_state(state_data: dict, headers: dict | None = None) -> dict:
+    """
+    POST/PUT: Update Brandon's state.
+    One conditional update_item: only provided fields change, version is bumped,
+    and a stale version yields 409 with the current state.
+    """
+    try:
+        try:
+            expected_version = parse_expected_version(state_data, headers or {})
+        except ValueError:
+            return create_response(400, {
+                'status': 'error',
+                'message': 'version must be an integer'
+            })
         
-        # Write updated state
-        table.put_item(Item=current_state)
-        logger.info(f"Updated state: {current_state}")
+        fields = {field: state_data[field] for field in STATE_FIELDS if field in state_data}
+        current_state = update_brandon_state_fields(fields, expected_version=expected_version)
         
         return create_response(200, {
             'status': 'success',
@@ -115,6 +358,9 @@ def update_state(state_data: dict) -> dict:
             'state': current_state
         })
     
+    except VersionConflict as conflict:
+        return conflict_response(conflict)
+    
     except Exception as e:
         logger.error(f"Error updating state: {e}", exc_info=True)
         return create_response(500, {
@@ -123,21 +369,21 @@ def update_state(state_data: dict) -> dict:
         })
 
 
-def delete_state() -> dict:
-    """DELETE: Reset state to default"""
+def delete_state(headers: dict | None = None) -> dict:
+    """
+    DELETE: Reset state to default.
+    A versioned write like POST/PUT, so the version keeps rising and an
+    If-Match header makes the reset conditional (409 when stale).
+    """
     try:
-        table = dynamodb.Table(BRANDON_STATE_LOG_TABLE)
-        
-        # Reset to default state
-        default_state = {
-            'state_id': 'CURRENT',
-            'status': 'available',
-            'location': 'shop',
-            'notes': 'Reset to default',
-            'updated_at': int(datetime.utcnow().timestamp())
-        }
-        
-        table.put_item(Item=default_state)
+        try:
+            expected_version = parse_expected_version({}, headers or {})
+        except ValueError:
+            return create_response(400, {
+                'status': 'error',
+                'message': 'version must be an integer'
+            })
+        default_state = update_brandon_state_fields(dict(DEFAULT_STATE_FIELDS), expected_version=expected_version)
         logger.info(f"Reset state to default: {default_state}")
         
         return create_response(200, {
@@ -146,6 +392,9 @@ def delete_state() -> dict:
             'state': default_state
         })
     
+    except VersionConflict as conflict:
+        return conflict_response(conflict)
+    
     except Exception as e:
         logger.error(f"Error resetting state: {e}", exc_info=True)
         return create_response(500, {
@@ -154,12 +403,18 @@ def delete_state() -> dict:
         })
 
 
+@metered_handler('state-manager')
 def handler(event, context):
     """
     Main Lambda handler for admin state management.
-    Supports GET, POST/PUT, DELETE, OPTIONS methods.
+    Supports GET, POST/PUT, DELETE, OPTIONS methods; GET ?view=open, ?lead_id=,
+    ?phone= and a PUT naming a lead_id serve the bench's leads instead of the state.
+    Everything but OPTIONS needs the X-Linda-Admin-Key header (401/403 otherwise).
     """
-    logger.info(f"Event: {json.dumps(event)}")
+    # Never log the admin key
+    headers = {name: '***' if name.lower() == ADMIN_KEY_HEADER else value
+               for name, value in (event.get('headers') or {}).items()}
+    logger.info(f"Event: {json.dumps({**event, 'headers': headers})}")
     
     try:
         method = (event.get('requestContext', {}).get('http', {}).get('method') or event.get('httpMethod', 'GET')).upper()
@@ -167,6 +422,17 @@ def handler(event, context):
         # Handle CORS preflight
         if method == 'OPTIONS':
             return create_response(200, {'status': 'ok'})
+
+        denied = check_admin_key(event.get('headers'))
+        if denied is not None:
+            logger.warning(f"Rejected unauthenticated {method} ({denied['statusCode']})")
+            return denied
+
+        # Everything below reads and writes the shop named by X-Linda-Tenant
+        try:
+            set_tenant(tenant_from_headers(event.get('headers')))
+        except UnknownTenant as e:
+            return create_response(400, {'status': 'error', 'message': str(e)})
         
         # Parse request body for POST/PUT/DELETE
         body = event.get('body', '')
@@ -187,11 +453,30 @@ def handler(event, context):
         
         # Route by method
         if method == 'GET':
+            params = event.get('queryStringParameters') or {}
+            if params.get('metrics') == 'sales':
+                set_route('state-manager GET metrics')
+                return get_sales_metrics(params)
+            if params.get('view') == 'open':
+                set_route('state-manager GET open')
+                return open_leads(params)
+            if params.get('lead_id'):
+                set_route('state-manager GET lead')
+                return get_lead_record(params)
+            if params.get('phone'):
+                set_route('state-manager GET history')
+                return customer_history(params)
+            if params.get('watch'):
+                set_route('state-manager GET watch')
+                return watch_changes(params, context)
             return get_state()
+        elif method == 'PUT' and 'lead_id' in state_data:
+            set_route('state-manager PUT lead status')
+            return update_lead_status(state_data)
         elif method in ['POST', 'PUT']:
-            return update_state(state_data)
+            return update_state(state_data, event.get('headers') or {})
         elif method == 'DELETE':
-            return delete_state()
+            return delete_state(event.get('headers') or {})
         else:
             return create_response(405, {
                 'status': 'error',
@@ -0,0 +1,1626 @@
+"""
+Pluggable storage backends for LINDA Lambda functions.
+
+utils.py talks to a StorageBackend instead of DynamoDB directly, so the
+same helpers (and the handlers built on them) can run against:
+  - dynamodb: live tables via the low-level client + ddb_codec (default)
+  - memory:   process-local dicts, for unit runs and profiling
+  - sqlite:   a local file (or :memory:), shareable across processes
+
+Select with STORAGE_BACKEND=dynamodb|memory|sqlite (SQLITE_PATH for sqlite),
+or call set_backend() from tests and benchmarks. Every engine honors the
+same conditional-write semantics as the DynamoDB expressions.
+
+get_backend() hands out the current tenant's TenantBackend view of the
+engine, which stores partition keys with the tenant prefix (tenancy.py).
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+
+from capacity import instrument_client
+from ddb_codec import (
+    LEAD_CODEC, SCHEDULE_CODEC, STATE_CODEC, EVENT_CODEC, COUNTER_CODEC, PROFILE_CODEC, OUTBOX_CODEC, encode_value,
+)
+from lead_format import COMPACT_LEAD_WRITES, COMPACT_NAMES, FORMAT_ATTRIBUTE, pack_lead
+from tenancy import DEFAULT_TENANT, TENANT_SEPARATOR, get_tenant, split_tenant_key, tenant_key
+
+REGION = os.environ.get('DYNAMODB_REGION', 'us-east-1')
+REPAIRS_LEAD_LOG_TABLE = os.environ.get('REPAIRS_LEAD_LOG_TABLE', 'Repairs_Lead_Log')
+BRANDON_STATE_LOG_TABLE = os.environ.get('BRANDON_STATE_LOG_TABLE', 'Brandon_State_Log')
+SCHEDULE_TABLE = os.environ.get('SCHEDULE_TABLE', 'Repairs_Schedule')
+# Sparse GSI over booked and held slots (taken_queue + slot_at), for next-available searches
+TAKEN_SLOTS_INDEX = os.environ.get('TAKEN_SLOTS_INDEX', 'taken_queue-slot_at-index')
+TAKEN_QUEUE = 'TAKEN'
+# GSI on Repairs_Lead_Log: phone (HASH) + created_at (RANGE)
+LEAD_PHONE_INDEX = os.environ.get('LEAD_PHONE_INDEX', 'phone-created_at-index')
+# Sparse GSI: only open leads carry open_queue/open_at, so it holds the active work queue
+OPEN_LEADS_INDEX = os.environ.get('OPEN_LEADS_INDEX', 'open_queue-open_at-index')
+OPEN_QUEUE = 'OPEN'
+# Append-only upsell/discount events, and their per-day / per-item ADD counters
+SALES_EVENTS_TABLE = os.environ.get('SALES_EVENTS_TABLE', 'Repairs_Sales_Events')
+SALES_COUNTERS_TABLE = os.environ.get('SALES_COUNTERS_TABLE', 'Repairs_Sales_Counters')
+# One item per customer phone, kept current with ADD/SET on every booking and sales event
+CUSTOMER_PROFILES_TABLE = os.environ.get('CUSTOMER_PROFILES_TABLE', 'Repairs_Customer_Profiles')
+# String set on each profile of the outbox records already applied to it (one per booking)
+PROFILE_APPLIED_FIELD = 'applied_outbox_ids'
+# Side effects committed with their lead (outbox.py); the sparse GSI holds only pending records
+OUTBOX_TABLE = os.environ.get('OUTBOX_TABLE', 'Repairs_Outbox')
+OUTBOX_DUE_INDEX = os.environ.get('OUTBOX_DUE_INDEX', 'outbox_queue-next_attempt_at-index')
+OUTBOX_QUEUE = 'PENDING'
+
+# DynamoDB request limits
+BATCH_WRITE_LIMIT = 25
+BATCH_GET_LIMIT = 100
+BATCH_RETRY_ATTEMPTS = 5
+
+# Attributes cleared from a slot when a reservation is released
+SLOT_BOOKING_FIELDS = ('lead_id', 'phone', 'repair_type', 'device')
+# Attributes of a temporary hold (status='held'); an expired hold counts as available
+SLOT_HOLD_FIELDS = ('hold_id', 'hold_expires_at')
+# Attributes that put a booked or held slot in the taken-slots index
+SLOT_TAKEN_FIELDS = ('taken_queue', 'slot_at')
+
+
+def slot_sort_key(date: str, time: str | None) -> str:
+    """Sortable appointment key: 'YYYY-MM-DDTHH:MM' (date alone if time is unparsable)."""
+    try:
+        return f"{date}T{datetime.strptime((time or '').strip(), '%I:%M %p').strftime('%H:%M')}"
+    except ValueError:
+        return date
+
+
+def taken_slot_index(stored_date: str, time: str) -> dict:
+    """
+    Taken-slots index attributes for a booked or held slot: the TAKEN queue of
+    the tenant that owns the (stored, tenant-prefixed) date, sorted by slot time.
+    """
+    tenant, date = split_tenant_key(stored_date)
+    return {'taken_queue': tenant_key(TAKEN_QUEUE, tenant), 'slot_at': slot_sort_key(date, time)}
+
+
+def slot_is_open(slot: dict, now_ts: int, holder: str | None = None) -> bool:
+    """True when a slot can be held/booked: available, an expired hold, or held by holder."""
+    status = slot.get('status')
+    if status == 'available':
+        return True
+    if status == 'held':
+        return slot.get('hold_expires_at', 0) <= now_ts or (holder is not None and slot.get('hold_id') == holder)
+    return False
+
+
+class VersionConflict(Exception):
+    """A versioned write lost the race; current holds the item as it is now."""
+
+    def __init__(self, current: dict | None):
+        super().__init__('Item version changed since it was read')
+        self.current = current
+
+
+class LeadStatusConflict(Exception):
+    """A status transition found the lead in another status; current holds it as it is now."""
+
+    def __init__(self, current: dict | None):
+        super().__init__(f"Lead status is {(current or {}).get('status')!r}")
+        self.current = current
+
+
+class SlotConflict(Exception):
+    """A multi-slot booking found some slots taken; indexes are the positions of those bookings."""
+
+    def __init__(self, indexes: list[int]):
+        super().__init__(f"{len(indexes)} slot(s) not available")
+        self.indexes = indexes
+
+
+def _version_matches(item: dict | None, expected_version: int | None) -> bool:
+    """Items written before versioning count as version 0."""
+    if expected_version is None:
+        return True
+    return (item or {}).get('version', 0) == expected_version
+
+
+class StorageBackend:
+    """Interface implemented by every storage engine."""
+
+    name = 'base'
+
+    def get_state(self, state_id: str) -> dict | None:
+        raise NotImplementedError
+
+    def put_state(self, item: dict) -> None:
+        raise NotImplementedError
+
+    def update_state(self, state_id: str, fields: dict, now_ts: int, expected_version: int | None = None) -> dict:
+        """
+        Merge fields into the state item in one write, bump version, return the new item.
+        Raises VersionConflict when expected_version is given and does not match.
+        """
+        raise NotImplementedError
+
+    def put_lead(self, item: dict) -> None:
+        raise NotImplementedError
+
+    def get_lead_items(self, lead_id: str) -> list[dict]:
+        """Every item stored under lead_id, oldest timestamp first."""
+        raise NotImplementedError
+
+    def scan_leads_by_date(self, date: str) -> list[dict]:
+        raise NotImplementedError
+
+    def query_leads_by_phone(self, phone: str, limit: int, start_key: dict | None = None) -> tuple[list[dict], dict | None]:
+        """Newest-first leads for a phone. Returns (items, last_key) where last_key resumes the page."""
+        raise NotImplementedError
+
+    def transition_lead(self, lead_id: str, from_status: str, to_status: str, keep_open: bool, now_ts: int) -> dict | None:
+        """
+        Move the lead's latest item from from_status to to_status, stamping
+        status_updated_at. keep_open=False drops it from the open-leads index.
+        Returns the updated lead, None when the lead does not exist; raises
+        LeadStatusConflict when its status is not from_status.
+        """
+        raise NotImplementedError
+
+    def query_open_leads(self, limit: int, start_key: dict | None = None,
+                         queue: str = OPEN_QUEUE) -> tuple[list[dict], dict | None]:
+        """Open leads in queue by open_at (appointment order). Returns (items, last_key) like query_leads_by_phone."""
+        raise NotImplementedError
+
+    def seed_slots(self, date: str, slot_times: list[str], now_ts: int) -> None:
+        """Create missing slots as available; existing slots are left untouched."""
+        raise NotImplementedError
+
+    def query_schedule(self, date: str) -> list[dict]:
+        raise NotImplementedError
+
+    def hold_slot(self, date: str, time: str, holder: str, expires_at: int, now_ts: int) -> bool:
+        """
+        Set status=held for holder until expires_at (plus taken_slot_index()) if
+        slot_is_open(). Returns False otherwise.
+        """
+        raise NotImplementedError
+
+    def reserve_slot(self, date: str, time: str, fields: dict, now_ts: int, holder: str | None = None) -> bool:
+        """
+        Set status=booked plus fields (and taken_slot_index()) if slot_is_open();
+        clears any hold. Returns False otherwise.
+        """
+        raise NotImplementedError
+
+    def release_slot(self, date: str, time: str, lead_id: str, now_ts: int) -> None:
+        """Return a slot to available (out of the taken-slots index) if it is still held by lead_id; otherwise no-op."""
+        raise NotImplementedError
+
+    def query_taken_slots(self, start_at: str, limit: int, start_key: dict | None = None,
+                          queue: str = TAKEN_QUEUE) -> tuple[list[dict], dict | None]:
+        """
+        Booked and held slots in queue from slot_at >= start_at, in slot_at order.
+        Items carry the index keys plus status and hold fields; returns
+        (items, last_key) like query_open_leads.
+        """
+        raise NotImplementedError
+
+    def book_slots(self, bookings: list[dict], now_ts: int) -> None:
+        """
+        reserve_slot() several slots and write their leads and outbox records in
+        one transaction. Each booking is {'date', 'time', 'fields', 'holder',
+        'lead', 'outbox'}; no two may share a slot. Raises SlotConflict naming
+        every booking whose slot was not open, writing nothing.
+        """
+        raise NotImplementedError
+
+    def put_events(self, items: list[dict]) -> None:
+        """Append sales events (keyed by event_id) in as few requests as the engine allows."""
+        raise NotImplementedError
+
+    def add_counters(self, counter_key: str, deltas: dict, attributes: dict, now_ts: int) -> None:
+        """
+        Atomically add deltas to one counter item, creating it if needed.
+        Numeric deltas are summed; set deltas are unioned. attributes are set as-is.
+        """
+        raise NotImplementedError
+
+    def get_counters(self, counter_keys: list[str]) -> dict[str, dict]:
+        """Counter items by key; keys never counted are omitted."""
+        raise NotImplementedError
+
+    def get_profile(self, phone: str) -> dict | None:
+        """The customer profile for phone (a single GetItem), None for first-time customers."""
+        raise NotImplementedError
+
+    def update_profile(self, phone: str, deltas: dict, attributes: dict, now_ts: int,
+                       applied_id: str | None = None) -> bool:
+        """
+        add_counters() semantics applied to the profile item keyed on phone.
+        With applied_id the update lands at most once: the ID joins the
+        profile's PROFILE_APPLIED_FIELD set in the same write, and a repeat
+        with an ID already there changes nothing and returns False.
+        """
+        raise NotImplementedError
+
+    def put_lead_with_outbox(self, item: dict, records: list[dict]) -> None:
+        """
+        Write a lead and its outbox records in one transaction: all or nothing.
+        Raises ValueError (writing nothing) if a record's outbox_id already exists.
+        """
+        raise NotImplementedError
+
+    def due_outbox(self, now_ts: int, limit: int) -> list[dict]:
+        """Pending outbox records whose next_attempt_at has passed, earliest first."""
+        raise NotImplementedError
+
+    def claim_outbox(self, outbox_id: str, now_ts: int, lease_until: int) -> dict | None:
+        """
+        Lease a due record to the caller by moving next_attempt_at to lease_until.
+        Returns the record, or None if it is delivered, dead, or leased elsewhere.
+        """
+        raise NotImplementedError
+
+    def complete_outbox(self, outbox_id: str) -> None:
+        """Delete a delivered record."""
+        raise NotImplementedError
+
+    def fail_outbox(self, outbox_id: str, error: str, retry_at: int | None, now_ts: int) -> None:
+        """Count a failed attempt: due again at retry_at, or dead (kept, off the queue) when None."""
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB
+# ---------------------------------------------------------------------------
+
+def _is_conditional_failure(error: ClientError) -> bool:
+    return error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+class DynamoDBBackend(StorageBackend):
+    """Live DynamoDB tables through the low-level client and ddb_codec."""
+
+    name = 'dynamodb'
+
+    def __init__(self, client=None):
+        self.client = instrument_client(client or boto3.client('dynamodb', region_name=REGION))
+
+    def get_state(self, state_id: str) -> dict | None:
+        response = self.client.get_item(
+            TableName=BRANDON_STATE_LOG_TABLE,
+            Key={'state_id': {'S': state_id}},
+        )
+        return STATE_CODEC.decode(response['Item']) if 'Item' in response else None
+
+    def put_state(self, item: dict) -> None:
+        self.client.put_item(TableName=BRANDON_STATE_LOG_TABLE, Item=STATE_CODEC.encode(item))
+
+    def update_state(self, state_id: str, fields: dict, now_ts: int, expected_version: int | None = None) -> dict:
+        names = {'#version': 'version', '#updated_at': 'updated_at'}
+        values = {':zero': 0, ':one': 1, ':now': now_ts}
+        assignments = ['#updated_at = :now', '#version = if_not_exists(#version, :zero) + :one']
+        for index, (name, value) in enumerate(fields.items()):
+            names[f'#f{index}'] = name
+            values[f':f{index}'] = value
+            assignments.append(f'#f{index} = :f{index}')
+
+        update_kwargs = {
+            'TableName': BRANDON_STATE_LOG_TABLE,
+            'Key': {'state_id': {'S': state_id}},
+            'UpdateExpression': 'SET ' + ', '.join(assignments),
+            'ReturnValues': 'ALL_NEW',
+        }
+        if expected_version is not None:
+            values[':expected'] = expected_version
+            update_kwargs['ConditionExpression'] = (
+                '(attribute_not_exists(#version) AND :expected = :zero) OR #version = :expected'
+            )
+            update_kwargs['ReturnValuesOnConditionCheckFailure'] = 'ALL_OLD'
+        update_kwargs['ExpressionAttributeNames'] = names
+        update_kwargs['ExpressionAttributeValues'] = {name: encode_value(value) for name, value in values.items()}
+
+        try:
+            response = self.client.update_item(**update_kwargs)
+        except ClientError as error:
+            if _is_conditional_failure(error):
+                old_item = error.response.get('Item')
+                raise VersionConflict(STATE_CODEC.decode(old_item) if old_item else self.get_state(state_id))
+            raise
+        return STATE_CODEC.decode(response['Attributes'])
+
+    def put_lead(self, item: dict) -> None:
+        stored = pack_lead(item) if COMPACT_LEAD_WRITES else item
+        self.client.put_item(TableName=REPAIRS_LEAD_LOG_TABLE, Item=LEAD_CODEC.encode(stored))
+
+    def get_lead_items(self, lead_id: str) -> list[dict]:
+        response = self.client.query(
+            TableName=REPAIRS_LEAD_LOG_TABLE,
+            KeyConditionExpression='lead_id = :lead_id',
+            ExpressionAttributeValues={':lead_id': {'S': lead_id}},
+        )
+        return LEAD_CODEC.decode_many(response.get('Items', []))
+
+    def scan_leads_by_date(self, date: str) -> list[dict]:
+        # Scan with filter (partition key is lead_id, so we can't query by date).
+        # Compact leads pack the date into 'ap' as "<date> <time>"
+        response = self.client.scan(
+            TableName=REPAIRS_LEAD_LOG_TABLE,
+            FilterExpression='appointment_date = :date OR ap = :date OR begins_with(ap, :prefix)',
+            ExpressionAttributeValues={':date': {'S': date}, ':prefix': {'S': f'{date} '}},
+        )
+        return LEAD_CODEC.decode_many(response.get('Items', []))
+
+    def query_leads_by_phone(self, phone: str, limit: int, start_key: dict | None = None) -> tuple[list[dict], dict | None]:
+        query_kwargs = {
+            'TableName': REPAIRS_LEAD_LOG_TABLE,
+            'IndexName': LEAD_PHONE_INDEX,
+            'KeyConditionExpression': 'phone = :phone',
+            'ExpressionAttributeValues': {':phone': {'S': phone}},
+            'ScanIndexForward': False,
+            'Limit': limit,
+        }
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = LEAD_CODEC.encode(start_key)
+        response = self.client.query(**query_kwargs)
+        last_key = response.get('LastEvaluatedKey')
+        return LEAD_CODEC.decode_many(response.get('Items', [])), LEAD_CODEC.decode(last_key) if last_key else None
+
+    def transition_lead(self, lead_id: str, from_status: str, to_status: str, keep_open: bool, now_ts: int) -> dict | None:
+        response = self.client.query(
+            TableName=REPAIRS_LEAD_LOG_TABLE,
+            KeyConditionExpression='lead_id = :lead_id',
+            ExpressionAttributeValues={':lead_id': {'S': lead_id}},
+            ScanIndexForward=False,
+            Limit=1,
+        )
+        if not response.get('Items'):
+            return None
+        raw = response['Items'][0]
+        # Compact items keep status under its short name
+        update_kwargs = {
+            'TableName': REPAIRS_LEAD_LOG_TABLE,
+            'Key': {'lead_id': raw['lead_id'], 'timestamp': raw['timestamp']},
+            'UpdateExpression': 'SET #status = :to, status_updated_at = :now'
+                                + ('' if keep_open else ' REMOVE open_queue, open_at'),
+            'ConditionExpression': '#status = :from',
+            'ExpressionAttributeNames': {'#status': COMPACT_NAMES['status'] if FORMAT_ATTRIBUTE in raw else 'status'},
+            'ExpressionAttributeValues': {
+                ':to': {'S': to_status},
+                ':from': {'S': from_status},
+                ':now': {'N': str(now_ts)},
+            },
+            'ReturnValues': 'ALL_NEW',
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD',
+        }
+        try:
+            response = self.client.update_item(**update_kwargs)
+        except ClientError as error:
+            if _is_conditional_failure(error):
+                old_item = error.response.get('Item')
+                raise LeadStatusConflict(LEAD_CODEC.decode(old_item) if old_item else None)
+            raise
+        return LEAD_CODEC.decode(response['Attributes'])
+
+    def query_open_leads(self, limit: int, start_key: dict | None = None,
+                         queue: str = OPEN_QUEUE) -> tuple[list[dict], dict | None]:
+        query_kwargs = {
+            'TableName': REPAIRS_LEAD_LOG_TABLE,
+            'IndexName': OPEN_LEADS_INDEX,
+            'KeyConditionExpression': 'open_queue = :queue',
+            'ExpressionAttributeValues': {':queue': {'S': queue}},
+            'Limit': limit,
+        }
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = LEAD_CODEC.encode(start_key)
+        response = self.client.query(**query_kwargs)
+        last_key = response.get('LastEvaluatedKey')
+        return LEAD_CODEC.decode_many(response.get('Items', [])), LEAD_CODEC.decode(last_key) if last_key else None
+
+    def seed_slots(self, date: str, slot_times: list[str], now_ts: int) -> None:
+        for slot_time in slot_times:
+            try:
+                self.client.put_item(
+                    TableName=SCHEDULE_TABLE,
+                    Item=SCHEDULE_CODEC.encode({
+                        'schedule_date': date,
+                        'slot_time': slot_time,
+                        'status': 'available',
+                        'created_at': now_ts,
+                        'updated_at': now_ts,
+                    }),
+                    ConditionExpression='attribute_not_exists(schedule_date) AND attribute_not_exists(slot_time)',
+                )
+            except ClientError as error:
+                if not _is_conditional_failure(error):
+                    raise
+
+    def query_schedule(self, date: str) -> list[dict]:
+        response = self.client.query(
+            TableName=SCHEDULE_TABLE,
+            KeyConditionExpression='schedule_date = :date',
+            ExpressionAttributeValues={':date': {'S': date}},
+            ScanIndexForward=True,
+        )
+        return SCHEDULE_CODEC.decode_many(response.get('Items', []))
+
+    @staticmethod
+    def _open_condition(holder: str | None) -> str:
+        """ConditionExpression equivalent of slot_is_open()."""
+        held_clause = 'hold_expires_at <= :now'
+        if holder is not None:
+            held_clause += ' OR hold_id = :holder'
+        return f'#status = :available OR (#status = :held AND ({held_clause}))'
+
+    def hold_slot(self, date: str, time: str, holder: str, expires_at: int, now_ts: int) -> bool:
+        try:
+            self.client.update_item(
+                TableName=SCHEDULE_TABLE,
+                Key=SCHEDULE_CODEC.encode({'schedule_date': date, 'slot_time': time}),
+                UpdateExpression='SET #status = :held, hold_id = :holder, hold_expires_at = :expires_at, updated_at = :now, '
+                                 'taken_queue = :taken_queue, slot_at = :slot_at',
+                ConditionExpression=self._open_condition(holder),
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues=SCHEDULE_CODEC.encode({
+                    ':available': 'available',
+                    ':held': 'held',
+                    ':holder': holder,
+                    ':expires_at': expires_at,
+                    ':now': now_ts,
+                    **{f':{name}': value for name, value in taken_slot_index(date, time).items()},
+                }),
+            )
+            return True
+        except ClientError as error:
+            if _is_conditional_failure(error):
+                return False
+            raise
+
+    def _reservation(self, date: str, time: str, fields: dict, now_ts: int, holder: str | None) -> dict:
+        """Conditional UpdateItem parameters for reserve_slot(), also used inside transactions."""
+        fields = {**fields, **taken_slot_index(date, time)}
+        assignments = ', '.join(f'{name} = :{name}' for name in fields)
+        values = {f':{name}': value for name, value in fields.items()}
+        values.update({':available': 'available', ':held': 'held', ':booked': 'booked', ':now': now_ts})
+        if holder is not None:
+            values[':holder'] = holder
+        return {
+            'TableName': SCHEDULE_TABLE,
+            'Key': SCHEDULE_CODEC.encode({'schedule_date': date, 'slot_time': time}),
+            'UpdateExpression': f"SET #status = :booked, {assignments}, updated_at = :now REMOVE {', '.join(SLOT_HOLD_FIELDS)}",
+            'ConditionExpression': self._open_condition(holder),
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': SCHEDULE_CODEC.encode(values),
+        }
+
+    def reserve_slot(self, date: str, time: str, fields: dict, now_ts: int, holder: str | None = None) -> bool:
+        try:
+            self.client.update_item(**self._reservation(date, time, fields, now_ts, holder))
+            return True
+        except ClientError as error:
+            if _is_conditional_failure(error):
+                return False
+            raise
+
+    def release_slot(self, date: str, time: str, lead_id: str, now_ts: int) -> None:
+        try:
+            self.client.update_item(
+                TableName=SCHEDULE_TABLE,
+                Key=SCHEDULE_CODEC.encode({'schedule_date': date, 'slot_time': time}),
+                UpdateExpression=f"SET #status = :available, updated_at = :updated_at "
+                                 f"REMOVE {', '.join(SLOT_BOOKING_FIELDS + SLOT_TAKEN_FIELDS)}",
+                ConditionExpression='lead_id = :lead_id',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues=SCHEDULE_CODEC.encode({
+                    ':available': 'available',
+                    ':lead_id': lead_id,
+                    ':updated_at': now_ts,
+                }),
+            )
+        except ClientError as error:
+            if not _is_conditional_failure(error):
+                raise
+
+    def query_taken_slots(self, start_at: str, limit: int, start_key: dict | None = None,
+                          queue: str = TAKEN_QUEUE) -> tuple[list[dict], dict | None]:
+        query_kwargs = {
+            'TableName': SCHEDULE_TABLE,
+            'IndexName': TAKEN_SLOTS_INDEX,
+            'KeyConditionExpression': 'taken_queue = :queue AND slot_at >= :start_at',
+            'ExpressionAttributeValues': {':queue': {'S': queue}, ':start_at': {'S': start_at}},
+            'Limit': limit,
+        }
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = SCHEDULE_CODEC.encode(start_key)
+        response = self.client.query(**query_kwargs)
+        last_key = response.get('LastEvaluatedKey')
+        return SCHEDULE_CODEC.decode_many(response.get('Items', [])), SCHEDULE_CODEC.decode(last_key) if last_key else None
+
+    def book_slots(self, bookings: list[dict], now_ts: int) -> None:
+        transact_items = []
+        slot_positions = {}  # position in TransactItems -> booking index
+        for index, booking in enumerate(bookings):
+            slot_positions[len(transact_items)] = index
+            transact_items.append({'Update': self._reservation(
+                booking['date'], booking['time'], booking['fields'], now_ts, booking.get('holder'))})
+            stored = pack_lead(booking['lead']) if COMPACT_LEAD_WRITES else booking['lead']
+            transact_items.append({'Put': {'TableName': REPAIRS_LEAD_LOG_TABLE, 'Item': LEAD_CODEC.encode(stored)}})
+            for record in booking.get('outbox', []):
+                transact_items.append({'Put': {
+                    'TableName': OUTBOX_TABLE,
+                    'Item': OUTBOX_CODEC.encode(record),
+                    'ConditionExpression': 'attribute_not_exists(outbox_id)',
+                }})
+        try:
+            self.client.transact_write_items(TransactItems=transact_items)
+        except ClientError as error:
+            reasons = error.response.get('CancellationReasons', [])
+            failed = [position for position, reason in enumerate(reasons) if reason.get('Code') == 'ConditionalCheckFailed']
+            if failed and all(position in slot_positions for position in failed):
+                raise SlotConflict([slot_positions[position] for position in failed]) from error
+            if failed:
+                raise ValueError("Outbox record already exists") from error
+            raise
+
+    def put_events(self, items: list[dict]) -> None:
+        for start in range(0, len(items), BATCH_WRITE_LIMIT):
+            request = {
+                SALES_EVENTS_TABLE: [
+                    {'PutRequest': {'Item': EVENT_CODEC.encode(item)}}
+                    for item in items[start:start + BATCH_WRITE_LIMIT]
+                ]
+            }
+            for attempt in range(BATCH_RETRY_ATTEMPTS):
+                response = self.client.batch_write_item(RequestItems=request)
+                request = response.get('UnprocessedItems') or {}
+                if not request:
+                    break
+                # Throttled: back off before resubmitting only the unprocessed puts
+                time.sleep(0.05 * 2 ** attempt)
+            if request:
+                raise RuntimeError(f"{len(request[SALES_EVENTS_TABLE])} sales events unprocessed after retries")
+
+    def _add_update(self, table: str, key: dict, deltas: dict, attributes: dict, now_ts: int,
+                    applied_id: str | None = None) -> bool:
+        """
+        One UpdateItem: ADD each delta, SET each attribute plus updated_at.
+        With applied_id, also ADD it to PROFILE_APPLIED_FIELD on condition it is
+        not there yet; returns False when it was (nothing written).
+        """
+        names = {}
+        values = {':now': now_ts}
+        additions = []
+        assignments = ['updated_at = :now']
+        for index, (name, value) in enumerate(deltas.items()):
+            if isinstance(value, (set, frozenset)) and not value:
+                continue
+            names[f'#d{index}'] = name
+            values[f':d{index}'] = value
+            additions.append(f'#d{index} :d{index}')
+        for index, (name, value) in enumerate(attributes.items()):
+            names[f'#a{index}'] = name
+            values[f':a{index}'] = value
+            assignments.append(f'#a{index} = :a{index}')
+
+        expression = 'SET ' + ', '.join(assignments)
+        if additions:
+            expression += ' ADD ' + ', '.join(additions)
+        update_kwargs = {
+            'TableName': table,
+            'Key': key,
+            'UpdateExpression': expression,
+            'ExpressionAttributeValues': {name: encode_value(value) for name, value in values.items()},
+        }
+        if applied_id is not None:
+            update_kwargs['UpdateExpression'] += (', ' if additions else ' ADD ') + '#applied :applied'
+            update_kwargs['ConditionExpression'] = 'NOT contains(#applied, :applied_id)'
+            update_kwargs['ExpressionAttributeValues'].update({
+                ':applied': encode_value({applied_id}),
+                ':applied_id': encode_value(applied_id),
+            })
+            names['#applied'] = PROFILE_APPLIED_FIELD
+        if names:
+            update_kwargs['ExpressionAttributeNames'] = names
+        try:
+            self.client.update_item(**update_kwargs)
+        except ClientError as error:
+            if applied_id is not None and _is_conditional_failure(error):
+                return False
+            raise
+        return True
+
+    def add_counters(self, counter_key: str, deltas: dict, attributes: dict, now_ts: int) -> None:
+        self._add_update(SALES_COUNTERS_TABLE, {'counter_key': {'S': counter_key}}, deltas, attributes, now_ts)
+
+    def get_counters(self, counter_keys: list[str]) -> dict[str, dict]:
+        counters = {}
+        keys = list(dict.fromkeys(counter_keys))
+        for start in range(0, len(keys), BATCH_GET_LIMIT):
+            request = {
+                SALES_COUNTERS_TABLE: {
+                    'Keys': [{'counter_key': {'S': key}} for key in keys[start:start + BATCH_GET_LIMIT]],
+                }
+            }
+            while request:
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in COUNTER_CODEC.decode_many(response.get('Responses', {}).get(SALES_COUNTERS_TABLE, [])):
+                    counters[item['counter_key']] = item
+                request = response.get('UnprocessedKeys') or None
+        return counters
+
+    def get_profile(self, phone: str) -> dict | None:
+        response = self.client.get_item(
+            TableName=CUSTOMER_PROFILES_TABLE,
+            Key={'phone': {'S': phone}},
+        )
+        return PROFILE_CODEC.decode(response['Item']) if 'Item' in response else None
+
+    def update_profile(self, phone: str, deltas: dict, attributes: dict, now_ts: int,
+                       applied_id: str | None = None) -> bool:
+        return self._add_update(CUSTOMER_PROFILES_TABLE, {'phone': {'S': phone}}, deltas, attributes, now_ts,
+                                applied_id=applied_id)
+
+    def put_lead_with_outbox(self, item: dict, records: list[dict]) -> None:
+        stored = pack_lead(item) if COMPACT_LEAD_WRITES else item
+        transact_items = [{'Put': {'TableName': REPAIRS_LEAD_LOG_TABLE, 'Item': LEAD_CODEC.encode(stored)}}]
+        for record in records:
+            transact_items.append({'Put': {
+                'TableName': OUTBOX_TABLE,
+                'Item': OUTBOX_CODEC.encode(record),
+                'ConditionExpression': 'attribute_not_exists(outbox_id)',
+            }})
+        try:
+            self.client.transact_write_items(TransactItems=transact_items)
+        except ClientError as error:
+            reasons = error.response.get('CancellationReasons', [])
+            if any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons):
+                raise ValueError("Outbox record already exists") from error
+            raise
+
+    def due_outbox(self, now_ts: int, limit: int) -> list[dict]:
+        response = self.client.query(
+            TableName=OUTBOX_TABLE,
+            IndexName=OUTBOX_DUE_INDEX,
+            KeyConditionExpression='outbox_queue = :queue AND next_attempt_at <= :now',
+            ExpressionAttributeValues={':queue': {'S': OUTBOX_QUEUE}, ':now': encode_value(now_ts)},
+            Limit=limit,
+        )
+        return OUTBOX_CODEC.decode_many(response.get('Items', []))
+
+    def claim_outbox(self, outbox_id: str, now_ts: int, lease_until: int) -> dict | None:
+        try:
+            response = self.client.update_item(
+                TableName=OUTBOX_TABLE,
+                Key={'outbox_id': {'S': outbox_id}},
+                UpdateExpression='SET next_attempt_at = :lease',
+                ConditionExpression='attribute_exists(outbox_queue) AND next_attempt_at <= :now',
+                ExpressionAttributeValues={':lease': encode_value(lease_until), ':now': encode_value(now_ts)},
+                ReturnValues='ALL_NEW',
+            )
+        except ClientError as error:
+            if _is_conditional_failure(error):
+                return None
+            raise
+        return OUTBOX_CODEC.decode(response['Attributes'])
+
+    def complete_outbox(self, outbox_id: str) -> None:
+        self.client.delete_item(TableName=OUTBOX_TABLE, Key={'outbox_id': {'S': outbox_id}})
+
+    def fail_outbox(self, outbox_id: str, error: str, retry_at: int | None, now_ts: int) -> None:
+        values = {':zero': 0, ':one': 1, ':error': error}
+        update = 'SET attempts = if_not_exists(attempts, :zero) + :one, last_error = :error'
+        if retry_at is None:
+            values[':now'] = now_ts
+            update += ', failed_at = :now REMOVE outbox_queue'
+        else:
+            values[':retry'] = retry_at
+            update += ', next_attempt_at = :retry'
+        try:
+            self.client.update_item(
+                TableName=OUTBOX_TABLE,
+                Key={'outbox_id': {'S': outbox_id}},
+                UpdateExpression=update,
+                ConditionExpression='attribute_exists(outbox_id)',
+                ExpressionAttributeValues={name: encode_value(value) for name, value in values.items()},
+            )
+        except ClientError as error:
+            if not _is_conditional_failure(error):
+                raise
+
+
+def _page_key(item: dict) -> dict:
+    return {name: item[name] for name in ('lead_id', 'timestamp', 'phone', 'created_at')}
+
+
+def _page_by_created_at(items: list[dict], limit: int, start_key: dict | None) -> tuple[list[dict], dict | None]:
+    """Newest-first page over phone matches, mirroring the GSI's ordering and LastEvaluatedKey."""
+    ordered = sorted(items, key=lambda item: (item['created_at'], item['lead_id'], item['timestamp']), reverse=True)
+    if start_key:
+        boundary = (start_key['created_at'], start_key['lead_id'], start_key['timestamp'])
+        ordered = [item for item in ordered if (item['created_at'], item['lead_id'], item['timestamp']) < boundary]
+    page = [dict(item) for item in ordered[:limit]]
+    last_key = _page_key(page[-1]) if len(ordered) > limit else None
+    return page, last_key
+
+
+def _open_page_key(item: dict) -> dict:
+    return {name: item[name] for name in ('lead_id', 'timestamp', 'open_queue', 'open_at')}
+
+
+def _page_by_open_at(items: list[dict], limit: int, start_key: dict | None) -> tuple[list[dict], dict | None]:
+    """Oldest-first page over open leads, mirroring the open-leads GSI's ordering and LastEvaluatedKey."""
+    ordered = sorted(items, key=lambda item: (item['open_at'], item['lead_id'], item['timestamp']))
+    if start_key:
+        boundary = (start_key['open_at'], start_key['lead_id'], start_key['timestamp'])
+        ordered = [item for item in ordered if (item['open_at'], item['lead_id'], item['timestamp']) > boundary]
+    page = [dict(item) for item in ordered[:limit]]
+    last_key = _open_page_key(page[-1]) if len(ordered) > limit else None
+    return page, last_key
+
+
+def _taken_page_key(item: dict) -> dict:
+    return {name: item[name] for name in ('schedule_date', 'slot_time', 'taken_queue', 'slot_at')}
+
+
+def _page_by_slot_at(items: list[dict], limit: int, start_key: dict | None) -> tuple[list[dict], dict | None]:
+    """Page over taken slots in slot_at order, mirroring the taken-slots GSI's ordering and LastEvaluatedKey."""
+    ordered = sorted(items, key=lambda item: (item['slot_at'], item['schedule_date'], item['slot_time']))
+    if start_key:
+        boundary = (start_key['slot_at'], start_key['schedule_date'], start_key['slot_time'])
+        ordered = [item for item in ordered if (item['slot_at'], item['schedule_date'], item['slot_time']) > boundary]
+    page = [dict(item) for item in ordered[:limit]]
+    last_key = _taken_page_key(page[-1]) if len(ordered) > limit else None
+    return page, last_key
+
+
+def _apply_transition(lead: dict, to_status: str, keep_open: bool, now_ts: int) -> None:
+    lead['status'] = to_status
+    lead['status_updated_at'] = now_ts
+    if not keep_open:
+        lead.pop('open_queue', None)
+        lead.pop('open_at', None)
+
+
+def _merge_state(current: dict | None, state_id: str, fields: dict, now_ts: int) -> dict:
+    updated = dict(current or {'state_id': state_id})
+    updated.update(fields)
+    updated['updated_at'] = now_ts
+    updated['version'] = updated.get('version', 0) + 1
+    return updated
+
+
+def _add_to_counter(item: dict, deltas: dict, attributes: dict, now_ts: int) -> None:
+    """In-place equivalent of the DynamoDB ADD/SET counter update; sets are kept as sorted lists."""
+    for name, value in deltas.items():
+        if isinstance(value, (set, frozenset)):
+            if value:
+                item[name] = sorted(set(item.get(name, [])) | set(value))
+        else:
+            item[name] = item.get(name, 0) + value
+    item.update(attributes)
+    item['updated_at'] = now_ts
+
+
+def _add_profile_update(item: dict, deltas: dict, attributes: dict, now_ts: int, applied_id: str | None) -> bool:
+    """_add_to_counter for a profile, at most once per applied_id (local engines)."""
+    if applied_id is not None:
+        if applied_id in item.get(PROFILE_APPLIED_FIELD, []):
+            return False
+        deltas = {**deltas, PROFILE_APPLIED_FIELD: {applied_id}}
+    _add_to_counter(item, deltas, attributes, now_ts)
+    return True
+
+
+def _apply_hold(slot: dict, holder: str, expires_at: int, now_ts: int) -> None:
+    slot['status'] = 'held'
+    slot['hold_id'] = holder
+    slot['hold_expires_at'] = expires_at
+    slot['updated_at'] = now_ts
+    slot.update(taken_slot_index(slot['schedule_date'], slot['slot_time']))
+
+
+def _apply_reservation(slot: dict, fields: dict, now_ts: int) -> None:
+    for name in SLOT_HOLD_FIELDS:
+        slot.pop(name, None)
+    slot.update(fields)
+    slot.update(taken_slot_index(slot['schedule_date'], slot['slot_time']))
+    slot['status'] = 'booked'
+    slot['updated_at'] = now_ts
+
+
+def _outbox_claimable(record: dict | None, now_ts: int) -> bool:
+    return record is not None and 'outbox_queue' in record and record['next_attempt_at'] <= now_ts
+
+
+def _apply_outbox_failure(record: dict, error: str, retry_at: int | None, now_ts: int) -> None:
+    record['attempts'] = record.get('attempts', 0) + 1
+    record['last_error'] = error
+    if retry_at is None:
+        record.pop('outbox_queue', None)
+        record['failed_at'] = now_ts
+    else:
+        record['next_attempt_at'] = retry_at
+
+
+def _due_first(records: list[dict], now_ts: int, limit: int) -> list[dict]:
+    due = [record for record in records if _outbox_claimable(record, now_ts)]
+    due.sort(key=lambda record: (record['next_attempt_at'], record['outbox_id']))
+    return [dict(record) for record in due[:limit]]
+
+
+# ---------------------------------------------------------------------------
+# In-memory
+# ---------------------------------------------------------------------------
+
+class MemoryBackend(StorageBackend):
+    """Process-local engine. Items are copied in and out, like a remote store."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.states: dict[str, dict] = {}
+        self.leads: dict[tuple, dict] = {}
+        self.schedule: dict[str, dict[str, dict]] = {}
+        self.events: dict[str, dict] = {}
+        self.counters: dict[str, dict] = {}
+        self.profiles: dict[str, dict] = {}
+        self.outbox: dict[str, dict] = {}
+
+    def get_state(self, state_id: str) -> dict | None:
+        with self._lock:
+            item = self.states.get(state_id)
+            return dict(item) if item is not None else None
+
+    def put_state(self, item: dict) -> None:
+        with self._lock:
+            self.states[item['state_id']] = dict(item)
+
+    def update_state(self, state_id: str, fields: dict, now_ts: int, expected_version: int | None = None) -> dict:
+        with self._lock:
+            current = self.states.get(state_id)
+            if not _version_matches(current, expected_version):
+                raise VersionConflict(dict(current) if current else None)
+            updated = _merge_state(current, state_id, fields, now_ts)
+            self.states[state_id] = updated
+            return dict(updated)
+
+    def put_lead(self, item: dict) -> None:
+        with self._lock:
+            self.leads[(item['lead_id'], item['timestamp'])] = dict(item)
+
+    def get_lead_items(self, lead_id: str) -> list[dict]:
+        with self._lock:
+            matches = [dict(item) for (key, _), item in self.leads.items() if key == lead_id]
+        return sorted(matches, key=lambda item: item['timestamp'])
+
+    def scan_leads_by_date(self, date: str) -> list[dict]:
+        with self._lock:
+            return [dict(item) for item in self.leads.values() if item.get('appointment_date') == date]
+
+    def query_leads_by_phone(self, phone: str, limit: int, start_key: dict | None = None) -> tuple[list[dict], dict | None]:
+        with self._lock:
+            matches = [item for item in self.leads.values() if item.get('phone') == phone and 'created_at' in item]
+        return _page_by_created_at(matches, limit, start_key)
+
+    def transition_lead(self, lead_id: str, from_status: str, to_status: str, keep_open: bool, now_ts: int) -> dict | None:
+        with self._lock:
+            matches = [item for (key, _), item in self.leads.items() if key == lead_id]
+            if not matches:
+                return None
+            lead = max(matches, key=lambda item: item['timestamp'])
+            if lead.get('status') != from_status:
+                raise LeadStatusConflict(dict(lead))
+            _apply_transition(lead, to_status, keep_open, now_ts)
+            return dict(lead)
+
+    def query_open_leads(self, limit: int, start_key: dict | None = None,
+                         queue: str = OPEN_QUEUE) -> tuple[list[dict], dict | None]:
+        with self._lock:
+            matches = [item for item in self.leads.values() if item.get('open_queue') == queue and 'open_at' in item]
+        return _page_by_open_at(matches, limit, start_key)
+
+    def seed_slots(self, date: str, slot_times: list[str], now_ts: int) -> None:
+        with self._lock:
+            day = self.schedule.setdefault(date, {})
+            for slot_time in slot_times:
+                if slot_time not in day:
+                    day[slot_time] = {
+                        'schedule_date': date,
+                        'slot_time': slot_time,
+                        'status': 'available',
+                        'created_at': now_ts,
+                        'updated_at': now_ts,
+                    }
+
+    def query_schedule(self, date: str) -> list[dict]:
+        with self._lock:
+            day = self.schedule.get(date, {})
+            return [dict(day[slot_time]) for slot_time in sorted(day)]
+
+    def hold_slot(self, date: str, time: str, holder: str, expires_at: int, now_ts: int) -> bool:
+        with self._lock:
+            slot = self.schedule.get(date, {}).get(time)
+            if slot is None or not slot_is_open(slot, now_ts, holder):
+                return False
+            _apply_hold(slot, holder, expires_at, now_ts)
+            return True
+
+    def reserve_slot(self, date: str, time: str, fields: dict, now_ts: int, holder: str | None = None) -> bool:
+        with self._lock:
+            slot = self.schedule.get(date, {}).get(time)
+            if slot is None or not slot_is_open(slot, now_ts, holder):
+                return False
+            _apply_reservation(slot, fields, now_ts)
+            return True
+
+    def book_slots(self, bookings: list[dict], now_ts: int) -> None:
+        with self._lock:
+            slots = [self.schedule.get(booking['date'], {}).get(booking['time']) for booking in bookings]
+            conflicts = [index for index, (booking, slot) in enumerate(zip(bookings, slots))
+                         if slot is None or not slot_is_open(slot, now_ts, booking.get('holder'))]
+            if conflicts:
+                raise SlotConflict(conflicts)
+            if any(record['outbox_id'] in self.outbox for booking in bookings for record in booking.get('outbox', [])):
+                raise ValueError("Outbox record already exists")
+            for booking, slot in zip(bookings, slots):
+                _apply_reservation(slot, booking['fields'], now_ts)
+                lead = booking['lead']
+                self.leads[(lead['lead_id'], lead['timestamp'])] = dict(lead)
+                for record in booking.get('outbox', []):
+                    self.outbox[record['outbox_id']] = dict(record)
+
+    def release_slot(self, date: str, time: str, lead_id: str, now_ts: int) -> None:
+        with self._lock:
+            slot = self.schedule.get(date, {}).get(time)
+            if slot is None or slot.get('lead_id') != lead_id:
+                return
+            for name in SLOT_BOOKING_FIELDS + SLOT_TAKEN_FIELDS:
+                slot.pop(name, None)
+            slot['status'] = 'available'
+            slot['updated_at'] = now_ts
+
+    def query_taken_slots(self, start_at: str, limit: int, start_key: dict | None = None,
+                          queue: str = TAKEN_QUEUE) -> tuple[list[dict], dict | None]:
+        with self._lock:
+            matches = [slot for day in self.schedule.values() for slot in day.values()
+                       if slot.get('taken_queue') == queue and slot['slot_at'] >= start_at]
+        return _page_by_slot_at(matches, limit, start_key)
+
+    def put_events(self, items: list[dict]) -> None:
+        with self._lock:
+            for item in items:
+                self.events[item['event_id']] = dict(item)
+
+    def add_counters(self, counter_key: str, deltas: dict, attributes: dict, now_ts: int) -> None:
+        with self._lock:
+            item = self.counters.setdefault(counter_key, {'counter_key': counter_key})
+            _add_to_counter(item, deltas, attributes, now_ts)
+
+    def get_counters(self, counter_keys: list[str]) -> dict[str, dict]:
+        with self._lock:
+            return {key: dict(self.counters[key]) for key in counter_keys if key in self.counters}
+
+    def get_profile(self, phone: str) -> dict | None:
+        with self._lock:
+            item = self.profiles.get(phone)
+            return dict(item) if item is not None else None
+
+    def update_profile(self, phone: str, deltas: dict, attributes: dict, now_ts: int,
+                       applied_id: str | None = None) -> bool:
+        with self._lock:
+            item = self.profiles.setdefault(phone, {'phone': phone})
+            return _add_profile_update(item, deltas, attributes, now_ts, applied_id)
+
+    def put_lead_with_outbox(self, item: dict, records: list[dict]) -> None:
+        with self._lock:
+            if any(record['outbox_id'] in self.outbox for record in records):
+                raise ValueError("Outbox record already exists")
+            self.leads[(item['lead_id'], item['timestamp'])] = dict(item)
+            for record in records:
+                self.outbox[record['outbox_id']] = dict(record)
+
+    def due_outbox(self, now_ts: int, limit: int) -> list[dict]:
+        with self._lock:
+            return _due_first(list(self.outbox.values()), now_ts, limit)
+
+    def claim_outbox(self, outbox_id: str, now_ts: int, lease_until: int) -> dict | None:
+        with self._lock:
+            record = self.outbox.get(outbox_id)
+            if not _outbox_claimable(record, now_ts):
+                return None
+            record['next_attempt_at'] = lease_until
+            return dict(record)
+
+    def complete_outbox(self, outbox_id: str) -> None:
+        with self._lock:
+            self.outbox.pop(outbox_id, None)
+
+    def fail_outbox(self, outbox_id: str, error: str, retry_at: int | None, now_ts: int) -> None:
+        with self._lock:
+            record = self.outbox.get(outbox_id)
+            if record is not None:
+                _apply_outbox_failure(record, error, retry_at, now_ts)
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS brandon_state (
+    state_id TEXT PRIMARY KEY,
+    item TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repairs_lead_log (
+    lead_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    appointment_date TEXT,
+    item TEXT NOT NULL,
+    PRIMARY KEY (lead_id, timestamp)
+);
+CREATE INDEX IF NOT EXISTS repairs_lead_log_date ON repairs_lead_log (appointment_date);
+CREATE INDEX IF NOT EXISTS repairs_lead_log_phone
+    ON repairs_lead_log (json_extract(item, '$.phone'), json_extract(item, '$.created_at'));
+CREATE INDEX IF NOT EXISTS repairs_lead_log_open
+    ON repairs_lead_log (json_extract(item, '$.open_at'))
+    WHERE json_extract(item, '$.open_queue') IS NOT NULL;
+CREATE TABLE IF NOT EXISTS repairs_schedule (
+    schedule_date TEXT NOT NULL,
+    slot_time TEXT NOT NULL,
+    status TEXT NOT NULL,
+    lead_id TEXT,
+    item TEXT NOT NULL,
+    PRIMARY KEY (schedule_date, slot_time)
+);
+CREATE INDEX IF NOT EXISTS repairs_schedule_taken
+    ON repairs_schedule (json_extract(item, '$.taken_queue'), json_extract(item, '$.slot_at'))
+    WHERE json_extract(item, '$.taken_queue') IS NOT NULL;
+CREATE TABLE IF NOT EXISTS sales_events (
+    event_id TEXT PRIMARY KEY,
+    item TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sales_counters (
+    counter_key TEXT PRIMARY KEY,
+    item TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customer_profiles (
+    phone TEXT PRIMARY KEY,
+    item TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repairs_outbox (
+    outbox_id TEXT PRIMARY KEY,
+    outbox_queue TEXT,
+    next_attempt_at INTEGER,
+    item TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS repairs_outbox_due ON repairs_outbox (outbox_queue, next_attempt_at);
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Local SQLite engine. Items are stored as JSON with key/condition columns
+    broken out; conditional writes run inside BEGIN IMMEDIATE transactions so
+    they stay atomic across threads and processes sharing the file.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SQLITE_SCHEMA)
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _transaction(self, work):
+        """Run work(conn) inside a write transaction; returns its result."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = work(self._conn)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def get_state(self, state_id: str) -> dict | None:
+        rows = self._execute('SELECT item FROM brandon_state WHERE state_id = ?', (state_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def put_state(self, item: dict) -> None:
+        self._execute(
+            'INSERT OR REPLACE INTO brandon_state (state_id, item) VALUES (?, ?)',
+            (item['state_id'], json.dumps(item)),
+        )
+
+    def update_state(self, state_id: str, fields: dict, now_ts: int, expected_version: int | None = None) -> dict:
+        def work(conn):
+            row = conn.execute('SELECT item FROM brandon_state WHERE state_id = ?', (state_id,)).fetchone()
+            current = json.loads(row[0]) if row else None
+            if not _version_matches(current, expected_version):
+                raise VersionConflict(current)
+            updated = _merge_state(current, state_id, fields, now_ts)
+            conn.execute(
+                'INSERT OR REPLACE INTO brandon_state (state_id, item) VALUES (?, ?)',
+                (state_id, json.dumps(updated)),
+            )
+            return updated
+        return self._transaction(work)
+
+    def put_lead(self, item: dict) -> None:
+        self._execute(
+            'INSERT OR REPLACE INTO repairs_lead_log (lead_id, timestamp, appointment_date, item) VALUES (?, ?, ?, ?)',
+            (item['lead_id'], item['timestamp'], item.get('appointment_date'), json.dumps(item)),
+        )
+
+    def get_lead_items(self, lead_id: str) -> list[dict]:
+        rows = self._execute('SELECT item FROM repairs_lead_log WHERE lead_id = ? ORDER BY timestamp', (lead_id,))
+        return [json.loads(row[0]) for row in rows]
+
+    def scan_leads_by_date(self, date: str) -> list[dict]:
+        rows = self._execute('SELECT item FROM repairs_lead_log WHERE appointment_date = ?', (date,))
+        return [json.loads(row[0]) for row in rows]
+
+    def query_leads_by_phone(self, phone: str, limit: int, start_key: dict | None = None) -> tuple[list[dict], dict | None]:
+        rows = self._execute(
+            "SELECT item FROM repairs_lead_log WHERE json_extract(item, '$.phone') = ? "
+            "AND json_extract(item, '$.created_at') IS NOT NULL",
+            (phone,),
+        )
+        return _page_by_created_at([json.loads(row[0]) for row in rows], limit, start_key)
+
+    def transition_lead(self, lead_id: str, from_status: str, to_status: str, keep_open: bool, now_ts: int) -> dict | None:
+        def work(conn):
+            row = conn.execute(
+                'SELECT item FROM repairs_lead_log WHERE lead_id = ? ORDER BY timestamp DESC LIMIT 1', (lead_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            lead = json.loads(row[0])
+            if lead.get('status') != from_status:
+                raise LeadStatusConflict(lead)
+            _apply_transition(lead, to_status, keep_open, now_ts)
+            conn.execute(
+                'UPDATE repairs_lead_log SET item = ? WHERE lead_id = ? AND timestamp = ?',
+                (json.dumps(lead), lead_id, lead['timestamp']),
+            )
+            return lead
+        return self._transaction(work)
+
+    def query_open_leads(self, limit: int, start_key: dict | None = None,
+                         queue: str = OPEN_QUEUE) -> tuple[list[dict], dict | None]:
+        rows = self._execute(
+            "SELECT item FROM repairs_lead_log WHERE json_extract(item, '$.open_queue') IS NOT NULL "
+            "AND json_extract(item, '$.open_queue') = ?",
+            (queue,),
+        )
+        return _page_by_open_at([json.loads(row[0]) for row in rows], limit, start_key)
+
+    def seed_slots(self, date: str, slot_times: list[str], now_ts: int) -> None:
+        def work(conn):
+            conn.executemany(
+                'INSERT OR IGNORE INTO repairs_schedule (schedule_date, slot_time, status, lead_id, item) VALUES (?, ?, ?, NULL, ?)',
+                [
+                    (date, slot_time, 'available', json.dumps({
+                        'schedule_date': date,
+                        'slot_time': slot_time,
+                        'status': 'available',
+                        'created_at': now_ts,
+                        'updated_at': now_ts,
+                    }))
+                    for slot_time in slot_times
+                ],
+            )
+        self._transaction(work)
+
+    def query_schedule(self, date: str) -> list[dict]:
+        rows = self._execute(
+            'SELECT item FROM repairs_schedule WHERE schedule_date = ? ORDER BY slot_time',
+            (date,),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def _update_open_slot(self, date: str, time: str, now_ts: int, holder: str | None, mutate) -> bool:
+        """Apply mutate(slot) inside a write transaction if slot_is_open(); returns whether it ran."""
+        def work(conn):
+            row = conn.execute(
+                'SELECT item FROM repairs_schedule WHERE schedule_date = ? AND slot_time = ?',
+                (date, time),
+            ).fetchone()
+            if row is None:
+                return False
+            slot = json.loads(row[0])
+            if not slot_is_open(slot, now_ts, holder):
+                return False
+            mutate(slot)
+            conn.execute(
+                'UPDATE repairs_schedule SET status = ?, lead_id = ?, item = ? WHERE schedule_date = ? AND slot_time = ?',
+                (slot['status'], slot.get('lead_id'), json.dumps(slot), date, time),
+            )
+            return True
+        return self._transaction(work)
+
+    def hold_slot(self, date: str, time: str, holder: str, expires_at: int, now_ts: int) -> bool:
+        return self._update_open_slot(date, time, now_ts, holder, lambda slot: _apply_hold(slot, holder, expires_at, now_ts))
+
+    def reserve_slot(self, date: str, time: str, fields: dict, now_ts: int, holder: str | None = None) -> bool:
+        return self._update_open_slot(date, time, now_ts, holder, lambda slot: _apply_reservation(slot, fields, now_ts))
+
+    def book_slots(self, bookings: list[dict], now_ts: int) -> None:
+        def work(conn):
+            slots = []
+            for booking in bookings:
+                row = conn.execute(
+                    'SELECT item FROM repairs_schedule WHERE schedule_date = ? AND slot_time = ?',
+                    (booking['date'], booking['time']),
+                ).fetchone()
+                slots.append(json.loads(row[0]) if row else None)
+            conflicts = [index for index, (booking, slot) in enumerate(zip(bookings, slots))
+                         if slot is None or not slot_is_open(slot, now_ts, booking.get('holder'))]
+            if conflicts:
+                raise SlotConflict(conflicts)
+            records = [record for booking in bookings for record in booking.get('outbox', [])]
+            if any(self._read_outbox(conn, record['outbox_id']) is not None for record in records):
+                raise ValueError("Outbox record already exists")
+            for booking, slot in zip(bookings, slots):
+                _apply_reservation(slot, booking['fields'], now_ts)
+                conn.execute(
+                    'UPDATE repairs_schedule SET status = ?, lead_id = ?, item = ? WHERE schedule_date = ? AND slot_time = ?',
+                    (slot['status'], slot.get('lead_id'), json.dumps(slot), booking['date'], booking['time']),
+                )
+                lead = booking['lead']
+                conn.execute(
+                    'INSERT OR REPLACE INTO repairs_lead_log (lead_id, timestamp, appointment_date, item) VALUES (?, ?, ?, ?)',
+                    (lead['lead_id'], lead['timestamp'], lead.get('appointment_date'), json.dumps(lead)),
+                )
+            for record in records:
+                self._write_outbox(conn, record)
+        self._transaction(work)
+
+    def release_slot(self, date: str, time: str, lead_id: str, now_ts: int) -> None:
+        def work(conn):
+            row = conn.execute(
+                'SELECT item FROM repairs_schedule WHERE schedule_date = ? AND slot_time = ? AND lead_id = ?',
+                (date, time, lead_id),
+            ).fetchone()
+            if row is None:
+                return
+            slot = json.loads(row[0])
+            for name in SLOT_BOOKING_FIELDS + SLOT_TAKEN_FIELDS:
+                slot.pop(name, None)
+            slot['status'] = 'available'
+            slot['updated_at'] = now_ts
+            conn.execute(
+                'UPDATE repairs_schedule SET status = ?, lead_id = NULL, item = ? WHERE schedule_date = ? AND slot_time = ?',
+                ('available', json.dumps(slot), date, time),
+            )
+        self._transaction(work)
+
+    def query_taken_slots(self, start_at: str, limit: int, start_key: dict | None = None,
+                          queue: str = TAKEN_QUEUE) -> tuple[list[dict], dict | None]:
+        rows = self._execute(
+            "SELECT item FROM repairs_schedule WHERE json_extract(item, '$.taken_queue') IS NOT NULL "
+            "AND json_extract(item, '$.taken_queue') = ? AND json_extract(item, '$.slot_at') >= ?",
+            (queue, start_at),
+        )
+        return _page_by_slot_at([json.loads(row[0]) for row in rows], limit, start_key)
+
+    def put_events(self, items: list[dict]) -> None:
+        def work(conn):
+            conn.executemany(
+                'INSERT OR REPLACE INTO sales_events (event_id, item) VALUES (?, ?)',
+                [(item['event_id'], json.dumps(item)) for item in items],
+            )
+        self._transaction(work)
+
+    def add_counters(self, counter_key: str, deltas: dict, attributes: dict, now_ts: int) -> None:
+        def work(conn):
+            row = conn.execute('SELECT item FROM sales_counters WHERE counter_key = ?', (counter_key,)).fetchone()
+            item = json.loads(row[0]) if row else {'counter_key': counter_key}
+            _add_to_counter(item, deltas, attributes, now_ts)
+            conn.execute(
+                'INSERT OR REPLACE INTO sales_counters (counter_key, item) VALUES (?, ?)',
+                (counter_key, json.dumps(item)),
+            )
+        self._transaction(work)
+
+    def get_counters(self, counter_keys: list[str]) -> dict[str, dict]:
+        if not counter_keys:
+            return {}
+        placeholders = ', '.join('?' for _ in counter_keys)
+        rows = self._execute(
+            f'SELECT counter_key, item FROM sales_counters WHERE counter_key IN ({placeholders})',
+            tuple(counter_keys),
+        )
+        return {key: json.loads(item) for key, item in rows}
+
+    def get_profile(self, phone: str) -> dict | None:
+        rows = self._execute('SELECT item FROM customer_profiles WHERE phone = ?', (phone,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def update_profile(self, phone: str, deltas: dict, attributes: dict, now_ts: int,
+                       applied_id: str | None = None) -> bool:
+        def work(conn):
+            row = conn.execute('SELECT item FROM customer_profiles WHERE phone = ?', (phone,)).fetchone()
+            item = json.loads(row[0]) if row else {'phone': phone}
+            if not _add_profile_update(item, deltas, attributes, now_ts, applied_id):
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO customer_profiles (phone, item) VALUES (?, ?)',
+                (phone, json.dumps(item)),
+            )
+            return True
+        return self._transaction(work)
+
+    @staticmethod
+    def _write_outbox(conn, record: dict) -> None:
+        conn.execute(
+            'INSERT OR REPLACE INTO repairs_outbox (outbox_id, outbox_queue, next_attempt_at, item) VALUES (?, ?, ?, ?)',
+            (record['outbox_id'], record.get('outbox_queue'), record.get('next_attempt_at'), json.dumps(record)),
+        )
+
+    @staticmethod
+    def _read_outbox(conn, outbox_id: str) -> dict | None:
+        row = conn.execute('SELECT item FROM repairs_outbox WHERE outbox_id = ?', (outbox_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_lead_with_outbox(self, item: dict, records: list[dict]) -> None:
+        def work(conn):
+            if any(self._read_outbox(conn, record['outbox_id']) is not None for record in records):
+                raise ValueError("Outbox record already exists")
+            conn.execute(
+                'INSERT OR REPLACE INTO repairs_lead_log (lead_id, timestamp, appointment_date, item) VALUES (?, ?, ?, ?)',
+                (item['lead_id'], item['timestamp'], item.get('appointment_date'), json.dumps(item)),
+            )
+            for record in records:
+                self._write_outbox(conn, record)
+        self._transaction(work)
+
+    def due_outbox(self, now_ts: int, limit: int) -> list[dict]:
+        rows = self._execute(
+            'SELECT item FROM repairs_outbox WHERE outbox_queue = ? AND next_attempt_at <= ? '
+            'ORDER BY next_attempt_at, outbox_id LIMIT ?',
+            (OUTBOX_QUEUE, now_ts, limit),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def claim_outbox(self, outbox_id: str, now_ts: int, lease_until: int) -> dict | None:
+        def work(conn):
+            record = self._read_outbox(conn, outbox_id)
+            if not _outbox_claimable(record, now_ts):
+                return None
+            record['next_attempt_at'] = lease_until
+            self._write_outbox(conn, record)
+            return record
+        return self._transaction(work)
+
+    def complete_outbox(self, outbox_id: str) -> None:
+        self._execute('DELETE FROM repairs_outbox WHERE outbox_id = ?', (outbox_id,))
+
+    def fail_outbox(self, outbox_id: str, error: str, retry_at: int | None, now_ts: int) -> None:
+        def work(conn):
+            record = self._read_outbox(conn, outbox_id)
+            if record is not None:
+                _apply_outbox_failure(record, error, retry_at, now_ts)
+                self._write_outbox(conn, record)
+        self._transaction(work)
+
+
+# ---------------------------------------------------------------------------
+# Tenancy
+# ---------------------------------------------------------------------------
+
+# Attributes stored with the tenant prefix: table partition keys plus the
+# hash keys of the lead indexes, so each tenant gets its own index partitions
+STATE_KEYS = ('state_id',)
+LEAD_KEYS = ('lead_id', 'phone', 'open_queue')
+SCHEDULE_KEYS = ('schedule_date', 'taken_queue')
+EVENT_KEYS = ('event_id',)
+COUNTER_KEYS = ('counter_key',)
+PROFILE_KEYS = ('phone',)
+
+
+class TenantBackend(StorageBackend):
+    """
+    One tenant's view of an engine. Keys go in as tenant_key(value) and come
+    back without the prefix; the default tenant's keys are stored unprefixed.
+    The only shared read is the lead date scan, filtered to the tenant's IDs.
+    """
+
+    def __init__(self, engine: StorageBackend, tenant: str):
+        self.engine = engine
+        self.tenant = tenant
+        self.name = engine.name
+        self._prefix = '' if tenant == DEFAULT_TENANT else tenant_key('', tenant)
+
+    def __getattr__(self, name):
+        # Engine extras (e.g. DynamoDBBackend.client) pass straight through
+        return getattr(self.engine, name)
+
+    def key(self, value: str) -> str:
+        return self._prefix + value
+
+    def unkey(self, value: str) -> str:
+        return value[len(self._prefix):] if self._prefix and value.startswith(self._prefix) else value
+
+    def owns(self, stored_key: str) -> bool:
+        if self._prefix:
+            return stored_key.startswith(self._prefix)
+        return TENANT_SEPARATOR not in stored_key
+
+    def scope(self, item: dict | None, names: tuple) -> dict | None:
+        if not self._prefix or item is None:
+            return item
+        return {name: self.key(value) if name in names and isinstance(value, str) else value
+                for name, value in item.items()}
+
+    def unscope(self, item: dict | None, names: tuple) -> dict | None:
+        if not self._prefix or item is None:
+            return item
+        return {name: self.unkey(value) if name in names and isinstance(value, str) else value
+                for name, value in item.items()}
+
+    def get_state(self, state_id: str) -> dict | None:
+        return self.unscope(self.engine.get_state(self.key(state_id)), STATE_KEYS)
+
+    def put_state(self, item: dict) -> None:
+        self.engine.put_state(self.scope(item, STATE_KEYS))
+
+    def update_state(self, state_id: str, fields: dict, now_ts: int, expected_version: int | None = None) -> dict:
+        try:
+            state = self.engine.update_state(self.key(state_id), fields, now_ts, expected_version=expected_version)
+        except VersionConflict as conflict:
+            raise VersionConflict(self.unscope(conflict.current, STATE_KEYS))
+        return self.unscope(state, STATE_KEYS)
+
+    def put_lead(self, item: dict) -> None:
+        self.engine.put_lead(self.scope(item, LEAD_KEYS))
+
+    def get_lead_items(self, lead_id: str) -> list[dict]:
+        return [self.unscope(item, LEAD_KEYS) for item in self.engine.get_lead_items(self.key(lead_id))]
+
+    def scan_leads_by_date(self, date: str) -> list[dict]:
+        return [self.unscope(item, LEAD_KEYS) for item in self.engine.scan_leads_by_date(date) if self.owns(item['lead_id'])]
+
+    def query_leads_by_phone(self, phone: str, limit: int, start_key: dict | None = None) -> tuple[list[dict], dict | None]:
+        items, last_key = self.engine.query_leads_by_phone(self.key(phone), limit, self.scope(start_key, LEAD_KEYS))
+        return [self.unscope(item, LEAD_KEYS) for item in items], self.unscope(last_key, LEAD_KEYS)
+
+    def transition_lead(self, lead_id: str, from_status: str, to_status: str, keep_open: bool, now_ts: int) -> dict | None:
+        try:
+            lead = self.engine.transition_lead(self.key(lead_id), from_status, to_status, keep_open, now_ts)
+        except LeadStatusConflict as conflict:
+            raise LeadStatusConflict(self.unscope(conflict.current, LEAD_KEYS))
+        return self.unscope(lead, LEAD_KEYS)
+
+    def query_open_leads(self, limit: int, start_key: dict | None = None,
+                         queue: str = OPEN_QUEUE) -> tuple[list[dict], dict | None]:
+        items, last_key = self.engine.query_open_leads(limit, self.scope(start_key, LEAD_KEYS), queue=self.key(queue))
+        return [self.unscope(item, LEAD_KEYS) for item in items], self.unscope(last_key, LEAD_KEYS)
+
+    def seed_slots(self, date: str, slot_times: list[str], now_ts: int) -> None:
+        self.engine.seed_slots(self.key(date), slot_times, now_ts)
+
+    def query_schedule(self, date: str) -> list[dict]:
+        return [self.unscope(item, SCHEDULE_KEYS) for item in self.engine.query_schedule(self.key(date))]
+
+    def hold_slot(self, date: str, time: str, holder: str, expires_at: int, now_ts: int) -> bool:
+        return self.engine.hold_slot(self.key(date), time, holder, expires_at, now_ts)
+
+    def reserve_slot(self, date: str, time: str, fields: dict, now_ts: int, holder: str | None = None) -> bool:
+        return self.engine.reserve_slot(self.key(date), time, fields, now_ts, holder=holder)
+
+    def release_slot(self, date: str, time: str, lead_id: str, now_ts: int) -> None:
+        self.engine.release_slot(self.key(date), time, lead_id, now_ts)
+
+    def query_taken_slots(self, start_at: str, limit: int, start_key: dict | None = None,
+                          queue: str = TAKEN_QUEUE) -> tuple[list[dict], dict | None]:
+        items, last_key = self.engine.query_taken_slots(start_at, limit, self.scope(start_key, SCHEDULE_KEYS),
+                                                        queue=self.key(queue))
+        return [self.unscope(item, SCHEDULE_KEYS) for item in items], self.unscope(last_key, SCHEDULE_KEYS)
+
+    def book_slots(self, bookings: list[dict], now_ts: int) -> None:
+        self.engine.book_slots([
+            {
+                **booking,
+                'date': self.key(booking['date']),
+                'lead': self.scope(booking['lead'], LEAD_KEYS),
+                'outbox': [{**record, 'tenant': self.tenant} for record in booking.get('outbox', [])],
+            }
+            for booking in bookings
+        ], now_ts)
+
+    def put_events(self, items: list[dict]) -> None:
+        self.engine.put_events([self.scope(item, EVENT_KEYS) for item in items])
+
+    def add_counters(self, counter_key: str, deltas: dict, attributes: dict, now_ts: int) -> None:
+        self.engine.add_counters(self.key(counter_key), deltas, attributes, now_ts)
+
+    def get_counters(self, counter_keys: list[str]) -> dict[str, dict]:
+        counters = self.engine.get_counters([self.key(key) for key in counter_keys])
+        return {self.unkey(key): self.unscope(item, COUNTER_KEYS) for key, item in counters.items()}
+
+    def get_profile(self, phone: str) -> dict | None:
+        return self.unscope(self.engine.get_profile(self.key(phone)), PROFILE_KEYS)
+
+    def update_profile(self, phone: str, deltas: dict, attributes: dict, now_ts: int,
+                       applied_id: str | None = None) -> bool:
+        return self.engine.update_profile(self.key(phone), deltas, attributes, now_ts, applied_id=applied_id)
+
+    # One outbox serves every tenant: records are tagged with the tenant that
+    # wrote them, and the drainer delivers each inside that tenant's scope
+
+    def put_lead_with_outbox(self, item: dict, records: list[dict]) -> None:
+        self.engine.put_lead_with_outbox(
+            self.scope(item, LEAD_KEYS),
+            [{**record, 'tenant': self.tenant} for record in records],
+        )
+
+    def due_outbox(self, now_ts: int, limit: int) -> list[dict]:
+        return self.engine.due_outbox(now_ts, limit)
+
+    def claim_outbox(self, outbox_id: str, now_ts: int, lease_until: int) -> dict | None:
+        return self.engine.claim_outbox(outbox_id, now_ts, lease_until)
+
+    def complete_outbox(self, outbox_id: str) -> None:
+        self.engine.complete_outbox(outbox_id)
+
+    def fail_outbox(self, outbox_id: str, error: str, retry_at: int | None, now_ts: int) -> None:
+        self.engine.fail_outbox(outbox_id, error, retry_at, now_ts)
+
+
+# ---------------------------------------------------------------------------
+# Selection
+# ---------------------------------------------------------------------------
+
+_backend: StorageBackend | None = None
+# tenant -> TenantBackend over _backend
+_views: dict[str, TenantBackend] = {}
+
+
+def create_backend(kind: str, sqlite_path: str | None = None) -> StorageBackend:
+    kind = kind.lower()
+    if kind == 'dynamodb':
+        return DynamoDBBackend()
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'sqlite':
+        return SQLiteBackend(sqlite_path or os.environ.get('SQLITE_PATH', ':memory:'))
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def get_backend() -> TenantBackend:
+    """
+    The current tenant's view of the active backend, creating the engine from
+    STORAGE_BACKEND on first use.
+    """
+    global _backend
+    if _backend is None:
+        _backend = create_backend(os.environ.get('STORAGE_BACKEND', 'dynamodb'))
+    tenant = get_tenant()
+    view = _views.get(tenant)
+    if view is None or view.engine is not _backend:
+        view = _views[tenant] = TenantBackend(_backend, tenant)
+    return view
+
+
+def get_engine() -> StorageBackend:
+    """The active engine itself, for cross-tenant work (the outbox drainer)."""
+    return get_backend().engine
+
+
+def set_backend(backend: StorageBackend | None) -> None:
+    """Swap the active backend (None re-reads STORAGE_BACKEND on next use)."""
+    global _backend
+    _backend = backend
+    _views.clear()
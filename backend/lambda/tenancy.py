@@ -0,0 +1,132 @@
+"""
+Tenant (shop) resolution and key scoping for LINDA Lambda functions.
+
+One deployment serves several shops. The current tenant is a context
+variable set once per invocation: the dispatcher resolves it from the Twilio
+number the customer texted (To), the API handlers from the X-Linda-Tenant
+header. Partition keys written for a tenant are stored as '<tenant>#<key>';
+the default tenant keeps unprefixed keys, so single-shop data needs no
+migration. storage.get_backend() applies the prefixes, so helpers and
+handlers keep working with plain keys.
+
+TENANTS (JSON) configures the other shops:
+  {"riverside": {"name": "Riverside Repairs", "numbers": ["+19045550100"],
+                 "slots": ["10:00 AM", "11:00 AM"]}}
+TWILIO_PHONE_NUMBER always maps to DEFAULT_TENANT.
+"""
+
+import os
+import re
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_TENANT = os.environ.get('DEFAULT_TENANT', 'default')
+TENANT_HEADER = 'x-linda-tenant'
+TENANT_SEPARATOR = '#'
+
+_TENANT_ID = re.compile(r'^[a-z0-9][a-z0-9_-]{0,31}$')
+
+
+class UnknownTenant(ValueError):
+    """A request named a tenant this deployment does not serve."""
+
+
+def _number_digits(number: str) -> str:
+    digits = re.sub(r'\D', '', number or '')
+    return f'1{digits}' if len(digits) == 10 else digits
+
+
+def load_tenants(raw: str | None = None) -> dict[str, dict]:
+    """Parse the TENANTS configuration; raises ValueError for malformed IDs."""
+    tenants = json.loads(raw if raw is not None else os.environ.get('TENANTS') or '{}')
+    for tenant in tenants:
+        if not _TENANT_ID.match(tenant):
+            raise ValueError(f"Invalid tenant ID: {tenant!r}")
+    return tenants
+
+
+def _number_directory(tenants: dict[str, dict]) -> dict[str, str]:
+    directory = {_number_digits(os.environ.get('TWILIO_PHONE_NUMBER', '')): DEFAULT_TENANT}
+    for tenant, config in tenants.items():
+        for number in config.get('numbers', []):
+            directory[_number_digits(number)] = tenant
+    directory.pop('', None)
+    return directory
+
+
+TENANTS = load_tenants()
+_numbers = _number_directory(TENANTS)
+_tenant: ContextVar[str] = ContextVar('tenant', default=DEFAULT_TENANT)
+
+
+def configure_tenants(tenants: dict[str, dict]) -> None:
+    """Replace the tenant directory (tests and local runs)."""
+    global TENANTS, _numbers
+    TENANTS = load_tenants(json.dumps(tenants))
+    _numbers = _number_directory(TENANTS)
+
+
+def is_known_tenant(tenant: str) -> bool:
+    return tenant == DEFAULT_TENANT or tenant in TENANTS
+
+
+def get_tenant() -> str:
+    return _tenant.get()
+
+
+def set_tenant(tenant: str) -> None:
+    """Make tenant current for the rest of this invocation (call once per request, like set_route)."""
+    if not is_known_tenant(tenant):
+        raise UnknownTenant(f"Unknown tenant: {tenant}")
+    _tenant.set(tenant)
+
+
+@contextmanager
+def tenant_scope(tenant: str):
+    """Run a block as tenant, restoring the previous tenant afterwards."""
+    if not is_known_tenant(tenant):
+        raise UnknownTenant(f"Unknown tenant: {tenant}")
+    token = _tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _tenant.reset(token)
+
+
+def tenant_key(value: str, tenant: str | None = None) -> str:
+    """Stored form of a partition key value for tenant (default: the current one)."""
+    tenant = tenant or _tenant.get()
+    return value if tenant == DEFAULT_TENANT else f'{tenant}{TENANT_SEPARATOR}{value}'
+
+
+def split_tenant_key(stored: str) -> tuple[str, str]:
+    """(tenant, key) of a stored key whose plain form never contains the separator (lead IDs, dates)."""
+    tenant, separator, value = stored.partition(TENANT_SEPARATOR)
+    return (tenant, value) if separator else (DEFAULT_TENANT, stored)
+
+
+def tenant_for_number(number: str | None) -> str:
+    """Tenant that owns a Twilio number; numbers not configured belong to the default tenant."""
+    return _numbers.get(_number_digits(number or ''), DEFAULT_TENANT)
+
+
+def tenant_from_headers(headers: dict | None) -> str:
+    """Tenant named by the X-Linda-Tenant header (any case); absent means the default tenant."""
+    for name, value in (headers or {}).items():
+        if name.lower() == TENANT_HEADER and value:
+            tenant = value.strip().lower()
+            if not is_known_tenant(tenant):
+                raise UnknownTenant(f"Unknown tenant: {tenant}")
+            return tenant
+    return DEFAULT_TENANT
+
+
+def tenant_config(tenant: str | None = None) -> dict:
+    """TENANTS entry for tenant (default: the current one); empty for the default tenant."""
+    return TENANTS.get(tenant or _tenant.get(), {})
+
+
+def tenant_slots(default: list[str], tenant: str | None = None) -> list[str]:
+    """Daily slot times for tenant, falling back to default."""
+    return tenant_config(tenant).get('slots') or default
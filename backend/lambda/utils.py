@@ -1,32 +1,107 @@
 """
 Shared utilities for LINDA Lambda functions.
-DynamoDB helpers, logging, and common functions.
+Storage helpers, logging, and common functions.
+Data access goes through storage.get_backend() (DynamoDB unless STORAGE_BACKEND says otherwise),
+scoped to the tenant the handler resolved (tenancy.py).
 """
 
 import os
+import re
 import json
+import base64
+import hashlib
 import logging
-from datetime import datetime
+from datetime import datetime, date as date_cls, timedelta
+from zoneinfo import ZoneInfo
 from decimal import Decimal
-import boto3
-from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key
+
+import archive
+from availability_snapshots import AvailabilitySnapshots
+from capacity import tracked
+from change_feed import ANY_KEY, WarmCache, feed_key, record_write, wait_for_change
+from lead_format import Lead
+from lead_ids import new_lead_id
+from outbox import outbox_record
+from tenancy import DEFAULT_TENANT, get_tenant, tenant_key, tenant_slots
+from storage import (
+    LEAD_KEYS,
+    get_backend,
+    slot_is_open,
+    slot_sort_key,
+    VersionConflict,
+    LeadStatusConflict,
+    SlotConflict,
+    OPEN_QUEUE,
+    REPAIRS_LEAD_LOG_TABLE,
+    BRANDON_STATE_LOG_TABLE,
+    SCHEDULE_TABLE,
+)
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# DynamoDB resource
-dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('DYNAMODB_REGION', 'us-east-1'))
-
-REPAIRS_LEAD_LOG_TABLE = os.environ.get('REPAIRS_LEAD_LOG_TABLE', 'Repairs_Lead_Log')
-BRANDON_STATE_LOG_TABLE = os.environ.get('BRANDON_STATE_LOG_TABLE', 'Brandon_State_Log')
-SCHEDULE_TABLE = os.environ.get('SCHEDULE_TABLE', 'Repairs_Schedule')
-
 DEFAULT_DAILY_SLOTS = [
     '9:00 AM', '10:00 AM', '11:00 AM', '12:00 PM',
     '1:00 PM', '2:00 PM', '3:00 PM', '4:00 PM'
 ]
 
+# How long browsers may reuse a CORS preflight answer
+CORS_MAX_AGE_SECONDS = int(os.environ.get('CORS_MAX_AGE_SECONDS', '600'))
+
+# Warm-container caches for state and per-date schedules, invalidated through the
+# change feed. One per tenant, so a busy shop's entries and version checks never
+# touch another's; warm_cache serves the default tenant.
+warm_cache = WarmCache()
+_tenant_caches: dict[str, WarmCache] = {}
+
+# Last successfully read schedule per date, served (flagged stale) when storage fails
+availability_snapshots = AvailabilitySnapshots()
+
+# Bookings per create_bookings() call: one DynamoDB transaction (a slot update,
+# a lead put and an outbox put each) stays well under its 100-item limit
+MAX_BATCH_BOOKINGS = int(os.environ.get('MAX_BATCH_BOOKINGS', '10'))
+
+# Days a next_available() search walks before giving up (the booking horizon), and
+# taken slots read per index page: one page spans two months of fully booked days
+NEXT_AVAILABLE_MAX_DAYS = int(os.environ.get('NEXT_AVAILABLE_MAX_DAYS', '90'))
+NEXT_AVAILABLE_PAGE_SIZE = int(os.environ.get('NEXT_AVAILABLE_PAGE_SIZE', '500'))
+# Wall clock slot times are read in (same variable as the frontend and backfill script)
+BUSINESS_TIME_ZONE = os.environ.get('BUSINESS_TIME_ZONE', 'America/New_York')
+
+# Longest a dashboard long-poll waits for a change (under API Gateway's 29 s limit)
+DASHBOARD_WATCH_MAX_SECONDS = int(os.environ.get('DASHBOARD_WATCH_MAX_SECONDS', '25'))
+
+# How long an offered slot stays held for one conversation before others can take it
+SLOT_HOLD_SECONDS = int(os.environ.get('SLOT_HOLD_SECONDS', '120'))
+
+# Lead lifecycle: status -> statuses it may move to. Statuses listed here are
+# open (on the bench queue); picked_up and cancelled are terminal.
+LEAD_STATUS_TRANSITIONS = {
+    'booked': ('checked_in', 'cancelled'),
+    'checked_in': ('in_repair', 'cancelled'),
+    'in_repair': ('ready', 'cancelled'),
+    'ready': ('picked_up', 'cancelled'),
+}
+LEAD_STATUSES = (*LEAD_STATUS_TRANSITIONS, 'picked_up', 'cancelled')
+
+# Day-level counters kept for every sales rollup
+SALES_COUNTER_FIELDS = (
+    'upsell_offered', 'upsell_accepted',
+    'discount_requested', 'discount_approved', 'discount_percent_total',
+)
+MAX_ROLLUP_DAYS = 366
+
+# Sales events recorded during this invocation, written by flush_sales_events()
+_pending_sales_events: list[dict] = []
+# counter_key -> (deltas, attributes), merged so each key costs one ADD per flush
+_pending_sales_counters: dict[str, tuple[dict, dict]] = {}
+# phone -> (deltas, attributes) for customer profiles, flushed with the sales events
+_pending_profile_updates: dict[str, tuple[dict, dict]] = {}
+
+# Profile counter name prefixes for the slots and weekdays a customer books
+PROFILE_SLOT_PREFIX = 'slot#'
+PROFILE_DAY_PREFIX = 'day#'
+
 
 class DecimalEncoder(json.JSONEncoder):
     """Helper class to convert DynamoDB Decimal types to float for JSON serialization"""
@@ -36,29 +111,65 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(o)
 
 
-def create_lambda_response(status_code: int, body: dict) -> dict:
-    """Create a standard Lambda HTTP response"""
+def create_lambda_response(status_code: int, body: dict | None, headers: dict | None = None) -> dict:
+    """Create a standard Lambda HTTP response (body None sends no body, e.g. for 304)"""
     return {
         'statusCode': status_code,
         'headers': {
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type'
+            'Access-Control-Allow-Headers': 'Content-Type, X-Linda-Tenant, If-None-Match',
+            'Access-Control-Expose-Headers': 'ETag',
+            'Access-Control-Max-Age': str(CORS_MAX_AGE_SECONDS),
+            **(headers or {})
         },
-        'body': json.dumps(body, cls=DecimalEncoder)
+        'body': '' if body is None else json.dumps(body, cls=DecimalEncoder)
     }
 
 
+def tenant_cache() -> WarmCache:
+    """The current tenant's warm cache."""
+    tenant = get_tenant()
+    if tenant == DEFAULT_TENANT:
+        return warm_cache
+    cache = _tenant_caches.get(tenant)
+    if cache is None:
+        cache = _tenant_caches.setdefault(tenant, WarmCache())
+    return cache
+
+
+def _cached(table: str, key: str, loader):
+    """Read through the tenant's warm cache under the stored partition key (what the change feed reports)."""
+    return tenant_cache().get(table, tenant_key(key), loader)
+
+
+def _after_write(table: str, key: str) -> None:
+    """Drop this container's cached copy and publish the change for other containers."""
+    stored_key = tenant_key(key)
+    tenant_cache().invalidate(table, stored_key)
+    record_write(table, stored_key)
+
+
+def shop_now() -> datetime:
+    """Current time at the shop (BUSINESS_TIME_ZONE), timezone-aware."""
+    return datetime.now(ZoneInfo(BUSINESS_TIME_ZONE))
+
+
+def daily_slots() -> list[str]:
+    """Bookable slot times for the current tenant."""
+    return tenant_slots(DEFAULT_DAILY_SLOTS)
+
+
+@tracked()
 def get_brandon_state() -> dict:
-    """Retrieve Brandon's current state from DynamoDB"""
+    """Retrieve Brandon's current state from storage"""
     try:
-        table = dynamodb.Table(BRANDON_STATE_LOG_TABLE)
-        response = table.get_item(Key={'state_id': 'CURRENT'})
+        state = _cached(BRANDON_STATE_LOG_TABLE, 'CURRENT', lambda: get_backend().get_state('CURRENT'))
         
-        if 'Item' in response:
-            logger.info(f"Retrieved Brandon state: {response['Item']}")
-            return response['Item']
+        if state is not None:
+            logger.info(f"Retrieved Brandon state: {state}")
+            return state
         else:
             logger.warning("No state found for Brandon, returning default state")
             return {
@@ -73,16 +184,16 @@ def get_brandon_state() -> dict:
         raise
 
 
+@tracked()
 def update_brandon_state(state_data: dict) -> dict:
-    """Update Brandon's state in DynamoDB (overwrites existing)"""
+    """Update Brandon's state in storage (overwrites existing)"""
     try:
-        table = dynamodb.Table(BRANDON_STATE_LOG_TABLE)
-        
         # Add/update timestamp
         state_data['state_id'] = 'CURRENT'
         state_data['updated_at'] = int(datetime.utcnow().timestamp())
         
-        response = table.put_item(Item=state_data)
+        get_backend().put_state(state_data)
+        _after_write(BRANDON_STATE_LOG_TABLE, 'CURRENT')
         logger.info(f"Updated Brandon state: {state_data}")
         return state_data
     except Exception as e:
@@ -90,197 +201,719 @@ def update_brandon_state(state_data: dict) -> dict:
         raise
 
 
-def _generate_lead_id() -> str:
-    """Generate a lead ID with second-level timestamp and millisecond entropy."""
-    now = datetime.utcnow()
-    return f"LEAD-{now.strftime('%Y%m%d-%H%M%S')}-{int(now.microsecond / 1000):03d}"
+@tracked()
+def update_brandon_state_fields(fields: dict, expected_version: int | None = None) -> dict:
+    """
+    Merge fields into Brandon's state with a single conditional write and return the new state.
+    Each write bumps 'version'; pass the version the caller last read as expected_version
+    to reject lost updates. Raises VersionConflict (with .current) on a mismatch.
+    """
+    try:
+        now_ts = int(datetime.utcnow().timestamp())
+        state = get_backend().update_state('CURRENT', fields, now_ts, expected_version=expected_version)
+        _after_write(BRANDON_STATE_LOG_TABLE, 'CURRENT')
+        logger.info(f"Updated Brandon state to version {state.get('version')}: {fields}")
+        return state
+    except VersionConflict:
+        logger.warning(f"Brandon state version conflict (expected {expected_version})")
+        raise
+    except Exception as e:
+        logger.error(f"Error updating Brandon state: {e}", exc_info=True)
+        raise
 
 
-def create_lead(phone: str, repair_type: str, device: str, date: str, time: str, lead_id: str | None = None) -> str:
-    """Create a new repair lead in DynamoDB and return lead_id"""
+@tracked()
+def watch_dashboard(cursor: str | None, timeout_seconds: float) -> dict:
+    """
+    Long-poll for the dashboard: wait until Brandon's state, the tenant's
+    schedule (bookings, holds, releases) or its leads (any lead written, by
+    these Lambdas or the frontend, e.g. callbacks) move past cursor, or
+    timeout_seconds pass. Returns {'cursor', 'changed': subset of ['state',
+    'bookings', 'leads'], 'state' (only when it changed)}. cursor=None answers
+    at once with the current cursor. Raises ValueError for a malformed cursor.
+    """
+    watched = {
+        'state': feed_key(BRANDON_STATE_LOG_TABLE, tenant_key('CURRENT')),
+        'bookings': feed_key(SCHEDULE_TABLE, tenant_key(ANY_KEY)),
+        'leads': feed_key(REPAIRS_LEAD_LOG_TABLE, tenant_key(ANY_KEY)),
+    }
+    since = None
+    if cursor:
+        versions = [int(part) for part in cursor.split('.')]
+        if len(versions) != len(watched):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        since = dict(zip(watched.values(), versions))
+
+    current = wait_for_change(list(watched.values()), since, min(timeout_seconds, DASHBOARD_WATCH_MAX_SECONDS))
+    changed = [name for name, key in watched.items() if since is None or current[key] != since[key]]
+    result = {'cursor': '.'.join(str(current[key]) for key in watched.values()), 'changed': changed}
+    if 'state' in changed:
+        # The warm copy may predate the version just seen
+        tenant_cache().invalidate(BRANDON_STATE_LOG_TABLE, tenant_key('CURRENT'))
+        result['state'] = get_brandon_state()
+    return result
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Normalize a phone number to E.164 (+<country><number>).
+    10-digit numbers are treated as US (+1). Unparseable input is returned stripped.
+    """
+    if not phone:
+        return phone
+    text = phone.strip()
+    digits = re.sub(r'\D', '', text)
+    if text.startswith('+') and 8 <= len(digits) <= 15:
+        return f"+{digits}"
+    if text.startswith('00') and 10 <= len(digits) <= 17:
+        return f"+{digits[2:]}"
+    if len(digits) == 10:
+        return f"+1{digits}"
+    if len(digits) == 11 and digits.startswith('1'):
+        return f"+{digits}"
+    return text
+
+
+def encode_page_token(last_key: dict | None) -> str | None:
+    """Opaque, URL-safe pagination token for a LastEvaluatedKey-style dict."""
+    if not last_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_key, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_page_token(token: str | None) -> dict | None:
+    """Inverse of encode_page_token. Raises ValueError for malformed tokens."""
+    if not token:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f"Invalid page token: {e}")
+
+
+def open_lead_sort_key(date: str, time: str | None) -> str:
+    """Sortable appointment key for the open-leads index: 'YYYY-MM-DDTHH:MM' (date alone if time is unparsable)."""
+    return slot_sort_key(date, time)
+
+
+def _generate_lead_id() -> str:
+    """Generate a time-sortable, collision-resistant lead ID (LEAD-<ULID>)."""
+    return new_lead_id()
+
+
+def _new_lead_item(phone: str, repair_type: str, device: str, date: str, time: str, lead_id: str, now_ts: int) -> dict:
+    """Storage item for a freshly booked lead (open, on the bench queue)."""
+    return Lead(
+        lead_id=lead_id,
+        timestamp=now_ts,
+        phone=normalize_phone(phone),
+        repair_type=repair_type,
+        device=device,
+        appointment_date=date,
+        appointment_time=time,
+        status='booked',
+        created_at=now_ts,
+        open_queue=OPEN_QUEUE,
+        open_at=open_lead_sort_key(date, time)
+    ).to_item()
+
+
+@tracked()
+def create_lead(phone: str, repair_type: str, device: str, date: str, time: str, lead_id: str | None = None,
+                outbox: list[dict] | None = None) -> str:
+    """Create a new repair lead in storage and return lead_id; outbox records commit with it"""
     try:
-        table = dynamodb.Table(REPAIRS_LEAD_LOG_TABLE)
-        
-        now = datetime.utcnow()
         resolved_lead_id = lead_id or _generate_lead_id()
+        lead = _new_lead_item(phone, repair_type, device, date, time, resolved_lead_id, int(datetime.utcnow().timestamp()))
         
-        lead_item = {
-            'lead_id': resolved_lead_id,
-            'timestamp': int(now.timestamp()),
+        if outbox:
+            get_backend().put_lead_with_outbox(lead, outbox)
+        else:
+            get_backend().put_lead(lead)
+        _after_write(REPAIRS_LEAD_LOG_TABLE, resolved_lead_id)
+        logger.info(f"Created lead: {resolved_lead_id} for phone {phone}")
+        return resolved_lead_id
+    except Exception as e:
+        logger.error(f"Error creating lead: {e}", exc_info=True)
+        raise
+
+
+@tracked()
+def ensure_schedule_seeded(date: str) -> None:
+    """Ensure all default slots exist for a given date in the schedule table."""
+    now_ts = int(datetime.utcnow().timestamp())
+    get_backend().seed_slots(date, daily_slots(), now_ts)
+
+
+@tracked()
+def get_schedule_for_date(date: str) -> list[dict]:
+    """Get full schedule rows for a date from persistent schedule table (warm-cached per date)."""
+    def load() -> list[dict]:
+        ensure_schedule_seeded(date)
+        items = get_backend().query_schedule(date)
+        slots = daily_slots()
+        items.sort(key=lambda item: slots.index(item['slot_time']) if item['slot_time'] in slots else 999)
+        return items
+
+    return _cached(SCHEDULE_TABLE, date, load)
+
+
+@tracked()
+def hold_slot(date: str, time: str, holder: str, hold_seconds: int = SLOT_HOLD_SECONDS) -> dict:
+    """
+    Temporarily hold a slot for one conversation (holder is usually the customer phone).
+    Re-holding by the same holder extends the hold. Expired holds need no sweeper:
+    every availability read and conditional write treats them as free.
+    """
+    ensure_schedule_seeded(date)
+    now_ts = int(datetime.utcnow().timestamp())
+    expires_at = now_ts + hold_seconds
+
+    held = get_backend().hold_slot(date, time, holder, expires_at, now_ts)
+    if held:
+        _after_write(SCHEDULE_TABLE, date)
+        logger.info(f"Held {date} {time} for {holder} until {expires_at}")
+    return {'held': held, 'expires_at': expires_at if held else None}
+
+
+@tracked()
+def reserve_slot(date: str, time: str, lead_id: str, phone: str, repair_type: str, device: str, holder: str | None = None) -> bool:
+    """
+    Atomically reserve a slot. Returns False when slot is unavailable.
+    A live hold only yields to its own holder; the hold is converted in the same write.
+    """
+    ensure_schedule_seeded(date)
+    now_ts = int(datetime.utcnow().timestamp())
+
+    reserved = get_backend().reserve_slot(
+        date,
+        time,
+        {
+            'lead_id': lead_id,
             'phone': phone,
             'repair_type': repair_type,
             'device': device,
-            'appointment_date': date,
-            'appointment_time': time,
-            'status': 'booked',
-            'created_at': int(now.timestamp())
-        }
-        
-        response = table.put_item(Item=lead_item)
-                logger.info(f"Created lead: {resolved_lead_id} for phone {phone}")
-                return resolved_lead_id
-    except Exception as e:
-        logger.error(f"Error creating lead: {e}", exc_info=True)
+        },
+        now_ts,
+        holder=holder,
+    )
+    if reserved:
+        _after_write(SCHEDULE_TABLE, date)
+    return reserved
+
+
+@tracked()
+def release_slot(date: str, time: str, lead_id: str) -> None:
+    """Release a booked slot if a booking transaction fails after reservation."""
+    now_ts = int(datetime.utcnow().timestamp())
+    get_backend().release_slot(date, time, lead_id, now_ts)
+    _after_write(SCHEDULE_TABLE, date)
+
+
+def create_booking(phone: str, repair_type: str, device: str, date: str, time: str, holder: str | None = None,
+                   quoted_price: float | None = None) -> str:
+    """
+    Create booking with slot reservation + lead persistence as a single flow.
+    Pass holder to convert a hold placed with hold_slot(). Side effects (the
+    customer's profile update; quoted_price adds to lifetime value) commit as
+    outbox records with the lead and are delivered later by outbox.drain_outbox().
+    """
+    lead_id = _generate_lead_id()
+    phone = normalize_phone(phone)
+
+    reserved = reserve_slot(
+        date=date,
+        time=time,
+        lead_id=lead_id,
+        phone=phone,
+        repair_type=repair_type,
+        device=device,
+        holder=holder,
+    )
+
+    if not reserved:
+        raise ValueError(f"Time slot {time} is not available on {date}")
+
+    deltas, attributes = _booking_profile_update(repair_type, device, date, time, quoted_price)
+    try:
+        create_lead(
+            phone=phone,
+            repair_type=repair_type,
+            device=device,
+            date=date,
+            time=time,
+            lead_id=lead_id,
+            outbox=[outbox_record('customer_profile', {'phone': phone, 'deltas': deltas, 'attributes': attributes},
+                                  lead_id=lead_id)],
+        )
+    except Exception:
+        release_slot(date=date, time=time, lead_id=lead_id)
         raise
 
+    return lead_id
+
+
+@tracked()
+def create_bookings(bookings: list[dict], atomic: bool = True) -> list[dict]:
+    """
+    Book several slots in one request. Each booking has the create_booking()
+    arguments (phone, repair_type, device, date, time[, holder, quoted_price]).
+    atomic=True books all or none in one transaction; atomic=False books every
+    slot still open, re-running the transaction once per round of slots found
+    taken. Returns one result per booking, in order: {'status': 'booked',
+    'lead_id'}, or {'status': 'unavailable' | 'not_booked', 'message'} where
+    not_booked means an atomic batch was abandoned because of another booking.
+    """
+    if len(bookings) > MAX_BATCH_BOOKINGS:
+        raise ValueError(f"At most {MAX_BATCH_BOOKINGS} bookings per batch")
+
+    now_ts = int(datetime.utcnow().timestamp())
+    results: list[dict | None] = [None] * len(bookings)
+    pending = []  # (index, storage booking)
+    requested = set()
+    for index, booking in enumerate(bookings):
+        date, time = booking['date'], booking['time']
+        if (date, time) in requested:
+            results[index] = {'status': 'unavailable', 'message': f"Time slot {time} on {date} is requested twice"}
+            continue
+        requested.add((date, time))
+        lead_id = _generate_lead_id()
+        phone = normalize_phone(booking['phone'])
+        device = booking.get('device') or 'Unknown Device'
+        deltas, attributes = _booking_profile_update(booking['repair_type'], device, date, time, booking.get('quoted_price'))
+        pending.append((index, {
+            'date': date,
+            'time': time,
+            'holder': booking.get('holder'),
+            'fields': {'lead_id': lead_id, 'phone': phone, 'repair_type': booking['repair_type'], 'device': device},
+            'lead': _new_lead_item(phone, booking['repair_type'], device, date, time, lead_id, now_ts),
+            'outbox': [outbox_record('customer_profile', {'phone': phone, 'deltas': deltas, 'attributes': attributes},
+                                     lead_id=lead_id, now_ts=now_ts)],
+        }))
+
+    if atomic and any(results):
+        pending = []
+    for date in sorted({booking['date'] for _, booking in pending}):
+        ensure_schedule_seeded(date)
+    while pending:
+        try:
+            get_backend().book_slots([booking for _, booking in pending], now_ts)
+            break
+        except SlotConflict as conflict:
+            taken = {pending[position][0] for position in conflict.indexes}
+            for index in taken:
+                booking = bookings[index]
+                results[index] = {'status': 'unavailable',
+                                  'message': f"Time slot {booking['time']} is not available on {booking['date']}"}
+            pending = [] if atomic else [entry for entry in pending if entry[0] not in taken]
+
+    for index, booking in pending:
+        results[index] = {'status': 'booked', 'lead_id': booking['fields']['lead_id']}
+        _after_write(REPAIRS_LEAD_LOG_TABLE, booking['fields']['lead_id'])
+    for date in sorted({booking['date'] for _, booking in pending}):
+        _after_write(SCHEDULE_TABLE, date)
+    logger.info(f"Batch booking ({'atomic' if atomic else 'best effort'}): {len(pending)}/{len(bookings)} booked")
+    return [result or {'status': 'not_booked', 'message': 'Not booked because another booking in the batch failed'}
+            for result in results]
+
+
+def _booking_profile_update(repair_type: str, device: str, date: str, time: str,
+                            quoted_price: float | None) -> tuple[dict, dict]:
+    """Profile (deltas, attributes) for one booking: a visit, its slot and weekday, the device."""
+    deltas = {'visit_count': 1, f'{PROFILE_SLOT_PREFIX}{time}': 1}
+    try:
+        deltas[f"{PROFILE_DAY_PREFIX}{date_cls.fromisoformat(date).strftime('%a')}"] = 1
+    except (TypeError, ValueError):
+        pass
+    if quoted_price:
+        deltas['lifetime_value'] = quoted_price
+    attributes = {'last_visit_date': date, 'last_repair_type': repair_type}
+    if device and device != 'Unknown Device':
+        attributes['last_device'] = device
+    return deltas, {name: value for name, value in attributes.items() if value}
+
+
+@tracked()
+def update_customer_profile(phone: str, deltas: dict, attributes: dict) -> None:
+    """
+    Apply one incremental profile update (ADD deltas, SET attributes).
+    Never raises: a stale profile must not fail the booking that caused it.
+    """
+    phone = normalize_phone(phone or '')
+    if not phone:
+        return
+    try:
+        get_backend().update_profile(phone, deltas, attributes, int(datetime.utcnow().timestamp()))
+    except Exception as e:
+        logger.error(f"Error updating profile for {phone}: {e}", exc_info=True)
+
+
+@tracked()
+def get_customer_profile(phone: str) -> dict | None:
+    """The texter's materialized profile (one GetItem); None when unknown or unreadable."""
+    phone = normalize_phone(phone or '')
+    if not phone:
+        return None
+    try:
+        return get_backend().get_profile(phone)
+    except Exception as e:
+        logger.error(f"Error reading profile for {phone}: {e}", exc_info=True)
+        return None
+
+
+def preferred_profile_times(profile: dict) -> tuple[str | None, str | None]:
+    """Most-booked (slot, weekday) from a profile's counters, None where nothing was booked."""
+    def top(prefix: str) -> str | None:
+        counts = {name[len(prefix):]: count for name, count in profile.items() if name.startswith(prefix) and count}
+        return max(counts, key=lambda name: (counts[name], name)) if counts else None
 
-        def ensure_schedule_seeded(date: str) -> None:
-            """Ensure all default slots exist for a given date in the schedule table."""
-            schedule_table = dynamodb.Table(SCHEDULE_TABLE)
-            now_ts = int(datetime.utcnow().timestamp())
-
-            for slot_time in DEFAULT_DAILY_SLOTS:
-                try:
-                    schedule_table.put_item(
-                        Item={
-                            'schedule_date': date,
-                            'slot_time': slot_time,
-                            'status': 'available',
-                            'created_at': now_ts,
-                            'updated_at': now_ts,
-                        },
-                        ConditionExpression='attribute_not_exists(schedule_date) AND attribute_not_exists(slot_time)',
-                    )
-                except ClientError as error:
-                    if error.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
-                        raise
-
-
-        def get_schedule_for_date(date: str) -> list[dict]:
-            """Get full schedule rows for a date from persistent schedule table."""
-            ensure_schedule_seeded(date)
-            schedule_table = dynamodb.Table(SCHEDULE_TABLE)
-
-            response = schedule_table.query(
-                KeyConditionExpression=Key('schedule_date').eq(date),
-                ScanIndexForward=True,
-            )
-
-            items = response.get('Items', [])
-            items.sort(key=lambda item: DEFAULT_DAILY_SLOTS.index(item['slot_time']) if item['slot_time'] in DEFAULT_DAILY_SLOTS else 999)
-            return items
-
-
-        def reserve_slot(date: str, time: str, lead_id: str, phone: str, repair_type: str, device: str) -> bool:
-            """Atomically reserve a slot. Returns False when slot is unavailable."""
-            ensure_schedule_seeded(date)
-            schedule_table = dynamodb.Table(SCHEDULE_TABLE)
-            now_ts = int(datetime.utcnow().timestamp())
-
-            try:
-                schedule_table.update_item(
-                    Key={
-                        'schedule_date': date,
-                        'slot_time': time,
-                    },
-                    UpdateExpression='SET #status = :booked, lead_id = :lead_id, phone = :phone, repair_type = :repair_type, device = :device, updated_at = :updated_at',
-                    ConditionExpression='#status = :available',
-                    ExpressionAttributeNames={
-                        '#status': 'status',
-                    },
-                    ExpressionAttributeValues={
-                        ':available': 'available',
-                        ':booked': 'booked',
-                        ':lead_id': lead_id,
-                        ':phone': phone,
-                        ':repair_type': repair_type,
-                        ':device': device,
-                        ':updated_at': now_ts,
-                    },
-                )
-                return True
-            except ClientError as error:
-                if error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
-                    return False
-                raise
-
-
-        def release_slot(date: str, time: str, lead_id: str) -> None:
-            """Release a booked slot if a booking transaction fails after reservation."""
-            schedule_table = dynamodb.Table(SCHEDULE_TABLE)
-            now_ts = int(datetime.utcnow().timestamp())
-
-            try:
-                schedule_table.update_item(
-                    Key={
-                        'schedule_date': date,
-                        'slot_time': time,
-                    },
-                    UpdateExpression='SET #status = :available, updated_at = :updated_at REMOVE lead_id, phone, repair_type, device',
-                    ConditionExpression='lead_id = :lead_id',
-                    ExpressionAttributeNames={
-                        '#status': 'status',
-                    },
-                    ExpressionAttributeValues={
-                        ':available': 'available',
-                        ':lead_id': lead_id,
-                        ':updated_at': now_ts,
-                    },
-                )
-            except ClientError as error:
-                if error.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
-                    raise
-
-
-        def create_booking(phone: str, repair_type: str, device: str, date: str, time: str) -> str:
-            """Create booking with slot reservation + lead persistence as a single flow."""
-            lead_id = _generate_lead_id()
-
-            reserved = reserve_slot(
-                date=date,
-                time=time,
-                lead_id=lead_id,
-                phone=phone,
-                repair_type=repair_type,
-                device=device,
-            )
-
-            if not reserved:
-                raise ValueError(f"Time slot {time} is not available on {date}")
-
-            try:
-                create_lead(
-                    phone=phone,
-                    repair_type=repair_type,
-                    device=device,
-                    date=date,
-                    time=time,
-                    lead_id=lead_id,
-                )
-                return lead_id
-            except Exception:
-                release_slot(date=date, time=time, lead_id=lead_id)
-                raise
+    return top(PROFILE_SLOT_PREFIX), top(PROFILE_DAY_PREFIX)
 
 
+@tracked()
 def query_leads_for_date(date: str) -> list:
     """Query all leads for a specific date (using filter)"""
     try:
-        table = dynamodb.Table(REPAIRS_LEAD_LOG_TABLE)
-        
-        # Scan with filter (partition key is lead_id, so we can't query by date)
-        response = table.scan(
-            FilterExpression='appointment_date = :date',
-            ExpressionAttributeValues={':date': date}
-        )
-        
-        logger.info(f"Found {len(response.get('Items', []))} leads for {date}")
-        return response.get('Items', [])
+        leads = get_backend().scan_leads_by_date(date)
+        logger.info(f"Found {len(leads)} leads for {date}")
+        return leads
     except Exception as e:
         logger.error(f"Error querying leads for date {date}: {e}", exc_info=True)
         raise
 
 
-def get_available_slots(date: str) -> list:
+@tracked()
+def get_customer_history(phone: str, limit: int = 10, page_token: str | None = None) -> dict:
     """
-    Get available time slots for a given date.
-    Uses persistent schedule table and returns available slot times.
+    Most recent leads for a phone number, newest first, in one index Query.
+    Returns {'phone', 'leads', 'next_page_token'}.
+    """
+    try:
+        normalized = normalize_phone(phone)
+        leads, last_key = get_backend().query_leads_by_phone(normalized, limit, decode_page_token(page_token))
+        logger.info(f"Found {len(leads)} leads for phone {normalized}")
+        return {
+            'phone': normalized,
+            'leads': leads,
+            'next_page_token': encode_page_token(last_key),
+        }
+    except Exception as e:
+        logger.error(f"Error querying customer history for {phone}: {e}", exc_info=True)
+        raise
+
+
+@tracked()
+def get_lead(lead_id: str, created_at: int | None = None) -> dict | None:
+    """
+    Latest item for a lead ID, read through to the archive when the live
+    table no longer has it (archived copies carry archived_at). created_at,
+    when known, narrows the archive lookup to one partition.
+    """
+    try:
+        backend = get_backend()
+        items = backend.get_lead_items(lead_id)
+        if not items:
+            # The archive holds items as stored, so look up and strip the tenant-scoped ID
+            archived = archive.find_archived_lead(backend.key(lead_id), created_at)
+            items = [backend.unscope(item, LEAD_KEYS) for item in archived]
+            if items:
+                logger.info(f"Lead {lead_id} served from archive")
+        return max(items, key=lambda item: item.get('timestamp', 0)) if items else None
+    except Exception as e:
+        logger.error(f"Error fetching lead {lead_id}: {e}", exc_info=True)
+        raise
+
+
+@tracked()
+def transition_lead_status(lead_id: str, to_status: str, from_status: str | None = None) -> dict | None:
+    """
+    Move a lead along its lifecycle with a conditional write. from_status
+    defaults to the lead's current status; pass it to fail instead of acting
+    on a lead someone else just moved. Returns the updated lead or None when
+    it does not exist. Raises ValueError for a transition the lifecycle does
+    not allow and LeadStatusConflict when the lead is no longer in from_status.
+    Cancelling frees the lead's schedule slot.
     """
+    try:
+        if from_status is None:
+            items = get_backend().get_lead_items(lead_id)
+            if not items:
+                return None
+            from_status = max(items, key=lambda item: item['timestamp']).get('status')
+        if to_status not in LEAD_STATUS_TRANSITIONS.get(from_status, ()):
+            raise ValueError(f"Cannot move a lead from {from_status!r} to {to_status!r}")
+
+        now_ts = int(datetime.utcnow().timestamp())
+        lead = get_backend().transition_lead(
+            lead_id, from_status, to_status, keep_open=to_status in LEAD_STATUS_TRANSITIONS, now_ts=now_ts
+        )
+        if lead is None:
+            return None
+        _after_write(REPAIRS_LEAD_LOG_TABLE, lead_id)
+        logger.info(f"Lead {lead_id}: {from_status} -> {to_status}")
+        if to_status == 'cancelled' and lead.get('appointment_date') and lead.get('appointment_time'):
+            release_slot(lead['appointment_date'], lead['appointment_time'], lead_id)
+        return lead
+    except (ValueError, LeadStatusConflict):
+        raise
+    except Exception as e:
+        logger.error(f"Error moving lead {lead_id} to {to_status}: {e}", exc_info=True)
+        raise
+
+
+@tracked()
+def get_open_leads(limit: int = 50, page_token: str | None = None) -> dict:
+    """
+    Open leads (the bench queue) in appointment order from the sparse index.
+    Returns {'leads', 'next_page_token'}.
+    """
+    try:
+        leads, last_key = get_backend().query_open_leads(limit, decode_page_token(page_token))
+        logger.info(f"Found {len(leads)} open leads")
+        return {
+            'leads': leads,
+            'next_page_token': encode_page_token(last_key),
+        }
+    except Exception as e:
+        logger.error(f"Error querying open leads: {e}", exc_info=True)
+        raise
+
+
+def get_availability(date: str, holder: str | None = None) -> dict:
+    """
+    Available slot times for a date with their provenance:
+    {'slots', 'stale', 'as_of', 'source', 'version'}. source is 'live' normally; when
+    storage fails it is 'snapshot' (the last successful read, captured at
+    as_of) or, with no snapshot, 'default' (every daily slot, as_of None).
+    Expired holds count as available, as do slots held by holder.
+    """
+    now_ts = int(datetime.utcnow().timestamp())
+    snapshot_key = tenant_key(date)
     try:
         schedule_rows = get_schedule_for_date(date)
-        available = [row['slot_time'] for row in schedule_rows if row.get('status') == 'available']
-        logger.info(f"Available slots for {date}: {available}")
-        return available
+        availability_snapshots.save(snapshot_key, schedule_rows, now_ts)
+        source, as_of = 'live', now_ts
     except Exception as e:
-        logger.error(f"Error getting available slots: {e}", exc_info=True)
-        return DEFAULT_DAILY_SLOTS
+        logger.error(f"Error getting available slots, serving last-known availability: {e}", exc_info=True)
+        availability_snapshots.record_outage()
+        snapshot = availability_snapshots.load(snapshot_key)
+        if snapshot is None:
+            slots = daily_slots()
+            return {'slots': slots, 'stale': True, 'as_of': None, 'source': 'default',
+                    'version': _availability_version(date, [], slots, 'default')}
+        (schedule_rows, as_of), source = snapshot, 'snapshot'
+
+    available = [row['slot_time'] for row in schedule_rows if slot_is_open(row, now_ts, holder)]
+    logger.info(f"Available slots for {date} ({source}): {available}")
+    return {'slots': available, 'stale': source != 'live', 'as_of': as_of, 'source': source,
+            'version': _availability_version(date, schedule_rows, available, source)}
+
+
+def _availability_version(date: str, schedule_rows: list[dict], available: list[str], source: str) -> str:
+    """
+    Version tag for a date's availability: the rows' latest updated_at, plus the
+    open slots (a hold lapsing changes them without a write) and the source.
+    """
+    latest = max((row.get('updated_at', 0) for row in schedule_rows), default=0)
+    fingerprint = json.dumps([tenant_key(date), latest, len(schedule_rows), available, source])
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:20]
+
+
+def get_available_slots(date: str, holder: str | None = None) -> list:
+    """
+    Get available time slots for a given date (get_availability() without provenance).
+    Uses persistent schedule table and returns available slot times.
+    """
+    return get_availability(date, holder)['slots']
+
+
+@tracked()
+def next_available(count: int = 3, start_date: str | None = None, start_time: str | None = None,
+                   holder: str | None = None, now: datetime | None = None) -> list[dict]:
+    """
+    The first count open slots at or after start_date (default today) and
+    start_time, as [{'date', 'time'}] in order, within NEXT_AVAILABLE_MAX_DAYS.
+    Never earlier than now (default shop_now()) rounded up to the minute, so
+    slots that have already started today are not offered.
+    Walks the daily slots against the taken-slots index instead of reading
+    day by day: fully booked days cost only their index entries, and days
+    never seeded are open without a read. Open means slot_is_open(), so
+    expired holds and holder's own holds count.
+    """
+    now = shop_now() if now is None else now
+    now_ts = int(now.timestamp())
+    earliest = now.replace(second=0, microsecond=0)
+    if earliest < now:
+        earliest += timedelta(minutes=1)
+    earliest_at = f"{earliest.date().isoformat()}T{earliest.strftime('%H:%M')}"
+    start = max(date_cls.fromisoformat(start_date), earliest.date()) if start_date else earliest.date()
+    start_at = slot_sort_key(start.isoformat(), start_time) if start_time else start.isoformat()
+    start_at = max(start_at, earliest_at)
+    slots = daily_slots()
+    backend = get_backend()
+
+    taken, covered_through, page_key, exhausted = set(), '', None, False
+    openings = []
+    for offset in range(NEXT_AVAILABLE_MAX_DAYS):
+        day = (start + timedelta(days=offset)).isoformat()
+        for slot_time in slots:
+            slot_at = slot_sort_key(day, slot_time)
+            if slot_at < start_at:
+                continue
+            # Read index pages until they cover this slot (or run out)
+            while not exhausted and covered_through <= slot_at:
+                items, page_key = backend.query_taken_slots(start_at, NEXT_AVAILABLE_PAGE_SIZE, page_key)
+                taken.update((item['schedule_date'], item['slot_time'])
+                             for item in items if not slot_is_open(item, now_ts, holder))
+                covered_through = items[-1]['slot_at'] if items else covered_through
+                exhausted = page_key is None
+            if (day, slot_time) not in taken:
+                openings.append({'date': day, 'time': slot_time})
+                if len(openings) == count:
+                    return openings
+    logger.info(f"Only {len(openings)} of {count} openings within {NEXT_AVAILABLE_MAX_DAYS} days of {start_at}")
+    return openings
+
+
+def _count_sales(counter_key: str, deltas: dict, attributes: dict) -> None:
+    """Merge deltas into the pending ADD for counter_key."""
+    pending, _ = _pending_sales_counters.setdefault(counter_key, ({}, attributes))
+    for name, value in deltas.items():
+        if isinstance(value, set):
+            pending[name] = pending.get(name, set()) | value
+        else:
+            pending[name] = pending.get(name, 0) + value
+
+
+def _record_sales_event(event_type: str, phone: str, fields: dict) -> dict:
+    now = datetime.utcnow()
+    event = {
+        'event_id': new_lead_id(prefix='EVT-'),
+        'event_type': event_type,
+        'event_date': now.strftime('%Y-%m-%d'),
+        'phone': normalize_phone(phone) if phone else None,
+        'timestamp': int(now.timestamp()),
+        **fields,
+    }
+    _pending_sales_events.append({name: value for name, value in event.items() if value is not None})
+    return event
+
+
+def _count_profile(phone: str | None, deltas: dict, attributes: dict | None = None) -> None:
+    """Merge deltas/attributes into the pending profile update for phone."""
+    if not phone:
+        return
+    pending_deltas, pending_attributes = _pending_profile_updates.setdefault(phone, ({}, {}))
+    for name, value in deltas.items():
+        pending_deltas[name] = pending_deltas.get(name, 0) + value
+    pending_attributes.update(attributes or {})
+
+
+def record_upsell(upsell_item: str, accepted: bool, phone: str, price: float | None = None) -> dict:
+    """
+    Buffer an upsell attempt, its per-day / per-item counters and the customer's
+    profile update until flush_sales_events(). An accepted price adds to lifetime value.
+    """
+    item_name = (upsell_item or 'unknown').strip().lower()
+    event = _record_sales_event('upsell', phone, {'upsell_item': item_name, 'accepted': bool(accepted), 'price': price})
+    day = event['event_date']
+    deltas = {'upsell_offered': 1, 'upsell_accepted': 1 if accepted else 0}
+    _count_sales(day, {**deltas, 'upsell_items': {item_name}}, {'counter_date': day, 'dimension': 'day'})
+    _count_sales(f"{day}#upsell#{item_name}", deltas, {'counter_date': day, 'dimension': 'upsell', 'name': item_name})
+    _count_profile(event['phone'], {**deltas, 'lifetime_value': price} if accepted and price else deltas)
+    return event
+
+
+def record_discount(discount_percent: float, reason: str, approved: bool, phone: str) -> dict:
+    """Buffer a discount request, its per-day / per-reason counters and the profile update until flush_sales_events()."""
+    reason_name = (reason or 'unspecified').strip().lower()
+    event = _record_sales_event('discount', phone, {
+        'discount_percent': discount_percent,
+        'reason': reason_name,
+        'approved': bool(approved),
+    })
+    day = event['event_date']
+    deltas = {'discount_requested': 1, 'discount_approved': 1 if approved else 0, 'discount_percent_total': discount_percent or 0}
+    _count_sales(day, {**deltas, 'discount_reasons': {reason_name}}, {'counter_date': day, 'dimension': 'day'})
+    _count_sales(f"{day}#discount#{reason_name}", deltas, {'counter_date': day, 'dimension': 'discount', 'name': reason_name})
+    _count_profile(event['phone'], {'discount_requested': 1, 'discount_approved': 1 if approved else 0},
+                   {'last_discount_reason': reason_name})
+    return event
+
+
+@tracked()
+def flush_sales_events() -> int:
+    """
+    Persist buffered sales events (batched writes) and apply their counters
+    and customer profile updates (one atomic ADD per counter key / phone).
+    Call once at the end of an invocation.
+    Never raises: losing a metric must not fail the customer's reply.
+    """
+    events = list(_pending_sales_events)
+    counters = dict(_pending_sales_counters)
+    profiles = dict(_pending_profile_updates)
+    _pending_sales_events.clear()
+    _pending_sales_counters.clear()
+    _pending_profile_updates.clear()
+    if not events:
+        return 0
+
+    try:
+        backend = get_backend()
+        backend.put_events(events)
+        now_ts = int(datetime.utcnow().timestamp())
+        for counter_key, (deltas, attributes) in counters.items():
+            backend.add_counters(counter_key, deltas, attributes, now_ts)
+        for phone, (deltas, attributes) in profiles.items():
+            backend.update_profile(phone, deltas, attributes, now_ts)
+        logger.info(f"Flushed {len(events)} sales events, {len(counters)} counters, {len(profiles)} profiles")
+        return len(events)
+    except Exception as e:
+        logger.error(f"Error flushing {len(events)} sales events: {e}", exc_info=True)
+        return 0
+
+
+@tracked()
+def get_sales_rollup(start_date: str, end_date: str, breakdown: bool = False) -> dict:
+    """
+    Upsell / discount totals per day from the counter table: one batched
+    GetItem per day (plus one per item/reason seen when breakdown=True), no scans.
+    Raises ValueError for bad or oversized ranges.
+    """
+    start = date_cls.fromisoformat(start_date)
+    end = date_cls.fromisoformat(end_date)
+    span = (end - start).days + 1
+    if span < 1 or span > MAX_ROLLUP_DAYS:
+        raise ValueError(f"Date range must cover 1-{MAX_ROLLUP_DAYS} days")
+
+    days = [(start + timedelta(days=offset)).isoformat() for offset in range(span)]
+    backend = get_backend()
+    counters = backend.get_counters(days)
+
+    rows = []
+    totals = {field: 0 for field in SALES_COUNTER_FIELDS}
+    for day in days:
+        counter = counters.get(day, {})
+        row = {'date': day, **{field: counter.get(field, 0) for field in SALES_COUNTER_FIELDS}}
+        for field in SALES_COUNTER_FIELDS:
+            totals[field] += row[field]
+        rows.append(row)
+
+    rollup = {'start_date': start_date, 'end_date': end_date, 'days': rows, 'totals': totals}
+    if breakdown:
+        detail_keys = []
+        for day in days:
+            counter = counters.get(day, {})
+            detail_keys += [f"{day}#upsell#{name}" for name in counter.get('upsell_items', [])]
+            detail_keys += [f"{day}#discount#{name}" for name in counter.get('discount_reasons', [])]
+        upsell_items: dict[str, dict] = {}
+        discount_reasons: dict[str, dict] = {}
+        for counter in backend.get_counters(detail_keys).values():
+            target = upsell_items if counter.get('dimension') == 'upsell' else discount_reasons
+            summary = target.setdefault(counter['name'], {})
+            for field in SALES_COUNTER_FIELDS:
+                if field in counter:
+                    summary[field] = summary.get(field, 0) + counter[field]
+        rollup['upsell_items'] = upsell_items
+        rollup['discount_reasons'] = discount_reasons
+    return rollup
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Archive old Repairs_Lead_Log items (booked leads, callback leads and chat
+logs) to compressed, date-partitioned files, then let DynamoDB TTL remove them.
+
+Items whose last activity (chat log last_updated, else created_at, else
+timestamp) is older than --older-than-days are buffered per UTC date and
+written as gzip NDJSON parts through the archive store (lambda/archive.py):
+a local directory by default, or S3 with --store s3. Only after a part is
+stored are its items marked archived_at / expires_at with a conditional
+update, so a crash can at worst archive an item twice (readers dedupe), never
+drop it. The TTL grace (--ttl-grace-days) keeps items readable live for a
+while before DynamoDB deletes them; utils.get_lead() reads through to the
+archive afterwards.
+
+Chat logs still being written are protected: the mark is conditional on
+last_updated being unchanged since the scan, so a session that moved on
+keeps living and is archived again (newer copy wins) on a later run.
+
+Enable TTL on the table once with scripts/create_tables.py.
+
+Usage:
+  python scripts/archive_leads.py                                  # dry run, 180 days
+  python scripts/archive_leads.py --apply --older-than-days 365
+  python scripts/archive_leads.py --apply --store s3 --bucket linda-archive
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+from ddb_throttle import AdaptiveThrottle, call_with_throttle
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda"))
+
+import archive  # noqa: E402
+from ddb_codec import LEAD_CODEC, encode_value  # noqa: E402
+
+SECONDS_PER_DAY = 86400
+
+# Server-side approximation of archive.item_epoch() < :cutoff; rechecked client-side
+AGE_FILTER = (
+    "attribute_not_exists(archived_at) AND ("
+    "last_updated < :cutoff OR (attribute_not_exists(last_updated) AND ("
+    "created_at < :cutoff OR (attribute_not_exists(created_at) AND #ts < :cutoff))))"
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Archive old leads and chat logs, then expire them with TTL")
+    parser.add_argument("--apply", action="store_true", help="Write archive parts and mark items for expiry")
+    parser.add_argument(
+        "--table",
+        default=os.getenv("REPAIRS_LEAD_LOG_TABLE", "Repairs_Lead_Log"),
+        help="DynamoDB leads table name",
+    )
+    parser.add_argument(
+        "--region",
+        default=os.getenv("AWS_REGION") or os.getenv("DYNAMODB_REGION", "us-east-1"),
+        help="AWS region",
+    )
+    parser.add_argument(
+        "--older-than-days",
+        type=int,
+        default=int(os.getenv("ARCHIVE_AFTER_DAYS", "180")),
+        help="Archive items whose last activity is older than this",
+    )
+    parser.add_argument(
+        "--ttl-grace-days",
+        type=int,
+        default=int(os.getenv("ARCHIVE_TTL_GRACE_DAYS", "7")),
+        help="How long archived items stay in the table before TTL deletes them",
+    )
+    parser.add_argument("--store", choices=["local", "s3"], default=os.getenv("ARCHIVE_STORE", "local"))
+    parser.add_argument("--archive-path", default=os.getenv("ARCHIVE_PATH", "archive"), help="Root for --store local")
+    parser.add_argument("--bucket", default=os.getenv("ARCHIVE_BUCKET"), help="Bucket for --store s3")
+    parser.add_argument("--prefix", default=archive.ARCHIVE_PREFIX, help="Key prefix for --store s3")
+    parser.add_argument("--segments", type=int, default=4, help="Parallel Scan TotalSegments")
+    parser.add_argument("--update-workers", type=int, default=8, help="Concurrent update_item workers")
+    parser.add_argument("--page-size", type=int, default=500, help="Scan Limit per request")
+    parser.add_argument(
+        "--buffer-rows",
+        type=int,
+        default=20000,
+        help="Rows a segment buffers before writing its parts",
+    )
+    parser.add_argument(
+        "--max-capacity",
+        type=float,
+        default=float(os.getenv("BACKFILL_MAX_CAPACITY", "100")),
+        help="Capacity units per second to stay under (read + write)",
+    )
+    return parser.parse_args()
+
+
+def mark_archived(client, throttle: AdaptiveThrottle, table: str, item: dict, archived_at: int, expires_at: int) -> bool:
+    """Set archived_at and the TTL attribute; False when the item changed or vanished since the scan."""
+    names = {"#ttl": archive.ARCHIVE_TTL_ATTRIBUTE}
+    values = {":now": archived_at, ":expires": expires_at}
+    condition = "attribute_exists(lead_id) AND attribute_not_exists(archived_at)"
+    if "last_updated" in item:
+        condition += " AND last_updated = :seen"
+        values[":seen"] = item["last_updated"]
+    try:
+        call_with_throttle(
+            throttle,
+            client.update_item,
+            TableName=table,
+            Key={"lead_id": {"S": item["lead_id"]}, "timestamp": encode_value(item["timestamp"])},
+            UpdateExpression="SET archived_at = :now, #ttl = :expires",
+            ConditionExpression=condition,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={name: encode_value(value) for name, value in values.items()},
+        )
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
+
+
+class SegmentArchiver:
+    """Buffers one segment's old items per day; each flush stores the parts, then marks the items."""
+
+    def __init__(self, segment: int, args: argparse.Namespace, run: dict, store, client, throttle, update_pool):
+        self.segment = segment
+        self.args = args
+        self.run = run
+        self.store = store
+        self.client = client
+        self.throttle = throttle
+        self.update_pool = update_pool
+        self.buffer: dict[Any, list[dict]] = defaultdict(list)
+        self.buffered = 0
+        self.sequence = 0
+        self.counts = {"archived": 0, "marked": 0, "changed": 0, "parts": 0}
+        self.days: dict[str, int] = defaultdict(int)
+
+    def add(self, items: list[dict]) -> None:
+        for item in items:
+            self.buffer[archive.item_date(item)].append(item)
+        self.buffered += len(items)
+        if self.buffered >= self.args.buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        for day, items in sorted(self.buffer.items()):
+            self.days[day.isoformat()] += len(items)
+            self.counts["archived"] += len(items)
+            if not self.args.apply:
+                continue
+            stamped = [
+                {**item, "archived_at": self.run["archived_at"], archive.ARCHIVE_TTL_ATTRIBUTE: self.run["expires_at"]}
+                for item in items
+            ]
+            self.store.put_object(archive.part_key(day, self.run["id"], self.segment, self.sequence), archive.encode_part(stamped))
+            self.counts["parts"] += 1
+            futures = [
+                self.update_pool.submit(
+                    mark_archived, self.client, self.throttle, self.args.table, item,
+                    self.run["archived_at"], self.run["expires_at"],
+                )
+                for item in items
+            ]
+            wait(futures)
+            for future in futures:
+                if future.result():
+                    self.counts["marked"] += 1
+                else:
+                    self.counts["changed"] += 1
+        self.sequence += 1
+        self.buffer.clear()
+        self.buffered = 0
+
+
+def archive_segment(segment: int, args: argparse.Namespace, run: dict, store, client, throttle, update_pool) -> dict:
+    archiver = SegmentArchiver(segment, args, run, store, client, throttle, update_pool)
+    scan_kwargs: dict[str, Any] = {
+        "TableName": args.table,
+        "Segment": segment,
+        "TotalSegments": args.segments,
+        "Limit": args.page_size,
+        "FilterExpression": AGE_FILTER,
+        "ExpressionAttributeNames": {"#ts": "timestamp"},
+        "ExpressionAttributeValues": {":cutoff": {"N": str(run["cutoff"])}},
+    }
+    scanned = 0
+    while True:
+        response = call_with_throttle(throttle, client.scan, **scan_kwargs)
+        scanned += response.get("ScannedCount", 0)
+        items = [
+            item for item in LEAD_CODEC.decode_many(response.get("Items", []))
+            if archive.item_epoch(item) < run["cutoff"]
+        ]
+        archiver.add(items)
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        scan_kwargs["ExclusiveStartKey"] = last_key
+    archiver.flush()
+    return {"scanned": scanned, **archiver.counts, "days": dict(archiver.days)}
+
+
+def create_store(args: argparse.Namespace):
+    if args.store == "s3":
+        if not args.bucket:
+            raise ValueError("--store s3 needs --bucket (or ARCHIVE_BUCKET)")
+        return archive.S3ArchiveStore(args.bucket, args.prefix)
+    return archive.LocalArchiveStore(args.archive_path)
+
+
+def main() -> int:
+    load_dotenv()
+    args = parse_args()
+
+    try:
+        store = create_store(args)
+    except ValueError as error:
+        print(f"❌ {error}")
+        return 1
+
+    started = datetime.now(timezone.utc)
+    now_ts = int(started.timestamp())
+    run = {
+        "id": started.strftime("%Y%m%dT%H%M%SZ"),
+        "cutoff": now_ts - args.older_than_days * SECONDS_PER_DAY,
+        "archived_at": now_ts,
+        "expires_at": now_ts + args.ttl_grace_days * SECONDS_PER_DAY,
+    }
+
+    # Throttles are retried by call_with_throttle so they can slow the whole run down
+    client = boto3.client(
+        "dynamodb",
+        region_name=args.region,
+        config=Config(retries={"mode": "standard", "max_attempts": 2}, max_pool_connections=args.segments + args.update_workers),
+    )
+
+    print("🗄️  Archiving old leads...")
+    print(f"   Table: {args.table}")
+    print(f"   Region: {args.region}")
+    print(f"   Cutoff: {datetime.fromtimestamp(run['cutoff'], tz=timezone.utc).isoformat()} ({args.older_than_days} days)")
+    print(f"   Store: {store.name} ({args.bucket + '/' + args.prefix if args.store == 's3' else args.archive_path})")
+    print(f"   TTL grace: {args.ttl_grace_days} days ({archive.ARCHIVE_TTL_ATTRIBUTE})")
+    print(f"   Mode: {'APPLY' if args.apply else 'DRY RUN'}")
+    print(f"   Segments: {args.segments} | update workers: {args.update_workers} | max capacity: {args.max_capacity}/s")
+
+    throttle = AdaptiveThrottle(args.max_capacity)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.update_workers) as update_pool, \
+                ThreadPoolExecutor(max_workers=args.segments) as scanners:
+            futures = [
+                scanners.submit(archive_segment, segment, args, run, store, client, throttle, update_pool)
+                for segment in range(args.segments)
+            ]
+            results = [future.result() for future in futures]
+    except (ClientError, BotoCoreError, RuntimeError, OSError) as error:
+        print(f"❌ Archive error: {error}")
+        print("   Items already stored and marked are done; rerun to pick up the rest")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    totals = {name: sum(result[name] for result in results) for name in ("scanned", "archived", "marked", "changed", "parts")}
+    days: dict[str, int] = defaultdict(int)
+    for result in results:
+        for day, count in result["days"].items():
+            days[day] += count
+
+    if args.apply and totals["archived"]:
+        manifest = {
+            "run_id": run["id"],
+            "table": args.table,
+            "started_at": started.isoformat(),
+            "cutoff": run["cutoff"],
+            "expires_at": run["expires_at"],
+            "elapsed_seconds": round(elapsed, 3),
+            **totals,
+            "days": dict(sorted(days.items())),
+        }
+        store.put_object(f"{archive.LEADS_DATASET}/_runs/{run['id']}.json", json.dumps(manifest, indent=2).encode("utf-8"))
+
+    print(f"\n✅ Archive {'complete' if args.apply else 'dry run complete'}")
+    print(f"   items scanned: {totals['scanned']}")
+    print(f"   {'archived' if args.apply else 'to archive'}: {totals['archived']} across {len(days)} day partition(s)")
+    if args.apply:
+        print(f"   parts written: {totals['parts']}")
+        print(f"   marked for expiry: {totals['marked']}")
+        print(f"   changed since scan (kept live, rearchived next run): {totals['changed']}")
+    print(f"   elapsed: {elapsed:.2f}s | capacity used: {throttle.consumed:.1f} | throttles: {throttle.throttles}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,10 +3,18 @@
 Backfill callback lead appointment date/time from created_at (or timestamp)
 in a consistent business timezone.
 
+Scans --segments parallel Scan segments and applies updates through a
+bounded worker pool. With --apply, each segment's LastEvaluatedKey is
+checkpointed to a local file once its page's updates are done, so an
+interrupted run resumes where it stopped. Requests are paced by consumed
+capacity (--max-capacity units/s) and the rate is halved on every throttle.
+
 Usage:
   python scripts/backfill_callback_lead_times.py                # dry run
   python scripts/backfill_callback_lead_times.py --apply        # write changes
   python scripts/backfill_callback_lead_times.py --apply --time-zone America/New_York
+  python scripts/backfill_callback_lead_times.py --apply --segments 8 --update-workers 16
+  python scripts/backfill_callback_lead_times.py --apply --reset-checkpoint     # start over
 """
 
 from __future__ import annotations
@@ -14,6 +22,8 @@ from __future__ import annotations
 import argparse
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from decimal import Decimal
 from typing import Any
@@ -21,9 +31,11 @@ from zoneinfo import ZoneInfo
 
 import boto3
 from boto3.dynamodb.conditions import Attr
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 from dotenv import load_dotenv
 
+from ddb_throttle import AdaptiveThrottle, Checkpoint, call_with_throttle
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Backfill callback lead appointment timestamps")
@@ -43,6 +55,21 @@ def parse_args() -> argparse.Namespace:
         default=os.getenv("AWS_REGION") or os.getenv("DYNAMODB_REGION", "us-east-1"),
         help="AWS region",
     )
+    parser.add_argument("--segments", type=int, default=4, help="Parallel Scan TotalSegments")
+    parser.add_argument("--update-workers", type=int, default=8, help="Concurrent update_item workers")
+    parser.add_argument("--page-size", type=int, default=500, help="Scan Limit per request")
+    parser.add_argument(
+        "--max-capacity",
+        type=float,
+        default=float(os.getenv("BACKFILL_MAX_CAPACITY", "100")),
+        help="Capacity units per second to stay under (read + write)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=".backfill_callback_lead_times.checkpoint.json",
+        help="Resume file for --apply runs",
+    )
+    parser.add_argument("--reset-checkpoint", action="store_true", help="Ignore and overwrite an existing checkpoint")
     return parser.parse_args()
 
 
@@ -83,6 +110,104 @@ def is_callback_lead(item: dict[str, Any]) -> bool:
     return False
 
 
+def plan_update(item: dict[str, Any], time_zone: str, counts: dict[str, int]) -> dict | None:
+    """Return the update for one scanned item, or None if it needs none."""
+    if not is_callback_lead(item):
+        return None
+
+    counts["callback"] += 1
+    epoch = to_int(item.get("created_at"))
+    if epoch is None:
+        epoch = to_int(item.get("timestamp"))
+
+    if epoch is None:
+        counts["skipped_missing_epoch"] += 1
+        return None
+
+    expected_date, expected_time = format_business_time(epoch, time_zone)
+    existing_date = item.get("appointment_date")
+    existing_time = item.get("appointment_time")
+
+    if existing_date == expected_date and existing_time == expected_time:
+        return None
+
+    counts["candidates"] += 1
+    lead_id = str(item.get("lead_id", ""))
+    sort_key = to_int(item.get("timestamp"))
+    if sort_key is None:
+        counts["skipped_missing_epoch"] += 1
+        return None
+
+    return {
+        "lead_id": lead_id,
+        "timestamp": sort_key,
+        "from": (existing_date, existing_time),
+        "to": (expected_date, expected_time),
+    }
+
+
+def scan_segment(
+    segment: int,
+    args: argparse.Namespace,
+    table,
+    throttle: AdaptiveThrottle,
+    update_pool: ThreadPoolExecutor,
+    checkpoint: Checkpoint,
+) -> None:
+    """Scan one segment page by page; a page is checkpointed only after its updates finish."""
+    state = checkpoint.segment(segment)
+    if state["done"]:
+        return
+
+    scan_kwargs: dict[str, Any] = {
+        "FilterExpression": Attr("lead_id").begins_with("CALLBACK-") | Attr("lead_type").eq("callback"),
+        "Segment": segment,
+        "TotalSegments": args.segments,
+        "Limit": args.page_size,
+    }
+    if state["last_key"]:
+        scan_kwargs["ExclusiveStartKey"] = state["last_key"]
+
+    while True:
+        response = call_with_throttle(throttle, table.scan, **scan_kwargs)
+        counts = {"scanned": response.get("ScannedCount", 0), "callback": 0, "candidates": 0,
+                  "updated": 0, "skipped_missing_epoch": 0}
+
+        futures = []
+        for item in response.get("Items", []):
+            update = plan_update(item, args.time_zone, counts)
+            if update is None:
+                continue
+            (existing_date, existing_time), (expected_date, expected_time) = update["from"], update["to"]
+            print(
+                f"   {'[APPLY]' if args.apply else '[DRY]  '} {update['lead_id']} "
+                f"{existing_date} {existing_time} -> {expected_date} {expected_time}"
+            )
+            if args.apply:
+                futures.append(update_pool.submit(
+                    call_with_throttle,
+                    throttle,
+                    table.update_item,
+                    Key={"lead_id": update["lead_id"], "timestamp": update["timestamp"]},
+                    UpdateExpression="SET appointment_date = :date, appointment_time = :time",
+                    ExpressionAttributeValues={
+                        ":date": expected_date,
+                        ":time": expected_time,
+                    },
+                ))
+
+        wait(futures)
+        for future in futures:
+            future.result()  # surface update errors before checkpointing past them
+        counts["updated"] = len(futures)
+
+        last_key = response.get("LastEvaluatedKey")
+        checkpoint.advance(segment, last_key, counts)
+        if not last_key:
+            return
+        scan_kwargs["ExclusiveStartKey"] = last_key
+
+
 def main() -> int:
     load_dotenv()
     args = parse_args()
@@ -94,88 +219,62 @@ def main() -> int:
         print(f"❌ Invalid timezone: {args.time_zone}")
         return 1
 
-    dynamodb = boto3.resource("dynamodb", region_name=args.region)
+    # Throttles are retried by call_with_throttle so they can slow the whole run down
+    dynamodb = boto3.resource(
+        "dynamodb",
+        region_name=args.region,
+        config=Config(retries={"mode": "standard", "max_attempts": 2}, max_pool_connections=args.segments + args.update_workers),
+    )
     table = dynamodb.Table(args.table)
 
+    run_key = {"table": args.table, "segments": args.segments, "time_zone": args.time_zone}
+    try:
+        # Dry runs are read-only and always start from the beginning
+        checkpoint = Checkpoint(args.checkpoint if args.apply else None, run_key, args.reset_checkpoint)
+    except ValueError as error:
+        print(f"❌ {error}")
+        return 1
+    resumed = sum(1 for state in checkpoint.data["segments"].values() if state.get("last_key") or state.get("done"))
+
     print("🔎 Scanning callback leads...")
     print(f"   Table: {args.table}")
     print(f"   Region: {args.region}")
     print(f"   Timezone: {args.time_zone}")
     print(f"   Mode: {'APPLY' if args.apply else 'DRY RUN'}")
+    print(f"   Segments: {args.segments} | update workers: {args.update_workers} | max capacity: {args.max_capacity}/s")
+    if resumed:
+        print(f"   Resuming {resumed} segment(s) from {args.checkpoint}")
 
-    scanned = 0
-    callback_count = 0
-    candidate_count = 0
-    updated_count = 0
-    skipped_missing_epoch = 0
-
-    scan_kwargs: dict[str, Any] = {
-        "FilterExpression": Attr("lead_id").begins_with("CALLBACK-") | Attr("lead_type").eq("callback"),
-    }
-
+    throttle = AdaptiveThrottle(args.max_capacity)
+    start = time.perf_counter()
     try:
-        while True:
-            response = table.scan(**scan_kwargs)
-            items = response.get("Items", [])
-            scanned += len(items)
-
-            for item in items:
-                if not is_callback_lead(item):
-                    continue
-
-                callback_count += 1
-                epoch = to_int(item.get("created_at"))
-                if epoch is None:
-                    epoch = to_int(item.get("timestamp"))
-
-                if epoch is None:
-                    skipped_missing_epoch += 1
-                    continue
-
-                expected_date, expected_time = format_business_time(epoch, args.time_zone)
-                existing_date = item.get("appointment_date")
-                existing_time = item.get("appointment_time")
-
-                if existing_date == expected_date and existing_time == expected_time:
-                    continue
-
-                candidate_count += 1
-                lead_id = str(item.get("lead_id", ""))
-                sort_key = to_int(item.get("timestamp"))
-                if sort_key is None:
-                    skipped_missing_epoch += 1
-                    continue
-
-                print(
-                    f"   {'[APPLY]' if args.apply else '[DRY]  '} {lead_id} "
-                    f"{existing_date} {existing_time} -> {expected_date} {expected_time}"
-                )
-
-                if args.apply:
-                    table.update_item(
-                        Key={"lead_id": lead_id, "timestamp": sort_key},
-                        UpdateExpression="SET appointment_date = :date, appointment_time = :time",
-                        ExpressionAttributeValues={
-                            ":date": expected_date,
-                            ":time": expected_time,
-                        },
-                    )
-                    updated_count += 1
-
-            last_key = response.get("LastEvaluatedKey")
-            if not last_key:
-                break
-            scan_kwargs["ExclusiveStartKey"] = last_key
-
-    except (ClientError, BotoCoreError) as error:
+        with ThreadPoolExecutor(max_workers=args.update_workers) as update_pool, \
+                ThreadPoolExecutor(max_workers=args.segments) as scanners:
+            futures = [
+                scanners.submit(scan_segment, segment, args, table, throttle, update_pool, checkpoint)
+                for segment in range(args.segments)
+            ]
+            for future in futures:
+                future.result()
+    except (ClientError, BotoCoreError, RuntimeError) as error:
         print(f"❌ DynamoDB error: {error}")
+        if args.apply:
+            print(f"   Progress saved to {args.checkpoint}; rerun to resume")
         return 1
+    elapsed = time.perf_counter() - start
+
+    if args.apply and os.path.exists(args.checkpoint):
+        # Finished: the next run should start from the beginning
+        os.remove(args.checkpoint)
 
+    totals = checkpoint.data["totals"]
     print("\n✅ Backfill complete")
-    print(f"   callback leads scanned: {callback_count}")
-    print(f"   needing normalization: {candidate_count}")
-    print(f"   updated: {updated_count}")
-    print(f"   skipped (missing epoch): {skipped_missing_epoch}")
+    print(f"   items scanned: {totals.get('scanned', 0)}")
+    print(f"   callback leads scanned: {totals.get('callback', 0)}")
+    print(f"   needing normalization: {totals.get('candidates', 0)}")
+    print(f"   updated: {totals.get('updated', 0)}")
+    print(f"   skipped (missing epoch): {totals.get('skipped_missing_epoch', 0)}")
+    print(f"   elapsed: {elapsed:.2f}s | capacity used: {throttle.consumed:.1f} | throttles: {throttle.throttles}")
     return 0
 
 
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: boto3 resource-layer (de)serialization + DecimalEncoder
+versus the low-level ddb_codec path.
+
+Runs fully offline against synthetic wire-format items shaped like
+Repairs_Lead_Log and Repairs_Schedule rows.
+
+Usage:
+  python scripts/bench_ddb_codec.py
+  python scripts/bench_ddb_codec.py --items 500 --repeat 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda"))
+
+from ddb_codec import LEAD_CODEC, SCHEDULE_CODEC  # noqa: E402
+from utils import DecimalEncoder  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark DynamoDB item codecs")
+    parser.add_argument("--items", type=int, default=200, help="Items per batch (a scan/query page)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repeats (best is reported)")
+    parser.add_argument("--number", type=int, default=50, help="Batches per repeat")
+    return parser.parse_args()
+
+
+def make_lead_items(count: int) -> list[dict]:
+    base = 1_771_000_000
+    return [
+        {
+            "lead_id": {"S": f"LEAD-20260211-1400{i % 60:02d}-{i % 1000:03d}"},
+            "timestamp": {"N": str(base + i)},
+            "phone": {"S": f"+1904555{i % 10000:04d}"},
+            "repair_type": {"S": "screen"},
+            "device": {"S": "iPhone 14 Pro"},
+            "appointment_date": {"S": "2026-02-11"},
+            "appointment_time": {"S": "2:00 PM"},
+            "status": {"S": "booked"},
+            "created_at": {"N": str(base + i)},
+        }
+        for i in range(count)
+    ]
+
+
+def make_schedule_items(count: int) -> list[dict]:
+    base = 1_771_000_000
+    return [
+        {
+            "schedule_date": {"S": "2026-02-11"},
+            "slot_time": {"S": f"{9 + i % 8}:00 AM"},
+            "status": {"S": "available" if i % 3 else "booked"},
+            "created_at": {"N": str(base)},
+            "updated_at": {"N": str(base + i)},
+        }
+        for i in range(count)
+    ]
+
+
+def resource_read(items: list[dict]) -> str:
+    deserializer = TypeDeserializer()
+    decoded = [{k: deserializer.deserialize(v) for k, v in item.items()} for item in items]
+    return json.dumps(decoded, cls=DecimalEncoder)
+
+
+def codec_read(codec, items: list[dict]) -> str:
+    return json.dumps(codec.decode_many(items))
+
+
+def resource_write(items: list[dict]) -> list[dict]:
+    serializer = TypeSerializer()
+    return [{k: serializer.serialize(v) for k, v in item.items()} for item in items]
+
+
+def codec_write(codec, items: list[dict]) -> list[dict]:
+    return [codec.encode(item) for item in items]
+
+
+def best_us_per_item(func, items: int, repeat: int, number: int) -> float:
+    timings = timeit.repeat(func, repeat=repeat, number=number)
+    return min(timings) / (number * items) * 1_000_000
+
+
+def main() -> int:
+    args = parse_args()
+
+    print("⏱️  DynamoDB codec microbenchmark")
+    print(f"   Items per batch: {args.items} | repeat: {args.repeat} | batches: {args.number}\n")
+
+    deserializer = TypeDeserializer()
+    for label, codec, wire_items in (
+        ("Repairs_Lead_Log", LEAD_CODEC, make_lead_items(args.items)),
+        ("Repairs_Schedule", SCHEDULE_CODEC, make_schedule_items(args.items)),
+    ):
+        # Writes start from the Decimal-laden dicts the resource layer would hold
+        resource_items = [{k: deserializer.deserialize(v) for k, v in item.items()} for item in wire_items]
+        plain_items = codec.decode_many(wire_items)
+
+        read_resource = best_us_per_item(lambda: resource_read(wire_items), args.items, args.repeat, args.number)
+        read_codec = best_us_per_item(lambda: codec_read(codec, wire_items), args.items, args.repeat, args.number)
+        write_resource = best_us_per_item(lambda: resource_write(resource_items), args.items, args.repeat, args.number)
+        write_codec = best_us_per_item(lambda: codec_write(codec, plain_items), args.items, args.repeat, args.number)
+
+        print(f"📊 {label}")
+        print(f"   read  (wire -> JSON)  resource+DecimalEncoder: {read_resource:7.2f} µs/item | codec: {read_codec:7.2f} µs/item | {read_resource / read_codec:4.1f}x")
+        print(f"   write (dict -> wire)  TypeSerializer:          {write_resource:7.2f} µs/item | codec: {write_codec:7.2f} µs/item | {write_resource / write_codec:4.1f}x\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Measure the compact lead format (lambda/lead_format.py) against the original
+long-named items: stored item size, and the read/write units that size costs.
+
+Item sizes follow DynamoDB's billing rules (attribute name + value bytes,
+numbers at ~1 byte per 2 significant digits + 1). Scan and Query pages are
+billed on their summed size, so scan RCU falls in proportion to bytes; a
+single GetItem/PutItem rounds up to 4 KB / 1 KB and only drops when an item
+crosses that boundary.
+
+Runs offline on synthetic leads shaped like create_lead() output, or on a
+sample of the live table with --sample.
+
+Usage:
+  python scripts/bench_lead_format.py
+  python scripts/bench_lead_format.py --items 50000
+  python scripts/bench_lead_format.py --sample 2000          # live Repairs_Lead_Log
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import sys
+from pathlib import Path
+
+import boto3
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda"))
+
+from ddb_codec import LEAD_CODEC  # noqa: E402
+from lead_format import Lead, pack_lead  # noqa: E402
+from lead_ids import new_lead_id  # noqa: E402
+
+REPAIR_TYPES = ["screen", "battery", "charging port", "back glass", "water damage", "camera", "diagnostic"]
+DEVICES = ["iPhone 15 Pro Max", "iPhone 14", "iPhone 13 mini", "Samsung Galaxy S23", "Google Pixel 8", "iPad Air"]
+SLOTS = ["9:00 AM", "10:00 AM", "11:00 AM", "12:00 PM", "1:00 PM", "2:00 PM", "3:00 PM", "4:00 PM"]
+SCAN_PAGE_BYTES = 1024 * 1024
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure compact lead item size and capacity")
+    parser.add_argument("--items", type=int, default=10000, help="Synthetic leads to measure")
+    parser.add_argument("--sample", type=int, help="Measure this many items scanned from the live table instead")
+    parser.add_argument(
+        "--table",
+        default=os.getenv("REPAIRS_LEAD_LOG_TABLE", "Repairs_Lead_Log"),
+        help="DynamoDB leads table name (with --sample)",
+    )
+    parser.add_argument(
+        "--region",
+        default=os.getenv("AWS_REGION") or os.getenv("DYNAMODB_REGION", "us-east-1"),
+        help="AWS region",
+    )
+    return parser.parse_args()
+
+
+def number_size(text: str) -> int:
+    digits = text.lstrip("-").replace(".", "").strip("0") or "0"
+    return math.ceil(len(digits) / 2) + 1
+
+
+def value_size(attr: dict) -> int:
+    (type_code, raw), = attr.items()
+    if type_code == "S":
+        return len(raw.encode("utf-8"))
+    if type_code == "N":
+        return number_size(raw)
+    if type_code in ("BOOL", "NULL"):
+        return 1
+    if type_code == "B":
+        return len(raw)
+    if type_code == "SS":
+        return sum(len(value.encode("utf-8")) for value in raw)
+    if type_code == "NS":
+        return sum(number_size(value) for value in raw)
+    if type_code == "M":
+        return 3 + sum(len(name.encode("utf-8")) + value_size(value) + 1 for name, value in raw.items())
+    if type_code == "L":
+        return 3 + sum(value_size(value) + 1 for value in raw)
+    raise ValueError(f"Unsupported attribute type: {type_code}")
+
+
+def item_size(wire_item: dict) -> int:
+    """Billable size of a wire-format item in bytes."""
+    return sum(len(name.encode("utf-8")) + value_size(attr) for name, attr in wire_item.items())
+
+
+def make_leads(count: int) -> list[dict]:
+    rng = random.Random(42)
+    base = 1_771_000_000
+    leads = []
+    for index in range(count):
+        created_at = base + index * 37
+        leads.append(Lead(
+            lead_id=new_lead_id(),
+            timestamp=created_at,
+            phone=f"+1904{rng.randint(2000000, 9999999)}",
+            repair_type=rng.choice(REPAIR_TYPES),
+            device=rng.choice(DEVICES),
+            appointment_date=f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            appointment_time=rng.choice(SLOTS),
+            status="booked",
+            created_at=created_at,
+        ).to_item())
+    return leads
+
+
+def sample_leads(table: str, region: str, count: int) -> list[dict]:
+    client = boto3.client("dynamodb", region_name=region)
+    leads: list[dict] = []
+    scan_kwargs = {"TableName": table, "FilterExpression": "NOT begins_with(lead_id, :chat)",
+                   "ExpressionAttributeValues": {":chat": {"S": "CHATLOG-"}}}
+    while len(leads) < count:
+        response = client.scan(**scan_kwargs)
+        leads.extend(LEAD_CODEC.decode_many(response.get("Items", [])))
+        if not response.get("LastEvaluatedKey"):
+            break
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return leads[:count]
+
+
+def scan_rcu(sizes: list[int]) -> float:
+    """Eventually consistent Scan RCU: each 1 MB page bills its summed size in 4 KB units at 0.5."""
+    total = 0.0
+    page = 0
+    for size in sizes:
+        if page + size > SCAN_PAGE_BYTES:
+            total += math.ceil(page / 4096) * 0.5
+            page = 0
+        page += size
+    return total + math.ceil(page / 4096) * 0.5
+
+
+def report(label: str, sizes: list[int]) -> dict:
+    summary = {
+        "avg": sum(sizes) / len(sizes),
+        "max": max(sizes),
+        "scan_rcu": scan_rcu(sizes),
+        "put_wcu": sum(math.ceil(size / 1024) for size in sizes),
+        "get_rcu": sum(math.ceil(size / 4096) * 0.5 for size in sizes),
+    }
+    print(f"   {label:<8} avg {summary['avg']:7.1f} B | max {summary['max']:5d} B | "
+          f"full scan {summary['scan_rcu']:9.1f} RCU | puts {summary['put_wcu']:7d} WCU | gets {summary['get_rcu']:8.1f} RCU")
+    return summary
+
+
+def main() -> int:
+    load_dotenv()
+    args = parse_args()
+
+    if args.sample:
+        print(f"📏 Lead format size: sampling {args.sample} items from {args.table}")
+        leads = sample_leads(args.table, args.region, args.sample)
+        if not leads:
+            print("❌ No leads found")
+            return 1
+    else:
+        print(f"📏 Lead format size: {args.items} synthetic create_lead() items")
+        leads = make_leads(args.items)
+
+    legacy_sizes = [item_size(LEAD_CODEC.encode(lead)) for lead in leads]
+    compact_sizes = [item_size(LEAD_CODEC.encode(pack_lead(lead))) for lead in leads]
+
+    mismatches = sum(1 for lead in leads if LEAD_CODEC.decode(LEAD_CODEC.encode(pack_lead(lead))) != lead)
+    if mismatches:
+        print(f"❌ {mismatches} leads did not round-trip through the compact format")
+        return 1
+
+    print()
+    legacy = report("legacy", legacy_sizes)
+    compact = report("compact", compact_sizes)
+
+    # The phone GSI projects ALL attributes, so its storage and scans shrink by the same bytes
+    print(f"\n✅ {len(leads)} leads round-trip")
+    print(f"   item size: -{(1 - compact['avg'] / legacy['avg']) * 100:.1f}% "
+          f"({legacy['avg'] - compact['avg']:.1f} B/item, table and phone GSI)")
+    print(f"   scan RCU:  -{(1 - compact['scan_rcu'] / legacy['scan_rcu']) * 100:.1f}%")
+    print(f"   put WCU:   {legacy['put_wcu']} -> {compact['put_wcu']} (1 KB rounding)")
+    print(f"   get RCU:   {legacy['get_rcu']:.1f} -> {compact['get_rcu']:.1f} (4 KB rounding)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark Brandon state updates: legacy get_item + put_item versus the
+single conditional update_item used by state_manager.update_state.
+
+Runs against live DynamoDB by default. With --moto it runs offline against
+moto, adding --rtt-ms of simulated network latency per DynamoDB call.
+
+Usage:
+  python scripts/bench_state_update.py --moto --rtt-ms 15
+  python scripts/bench_state_update.py --iterations 50          # live tables
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import boto3
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda"))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark Brandon state update paths")
+    parser.add_argument("--iterations", type=int, default=100, help="Updates per path")
+    parser.add_argument("--moto", action="store_true", help="Run offline against moto")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Simulated latency added to every DynamoDB call")
+    parser.add_argument(
+        "--region",
+        default=os.getenv("AWS_REGION") or os.getenv("DYNAMODB_REGION", "us-east-1"),
+        help="AWS region",
+    )
+    return parser.parse_args()
+
+
+class CallMeter:
+    """Counts DynamoDB API calls and optionally sleeps to simulate network latency."""
+
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000
+        self.calls = 0
+
+    def __call__(self, **kwargs) -> None:
+        self.calls += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def attach(self, client) -> None:
+        client.meta.events.register_first("before-send.dynamodb", self)
+
+
+def create_state_table(region: str, table_name: str) -> None:
+    client = boto3.client("dynamodb", region_name=region)
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "state_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "state_id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def legacy_update(table, fields: dict) -> dict:
+    """The previous state_manager flow: read the full item, merge, write it back."""
+    current = table.get_item(Key={"state_id": "CURRENT"}).get("Item", {})
+    current["state_id"] = "CURRENT"
+    current.update(fields)
+    current["updated_at"] = int(time.time())
+    table.put_item(Item=current)
+    return current
+
+
+def route_capacity(meter, route: str) -> tuple[float, float]:
+    rows = [row for row in meter.snapshot() if row["route"] == route]
+    return sum(row["rcu"] for row in rows), sum(row["wcu"] for row in rows)
+
+
+def summarize(label: str, timings: list[float], calls: int, iterations: int, capacity: tuple[float, float]) -> float:
+    ordered = sorted(timings)
+    p50 = statistics.median(ordered) * 1000
+    p95 = ordered[int(len(ordered) * 0.95) - 1] * 1000
+    rcu, wcu = capacity
+    print(
+        f"   {label:<26} p50 {p50:7.2f} ms | p95 {p95:7.2f} ms | {calls / iterations:.1f} calls/update | "
+        f"{rcu / iterations:.2f} RCU + {wcu / iterations:.2f} WCU/update"
+    )
+    return p50
+
+
+def main() -> int:
+    load_dotenv()
+    args = parse_args()
+
+    mock = None
+    if args.moto:
+        from moto import mock_aws
+
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+        mock = mock_aws()
+        mock.start()
+        create_state_table(args.region, os.environ.get("BRANDON_STATE_LOG_TABLE", "Brandon_State_Log"))
+
+    import capacity
+    import storage
+
+    print("⏱️  Brandon state update benchmark")
+    print(f"   Mode: {'moto' if args.moto else 'live DynamoDB'} | simulated RTT: {args.rtt_ms} ms | iterations: {args.iterations}\n")
+
+    resource = boto3.resource("dynamodb", region_name=args.region)
+    table = resource.Table(storage.BRANDON_STATE_LOG_TABLE)
+    legacy_meter = CallMeter(args.rtt_ms)
+    legacy_meter.attach(resource.meta.client)
+    capacity.instrument_client(resource.meta.client)
+    capacity.meter.reset()
+
+    backend = storage.DynamoDBBackend(boto3.client("dynamodb", region_name=args.region))
+    update_meter = CallMeter(args.rtt_ms)
+    update_meter.attach(backend.client)
+
+    legacy_timings = []
+    capacity.set_route("legacy")
+    for index in range(args.iterations):
+        start = time.perf_counter()
+        legacy_update(table, {"notes": f"bench legacy {index}", "status": "available"})
+        legacy_timings.append(time.perf_counter() - start)
+
+    update_timings = []
+    capacity.set_route("setup")
+    version = backend.get_state("CURRENT").get("version")
+    update_meter.calls = 0
+    capacity.set_route("update")
+    for index in range(args.iterations):
+        start = time.perf_counter()
+        state = backend.update_state(
+            "CURRENT",
+            {"notes": f"bench update {index}", "status": "available"},
+            int(time.time()),
+            expected_version=version or 0,
+        )
+        update_timings.append(time.perf_counter() - start)
+        version = state["version"]
+
+    legacy_p50 = summarize("get_item + put_item", legacy_timings, legacy_meter.calls, args.iterations,
+                           route_capacity(capacity.meter, "legacy"))
+    update_p50 = summarize("conditional update_item", update_timings, update_meter.calls, args.iterations,
+                           route_capacity(capacity.meter, "update"))
+    print(f"\n   p50 latency ratio: {update_p50 / legacy_p50:.2f}x of legacy")
+
+    if mock:
+        mock.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Build the shared dependency layer for scripts/deploy_all.py --deps layer.
+
+Installs requirements.txt once for the Lambda runtime (manylinux wheels for
+Python 3.11), strips what never runs on Lambda (tests, stubs, C sources,
+install metadata, AWS service models and twilio's REST client that lambda/
+does not use), precompiles .pyc files (unchecked-hash, so /opt/python needs
+no writable __pycache__ and no mtimes leak into the archive), and writes
+deploy/LINDA-deps.zip with sorted entries and fixed timestamps: the same
+requirements give the same bytes, so deploy_all only publishes a new layer
+version when the sha256 changes.
+
+Every build prints a per-package report (files, unzipped and zipped size,
+cold import time in a fresh interpreter) against layer_baseline.json, and
+flags packages that grew or got slower. The stripped layer is import-checked
+against the handler modules before it is used.
+
+Usage:
+  python scripts/build_layer.py                    # build, report, compare with the baseline
+  python scripts/build_layer.py --check            # exit 1 on a size or import-time regression
+  python scripts/build_layer.py --update-baseline  # accept this build as the new baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = SCRIPT_DIR.parent
+LAMBDA_DIR = BACKEND_DIR / "lambda"
+DEPLOY_DIR = BACKEND_DIR / "deploy"
+REQUIREMENTS = BACKEND_DIR / "requirements.txt"
+BASELINE_PATH = BACKEND_DIR / "layer_baseline.json"
+
+LAYER_NAME = "LINDA-deps"
+LAMBDA_RUNTIME = "python3.11"
+TARGET_PYTHON = (3, 11)
+TARGET_PLATFORM = "manylinux2014_x86_64"
+LAYER_MOUNT = "/opt/python"  # where Lambda unpacks the layer's python/ directory
+
+# Handler modules the stripped layer must still import
+HANDLER_MODULES = ["dispatcher", "scheduler", "state_manager", "change_feed", "outbox", "router"]
+# AWS service models kept in botocore/boto3 data; lambda/ only calls DynamoDB and S3
+AWS_SERVICES = {"dynamodb", "s3", "sts", "sso", "sso-oidc"}
+# Subpackages lambda/ never imports (dispatcher only builds TwiML)
+PRUNED_PATHS = ["twilio/rest", "boto3/examples"]
+STRIP_DIRS = {"__pycache__", "tests", "test"}
+STRIP_SUFFIXES = (".pyi", ".pyx", ".pxd", ".c", ".h", ".cpp", ".md", ".rst")
+STRIP_FILES = {"py.typed"}
+# Kept from *.dist-info: METADATA (importlib.metadata.version) and entry points; licenses are kept too
+DIST_INFO_KEEP = {"METADATA", "entry_points.txt"}
+LICENSE_PATTERN = re.compile(r"^(LICEN[CS]E|COPYING|NOTICE|AUTHORS)", re.IGNORECASE)
+
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# A package is flagged when it grows past both the ratio and the slack
+SIZE_TOLERANCE = 0.10
+SIZE_SLACK_BYTES = 50_000
+IMPORT_TOLERANCE = 0.5
+IMPORT_SLACK_MS = 25.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the slim shared dependency layer")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if the report regresses against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help=f"Write this report to {BASELINE_PATH.name}")
+    parser.add_argument("--import-runs", type=int, default=5, help="Fresh interpreters per package import timing (best is kept)")
+    return parser.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def targets_this_python() -> bool:
+    """.pyc files and import timings are only valid from the runtime's Python version."""
+    return sys.version_info[:2] == TARGET_PYTHON
+
+
+def install_dependencies(target: Path) -> bool:
+    """pip install requirements.txt as the Lambda runtime would see them."""
+    result = subprocess.run([
+        sys.executable, "-m", "pip", "install",
+        "-r", str(REQUIREMENTS),
+        "-t", str(target),
+        "--platform", TARGET_PLATFORM,
+        "--python-version", ".".join(map(str, TARGET_PYTHON)),
+        "--implementation", "cp",
+        "--only-binary=:all:",
+        "--quiet",
+    ], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"  ❌ pip install failed: {result.stderr.strip()[-500:]}")
+        return False
+    return True
+
+
+def tree_size(root: Path) -> int:
+    return sum(path.stat().st_size for path in root.rglob("*") if path.is_file())
+
+
+def strip_tree(root: Path) -> None:
+    """Delete files the runtime never reads."""
+    for relative in PRUNED_PATHS:
+        shutil.rmtree(root / relative, ignore_errors=True)
+    for data_dir in (root / "botocore" / "data", root / "boto3" / "data"):
+        if data_dir.is_dir():
+            for service in data_dir.iterdir():
+                if service.is_dir() and service.name not in AWS_SERVICES:
+                    shutil.rmtree(service)
+    shutil.rmtree(root / "bin", ignore_errors=True)
+
+    for path in sorted(root.rglob("*"), reverse=True):
+        if not path.exists():
+            continue
+        if path.is_dir():
+            if path.name in STRIP_DIRS:
+                shutil.rmtree(path)
+            continue
+        parent = path.parent.name
+        if parent.endswith(".dist-info"):
+            if path.name not in DIST_INFO_KEEP and not LICENSE_PATTERN.match(path.name):
+                path.unlink()
+        elif path.name in STRIP_FILES or path.name.endswith(STRIP_SUFFIXES):
+            path.unlink()
+
+
+def precompile(root: Path) -> bool:
+    """Write unchecked-hash .pyc files for the runtime's Python (no mtimes, no source stat on import)."""
+    if not targets_this_python():
+        print(f"  ⚠️  Running Python {sys.version_info[0]}.{sys.version_info[1]}; "
+              f".pyc precompile needs {TARGET_PYTHON[0]}.{TARGET_PYTHON[1]} — layer ships sources only")
+        return False
+    # Paths in code objects name the layer's mount point, not the temp build dir,
+    # and a fixed hash seed keeps set constants in the same order on every build
+    result = subprocess.run([
+        sys.executable, "-m", "compileall", "-q", "-j", "0",
+        "--invalidation-mode", "unchecked-hash",
+        "-d", LAYER_MOUNT, str(root),
+    ], env={**os.environ, "PYTHONHASHSEED": "0"}, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"  ⚠️  Some files did not compile: {result.stdout.strip()[-300:]}")
+    return result.returncode == 0
+
+
+def deterministic_zip(zip_path: Path, entries: list[tuple[Path, str]]) -> str:
+    """Zip (path, arcname) entries in name order with fixed timestamps and modes. Returns the sha256."""
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path, arcname in sorted(entries, key=lambda entry: entry[1]):
+            info = zipfile.ZipInfo(arcname, date_time=ZIP_EPOCH)
+            info.external_attr = (0o755 if os.access(path, os.X_OK) else 0o644) << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, path.read_bytes(), compresslevel=9)
+    return hashlib.sha256(zip_path.read_bytes()).hexdigest()
+
+
+def check_imports(root: Path) -> list[str]:
+    """Import every handler module against the layer alone (no site-packages)."""
+    if not targets_this_python():
+        return []
+    env = {
+        "PATH": os.environ.get("PATH", ""),
+        "PYTHONPATH": os.pathsep.join([str(root), str(LAMBDA_DIR)]),
+        "STORAGE_BACKEND": "memory",
+        "CHANGE_FEED": "off",
+        "OPENAI_API_KEY": "sk-layer-import-check",
+    }
+    failures = []
+    for module in HANDLER_MODULES:
+        result = subprocess.run([sys.executable, "-S", "-c", f"import {module}"],
+                                env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            failures.append(f"{module}: {lines[-1] if lines else 'import failed'}")
+    return failures
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def package_of(relative: str) -> str:
+    """Report group for a path inside the layer: top-level package or module, or (dist-info)."""
+    top = relative.split("/", 1)[0]
+    if top.endswith(".dist-info"):
+        return "(dist-info)"
+    if top == "__pycache__":  # bytecode of a top-level module, e.g. six.cpython-311.pyc
+        return relative.split("/", 1)[1].split(".", 1)[0]
+    if "/" not in relative:
+        return top.split(".", 1)[0]
+    return top
+
+
+def importable(name: str, root: Path) -> bool:
+    return name.isidentifier() and (
+        (root / name / "__init__.py").exists() or (root / f"{name}.py").exists()
+        or any(root.glob(f"{name}.*.so"))
+    )
+
+
+def import_ms(name: str, root: Path, runs: int) -> float | None:
+    """Best-of-runs cumulative import time of one package in fresh interpreters (-X importtime)."""
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": str(root)}
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-S", "-X", "importtime", "-c", f"import {name}"],
+                                env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].rstrip() == f" {name}":
+                micros = int(fields[1])
+                best = micros if best is None else min(best, micros)
+    return round(best / 1000, 1) if best is not None else None
+
+
+def build_report(root: Path, zip_path: Path, sha256: str, raw_bytes: int, import_runs: int) -> dict:
+    packages: dict[str, dict] = {}
+    with zipfile.ZipFile(zip_path) as zf:
+        for info in zf.infolist():
+            row = packages.setdefault(package_of(info.filename.removeprefix("python/")),
+                                      {"files": 0, "bytes": 0, "zip_bytes": 0})
+            row["files"] += 1
+            row["bytes"] += info.file_size
+            row["zip_bytes"] += info.compress_size
+    if targets_this_python():
+        for name, row in packages.items():
+            if importable(name, root):
+                row["import_ms"] = import_ms(name, root, import_runs)
+    return {
+        "runtime": LAMBDA_RUNTIME,
+        "requirements_sha256": hashlib.sha256(REQUIREMENTS.read_bytes()).hexdigest(),
+        "zip_sha256": sha256,
+        "installed_bytes": raw_bytes,
+        "bytes": sum(row["bytes"] for row in packages.values()),
+        "zip_bytes": zip_path.stat().st_size,
+        "packages": dict(sorted(packages.items())),
+    }
+
+
+def machine_factor(report: dict, baseline: dict) -> float:
+    """
+    Median new/old import-time ratio across packages. A slower or busier
+    machine moves every package; a heavier dependency moves one, so import
+    times are compared after scaling the baseline by this factor.
+    """
+    old_packages = baseline.get("packages", {})
+    ratios = [
+        row["import_ms"] / old_packages[name]["import_ms"]
+        for name, row in report["packages"].items()
+        if row.get("import_ms") and (old_packages.get(name) or {}).get("import_ms", 0) >= 1
+    ]
+    return statistics.median(ratios) if ratios else 1.0
+
+
+def regressions(report: dict, baseline: dict) -> dict[str, list[str]]:
+    """Per-package reasons a build is worse than the baseline."""
+    flagged: dict[str, list[str]] = {}
+    old_packages = baseline.get("packages", {})
+    factor = machine_factor(report, baseline)
+    for name, row in report["packages"].items():
+        old = old_packages.get(name)
+        if old is None:
+            flagged.setdefault(name, []).append("new")
+            continue
+        grown = row["zip_bytes"] - old["zip_bytes"]
+        if grown > SIZE_SLACK_BYTES and grown > old["zip_bytes"] * SIZE_TOLERANCE:
+            flagged.setdefault(name, []).append(f"+{grown / 1024:.0f} KB zipped")
+        new_ms, old_ms = row.get("import_ms"), old.get("import_ms")
+        if new_ms is not None and old_ms is not None:
+            expected = old_ms * factor
+            slower = new_ms - expected
+            if slower > IMPORT_SLACK_MS and slower > expected * IMPORT_TOLERANCE:
+                flagged.setdefault(name, []).append(f"+{slower:.0f} ms import")
+    return flagged
+
+
+def print_report(report: dict, baseline: dict | None) -> dict[str, list[str]]:
+    flagged = regressions(report, baseline) if baseline else {}
+    old_packages = (baseline or {}).get("packages", {})
+    print(f"\n  {'package':<24} {'files':>6} {'unzipped':>10} {'zipped':>9} {'import ms':>10}  vs baseline")
+    for name, row in sorted(report["packages"].items(), key=lambda item: -item[1]["zip_bytes"]):
+        old = old_packages.get(name)
+        delta = ""
+        if old:
+            delta = f"{(row['zip_bytes'] - old['zip_bytes']) / 1024:+.0f} KB"
+            if row.get("import_ms") is not None and old.get("import_ms") is not None:
+                delta += f", {row['import_ms'] - old['import_ms']:+.1f} ms"
+        ms = f"{row['import_ms']:.1f}" if row.get("import_ms") is not None else "-"
+        mark = f"  ⚠️  {'; '.join(flagged[name])}" if name in flagged else ""
+        print(f"  {name:<24} {row['files']:>6} {row['bytes'] / 1024:>8.0f}KB {row['zip_bytes'] / 1024:>7.0f}KB "
+              f"{ms:>10}  {delta}{mark}")
+    for name in sorted(set(old_packages) - set(report["packages"])):
+        print(f"  {name:<24} removed since the baseline")
+
+    print(f"\n  Installed {report['installed_bytes'] / 2**20:.1f} MB -> "
+          f"{report['bytes'] / 2**20:.1f} MB stripped, {report['zip_bytes'] / 2**20:.1f} MB zipped")
+    print(f"  sha256 {report['zip_sha256']}")
+    if baseline:
+        print(f"  Baseline: {baseline['zip_bytes'] / 2**20:.1f} MB zipped "
+              f"({(report['zip_bytes'] - baseline['zip_bytes']) / 1024:+.0f} KB)")
+        factor = machine_factor(report, baseline)
+        if abs(factor - 1) > IMPORT_TOLERANCE:
+            print(f"  ℹ️  Imports run {factor:.2f}x the baseline across the board (machine speed); "
+                  "packages are flagged relative to that")
+        if baseline.get("requirements_sha256") != report["requirements_sha256"]:
+            print("  ℹ️  requirements.txt changed since the baseline")
+        if flagged:
+            print(f"  ⚠️  {len(flagged)} package(s) regressed — review, then --update-baseline to accept")
+        else:
+            print("  ✅ No regressions against the baseline")
+    else:
+        print(f"  ℹ️  No {BASELINE_PATH.name} yet — run with --update-baseline to record one")
+    return flagged
+
+
+def load_baseline() -> dict | None:
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return None
+
+
+def build_layer(import_runs: int = 5) -> tuple[Path, dict, dict[str, list[str]]] | None:
+    """Build deploy/LINDA-deps.zip. Returns (zip_path, report, regressions), or None if the build failed."""
+    DEPLOY_DIR.mkdir(exist_ok=True)
+    work_dir = Path(tempfile.mkdtemp(prefix="linda_layer_"))
+    try:
+        print(f"  📦 Installing dependencies for {LAMBDA_RUNTIME} ({TARGET_PLATFORM})...")
+        if not install_dependencies(work_dir):
+            return None
+        raw_bytes = tree_size(work_dir)
+        strip_tree(work_dir)
+        if precompile(work_dir):
+            print("  ✅ Precompiled .pyc (unchecked-hash)")
+        failures = check_imports(work_dir)
+        if failures:
+            for failure in failures:
+                print(f"  ❌ Layer import check: {failure}")
+            return None
+
+        zip_path = DEPLOY_DIR / f"{LAYER_NAME}.zip"
+        entries = [(path, f"python/{path.relative_to(work_dir).as_posix()}")
+                   for path in work_dir.rglob("*") if path.is_file()]
+        sha256 = deterministic_zip(zip_path, entries)
+        report = build_report(work_dir, zip_path, sha256, raw_bytes, import_runs)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    (DEPLOY_DIR / f"{LAYER_NAME}.report.json").write_text(json.dumps(report, indent=2) + "\n")
+    print(f"  > {zip_path.name}")
+    flagged = print_report(report, load_baseline())
+    return zip_path, report, flagged
+
+
+def main() -> None:
+    args = parse_args()
+    print(f"🧱 Building {LAYER_NAME}")
+    built = build_layer(args.import_runs)
+    if built is None:
+        sys.exit(1)
+    _, report, flagged = built
+    if args.update_baseline:
+        BASELINE_PATH.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"  ✅ Baseline written to {BASELINE_PATH}")
+    elif args.check and flagged:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Compare the two API deployment layouts from scripts/deploy_all.py:
+split (LINDA-dispatcher, LINDA-state-manager, LINDA-scheduler) versus single
+(LINDA-api, lambda/router.py).
+
+By default reads CloudWatch Logs Insights over the last --hours: per function,
+invocations, cold starts (REPORT lines with an Init Duration), cold-start rate
+and p50/p99 duration, where p99 "with init" is what a caller waits on a cold
+start. For LINDA-api it also breaks cold starts and p99 down by route from the
+router's EMF lines.
+
+With --local it needs no AWS: each run starts a fresh Python process per route
+and layout (memory storage, no change feed) and times the cold import plus the
+first request, which is the part of a cold start the layout controls. Cold-start
+rate depends on real traffic and only comes from CloudWatch.
+
+Usage:
+  python scripts/compare_layouts.py --hours 24
+  python scripts/compare_layouts.py --local --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+LAMBDA_DIR = BACKEND_DIR / "lambda"
+
+SPLIT_FUNCTIONS = ["LINDA-dispatcher", "LINDA-state-manager", "LINDA-scheduler"]
+SINGLE_FUNCTION = "LINDA-api"
+
+REPORT_QUERY = """
+filter @type = "REPORT"
+| fields @duration + coalesce(@initDuration, 0) as total
+| stats count(*) as invocations, count(@initDuration) as cold_starts,
+        pct(@duration, 50) as p50_ms, pct(@duration, 99) as p99_ms,
+        pct(total, 99) as p99_with_init_ms, pct(@initDuration, 99) as p99_init_ms
+"""
+ROUTE_QUERY = """
+filter Function = "api" and ispresent(Route)
+| stats count(*) as invocations, sum(ColdStart) as cold_starts,
+        pct(DurationMs, 99) as p99_ms, max(RouteImportMs) as max_route_import_ms by Route
+"""
+
+# Route -> (split module, request); the sms request is rejected before any OpenAI call
+LOCAL_ROUTES = {
+    "sms": ("dispatcher", {"httpMethod": "POST", "body": ""}),
+    "scheduler": ("scheduler", {"httpMethod": "GET", "headers": {}, "queryStringParameters": {"date": "2099-01-01"}}),
+    "state": ("state_manager", {"httpMethod": "GET", "headers": {"X-Linda-Admin-Key": "local-cold-start"}}),
+}
+COLD_RUN = """
+import importlib, json, sys, time
+started = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+response = module.handler(json.loads(sys.argv[2]), None)
+done = time.perf_counter()
+print(json.dumps({"init_ms": (imported - started) * 1000, "first_ms": (done - imported) * 1000,
+                  "status": response["statusCode"]}))
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare split and single API Lambda layouts")
+    parser.add_argument("--hours", type=float, default=24, help="CloudWatch window to read")
+    parser.add_argument("--local", action="store_true", help="Time cold starts locally instead of reading CloudWatch")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per route and layout with --local")
+    parser.add_argument(
+        "--region",
+        default=os.getenv("AWS_REGION") or os.getenv("DYNAMODB_REGION", "us-east-1"),
+        help="AWS region",
+    )
+    return parser.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# CloudWatch
+# ---------------------------------------------------------------------------
+
+def run_query(logs, log_groups: list[str], query: str, hours: float) -> list[dict]:
+    """Run a Logs Insights query and return its rows as dicts."""
+    now = int(time.time())
+    query_id = logs.start_query(
+        logGroupNames=log_groups,
+        startTime=now - int(hours * 3600),
+        endTime=now,
+        queryString=query,
+    )["queryId"]
+    while True:
+        result = logs.get_query_results(queryId=query_id)
+        if result["status"] in ("Complete", "Failed", "Cancelled", "Timeout"):
+            break
+        time.sleep(1)
+    return [{field["field"]: field["value"] for field in row} for row in result.get("results", [])]
+
+
+def existing_log_groups(logs, functions: list[str]) -> list[str]:
+    groups = []
+    for name in functions:
+        group = f"/aws/lambda/{name}"
+        found = logs.describe_log_groups(logGroupNamePrefix=group).get("logGroups", [])
+        if any(g["logGroupName"] == group for g in found):
+            groups.append(group)
+        else:
+            print(f"  ⚠️  No logs for {name} (not deployed in this layout?)")
+    return groups
+
+
+def print_report_row(label: str, row: dict) -> None:
+    invocations = int(float(row.get("invocations", 0)))
+    cold = int(float(row.get("cold_starts", 0)))
+    rate = cold / invocations * 100 if invocations else 0.0
+
+    def ms(key: str) -> str:
+        return f"{float(row[key]):9.1f}" if row.get(key) else f"{'-':>9}"
+
+    print(f"  {label:<22} {invocations:>8} {cold:>6} {rate:>6.2f}% {ms('p50_ms')} {ms('p99_ms')} "
+          f"{ms('p99_with_init_ms')} {ms('p99_init_ms')}")
+
+
+def compare_cloudwatch(region: str, hours: float) -> None:
+    import boto3
+
+    logs = boto3.client("logs", region_name=region)
+    print(f"📊 Last {hours:g}h of REPORT lines ({region})\n")
+    print(f"  {'function':<22} {'invokes':>8} {'cold':>6} {'cold %':>7} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'p99+init':>9} {'p99 init':>9}")
+
+    split_groups = existing_log_groups(logs, SPLIT_FUNCTIONS)
+    for group in split_groups:
+        for row in run_query(logs, [group], REPORT_QUERY, hours):
+            print_report_row(group.rsplit("/", 1)[-1], row)
+    if split_groups:
+        for row in run_query(logs, split_groups, REPORT_QUERY, hours):
+            print_report_row("split (all three)", row)
+
+    single_groups = existing_log_groups(logs, [SINGLE_FUNCTION])
+    for row in run_query(logs, single_groups, REPORT_QUERY, hours) if single_groups else []:
+        print_report_row(f"single ({SINGLE_FUNCTION})", row)
+
+    if single_groups:
+        print(f"\n  {SINGLE_FUNCTION} by route (router EMF):")
+        print(f"  {'route':<22} {'invokes':>8} {'cold':>6} {'cold %':>7} {'p99 ms':>9} {'import':>9}")
+        for row in run_query(logs, single_groups, ROUTE_QUERY, hours):
+            invocations = int(float(row.get("invocations", 0)))
+            cold = int(float(row.get("cold_starts", 0)))
+            rate = cold / invocations * 100 if invocations else 0.0
+            print(f"  /{row.get('Route', '?'):<21} {invocations:>8} {cold:>6} {rate:>6.2f}% "
+                  f"{float(row.get('p99_ms', 0)):9.1f} {float(row.get('max_route_import_ms', 0)):9.1f}")
+
+
+# ---------------------------------------------------------------------------
+# Local cold starts
+# ---------------------------------------------------------------------------
+
+def cold_run(module: str, event: dict) -> dict:
+    """Import a handler module in a fresh interpreter and serve one request."""
+    env = {
+        **os.environ,
+        "STORAGE_BACKEND": "memory",
+        "CHANGE_FEED": "off",
+        "CAPACITY_METRICS": "off",
+        "ROUTER_METRICS": "off",
+        "ADMIN_API_KEY": "local-cold-start",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "sk-local-cold-start",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_RUN, module, json.dumps(event)],
+        cwd=LAMBDA_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare_local(runs: int) -> bool:
+    print(f"📊 Local cold starts: median of {runs} fresh processes per route\n")
+    print(f"  {'route':<12} {'layout':<8} {'import ms':>10} {'first req ms':>13} {'cold total':>11}")
+    ok = True
+    for route, (module, event) in LOCAL_ROUTES.items():
+        for layout, target, request in (
+            ("split", module, event),
+            ("single", "router", {**event, "rawPath": f"/{route}"}),
+        ):
+            samples = [cold_run(target, request) for _ in range(runs)]
+            errors = [s["error"] for s in samples if "error" in s]
+            if errors:
+                print(f"  /{route:<11} {layout:<8} ❌ {errors[0]}")
+                ok = False
+                continue
+            init = statistics.median(s["init_ms"] for s in samples)
+            first = statistics.median(s["first_ms"] for s in samples)
+            print(f"  /{route:<11} {layout:<8} {init:>10.1f} {first:>13.1f} {init + first:>11.1f}")
+    print("\n  single: import covers the router only; each route module loads on its first request.")
+    return ok
+
+
+def main() -> None:
+    load_dotenv(BACKEND_DIR / ".env", override=False)
+    args = parse_args()
+    if args.local:
+        sys.exit(0 if compare_local(args.runs) else 1)
+    compare_cloudwatch(args.region, args.hours)
+
+
+if __name__ == "__main__":
+    main()
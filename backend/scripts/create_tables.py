@@ -13,6 +13,154 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+LEAD_PHONE_INDEX = os.getenv('LEAD_PHONE_INDEX', 'phone-created_at-index')
+OPEN_LEADS_INDEX = os.getenv('OPEN_LEADS_INDEX', 'open_queue-open_at-index')
+OUTBOX_DUE_INDEX = os.getenv('OUTBOX_DUE_INDEX', 'outbox_queue-next_attempt_at-index')
+TAKEN_SLOTS_INDEX = os.getenv('TAKEN_SLOTS_INDEX', 'taken_queue-slot_at-index')
+
+# Archived leads carry this epoch attribute; DynamoDB deletes them once it passes
+LEAD_TTL_ATTRIBUTE = os.getenv('ARCHIVE_TTL_ATTRIBUTE', 'expires_at')
+
+# Keys are all the change feed needs from the stream
+STREAM_SPECIFICATION = {'StreamEnabled': True, 'StreamViewType': 'KEYS_ONLY'}
+
+
+def phone_index_definition() -> dict:
+    """GSI for customer history: phone (HASH) + created_at (RANGE), newest-first queries."""
+    return {
+        'IndexName': LEAD_PHONE_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'phone', 'KeyType': 'HASH'},
+            {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+
+
+def open_leads_index_definition() -> dict:
+    """
+    Sparse GSI for the bench queue: open_queue (HASH) + open_at (RANGE).
+    Only open leads carry these attributes, so the index holds open jobs only.
+    """
+    return {
+        'IndexName': OPEN_LEADS_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'open_queue', 'KeyType': 'HASH'},
+            {'AttributeName': 'open_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+
+
+def outbox_due_index_definition() -> dict:
+    """
+    Sparse GSI for the outbox drainer: outbox_queue (HASH) + next_attempt_at (RANGE).
+    Delivered records are deleted and dead ones drop outbox_queue, so it holds pending work only.
+    """
+    return {
+        'IndexName': OUTBOX_DUE_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'outbox_queue', 'KeyType': 'HASH'},
+            {'AttributeName': 'next_attempt_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+
+
+def taken_slots_index_definition() -> dict:
+    """
+    Sparse GSI for next-available searches: taken_queue (HASH) + slot_at (RANGE).
+    Only booked and held slots carry these attributes; the projection keeps
+    just what slot_is_open() needs, so one page spans months of bookings.
+    """
+    return {
+        'IndexName': TAKEN_SLOTS_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'taken_queue', 'KeyType': 'HASH'},
+            {'AttributeName': 'slot_at', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['status', 'hold_id', 'hold_expires_at']}
+    }
+
+
+def ensure_index(dynamodb, table_name: str, definition: dict, attribute_definitions: list[dict]) -> bool:
+    """Add a GSI to an existing table if it is missing."""
+    index_name = definition['IndexName']
+    desc = dynamodb.describe_table(TableName=table_name)['Table']
+    existing = {index['IndexName'] for index in desc.get('GlobalSecondaryIndexes', [])}
+    if index_name in existing:
+        print(f"   ✅ Index '{index_name}' present")
+        return True
+    try:
+        dynamodb.update_table(
+            TableName=table_name,
+            AttributeDefinitions=attribute_definitions,
+            GlobalSecondaryIndexUpdates=[{'Create': definition}]
+        )
+        print(f"   ✅ Index '{index_name}' creation initiated (backfills in the background)")
+        return True
+    except ClientError as e:
+        print(f"   ❌ Error adding index '{index_name}': {e}")
+        if e.response['Error']['Code'] == 'LimitExceededException':
+            print("      DynamoDB builds one new index at a time; rerun once the other is ACTIVE")
+        return False
+
+
+def ensure_phone_index(dynamodb, table_name: str) -> bool:
+    """Add the phone GSI to an existing leads table if it is missing."""
+    return ensure_index(dynamodb, table_name, phone_index_definition(), [
+        {'AttributeName': 'phone', 'AttributeType': 'S'},
+        {'AttributeName': 'created_at', 'AttributeType': 'N'}
+    ])
+
+
+def ensure_open_leads_index(dynamodb, table_name: str) -> bool:
+    """Add the sparse open-leads GSI to an existing leads table if it is missing."""
+    return ensure_index(dynamodb, table_name, open_leads_index_definition(), [
+        {'AttributeName': 'open_queue', 'AttributeType': 'S'},
+        {'AttributeName': 'open_at', 'AttributeType': 'S'}
+    ])
+
+
+def ensure_taken_slots_index(dynamodb, table_name: str) -> bool:
+    """Add the sparse taken-slots GSI to an existing schedule table if it is missing."""
+    return ensure_index(dynamodb, table_name, taken_slots_index_definition(), [
+        {'AttributeName': 'taken_queue', 'AttributeType': 'S'},
+        {'AttributeName': 'slot_at', 'AttributeType': 'S'}
+    ])
+
+
+def ensure_stream(dynamodb, table_name: str) -> bool:
+    """Enable a KEYS_ONLY stream on an existing table so it feeds the change feed."""
+    desc = dynamodb.describe_table(TableName=table_name)['Table']
+    if desc.get('StreamSpecification', {}).get('StreamEnabled'):
+        print(f"   ✅ Stream enabled on '{table_name}'")
+        return True
+    try:
+        dynamodb.update_table(TableName=table_name, StreamSpecification=STREAM_SPECIFICATION)
+        print(f"   ✅ Stream enabled on '{table_name}'")
+        return True
+    except ClientError as e:
+        print(f"   ❌ Error enabling stream on '{table_name}': {e}")
+        return False
+
+def ensure_ttl(dynamodb, table_name: str, attribute: str) -> bool:
+    """Enable TTL on an ACTIVE table so archived items expire (scripts/archive_leads.py)."""
+    desc = dynamodb.describe_time_to_live(TableName=table_name)['TimeToLiveDescription']
+    if desc.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+        print(f"   ✅ TTL on '{desc.get('AttributeName')}' enabled for '{table_name}'")
+        return True
+    try:
+        dynamodb.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': attribute}
+        )
+        print(f"   ✅ TTL on '{attribute}' enabled for '{table_name}'")
+        return True
+    except ClientError as e:
+        print(f"   ❌ Error enabling TTL on '{table_name}': {e}")
+        return False
+
 def create_tables():
     """Create both DynamoDB tables for LINDA."""
     
@@ -23,9 +171,15 @@ def create_tables():
     repairs_table = os.getenv('REPAIRS_LEAD_LOG_TABLE', 'Repairs_Lead_Log')
     state_table = os.getenv('BRANDON_STATE_LOG_TABLE', 'Brandon_State_Log')
     schedule_table = os.getenv('SCHEDULE_TABLE', 'Repairs_Schedule')
+    feed_table = os.getenv('CHANGE_FEED_TABLE', 'LINDA_Change_Feed')
+    events_table = os.getenv('SALES_EVENTS_TABLE', 'Repairs_Sales_Events')
+    counters_table = os.getenv('SALES_COUNTERS_TABLE', 'Repairs_Sales_Counters')
+    profiles_table = os.getenv('CUSTOMER_PROFILES_TABLE', 'Repairs_Customer_Profiles')
+    outbox_table = os.getenv('OUTBOX_TABLE', 'Repairs_Outbox')
     
     print(f"Region: {region}")
-    print(f"Tables to create: {repairs_table}, {state_table}, {schedule_table}\n")
+    print(f"Tables to create: {repairs_table}, {state_table}, {schedule_table}, {feed_table}, "
+          f"{events_table}, {counters_table}, {profiles_table}, {outbox_table}\n")
     
     # Create DynamoDB client
     dynamodb = boto3.client('dynamodb', region_name=region)
@@ -41,9 +195,15 @@ def create_tables():
             ],
             AttributeDefinitions=[
                 {'AttributeName': 'lead_id', 'AttributeType': 'S'},
-                {'AttributeName': 'timestamp', 'AttributeType': 'N'}
+                {'AttributeName': 'timestamp', 'AttributeType': 'N'},
+                {'AttributeName': 'phone', 'AttributeType': 'S'},
+                {'AttributeName': 'created_at', 'AttributeType': 'N'},
+                {'AttributeName': 'open_queue', 'AttributeType': 'S'},
+                {'AttributeName': 'open_at', 'AttributeType': 'S'}
             ],
+            GlobalSecondaryIndexes=[phone_index_definition(), open_leads_index_definition()],
             BillingMode='PAY_PER_REQUEST',
+            StreamSpecification=STREAM_SPECIFICATION,
             Tags=[
                 {'Key': 'Project', 'Value': 'LINDA'},
                 {'Key': 'Environment', 'Value': 'Development'}
@@ -54,6 +214,12 @@ def create_tables():
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceInUseException':
             print(f"⚠️  Table '{repairs_table}' already exists")
+            if not ensure_phone_index(dynamodb, repairs_table):
+                return False
+            if not ensure_open_leads_index(dynamodb, repairs_table):
+                return False
+            if not ensure_stream(dynamodb, repairs_table):
+                return False
         else:
             print(f"❌ Error creating {repairs_table}: {e}")
             return False
@@ -70,6 +236,7 @@ def create_tables():
                 {'AttributeName': 'state_id', 'AttributeType': 'S'}
             ],
             BillingMode='PAY_PER_REQUEST',
+            StreamSpecification=STREAM_SPECIFICATION,
             Tags=[
                 {'Key': 'Project', 'Value': 'LINDA'},
                 {'Key': 'Environment', 'Value': 'Development'}
@@ -80,6 +247,8 @@ def create_tables():
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceInUseException':
             print(f"⚠️  Table '{state_table}' already exists")
+            if not ensure_stream(dynamodb, state_table):
+                return False
         else:
             print(f"❌ Error creating {state_table}: {e}")
             return False
@@ -95,9 +264,13 @@ def create_tables():
             ],
             AttributeDefinitions=[
                 {'AttributeName': 'schedule_date', 'AttributeType': 'S'},
-                {'AttributeName': 'slot_time', 'AttributeType': 'S'}
+                {'AttributeName': 'slot_time', 'AttributeType': 'S'},
+                {'AttributeName': 'taken_queue', 'AttributeType': 'S'},
+                {'AttributeName': 'slot_at', 'AttributeType': 'S'}
             ],
+            GlobalSecondaryIndexes=[taken_slots_index_definition()],
             BillingMode='PAY_PER_REQUEST',
+            StreamSpecification=STREAM_SPECIFICATION,
             Tags=[
                 {'Key': 'Project', 'Value': 'LINDA'},
                 {'Key': 'Environment', 'Value': 'Development'}
@@ -108,9 +281,98 @@ def create_tables():
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceInUseException':
             print(f"⚠️  Table '{schedule_table}' already exists")
+            if not ensure_stream(dynamodb, schedule_table):
+                return False
+            if not ensure_taken_slots_index(dynamodb, schedule_table):
+                return False
         else:
             print(f"❌ Error creating {schedule_table}: {e}")
             return False
+
+    # Table 4: LINDA_Change_Feed (one version counter per changed partition)
+    print(f"\nCreating table: {feed_table}...")
+    try:
+        response = dynamodb.create_table(
+            TableName=feed_table,
+            KeySchema=[
+                {'AttributeName': 'feed_key', 'KeyType': 'HASH'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'feed_key', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST',
+            Tags=[
+                {'Key': 'Project', 'Value': 'LINDA'},
+                {'Key': 'Environment', 'Value': 'Development'}
+            ]
+        )
+        print(f"✅ Table '{feed_table}' creation initiated")
+        print(f"   Status: {response['TableDescription']['TableStatus']}")
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceInUseException':
+            print(f"⚠️  Table '{feed_table}' already exists")
+        else:
+            print(f"❌ Error creating {feed_table}: {e}")
+            return False
+
+    # Tables 5-7: upsell/discount events, their per-day / per-item counters, per-phone customer profiles
+    for table_name, key_name in ((events_table, 'event_id'), (counters_table, 'counter_key'), (profiles_table, 'phone')):
+        print(f"\nCreating table: {table_name}...")
+        try:
+            response = dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=[
+                    {'AttributeName': key_name, 'KeyType': 'HASH'}
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': key_name, 'AttributeType': 'S'}
+                ],
+                BillingMode='PAY_PER_REQUEST',
+                Tags=[
+                    {'Key': 'Project', 'Value': 'LINDA'},
+                    {'Key': 'Environment', 'Value': 'Development'}
+                ]
+            )
+            print(f"✅ Table '{table_name}' creation initiated")
+            print(f"   Status: {response['TableDescription']['TableStatus']}")
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceInUseException':
+                print(f"⚠️  Table '{table_name}' already exists")
+            else:
+                print(f"❌ Error creating {table_name}: {e}")
+                return False
+
+    # Table 8: Repairs_Outbox (side effects committed with their lead; the stream wakes the drainer)
+    print(f"\nCreating table: {outbox_table}...")
+    try:
+        response = dynamodb.create_table(
+            TableName=outbox_table,
+            KeySchema=[
+                {'AttributeName': 'outbox_id', 'KeyType': 'HASH'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'outbox_id', 'AttributeType': 'S'},
+                {'AttributeName': 'outbox_queue', 'AttributeType': 'S'},
+                {'AttributeName': 'next_attempt_at', 'AttributeType': 'N'}
+            ],
+            GlobalSecondaryIndexes=[outbox_due_index_definition()],
+            BillingMode='PAY_PER_REQUEST',
+            StreamSpecification=STREAM_SPECIFICATION,
+            Tags=[
+                {'Key': 'Project', 'Value': 'LINDA'},
+                {'Key': 'Environment', 'Value': 'Development'}
+            ]
+        )
+        print(f"✅ Table '{outbox_table}' creation initiated")
+        print(f"   Status: {response['TableDescription']['TableStatus']}")
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceInUseException':
+            print(f"⚠️  Table '{outbox_table}' already exists")
+            if not ensure_stream(dynamodb, outbox_table):
+                return False
+        else:
+            print(f"❌ Error creating {outbox_table}: {e}")
+            return False
     
     # Wait for tables to become ACTIVE
     print("\n⏳ Waiting for tables to become ACTIVE...")
@@ -137,6 +399,24 @@ def create_tables():
             WaiterConfig={'Delay': 2, 'MaxAttempts': 30}
         )
         print(f"   ✅ {schedule_table} is ACTIVE")
+
+        print(f"   Waiting for {feed_table}...")
+        waiter.wait(
+            TableName=feed_table,
+            WaiterConfig={'Delay': 2, 'MaxAttempts': 30}
+        )
+        print(f"   ✅ {feed_table} is ACTIVE")
+
+        for table_name in (events_table, counters_table, profiles_table, outbox_table):
+            print(f"   Waiting for {table_name}...")
+            waiter.wait(
+                TableName=table_name,
+                WaiterConfig={'Delay': 2, 'MaxAttempts': 30}
+            )
+            print(f"   ✅ {table_name} is ACTIVE")
+
+        if not ensure_ttl(dynamodb, repairs_table, LEAD_TTL_ATTRIBUTE):
+            return False
     except Exception as e:
         print(f"   ⚠️  Timeout waiting for tables: {e}")
         print("   Tables may still be creating. Check AWS Console.")
@@ -146,14 +426,18 @@ def create_tables():
     try:
         tables = dynamodb.list_tables()['TableNames']
         
-        if repairs_table in tables and state_table in tables and schedule_table in tables:
+        all_tables = [repairs_table, state_table, schedule_table, feed_table, events_table, counters_table]
+        if all(name in tables for name in all_tables):
             print(f"✅ Both tables verified:")
             print(f"   - {repairs_table}")
             print(f"   - {state_table}")
             print(f"   - {schedule_table}")
+            print(f"   - {feed_table}")
+            print(f"   - {events_table}")
+            print(f"   - {counters_table}")
             
             # Get table details
-            for table_name in [repairs_table, state_table, schedule_table]:
+            for table_name in all_tables:
                 desc = dynamodb.describe_table(TableName=table_name)
                 table_info = desc['Table']
                 print(f"\n📊 {table_name}:")
@@ -0,0 +1,137 @@
+"""
+Capacity pacing and resumable checkpoints shared by LINDA's bulk DynamoDB
+scripts (backfills, migrations).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from decimal import Decimal
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+THROTTLE_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+MAX_THROTTLE_RETRIES = 8
+
+
+class AdaptiveThrottle:
+    """
+    Pacing shared by all scanners and updaters.
+    A token bucket refilled at `rate` capacity units/s is debited by each
+    request's ConsumedCapacity; throttling halves the rate (down to a floor)
+    and successes grow it back additively up to max_rate.
+    """
+
+    def __init__(self, max_rate: float):
+        self.max_rate = max_rate
+        self.min_rate = max(1.0, max_rate / 20)
+        self.rate = max_rate
+        self._tokens = max_rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.throttles = 0
+        self.consumed = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Block until the bucket is positive."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens > 0:
+                    return
+                delay = -self._tokens / self.rate
+            time.sleep(min(delay, 1.0))
+
+    def record(self, consumed: float) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens -= consumed
+            self.consumed += consumed
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+    def throttled(self, attempt: int) -> None:
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+        time.sleep(min(0.05 * 2 ** attempt, 5.0))
+
+
+def consumed_units(response: dict) -> float:
+    """CapacityUnits from a response; batch and transactional calls return one entry per table."""
+    consumed = response.get("ConsumedCapacity")
+    if not consumed:
+        return 1.0
+    if isinstance(consumed, list):
+        return float(sum(entry.get("CapacityUnits", 0) for entry in consumed))
+    return float(consumed.get("CapacityUnits", 1))
+
+
+def call_with_throttle(throttle: AdaptiveThrottle, operation, **kwargs) -> dict:
+    """Run a DynamoDB call with capacity pacing; retries only throttling errors."""
+    kwargs["ReturnConsumedCapacity"] = "TOTAL"
+    for attempt in range(MAX_THROTTLE_RETRIES):
+        throttle.acquire()
+        try:
+            response = operation(**kwargs)
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in THROTTLE_ERROR_CODES:
+                throttle.throttled(attempt)
+                continue
+            raise
+        throttle.record(consumed_units(response))
+        return response
+    raise RuntimeError(f"Still throttled after {MAX_THROTTLE_RETRIES} attempts")
+
+
+def _json_default(value: Any):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Unserializable checkpoint value: {value!r}")
+
+
+class Checkpoint:
+    """Per-segment LastEvaluatedKey plus running totals, saved atomically to a local file."""
+
+    def __init__(self, path: str | None, run_key: dict, reset: bool):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"run": run_key, "segments": {}, "totals": {}}
+        if path and os.path.exists(path) and not reset:
+            with open(path, encoding="utf-8") as handle:
+                saved = json.load(handle)
+            if saved.get("run") != run_key:
+                raise ValueError(
+                    f"Checkpoint {path} belongs to a different run ({saved.get('run')}); "
+                    "use --reset-checkpoint to start over"
+                )
+            self.data = saved
+
+    def segment(self, segment: int) -> dict:
+        return self.data["segments"].get(str(segment), {"last_key": None, "done": False})
+
+    def advance(self, segment: int, last_key: dict | None, counts: dict[str, int]) -> None:
+        with self._lock:
+            self.data["segments"][str(segment)] = {"last_key": last_key, "done": last_key is None}
+            totals = self.data["totals"]
+            for name, value in counts.items():
+                totals[name] = totals.get(name, 0) + value
+            if not self.path:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(self.data, handle, default=_json_default)
+            os.replace(tmp_path, self.path)
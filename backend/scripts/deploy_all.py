@@ -1,21 +1,28 @@
 #!/usr/bin/env python3
 """
 LINDA Backend Full Deployment Script
-Deploys: IAM Role, Lambda Functions (x3), API Gateway (HTTP API)
+Deploys: IAM Role, Lambda Functions (x3 + change-feed stream consumer + outbox drainer), Function URLs
 Outputs: API Gateway Invoke URL
+
+Usage:
+  python scripts/deploy_all.py                  # one function per API (dispatcher, state-manager, scheduler)
+  python scripts/deploy_all.py --layout single  # one LINDA-api function routing /sms, /state, /scheduler
+  python scripts/deploy_all.py --deps layer     # dependencies in one slim LINDA-deps layer (scripts/build_layer.py)
 """
 
 import os
 import sys
 import json
+import argparse
 import time
-import zipfile
 import tempfile
 import shutil
 import subprocess
 from pathlib import Path
 from dotenv import load_dotenv
 
+from build_layer import LAMBDA_RUNTIME, LAYER_NAME, build_layer, deterministic_zip
+
 # ---------------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------------
@@ -40,7 +47,45 @@ LAMBDA_FUNCTIONS = {
         "source": "scheduler.py",
         "description": "Booking API for customer appointments",
     },
+    "LINDA-change-feed": {
+        "handler": "change_feed.stream_handler",
+        "source": "change_feed.py",
+        "description": "DynamoDB Streams consumer that publishes cache invalidations",
+        "public_url": False,
+    },
+    "LINDA-outbox-drainer": {
+        "handler": "outbox.drain_handler",
+        "source": "outbox.py",
+        "description": "Delivers booking side effects from the outbox table with retries",
+        "public_url": False,
+    },
+}
+# --layout single: the three API functions above served by one function (lambda/router.py)
+CONSOLIDATED_FUNCTION = {
+    "LINDA-api": {
+        "handler": "router.handler",
+        "source": "router.py",
+        "modules": ["dispatcher.py", "scheduler.py", "state_manager.py"],
+        "description": "Twilio webhook, booking and admin APIs behind one path router",
+    },
+}
+# Split function -> path it is served under on LINDA-api
+CONSOLIDATED_ROUTES = {
+    "LINDA-dispatcher": "sms",
+    "LINDA-state-manager": "state",
+    "LINDA-scheduler": "scheduler",
 }
+# Modules bundled alongside every handler
+SHARED_MODULES = ["utils.py", "ddb_codec.py", "lead_ids.py", "storage.py", "change_feed.py", "capacity.py", "archive.py", "lead_format.py", "tenancy.py", "availability_snapshots.py", "outbox.py"]
+# Tables whose streams feed LINDA-change-feed
+STREAM_TABLES = [
+    os.getenv("BRANDON_STATE_LOG_TABLE", "Brandon_State_Log"),
+    os.getenv("SCHEDULE_TABLE", "Repairs_Schedule"),
+    os.getenv("REPAIRS_LEAD_LOG_TABLE", "Repairs_Lead_Log"),
+]
+OUTBOX_TABLE = os.getenv("OUTBOX_TABLE", "Repairs_Outbox")
+# Retries and expired leases are picked up by a scheduled sweep; new records come off the stream
+OUTBOX_SWEEP_RULE = "LINDA-outbox-sweep"
 
 # ---------------------------------------------------------------------------
 # Paths
@@ -66,12 +111,30 @@ for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
 
 ENV_VARS = {
     "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", ""),
+    # Shared secret the admin API (state_manager) requires in X-Linda-Admin-Key
+    "ADMIN_API_KEY": os.getenv("ADMIN_API_KEY", ""),
     "TWILIO_ACCOUNT_SID": os.getenv("TWILIO_ACCOUNT_SID", ""),
     "TWILIO_AUTH_TOKEN": os.getenv("TWILIO_AUTH_TOKEN", ""),
     "TWILIO_PHONE_NUMBER": os.getenv("TWILIO_PHONE_NUMBER", ""),
     "DYNAMODB_REGION": REGION,
     "REPAIRS_LEAD_LOG_TABLE": os.getenv("REPAIRS_LEAD_LOG_TABLE", "Repairs_Lead_Log"),
     "BRANDON_STATE_LOG_TABLE": os.getenv("BRANDON_STATE_LOG_TABLE", "Brandon_State_Log"),
+    "SCHEDULE_TABLE": os.getenv("SCHEDULE_TABLE", "Repairs_Schedule"),
+    "CHANGE_FEED_TABLE": os.getenv("CHANGE_FEED_TABLE", "LINDA_Change_Feed"),
+    "SALES_EVENTS_TABLE": os.getenv("SALES_EVENTS_TABLE", "Repairs_Sales_Events"),
+    "SALES_COUNTERS_TABLE": os.getenv("SALES_COUNTERS_TABLE", "Repairs_Sales_Counters"),
+    "CUSTOMER_PROFILES_TABLE": os.getenv("CUSTOMER_PROFILES_TABLE", "Repairs_Customer_Profiles"),
+    "OUTBOX_TABLE": os.getenv("OUTBOX_TABLE", "Repairs_Outbox"),
+    # Shops served besides the default one (see lambda/tenancy.py); "{}" keeps a single shop
+    "DEFAULT_TENANT": os.getenv("DEFAULT_TENANT", "default"),
+    "TENANTS": os.getenv("TENANTS", "{}"),
+    "WARM_CACHE_TTL_SECONDS": os.getenv("WARM_CACHE_TTL_SECONDS", "300"),
+    # Lead read-through to the archive; without a bucket the lookup finds nothing archived
+    "ARCHIVE_STORE": os.getenv("ARCHIVE_STORE", "s3" if os.getenv("ARCHIVE_BUCKET") else "local"),
+    "ARCHIVE_BUCKET": os.getenv("ARCHIVE_BUCKET", ""),
+    "ARCHIVE_PREFIX": os.getenv("ARCHIVE_PREFIX", "linda-archive/"),
+    # Last-known availability survives in /tmp for the life of a container
+    "AVAILABILITY_SNAPSHOT_PATH": os.getenv("AVAILABILITY_SNAPSHOT_PATH", "/tmp/linda_availability.json"),
 }
 
 
@@ -154,8 +217,20 @@ def ensure_iam_role():
 # Step 2: Package Lambda Functions
 # ---------------------------------------------------------------------------
 
-def package_lambdas() -> dict[str, str]:
-    """Package each Lambda function into a zip. Returns {name: zip_path}."""
+def functions_for(layout: str) -> dict[str, dict]:
+    """Functions to deploy: split keeps one per API; single swaps the three APIs for LINDA-api."""
+    if layout == "split":
+        return LAMBDA_FUNCTIONS
+    functions = {name: config for name, config in LAMBDA_FUNCTIONS.items() if name not in CONSOLIDATED_ROUTES}
+    return {**CONSOLIDATED_FUNCTION, **functions}
+
+
+def package_lambdas(functions: dict[str, dict], deps: str = "bundled") -> dict[str, str]:
+    """
+    Package each Lambda function into a zip. Returns {name: zip_path}.
+    deps="bundled" copies the dependency tree into every zip; "layer" ships
+    only our modules and leaves dependencies to the LINDA-deps layer.
+    """
     print("\n" + "=" * 60)
     print("STEP 2: Package Lambda Functions")
     print("=" * 60)
@@ -164,36 +239,33 @@ def package_lambdas() -> dict[str, str]:
 
     # Install deps once into a temp location
     deps_dir = Path(tempfile.mkdtemp(prefix="linda_deps_"))
-    print(f"  📦 Installing dependencies...")
-    result = run([
-        sys.executable, "-m", "pip", "install",
-        "-r", str(BACKEND_DIR / "requirements.txt"),
-        "-t", str(deps_dir),
-        "--quiet",
-    ])
-    if result.returncode != 0:
-        print(f"  ⚠️  pip install warnings: {result.stderr[:200]}")
+    if deps == "bundled":
+        print(f"  📦 Installing dependencies...")
+        result = run([
+            sys.executable, "-m", "pip", "install",
+            "-r", str(BACKEND_DIR / "requirements.txt"),
+            "-t", str(deps_dir),
+            "--quiet",
+        ])
+        if result.returncode != 0:
+            print(f"  ⚠️  pip install warnings: {result.stderr[:200]}")
 
     zips = {}
-    for func_name, config in LAMBDA_FUNCTIONS.items():
+    for func_name, config in functions.items():
         zip_path = DEPLOY_DIR / f"{func_name}.zip"
         print(f"  📦 Packaging {func_name}...")
 
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-            # Add the handler source
-            source_path = LAMBDA_DIR / config["source"]
-            zf.write(source_path, config["source"])
+        # Handler source, route modules (router) and shared modules
+        modules = dict.fromkeys([config["source"], *config.get("modules", []), *SHARED_MODULES])
+        entries = [(LAMBDA_DIR / module, module) for module in modules]
 
-            # Add shared utils
-            utils_path = LAMBDA_DIR / "utils.py"
-            zf.write(utils_path, "utils.py")
+        # Add dependencies
+        for root, dirs, files in os.walk(deps_dir):
+            for file in files:
+                file_path = Path(root) / file
+                entries.append((file_path, file_path.relative_to(deps_dir).as_posix()))
 
-            # Add dependencies
-            for root, dirs, files in os.walk(deps_dir):
-                for file in files:
-                    file_path = Path(root) / file
-                    arcname = str(file_path.relative_to(deps_dir))
-                    zf.write(file_path, arcname)
+        deterministic_zip(zip_path, entries)
 
         size_mb = zip_path.stat().st_size / (1024 * 1024)
         print(f"     > {zip_path.name} ({size_mb:.1f} MB)")
@@ -204,18 +276,54 @@ def package_lambdas() -> dict[str, str]:
     return zips
 
 
+def publish_layer() -> str:
+    """Build the LINDA-deps layer and publish it unless the same bytes are already live. Returns its ARN."""
+    print("\n" + "=" * 60)
+    print(f"STEP 2a: Shared Dependency Layer ({LAYER_NAME})")
+    print("=" * 60)
+
+    built = build_layer()
+    if built is None:
+        print("  ❌ Layer build failed")
+        sys.exit(1)
+    zip_path, report, flagged = built
+    if flagged:
+        print(f"  ⚠️  Deploying a layer that regressed against layer_baseline.json")
+
+    # Deterministic archives: an unchanged build has the same sha256 as the live version
+    digest = f"sha256:{report['zip_sha256']}"
+    versions = aws_json("lambda", "list-layer-versions", "--layer-name", LAYER_NAME) or {}
+    for version in versions.get("LayerVersions", [])[:1]:
+        if digest in version.get("Description", ""):
+            print(f"  ✅ Dependencies unchanged — reusing {version['LayerVersionArn']}")
+            return version["LayerVersionArn"]
+
+    published = aws_json("lambda", "publish-layer-version",
+                         "--layer-name", LAYER_NAME,
+                         "--description", f"LINDA dependencies {digest}",
+                         "--zip-file", f"fileb://{zip_path}",
+                         "--compatible-runtimes", LAMBDA_RUNTIME,
+                         "--compatible-architectures", "x86_64")
+    if not published:
+        print(f"  ❌ Publishing {LAYER_NAME} failed")
+        sys.exit(1)
+    print(f"  ✅ Published {published['LayerVersionArn']}")
+    return published["LayerVersionArn"]
+
+
 # ---------------------------------------------------------------------------
 # Step 3: Deploy Lambda Functions
 # ---------------------------------------------------------------------------
 
-def deploy_lambdas(zips: dict[str, str]):
+def deploy_lambdas(functions: dict[str, dict], zips: dict[str, str], layers: list[str] | None = None):
     print("\n" + "=" * 60)
     print("STEP 3: Deploy Lambda Functions")
     print("=" * 60)
 
     env_string = json.dumps({"Variables": ENV_VARS})
+    layer_args = ["--layers", *layers] if layers else []
 
-    for func_name, config in LAMBDA_FUNCTIONS.items():
+    for func_name, config in functions.items():
         zip_path = zips[func_name]
         print(f"\n  🚀 Deploying {func_name}...")
 
@@ -233,14 +341,15 @@ def deploy_lambdas(zips: dict[str, str]):
             print(f"     Creating new function...")
             result = aws("lambda", "create-function",
                           "--function-name", func_name,
-                          "--runtime", "python3.11",
+                          "--runtime", LAMBDA_RUNTIME,
                           "--role", ROLE_ARN,
                           "--handler", config["handler"],
                           "--description", config["description"],
                           "--zip-file", f"fileb://{zip_path}",
                           "--timeout", "60",
                           "--memory-size", "512",
-                          "--environment", env_string)
+                          "--environment", env_string,
+                          *layer_args)
         elif result.returncode == 0:
             # Code updated — now update config
             print(f"     Waiting for code update...")
@@ -250,7 +359,8 @@ def deploy_lambdas(zips: dict[str, str]):
                           "--function-name", func_name,
                           "--timeout", "60",
                           "--memory-size", "512",
-                          "--environment", env_string)
+                          "--environment", env_string,
+                          *layer_args)
         else:
             print(f"     ❌ Code update failed: {result.stderr[:200]}")
             continue
@@ -269,14 +379,16 @@ def deploy_lambdas(zips: dict[str, str]):
 # Step 4: Create Lambda Function URLs (replaces API Gateway)
 # ---------------------------------------------------------------------------
 
-def create_function_urls() -> dict[str, str]:
+def create_function_urls(functions: dict[str, dict]) -> dict[str, str]:
     """Create public Function URLs for each Lambda. Returns {name: url}."""
     print("\n" + "=" * 60)
     print("STEP 4: Lambda Function URLs")
     print("=" * 60)
 
     urls = {}
-    for func_name in LAMBDA_FUNCTIONS:
+    for func_name, config in functions.items():
+        if not config.get("public_url", True):
+            continue
         print(f"\n  Setting up URL for {func_name}...")
 
         # Check if URL config already exists
@@ -286,7 +398,8 @@ def create_function_urls() -> dict[str, str]:
             url = data["FunctionUrl"]
             print(f"     URL already exists: {url}")
         else:
-            # Create function URL with NONE auth (public) and CORS
+            # Create function URL with NONE auth (public) and CORS; the admin API
+            # (state_manager) checks X-Linda-Admin-Key itself
             cors_json = json.dumps({
                 "AllowOrigins": ["*"],
                 "AllowMethods": ["*"],
@@ -330,13 +443,94 @@ def create_function_urls() -> dict[str, str]:
     return urls
 
 
+def route_urls(urls: dict[str, str]) -> dict[str, str]:
+    """
+    --layout single: give each API its path on LINDA-api under its old name, so
+    verification, LAMBDA_URLS.json and the frontend .env lines stay the same.
+    """
+    api_url = urls.pop("LINDA-api", "")
+    if api_url:
+        for func_name, route in CONSOLIDATED_ROUTES.items():
+            urls[func_name] = f"{api_url.rstrip('/')}/{route}"
+    return urls
+
+
 # ---------------------------------------------------------------------------
-# Step 5: Verify
+# Step 5: Connect DynamoDB Streams to the change feed
+# ---------------------------------------------------------------------------
+
+def map_stream(function_name: str, table: str, mapped: set[str], batch_size: int) -> None:
+    """Point a table's stream at a Lambda unless it already is."""
+    desc = aws_json("dynamodb", "describe-table", "--table-name", table)
+    stream_arn = (desc or {}).get("Table", {}).get("LatestStreamArn")
+    if not stream_arn:
+        print(f"  ⚠️  {table} has no stream — run scripts/create_tables.py")
+        return
+    if stream_arn in mapped:
+        print(f"  ✅ {table} stream already mapped")
+        return
+    result = aws("lambda", "create-event-source-mapping",
+                  "--function-name", function_name,
+                  "--event-source-arn", stream_arn,
+                  "--starting-position", "LATEST",
+                  "--batch-size", str(batch_size),
+                  "--maximum-batching-window-in-seconds", "0")
+    if result.returncode == 0:
+        print(f"  ✅ {table} stream mapped to {function_name}")
+    else:
+        print(f"  ❌ Mapping {table} failed: {result.stderr[:200]}")
+
+
+def existing_stream_mappings(function_name: str) -> set[str]:
+    existing = aws_json("lambda", "list-event-source-mappings",
+                        "--function-name", function_name) or {}
+    return {m["EventSourceArn"] for m in existing.get("EventSourceMappings", [])}
+
+
+def connect_change_streams():
+    print("\n" + "=" * 60)
+    print("STEP 5: Change Feed and Outbox Streams")
+    print("=" * 60)
+
+    mapped = existing_stream_mappings("LINDA-change-feed")
+    for table in STREAM_TABLES:
+        map_stream("LINDA-change-feed", table, mapped, 100)
+
+    map_stream("LINDA-outbox-drainer", OUTBOX_TABLE, existing_stream_mappings("LINDA-outbox-drainer"), 25)
+    schedule_outbox_sweep()
+
+
+def schedule_outbox_sweep():
+    """Invoke the drainer every minute so failed side effects are retried."""
+    rule = aws_json("events", "put-rule",
+                    "--name", OUTBOX_SWEEP_RULE,
+                    "--schedule-expression", "rate(1 minute)")
+    if not rule:
+        print(f"  ❌ Could not create rule {OUTBOX_SWEEP_RULE}")
+        return
+    aws("lambda", "add-permission",
+        "--function-name", "LINDA-outbox-drainer",
+        "--statement-id", "outbox-sweep-schedule",
+        "--action", "lambda:InvokeFunction",
+        "--principal", "events.amazonaws.com",
+        "--source-arn", rule["RuleArn"])
+    function_arn = f"arn:aws:lambda:{REGION}:{ACCOUNT_ID}:function:LINDA-outbox-drainer"
+    result = aws("events", "put-targets",
+                  "--rule", OUTBOX_SWEEP_RULE,
+                  "--targets", json.dumps([{"Id": "outbox-drainer", "Arn": function_arn}]))
+    if result.returncode == 0:
+        print(f"  ✅ {OUTBOX_SWEEP_RULE} sweeps the outbox every minute")
+    else:
+        print(f"  ❌ Scheduling the outbox sweep failed: {result.stderr[:200]}")
+
+
+# ---------------------------------------------------------------------------
+# Step 6: Verify
 # ---------------------------------------------------------------------------
 
 def verify(urls: dict[str, str]):
     print("\n" + "=" * 60)
-    print("STEP 5: Verification")
+    print("STEP 6: Verification")
     print("=" * 60)
 
     import urllib.request
@@ -346,7 +540,7 @@ def verify(urls: dict[str, str]):
     if state_url:
         print(f"\n  Testing GET {state_url} ...")
         try:
-            req = urllib.request.Request(state_url)
+            req = urllib.request.Request(state_url, headers={"X-Linda-Admin-Key": ENV_VARS["ADMIN_API_KEY"]})
             with urllib.request.urlopen(req, timeout=30) as resp:
                 body = resp.read().decode("utf-8", errors="replace")
                 print(f"  State response: {body[:300]}")
@@ -372,22 +566,40 @@ def verify(urls: dict[str, str]):
 # ---------------------------------------------------------------------------
 
 def main():
+    parser = argparse.ArgumentParser(description="Deploy the LINDA backend")
+    parser.add_argument("--layout", choices=["split", "single"], default="split",
+                        help="split: one function per API; single: LINDA-api routes all three "
+                             "(compare with scripts/compare_layouts.py)")
+    parser.add_argument("--deps", choices=["bundled", "layer"], default="bundled",
+                        help="bundled: dependencies in every zip; layer: one slim, precompiled "
+                             f"{LAYER_NAME} layer shared by all functions")
+    args = parser.parse_args()
+    functions = functions_for(args.layout)
+
     print("=" * 60)
     print("  LINDA Backend Deployment")
-    print(f"  Account: {ACCOUNT_ID} | Region: {REGION}")
+    print(f"  Account: {ACCOUNT_ID} | Region: {REGION} | Layout: {args.layout} | Deps: {args.deps}")
     print("=" * 60)
 
     # Validate env
     if not ENV_VARS["OPENAI_API_KEY"]:
         print("OPENAI_API_KEY not found in backend/.env")
         sys.exit(1)
+    if not ENV_VARS["ADMIN_API_KEY"]:
+        print("ADMIN_API_KEY not found in backend/.env (the admin API refuses every request without it)")
+        sys.exit(1)
     print(f"  OpenAI Key: ...{ENV_VARS['OPENAI_API_KEY'][-8:]}")
     print(f"  Twilio SID: {ENV_VARS['TWILIO_ACCOUNT_SID'][:8]}...")
 
     ensure_iam_role()
-    zips = package_lambdas()
-    deploy_lambdas(zips)
-    urls = create_function_urls()
+    zips = package_lambdas(functions, args.deps)
+    layers = [publish_layer()] if args.deps == "layer" else None
+    deploy_lambdas(functions, zips, layers)
+    urls = create_function_urls(functions)
+    if args.layout == "single":
+        # The split functions stay deployed, so switching back is a frontend .env change
+        urls = route_urls(urls)
+    connect_change_streams()
 
     print("\n" + "=" * 60)
     print("  DEPLOYMENT COMPLETE")
@@ -407,6 +619,9 @@ def main():
     for name, url in urls.items():
         short = name.replace("LINDA-", "").upper()
         print(f"     NEXT_PUBLIC_{short}_URL={url}")
+    # Server-side only: /api/watch long-polls the admin API with the key
+    print(f"     STATE_MANAGER_URL={urls.get('LINDA-state-manager', '')}")
+    print("     LINDA_ADMIN_API_KEY=<ADMIN_API_KEY from backend/.env>")
     print()
 
 
@@ -16,6 +16,9 @@ DISPATCHER_FUNCTION="dispatcher"
 STATE_MANAGER_FUNCTION="state_manager"
 SCHEDULER_FUNCTION="scheduler"
 
+# Modules bundled alongside every handler
+SHARED_MODULES="utils.py ddb_codec.py lead_ids.py storage.py change_feed.py capacity.py archive.py lead_format.py tenancy.py availability_snapshots.py outbox.py"
+
 # Directories
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_DIR="$(dirname "$SCRIPT_DIR")"
@@ -70,7 +73,9 @@ deploy_lambda() {
     
     # Copy Lambda function code
     cp "$LAMBDA_DIR/$handler_file" "$deploy_temp/"
-    cp "$LAMBDA_DIR/utils.py" "$deploy_temp/"
+    for module in $SHARED_MODULES; do
+        cp "$LAMBDA_DIR/$module" "$deploy_temp/"
+    done
     
     # Install dependencies
     echo "Installing dependencies..."
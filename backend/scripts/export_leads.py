@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Export Repairs_Lead_Log with a parallel Scan.
+
+Each of --segments Scan segments is read by a worker (processes by default,
+so decoding scales across cores) and streamed page by page into its own
+gzip NDJSON part, or a Parquet part with --format parquet (needs pyarrow).
+Nothing holds the whole table in memory. A manifest.json lists the parts,
+counts, and the watermark to pass to the next incremental run.
+
+Incremental exports (--since / --since-manifest) filter on created_at. The
+filter still reads the whole table (DynamoDB bills the Scan before filtering)
+but only writes new leads. The new watermark trails the export start by
+--settle-seconds, so leads written during the run are exported again next
+time rather than missed: dedupe on (lead_id, timestamp) downstream.
+
+Usage:
+  python scripts/export_leads.py                                   # full export, gzip NDJSON
+  python scripts/export_leads.py --segments 16 --format parquet
+  python scripts/export_leads.py --since-manifest exports/leads-20261018T020000Z/manifest.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda"))
+
+from ddb_codec import LEAD_CODEC  # noqa: E402
+
+# Columns broken out in Parquet; any other attributes go into the JSON 'extra' column
+PARQUET_STRING_COLUMNS = [
+    "lead_id", "phone", "repair_type", "device", "appointment_date", "appointment_time", "status", "lead_type",
+]
+PARQUET_INT_COLUMNS = ["timestamp", "created_at"]
+PARQUET_ROW_GROUP = 10_000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Parallel export of the leads table")
+    parser.add_argument(
+        "--table",
+        default=os.getenv("REPAIRS_LEAD_LOG_TABLE", "Repairs_Lead_Log"),
+        help="DynamoDB leads table name",
+    )
+    parser.add_argument(
+        "--region",
+        default=os.getenv("AWS_REGION") or os.getenv("DYNAMODB_REGION", "us-east-1"),
+        help="AWS region",
+    )
+    parser.add_argument("--segments", type=int, default=(os.cpu_count() or 2) * 2, help="Parallel Scan TotalSegments")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Concurrent segment workers")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process", help="Worker type")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson", help="Output format")
+    parser.add_argument("--output-dir", help="Destination directory (default exports/leads-<UTC timestamp>)")
+    parser.add_argument("--page-size", type=int, default=1000, help="Scan Limit per request")
+    parser.add_argument("--since", type=int, help="Only export leads with created_at > this epoch watermark")
+    parser.add_argument("--since-manifest", help="Read --since from a previous export's manifest.json")
+    parser.add_argument(
+        "--settle-seconds",
+        type=int,
+        default=60,
+        help="How far the next watermark trails the export start (covers in-flight writes)",
+    )
+    return parser.parse_args()
+
+
+class PartWriter:
+    """Streams decoded items into one part file."""
+
+    def __init__(self, path: Path, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self._pa = pa
+            self._schema = pa.schema(
+                [(name, pa.string()) for name in PARQUET_STRING_COLUMNS]
+                + [(name, pa.int64()) for name in PARQUET_INT_COLUMNS]
+                + [("extra", pa.string())]
+            )
+            self._writer = pq.ParquetWriter(str(path), self._schema, compression="zstd")
+            self._buffer: list[dict] = []
+        else:
+            self._file = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+
+    def write(self, items: list[dict]) -> None:
+        self.rows += len(items)
+        if self.fmt == "parquet":
+            self._buffer.extend(items)
+            if len(self._buffer) >= PARQUET_ROW_GROUP:
+                self._flush_row_group()
+            return
+        for item in items:
+            self._file.write(json.dumps(item, separators=(",", ":")))
+            self._file.write("\n")
+
+    def _flush_row_group(self) -> None:
+        if not self._buffer:
+            return
+        columns = {name: [] for name in self._schema.names}
+        known = set(PARQUET_STRING_COLUMNS) | set(PARQUET_INT_COLUMNS)
+        for item in self._buffer:
+            for name in PARQUET_STRING_COLUMNS:
+                value = item.get(name)
+                columns[name].append(None if value is None else str(value))
+            for name in PARQUET_INT_COLUMNS:
+                value = item.get(name)
+                columns[name].append(int(value) if isinstance(value, (int, float)) else None)
+            extra = {key: value for key, value in item.items() if key not in known}
+            columns["extra"].append(json.dumps(extra, separators=(",", ":")) if extra else None)
+        self._writer.write_table(self._pa.table(columns, schema=self._schema))
+        self._buffer = []
+
+    def close(self) -> None:
+        if self.fmt == "parquet":
+            self._flush_row_group()
+            self._writer.close()
+        else:
+            self._file.close()
+
+
+def export_segment(task: dict) -> dict:
+    """Scan one segment and stream it to its part file. Runs inside a worker."""
+    client = boto3.client("dynamodb", region_name=task["region"])
+    suffix = "parquet" if task["format"] == "parquet" else "ndjson.gz"
+    path = Path(task["output_dir"]) / f"part-{task['segment']:04d}.{suffix}"
+    writer = PartWriter(path, task["format"])
+
+    scan_kwargs = {
+        "TableName": task["table"],
+        "Segment": task["segment"],
+        "TotalSegments": task["total_segments"],
+        "Limit": task["page_size"],
+    }
+    if task["since"] is not None:
+        scan_kwargs["FilterExpression"] = "created_at > :since"
+        scan_kwargs["ExpressionAttributeValues"] = {":since": {"N": str(task["since"])}}
+
+    scanned = 0
+    max_created_at = None
+    try:
+        while True:
+            response = client.scan(**scan_kwargs)
+            scanned += response.get("ScannedCount", 0)
+            items = LEAD_CODEC.decode_many(response.get("Items", []))
+            writer.write(items)
+            for item in items:
+                created_at = item.get("created_at")
+                if isinstance(created_at, int) and (max_created_at is None or created_at > max_created_at):
+                    max_created_at = created_at
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                break
+            scan_kwargs["ExclusiveStartKey"] = last_key
+    finally:
+        writer.close()
+
+    return {
+        "segment": task["segment"],
+        "file": path.name,
+        "rows": writer.rows,
+        "scanned": scanned,
+        "max_created_at": max_created_at,
+    }
+
+
+def read_watermark(manifest_path: str) -> int:
+    with open(manifest_path, encoding="utf-8") as handle:
+        return int(json.load(handle)["next_since"])
+
+
+def main() -> int:
+    load_dotenv()
+    args = parse_args()
+
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ --format parquet needs pyarrow (pip install pyarrow)")
+            return 1
+
+    since = args.since
+    if args.since_manifest:
+        try:
+            since = read_watermark(args.since_manifest)
+        except (OSError, KeyError, ValueError) as error:
+            print(f"❌ Cannot read watermark from {args.since_manifest}: {error}")
+            return 1
+
+    started = datetime.now(timezone.utc)
+    output_dir = Path(args.output_dir or f"exports/leads-{started.strftime('%Y%m%dT%H%M%SZ')}")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("📤 Exporting leads...")
+    print(f"   Table: {args.table}")
+    print(f"   Region: {args.region}")
+    print(f"   Segments: {args.segments} ({args.workers} {args.executor} workers)")
+    print(f"   Format: {args.format}")
+    print(f"   Mode: {'INCREMENTAL since ' + str(since) if since is not None else 'FULL'}")
+    print(f"   Output: {output_dir}")
+
+    tasks = [
+        {
+            "table": args.table,
+            "region": args.region,
+            "segment": segment,
+            "total_segments": args.segments,
+            "page_size": args.page_size,
+            "since": since,
+            "format": args.format,
+            "output_dir": str(output_dir),
+        }
+        for segment in range(args.segments)
+    ]
+
+    start = time.perf_counter()
+    executor_cls = ProcessPoolExecutor if args.executor == "process" else ThreadPoolExecutor
+    try:
+        with executor_cls(max_workers=args.workers) as executor:
+            parts = list(executor.map(export_segment, tasks))
+    except (ClientError, BotoCoreError) as error:
+        print(f"❌ DynamoDB error: {error}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    rows = sum(part["rows"] for part in parts)
+    scanned = sum(part["scanned"] for part in parts)
+    seen = [part["max_created_at"] for part in parts if part["max_created_at"] is not None]
+    next_since = int(started.timestamp()) - args.settle_seconds
+    if since is not None:
+        next_since = max(next_since, since)
+
+    manifest = {
+        "table": args.table,
+        "format": args.format,
+        "started_at": started.isoformat(),
+        "elapsed_seconds": round(elapsed, 3),
+        "since": since,
+        "next_since": next_since,
+        "max_created_at": max(seen) if seen else None,
+        "rows": rows,
+        "scanned": scanned,
+        "total_segments": args.segments,
+        "parts": sorted(parts, key=lambda part: part["segment"]),
+    }
+    (output_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    print("\n✅ Export complete")
+    print(f"   rows written: {rows} (scanned {scanned})")
+    print(f"   elapsed: {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+    print(f"   next watermark: {next_since} (pass --since-manifest {output_dir / 'manifest.json'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Load test: one hot tenant must not degrade another.
+
+A quiet shop reads availability for a handful of dates while a hot shop
+churns bookings (create_booking + cancel) on the same dates from many
+threads. Runs offline on the memory engine and memory change feed, with a
+fixed simulated round trip (--latency-ms) on every storage and feed call so
+cache misses cost what they would against DynamoDB.
+
+Three runs are compared:
+  baseline  quiet tenant alone
+  tenants   quiet and hot tenants with their own keys and warm caches
+  shared    both workloads in one keyspace (how a single-tenant deployment
+            would serve two shops): hot writes invalidate the quiet shop's cache
+Exits 1 if the quiet tenant's p95 in the tenants run is more than
+--max-slowdown times its baseline, or if any lead crosses tenants.
+
+Usage:
+  python scripts/load_test_tenants.py
+  python scripts/load_test_tenants.py --requests 2000 --hot-workers 16 --latency-ms 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Offline engine + feed, and warm caches on (the library default TTL of 0 disables them)
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("CHANGE_FEED", "memory")
+os.environ.setdefault("CAPACITY_METRICS", "off")
+os.environ.setdefault("WARM_CACHE_TTL_SECONDS", "300")
+os.environ.setdefault("WARM_CACHE_CHECK_SECONDS", "0.05")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda"))
+
+import change_feed  # noqa: E402
+import storage  # noqa: E402
+import tenancy  # noqa: E402
+import utils  # noqa: E402
+
+QUIET_TENANT = "quiet"
+HOT_TENANT = "hot"
+DATES = [f"2099-07-{day:02d}" for day in range(1, 6)]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check that a hot tenant does not slow down a quiet one")
+    parser.add_argument("--requests", type=int, default=1000, help="Availability reads by the quiet tenant per run")
+    parser.add_argument("--hot-workers", type=int, default=8, help="Threads booking and cancelling for the hot tenant")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Simulated round trip per storage/feed call")
+    parser.add_argument("--think-ms", type=float, default=2.0, help="Pause between quiet-tenant requests")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, help="Allowed quiet p95 (tenants run) / baseline p95")
+    return parser.parse_args()
+
+
+class RemoteStandIn:
+    """Wraps an engine or feed so every call sleeps one round trip first, like a remote table."""
+
+    def __init__(self, target, latency: float):
+        self._target = target
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self._latency)
+            return attr(*args, **kwargs)
+        return call
+
+
+def reset(latency: float) -> None:
+    storage.set_backend(RemoteStandIn(storage.MemoryBackend(), latency))
+    change_feed.set_feed(RemoteStandIn(change_feed.MemoryChangeFeed(), latency))
+    utils.warm_cache = change_feed.WarmCache()
+    utils._tenant_caches.clear()
+
+
+def quiet_workload(tenant: str, requests: int, think: float) -> tuple[list[float], change_feed.WarmCache]:
+    tenancy.set_tenant(tenant)
+    latencies = []
+    for index in range(requests):
+        start = time.perf_counter()
+        utils.get_available_slots(DATES[index % len(DATES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(think)
+    return latencies, utils.tenant_cache()
+
+
+def hot_workload(tenant: str, worker: int, stop: threading.Event, counts: list[int]) -> None:
+    tenancy.set_tenant(tenant)
+    index = 0
+    while not stop.is_set():
+        date = DATES[index % len(DATES)]
+        slot = utils.daily_slots()[(worker + index) % len(utils.daily_slots())]
+        index += 1
+        try:
+            lead_id = utils.create_booking(f"+1904555{worker:04d}", "screen", "iPhone 15", date, slot)
+        except ValueError:
+            continue  # another worker holds this slot right now
+        utils.transition_lead_status(lead_id, "cancelled", from_status="booked")
+        counts[worker] += 2
+
+
+def run(label: str, quiet_tenant: str, hot_tenant: str | None, args: argparse.Namespace) -> dict:
+    reset(args.latency_ms / 1000)
+    stop = threading.Event()
+    counts = [0] * args.hot_workers
+    hot_threads = []
+    if hot_tenant is not None:
+        hot_threads = [
+            threading.Thread(target=hot_workload, args=(hot_tenant, worker, stop, counts), daemon=True)
+            for worker in range(args.hot_workers)
+        ]
+        for thread in hot_threads:
+            thread.start()
+        time.sleep(0.2)  # let the hot tenant reach steady state
+
+    started = time.perf_counter()
+    latencies, cache = quiet_workload(quiet_tenant, args.requests, args.think_ms / 1000)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in hot_threads:
+        thread.join()
+
+    ordered = sorted(latencies)
+    result = {
+        "p50": statistics.median(ordered),
+        "p95": ordered[int(len(ordered) * 0.95) - 1],
+        "p99": ordered[int(len(ordered) * 0.99) - 1],
+        "hit_ratio": cache.hits / max(cache.hits + cache.misses, 1),
+        "hot_writes_per_s": sum(counts) / elapsed,
+    }
+    print(f"   {label:<9} quiet p50 {result['p50']:6.2f} ms | p95 {result['p95']:6.2f} ms | p99 {result['p99']:6.2f} ms | "
+          f"cache hits {result['hit_ratio'] * 100:5.1f}% | hot writes {result['hot_writes_per_s']:7.0f}/s")
+    return result
+
+
+def leaked_leads() -> list[str]:
+    """Lead IDs visible to the quiet tenant that it never wrote (it only reads, so any lead is a leak)."""
+    leaks = []
+    with tenancy.tenant_scope(QUIET_TENANT):
+        for date in DATES:
+            leaks += [lead["lead_id"] for lead in utils.query_leads_for_date(date)]
+        leaks += [lead["lead_id"] for lead in utils.get_open_leads()["leads"]]
+    return leaks
+
+
+def main() -> int:
+    args = parse_args()
+    tenancy.configure_tenants({QUIET_TENANT: {}, HOT_TENANT: {}})
+
+    print(f"🔥 Tenant isolation load test: {args.requests} quiet reads vs {args.hot_workers} hot writers, "
+          f"{args.latency_ms:g} ms per call\n")
+    baseline = run("baseline", QUIET_TENANT, None, args)
+    tenants = run("tenants", QUIET_TENANT, HOT_TENANT, args)
+    leaks = leaked_leads()
+    shared = run("shared", tenancy.DEFAULT_TENANT, tenancy.DEFAULT_TENANT, args)
+
+    slowdown = tenants["p95"] / max(baseline["p95"], 1e-9)
+    print(f"\n   quiet p95 with a hot neighbour: {slowdown:.2f}x baseline (tenants), "
+          f"{shared['p95'] / max(baseline['p95'], 1e-9):.2f}x (shared keyspace)")
+
+    if leaks:
+        print(f"❌ Quiet tenant saw {len(leaks)} hot-tenant leads, e.g. {leaks[:3]}")
+        return 1
+    if slowdown > args.max_slowdown:
+        print(f"❌ Hot tenant slowed the quiet one by {slowdown:.2f}x (limit {args.max_slowdown}x)")
+        return 1
+    print("✅ Hot tenant did not degrade the quiet one")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
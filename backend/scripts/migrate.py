@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Run a declared data migration (see scripts/migrations.py) over a DynamoDB table.
+
+Segments of a parallel Scan feed a transform; changed items are written as
+conditional updates, up to --batch-size per TransactWriteItems call. Each
+update only touches the changed attributes, requires them to still hold the
+values that were read, and adds the migration name to the item's
+'migrations' marker set. A rerun therefore skips migrated items, and a
+concurrent edit by the app is counted as a conflict instead of being
+overwritten. Progress, throughput and an ETA are reported as it runs.
+Requests are paced to --max-capacity units/s. --apply runs checkpoint each
+segment's position for resume.
+
+Usage:
+  python scripts/migrate.py --list
+  python scripts/migrate.py 0001_normalize_lead_phones                  # dry run: print diffs
+  python scripts/migrate.py 0001_normalize_lead_phones --apply --segments 8 --max-capacity 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+from ddb_throttle import AdaptiveThrottle, Checkpoint, call_with_throttle
+from migrations import MIGRATIONS, Migration  # also puts lambda/ on sys.path
+
+from ddb_codec import ItemCodec, encode_value  # noqa: E402
+
+# String set on every migrated item listing the migrations applied to it
+MARKER_ATTRIBUTE = "migrations"
+MAX_TRANSACT_ITEMS = 100
+THROTTLE_CANCELLATION_CODES = {"ThrottlingError", "ProvisionedThroughputExceeded", "TransactionConflict"}
+
+GENERIC_CODEC = ItemCodec()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a declared DynamoDB data migration")
+    parser.add_argument("name", nargs="?", help="Migration name (see --list)")
+    parser.add_argument("--list", action="store_true", help="List declared migrations")
+    parser.add_argument("--apply", action="store_true", help="Write changes (default is a dry run)")
+    parser.add_argument(
+        "--region",
+        default=os.getenv("AWS_REGION") or os.getenv("DYNAMODB_REGION", "us-east-1"),
+        help="AWS region",
+    )
+    parser.add_argument("--segments", type=int, default=4, help="Parallel Scan TotalSegments (one worker each)")
+    parser.add_argument("--page-size", type=int, default=500, help="Scan Limit per request")
+    parser.add_argument("--batch-size", type=int, default=25, help=f"Updates per transaction (max {MAX_TRANSACT_ITEMS})")
+    parser.add_argument(
+        "--max-capacity",
+        type=float,
+        default=float(os.getenv("MIGRATION_MAX_CAPACITY", "100")),
+        help="Capacity units per second to stay under (read + write)",
+    )
+    parser.add_argument("--show-diffs", type=int, default=20, help="Diffs to print (dry run prints up to this many)")
+    parser.add_argument("--report-seconds", type=float, default=10.0, help="Progress report interval")
+    parser.add_argument("--checkpoint", help="Resume file for --apply runs (default .migrate-<name>.checkpoint.json)")
+    parser.add_argument("--reset-checkpoint", action="store_true", help="Ignore and overwrite an existing checkpoint")
+    return parser.parse_args()
+
+
+class Progress:
+    """Thread-safe counters plus a periodic throughput / ETA line."""
+
+    FIELDS = ("scanned", "changed", "migrated", "conflicts", "unchanged")
+
+    def __init__(self, estimated_items: int, throttle: AdaptiveThrottle, initial: dict | None = None):
+        self.estimated_items = estimated_items
+        self.throttle = throttle
+        self.counts = {name: (initial or {}).get(name, 0) for name in self.FIELDS}
+        self.diffs_shown = 0
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._resumed_scanned = self.counts["scanned"]
+
+    def add(self, **deltas: int) -> None:
+        with self._lock:
+            for name, value in deltas.items():
+                self.counts[name] += value
+
+    def claim_diff(self, limit: int) -> bool:
+        with self._lock:
+            if self.diffs_shown >= limit:
+                return False
+            self.diffs_shown += 1
+            return True
+
+    def line(self) -> str:
+        with self._lock:
+            counts = dict(self.counts)
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        rate = (counts["scanned"] - self._resumed_scanned) / elapsed
+        remaining = max(self.estimated_items - counts["scanned"], 0)
+        eta = f"{remaining / rate:.0f}s" if rate > 0 and self.estimated_items else "?"
+        return (
+            f"   📈 scanned {counts['scanned']}/{self.estimated_items or '?'} | changed {counts['changed']} | "
+            f"migrated {counts['migrated']} | conflicts {counts['conflicts']} | {rate:.0f} items/s | "
+            f"{self.throttle.consumed / elapsed:.1f} CU/s (limit {self.throttle.rate:.0f}) | ETA {eta}"
+        )
+
+
+def diff_item(before: dict, after: dict, key_names: list[str]) -> tuple[dict, list[str]]:
+    """Attributes to SET and to REMOVE to turn before into after. Keys and the marker are never touched."""
+    for name in key_names:
+        if after.get(name) != before.get(name):
+            raise ValueError(f"Migration changed key attribute {name!r}; in-place migrations cannot move items")
+    ignored = set(key_names) | {MARKER_ATTRIBUTE}
+    set_fields = {name: value for name, value in after.items() if name not in ignored and before.get(name, object()) != value}
+    removed = [name for name in before if name not in ignored and name not in after]
+    return set_fields, removed
+
+
+def format_diff(key: dict, before: dict, set_fields: dict, removed: list[str]) -> str:
+    key_text = ", ".join(f"{name}={value}" for name, value in key.items())
+    changes = [f"{name}: {before.get(name)!r} -> {value!r}" for name, value in set_fields.items()]
+    changes += [f"{name}: {before[name]!r} -> (removed)" for name in removed]
+    return f"{key_text} | " + "; ".join(changes)
+
+
+def build_update(table: str, migration_name: str, key: dict, before: dict, set_fields: dict, removed: list[str]) -> dict:
+    """Conditional Update: unmigrated, and every touched attribute still as read."""
+    names = {"#m": MARKER_ATTRIBUTE}
+    values = {":name": migration_name, ":marker": {migration_name}}
+    assignments, removals = [], []
+    conditions = ["NOT contains(#m, :name)"]
+    for index, (name, value) in enumerate(set_fields.items()):
+        names[f"#s{index}"] = name
+        values[f":s{index}"] = value
+        assignments.append(f"#s{index} = :s{index}")
+        if name in before:
+            values[f":o{index}"] = before[name]
+            conditions.append(f"#s{index} = :o{index}")
+        else:
+            conditions.append(f"attribute_not_exists(#s{index})")
+    for index, name in enumerate(removed):
+        names[f"#r{index}"] = name
+        values[f":r{index}"] = before[name]
+        removals.append(f"#r{index}")
+        conditions.append(f"#r{index} = :r{index}")
+
+    expression = ""
+    if assignments:
+        expression += "SET " + ", ".join(assignments) + " "
+    if removals:
+        expression += "REMOVE " + ", ".join(removals) + " "
+    expression += "ADD #m :marker"
+    return {
+        "TableName": table,
+        "Key": {name: encode_value(value) for name, value in key.items()},
+        "UpdateExpression": expression,
+        "ConditionExpression": " AND ".join(conditions),
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": {name: encode_value(value) for name, value in values.items()},
+    }
+
+
+def write_one(client, throttle: AdaptiveThrottle, update: dict) -> bool:
+    """Returns False when the condition failed: changed since it was read, or migrated by an overlapping run."""
+    try:
+        call_with_throttle(throttle, client.update_item, **update)
+        return True
+    except ClientError as error:
+        if error.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        return False
+
+
+def write_batch(client, throttle: AdaptiveThrottle, updates: list[dict]) -> tuple[int, int]:
+    """
+    One TransactWriteItems for the batch; falls back to single updates when
+    any condition fails. Returns (migrated, conflicts).
+    """
+    if len(updates) > 1:
+        for attempt in range(3):
+            try:
+                call_with_throttle(throttle, client.transact_write_items, TransactItems=[{"Update": update} for update in updates])
+                return len(updates), 0
+            except ClientError as error:
+                if error.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+                    raise
+                reasons = {reason.get("Code") for reason in error.response.get("CancellationReasons", [])}
+                if reasons & THROTTLE_CANCELLATION_CODES and "ConditionalCheckFailed" not in reasons:
+                    throttle.throttled(attempt)
+                    continue
+                break
+    migrated = sum(1 for update in updates if write_one(client, throttle, update))
+    return migrated, len(updates) - migrated
+
+
+def migrate_segment(
+    segment: int,
+    args: argparse.Namespace,
+    migration: Migration,
+    key_names: list[str],
+    client,
+    throttle: AdaptiveThrottle,
+    checkpoint: Checkpoint,
+    progress: Progress,
+) -> None:
+    state = checkpoint.segment(segment)
+    if state["done"]:
+        return
+
+    scan_kwargs = {
+        "TableName": migration.table,
+        "Segment": segment,
+        "TotalSegments": args.segments,
+        "Limit": args.page_size,
+        "FilterExpression": "NOT contains(#m, :name)",
+        "ExpressionAttributeNames": {"#m": MARKER_ATTRIBUTE},
+        "ExpressionAttributeValues": {":name": {"S": migration.name}},
+    }
+    if state["last_key"]:
+        scan_kwargs["ExclusiveStartKey"] = state["last_key"]
+
+    while True:
+        response = call_with_throttle(throttle, client.scan, **scan_kwargs)
+        scanned = response.get("ScannedCount", 0)
+        updates = []
+        unchanged = 0
+        for item in GENERIC_CODEC.decode_many(response.get("Items", [])):
+            after = migration.transform(dict(item))
+            if after is None:
+                unchanged += 1
+                continue
+            set_fields, removed = diff_item(item, after, key_names)
+            if not set_fields and not removed:
+                unchanged += 1
+                continue
+            key = {name: item[name] for name in key_names}
+            if progress.claim_diff(args.show_diffs):
+                print(f"   {'[APPLY]' if args.apply else '[DRY]  '} {format_diff(key, item, set_fields, removed)}")
+            updates.append(build_update(migration.table, migration.name, key, item, set_fields, removed))
+
+        counts = {"scanned": scanned, "changed": len(updates), "unchanged": unchanged, "migrated": 0, "conflicts": 0}
+        if args.apply:
+            for start in range(0, len(updates), args.batch_size):
+                migrated, conflicts = write_batch(client, throttle, updates[start:start + args.batch_size])
+                counts["migrated"] += migrated
+                counts["conflicts"] += conflicts
+        progress.add(**counts)
+
+        last_key = response.get("LastEvaluatedKey")
+        # Checkpointed totals are what a resumed run starts its progress from
+        checkpoint.advance(segment, last_key, counts)
+        if not last_key:
+            return
+        scan_kwargs["ExclusiveStartKey"] = last_key
+
+
+def main() -> int:
+    load_dotenv()
+    args = parse_args()
+
+    if args.list or not args.name:
+        print("📋 Declared migrations:")
+        for migration in MIGRATIONS.values():
+            print(f"   {migration.name}  [{migration.table}]  {migration.description}")
+        return 0 if args.list else 1
+
+    migration = MIGRATIONS.get(args.name)
+    if migration is None:
+        print(f"❌ Unknown migration: {args.name} (see --list)")
+        return 1
+    if not 1 <= args.batch_size <= MAX_TRANSACT_ITEMS:
+        print(f"❌ --batch-size must be between 1 and {MAX_TRANSACT_ITEMS}")
+        return 1
+
+    client = boto3.client(
+        "dynamodb",
+        region_name=args.region,
+        config=Config(retries={"mode": "standard", "max_attempts": 2}, max_pool_connections=args.segments * 2),
+    )
+    try:
+        table_desc = client.describe_table(TableName=migration.table)["Table"]
+    except (ClientError, BotoCoreError) as error:
+        print(f"❌ DynamoDB error: {error}")
+        return 1
+    key_names = [entry["AttributeName"] for entry in table_desc["KeySchema"]]
+
+    checkpoint_path = args.checkpoint or f".migrate-{migration.name}.checkpoint.json"
+    run_key = {"migration": migration.name, "table": migration.table, "segments": args.segments}
+    try:
+        checkpoint = Checkpoint(checkpoint_path if args.apply else None, run_key, args.reset_checkpoint)
+    except ValueError as error:
+        print(f"❌ {error}")
+        return 1
+
+    throttle = AdaptiveThrottle(args.max_capacity)
+    progress = Progress(table_desc.get("ItemCount", 0), throttle, checkpoint.data["totals"])
+
+    print(f"🚚 Migration {migration.name}")
+    print(f"   {migration.description}")
+    print(f"   Table: {migration.table} (~{progress.estimated_items} items)")
+    print(f"   Mode: {'APPLY' if args.apply else 'DRY RUN'}")
+    print(f"   Segments: {args.segments} | batch size: {args.batch_size} | max capacity: {args.max_capacity}/s")
+
+    finished = threading.Event()
+
+    def report() -> None:
+        while not finished.wait(args.report_seconds):
+            print(progress.line())
+
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.segments) as workers:
+            futures = [
+                workers.submit(migrate_segment, segment, args, migration, key_names, client, throttle, checkpoint, progress)
+                for segment in range(args.segments)
+            ]
+            for future in futures:
+                future.result()
+    except (ClientError, BotoCoreError, RuntimeError, ValueError) as error:
+        finished.set()
+        print(f"❌ Migration failed: {error}")
+        if args.apply:
+            print(f"   Progress saved to {checkpoint_path}; rerun to resume")
+        return 1
+    finished.set()
+    elapsed = time.perf_counter() - start
+
+    if args.apply and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    counts = progress.counts
+    print(f"\n✅ Migration {'applied' if args.apply else 'dry run'} complete")
+    print(f"   scanned (unmigrated): {counts['scanned']}")
+    print(f"   changed: {counts['changed']} | unchanged: {counts['unchanged']}")
+    if args.apply:
+        print(f"   migrated: {counts['migrated']} | conflicts (rerun to retry): {counts['conflicts']}")
+    print(f"   elapsed: {elapsed:.2f}s | capacity used: {throttle.consumed:.1f} | throttles: {throttle.throttles}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Declared data migrations for LINDA's DynamoDB tables, run by scripts/migrate.py.
+
+A migration is a pure transform: it receives one decoded item and returns
+the item as it should be, or None when nothing changes. The runner diffs the
+two, writes only the changed attributes with conditional updates, and marks
+the item with the migration name so reruns skip it. Key attributes cannot
+change (that needs a copy-and-delete migration, not an in-place update).
+
+Add new migrations at the bottom with the next number; never edit one that
+has already run in production.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda"))
+
+from lead_format import unpack_lead  # noqa: E402
+from storage import OPEN_QUEUE, taken_slot_index  # noqa: E402
+from utils import normalize_phone, open_lead_sort_key  # noqa: E402
+
+REPAIRS_LEAD_LOG_TABLE = os.getenv("REPAIRS_LEAD_LOG_TABLE", "Repairs_Lead_Log")
+SCHEDULE_TABLE = os.getenv("SCHEDULE_TABLE", "Repairs_Schedule")
+# Booked leads with appointments older than this are treated as finished, not queued
+OPEN_LEAD_BACKFILL_DAYS = int(os.getenv("OPEN_LEAD_BACKFILL_DAYS", "14"))
+
+
+@dataclass(frozen=True)
+class Migration:
+    name: str
+    table: str
+    description: str
+    transform: Callable[[dict], dict | None]
+
+
+MIGRATIONS: dict[str, Migration] = {}
+
+
+def migration(name: str, table: str, description: str):
+    """Register a transform under a unique, ordered name."""
+    def register(transform: Callable[[dict], dict | None]) -> Callable[[dict], dict | None]:
+        if name in MIGRATIONS:
+            raise ValueError(f"Duplicate migration: {name}")
+        MIGRATIONS[name] = Migration(name, table, description, transform)
+        return transform
+    return register
+
+
+@migration(
+    "0001_normalize_lead_phones",
+    table=REPAIRS_LEAD_LOG_TABLE,
+    description="Rewrite lead phone numbers to E.164 so the phone index groups each customer",
+)
+def normalize_lead_phones(item: dict) -> dict | None:
+    phone = item.get("phone")
+    if not isinstance(phone, str):
+        return None
+    normalized = normalize_phone(phone)
+    if normalized == phone:
+        return None
+    return {**item, "phone": normalized}
+
+
+@migration(
+    "0002_backfill_lead_created_at",
+    table=REPAIRS_LEAD_LOG_TABLE,
+    description="Copy timestamp into created_at on legacy leads so they appear in customer history",
+)
+def backfill_lead_created_at(item: dict) -> dict | None:
+    if "created_at" in item or not isinstance(item.get("timestamp"), int):
+        return None
+    return {**item, "created_at": item["timestamp"]}
+
+
+@migration(
+    "0003_normalize_schedule_phones",
+    table=SCHEDULE_TABLE,
+    description="Rewrite booked slot phone numbers to E.164",
+)
+def normalize_schedule_phones(item: dict) -> dict | None:
+    return normalize_lead_phones(item)
+
+
+@migration(
+    "0004_index_open_leads",
+    table=REPAIRS_LEAD_LOG_TABLE,
+    description="Add recent booked appointment leads to the sparse open-leads index (open_queue/open_at)",
+)
+def index_open_leads(item: dict) -> dict | None:
+    # Items are raw: compact leads keep status and the appointment under short names
+    lead = unpack_lead(item)
+    if "open_queue" in item or lead.get("status") != "booked" or not lead.get("appointment_date"):
+        return None
+    if lead.get("lead_type", "appointment") == "callback" or lead["lead_id"].startswith(("CALLBACK-", "CHATLOG-")):
+        return None
+    cutoff = (date.today() - timedelta(days=OPEN_LEAD_BACKFILL_DAYS)).isoformat()
+    if lead["appointment_date"] < cutoff:
+        return None
+    return {**item, "open_queue": OPEN_QUEUE, "open_at": open_lead_sort_key(lead["appointment_date"], lead.get("appointment_time"))}
+
+
+@migration(
+    "0005_index_taken_slots",
+    table=SCHEDULE_TABLE,
+    description="Add booked and held slots to the sparse taken-slots index (taken_queue/slot_at) for next-available searches",
+)
+def index_taken_slots(item: dict) -> dict | None:
+    if "taken_queue" in item or item.get("status") not in ("booked", "held"):
+        return None
+    return {**item, **taken_slot_index(item["schedule_date"], item["slot_time"])}
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test degraded-mode availability.
+While storage works, every availability read refreshes a per-date snapshot
+(in the container and in a JSON file). During an outage the last-known slots
+are served flagged stale instead of every default slot, a new container
+picks the snapshot up from the file, and the dispatcher marks the slots
+tentative. Runs offline on the memory engine.
+
+Usage:
+  python test_availability_snapshot.py
+"""
+
+import os
+import sys
+import tempfile
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+import storage
+import utils
+from availability_snapshots import AvailabilitySnapshots
+
+TEST_DATE = '2099-08-01'
+
+
+class FlakyBackend:
+    """Memory engine that raises on every call while down is set, like an unreachable table."""
+
+    def __init__(self):
+        self.engine = storage.MemoryBackend()
+        self.down = False
+
+    def __getattr__(self, name):
+        attr = getattr(self.engine, name)
+
+        def call(*args, **kwargs):
+            if self.down:
+                raise ConnectionError('storage unreachable')
+            return attr(*args, **kwargs)
+        return call
+
+
+def test_availability_snapshot() -> bool:
+    print("🧪 Testing degraded-mode availability...\n")
+    snapshot_path = os.path.join(tempfile.mkdtemp(prefix='linda_snapshot_'), 'availability.json')
+    backend = FlakyBackend()
+    storage.set_backend(backend)
+    utils.availability_snapshots = AvailabilitySnapshots(path=snapshot_path)
+
+    try:
+        # TEST 1: live reads are flagged live and refresh the snapshot
+        utils.create_booking('+19045550100', 'screen', 'iPhone 15', TEST_DATE, '9:00 AM')
+        live = utils.get_availability(TEST_DATE)
+        if live['source'] != 'live' or live['stale'] or '9:00 AM' in live['slots'] or not os.path.exists(snapshot_path):
+            print(f"❌ Live read wrong: {live}")
+            return False
+        print("   ✅ live availability recorded")
+
+        # TEST 2: during an outage the last-known slots are served, flagged stale
+        backend.down = True
+        degraded = utils.get_availability(TEST_DATE)
+        if degraded['source'] != 'snapshot' or not degraded['stale'] or degraded['slots'] != live['slots'] \
+                or degraded['as_of'] != live['as_of'] or not utils.availability_snapshots.outage_recent():
+            print(f"❌ Outage read wrong: {degraded}")
+            return False
+        unknown = utils.get_availability('2099-08-02')
+        if unknown['source'] != 'default' or unknown['as_of'] is not None or unknown['slots'] != utils.DEFAULT_DAILY_SLOTS:
+            print(f"❌ Date without a snapshot returned {unknown}")
+            return False
+        print("   ✅ stale snapshot served during an outage (defaults only without one)")
+
+        # TEST 3: a fresh container reads the snapshot from the file
+        utils.availability_snapshots = AvailabilitySnapshots(path=snapshot_path)
+        if utils.get_available_slots(TEST_DATE) != live['slots']:
+            print("❌ New container did not load the snapshot file")
+            return False
+        print("   ✅ snapshot survives in the file")
+
+        # TEST 4: the dispatcher tells the model the slots are tentative
+        import dispatcher
+        result = dispatcher.execute_function('check_availability', {'date': TEST_DATE}, caller_phone='+19045550199')
+        if not result.get('tentative') or result['available_slots'] != live['slots'] or 'Tentative' not in result['message']:
+            print(f"❌ Dispatcher result not marked tentative: {result}")
+            return False
+        backend.down = False
+        if 'tentative' in dispatcher.execute_function('check_availability', {'date': TEST_DATE}):
+            print("❌ Live result still marked tentative")
+            return False
+        print("   ✅ dispatcher marks degraded availability tentative")
+    finally:
+        storage.set_backend(None)
+        utils.availability_snapshots = AvailabilitySnapshots()
+
+    print("\n🎉 Outages serve last-known availability, clearly flagged!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_availability_snapshot()
+    sys.exit(0 if success else 1)
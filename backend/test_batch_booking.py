@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test batch booking through the scheduler API.
+One POST with a "bookings" list books several devices in one transaction:
+atomic batches book all or none, best-effort batches book every open slot
+(one extra transaction per round of taken slots). Each item gets a result,
+and failed dates get one set of alternative slots. Single and batch POSTs
+name their own capacity route. Runs offline on the memory engine.
+
+Usage:
+  python test_batch_booking.py
+"""
+
+import os
+import sys
+import json
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+import scheduler
+import storage
+import utils
+
+TEST_DATE = '2099-11-01'
+
+
+class CountingBackend(storage.MemoryBackend):
+    """Memory engine that counts multi-slot transactions."""
+
+    transactions = 0
+
+    def book_slots(self, bookings: list[dict], now_ts: int) -> None:
+        self.transactions += 1
+        super().book_slots(bookings, now_ts)
+
+
+def post_batch(bookings: list[dict], mode: str | None = None) -> tuple[int, dict]:
+    body = {'bookings': bookings, **({'mode': mode} if mode else {})}
+    response = scheduler.handler({'httpMethod': 'POST', 'headers': {}, 'body': json.dumps(body)}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def family(*times: str) -> list[dict]:
+    devices = ['iPhone 15', 'Pixel 8', 'iPad Air', 'Galaxy S24']
+    return [{'phone': '+19045550100', 'repair_type': 'screen', 'device': devices[index % len(devices)],
+             'date': TEST_DATE, 'time': time}
+            for index, time in enumerate(times)]
+
+
+def test_batch_booking() -> bool:
+    print("🧪 Testing batch booking...\n")
+    engine = CountingBackend()
+    storage.set_backend(engine)
+
+    try:
+        # TEST 1: three devices, one transaction, all booked
+        status, body = post_batch(family('9:00 AM', '10:00 AM', '11:00 AM'))
+        lead_ids = [result.get('lead_id') for result in body['results']]
+        if status != 201 or body['status'] != 'success' or body['booked_count'] != 3 or not all(lead_ids) or \
+                engine.transactions != 1 or len(engine.outbox) != 3 or \
+                {'9:00 AM', '10:00 AM', '11:00 AM'} & set(utils.get_available_slots(TEST_DATE)):
+            print(f"❌ Atomic batch wrong: {status} {body}")
+            return False
+        print("   ✅ whole family booked in one transaction")
+
+        # TEST 2: atomic batch with a taken slot books nothing and offers alternatives once
+        engine.transactions = 0
+        status, body = post_batch(family('1:00 PM', '9:00 AM'))
+        if status != 409 or [result['status'] for result in body['results']] != ['not_booked', 'unavailable'] or \
+                '1:00 PM' not in utils.get_available_slots(TEST_DATE) or engine.transactions != 1 or \
+                body['alternatives'] != {TEST_DATE: utils.get_available_slots(TEST_DATE)}:
+            print(f"❌ Atomic conflict wrong: {status} {body}")
+            return False
+        print("   ✅ atomic batch is all-or-nothing")
+
+        # TEST 3: best effort books what it can, in two transactions
+        engine.transactions = 0
+        status, body = post_batch(family('1:00 PM', '9:00 AM', '2:00 PM'), mode='best_effort')
+        if status != 201 or body['status'] != 'partial' or \
+                [result['status'] for result in body['results']] != ['booked', 'unavailable', 'booked'] or \
+                engine.transactions != 2 or '1:00 PM' in body['alternatives'][TEST_DATE]:
+            print(f"❌ Best-effort batch wrong: {status} {body}")
+            return False
+        print("   ✅ best-effort batch books the open slots")
+
+        # TEST 4: duplicates and invalid items
+        status, body = post_batch(family('3:00 PM', '3:00 PM'), mode='best_effort')
+        if status != 201 or [result['status'] for result in body['results']] != ['booked', 'unavailable']:
+            print(f"❌ Duplicate slot in a batch: {status} {body}")
+            return False
+        invalid = family('4:00 PM', '4:00 PM')
+        invalid[1] = {**invalid[1], 'date': 'next tuesday'}
+        status, body = post_batch(invalid)
+        if status != 400 or [result['status'] for result in body['results']] != ['not_booked', 'invalid'] or \
+                '4:00 PM' not in utils.get_available_slots(TEST_DATE):
+            print(f"❌ Invalid atomic batch: {status} {body}")
+            return False
+        status, body = post_batch(family(*['12:00 PM'] * (utils.MAX_BATCH_BOOKINGS + 1)))
+        if status != 400:
+            print("❌ Oversized batch accepted")
+            return False
+        print("   ✅ duplicates, invalid items and oversized batches handled")
+
+        # TEST 5: single and batch bookings are metered under their own routes
+        routes = []
+        set_route = scheduler.set_route
+        scheduler.set_route = lambda route: (routes.append(route), set_route(route))
+        try:
+            single = scheduler.handler({'httpMethod': 'POST', 'headers': {}, 'body': json.dumps(family('4:00 PM')[0])}, None)
+            post_batch(family('2:00 PM'))
+        finally:
+            scheduler.set_route = set_route
+        if single['statusCode'] != 201 or routes != ['scheduler POST booking', 'scheduler POST batch']:
+            print(f"❌ POST routes named {routes} ({single['statusCode']})")
+            return False
+        print("   ✅ single and batch POSTs name their capacity route")
+    finally:
+        storage.set_backend(None)
+
+    print("\n🎉 One request books the whole family!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_batch_booking()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test the shared dependency layer build (scripts/build_layer.py) offline.
+Stripping keeps what imports need (METADATA, botocore.docs, the DynamoDB
+model) and drops the rest, archives are byte-identical whatever the file
+mtimes and walk order, and the report flags a package that grew or imports
+slower than the rest of the machine explains. No pip install is run.
+
+Usage:
+  python test_build_layer.py
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add scripts directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scripts'))
+
+import build_layer
+
+TREE = [
+    'botocore/__init__.py',
+    'botocore/docs/__init__.py',
+    'botocore/data/endpoints.json',
+    'botocore/data/dynamodb/2012-08-10/service-2.json.gz',
+    'botocore/data/ec2/2016-11-15/service-2.json.gz',
+    'botocore/tests/test_client.py',
+    'botocore-1.34.0.dist-info/METADATA',
+    'botocore-1.34.0.dist-info/RECORD',
+    'botocore-1.34.0.dist-info/LICENSE.txt',
+    'twilio/__init__.py',
+    'twilio/twiml/__init__.py',
+    'twilio/rest/__init__.py',
+    'pydantic_core/__init__.pyi',
+    'pydantic_core/py.typed',
+    'pydantic_core/README.md',
+    'bin/normalizer',
+    'six.py',
+]
+
+
+def make_tree(root: Path) -> None:
+    for relative in TREE:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"# {relative}\n")
+
+
+def package(name: str, zip_bytes: int, import_ms: float | None) -> dict:
+    return {'files': 1, 'bytes': zip_bytes * 3, 'zip_bytes': zip_bytes, 'import_ms': import_ms}
+
+
+def test_build_layer() -> bool:
+    print("🧪 Testing the dependency layer build...\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # TEST 1: stripping
+        root = Path(tmp) / 'layer'
+        make_tree(root)
+        build_layer.strip_tree(root)
+        kept = sorted(path.relative_to(root).as_posix() for path in root.rglob('*') if path.is_file())
+        expected = sorted([
+            'botocore/__init__.py',
+            'botocore/docs/__init__.py',
+            'botocore/data/endpoints.json',
+            'botocore/data/dynamodb/2012-08-10/service-2.json.gz',
+            'botocore-1.34.0.dist-info/METADATA',
+            'botocore-1.34.0.dist-info/LICENSE.txt',
+            'twilio/__init__.py',
+            'twilio/twiml/__init__.py',
+            'six.py',
+        ])
+        if kept != expected:
+            print(f"❌ Stripped tree: {kept}")
+            return False
+        print("   ✅ strips tests, stubs, metadata and unused modules; keeps what imports need")
+
+        # TEST 2: deterministic archives
+        entries = [(root / name, f'python/{name}') for name in kept]
+        first = build_layer.deterministic_zip(Path(tmp) / 'a.zip', entries)
+        for path in root.rglob('*'):
+            os.utime(path, (1_000_000_000, 1_000_000_000))
+        second = build_layer.deterministic_zip(Path(tmp) / 'b.zip', list(reversed(entries)))
+        if first != second:
+            print("❌ Archive bytes depend on mtimes or entry order")
+            return False
+        print("   ✅ same files give the same sha256")
+
+    # TEST 3: report grouping and regressions
+    if [build_layer.package_of(name) for name in (
+            'botocore/client.py', 'six.py', '__pycache__/six.cpython-311.pyc', 'six-1.16.dist-info/METADATA')] != \
+            ['botocore', 'six', 'six', '(dist-info)']:
+        print("❌ Report grouping")
+        return False
+    baseline = {'packages': {
+        'boto3': package('boto3', 200_000, 100.0),
+        'openai': package('openai', 500_000, 300.0),
+        'httpx': package('httpx', 200_000, 80.0),
+        'six': package('six', 8_000, 5.0),
+    }}
+    # Machine twice as slow: every import doubles, httpx also grows 300 KB and boto3 gains 150 ms
+    report = {'packages': {
+        'boto3': package('boto3', 200_000, 350.0),
+        'openai': package('openai', 500_000, 600.0),
+        'httpx': package('httpx', 500_000, 160.0),
+        'six': package('six', 8_000, 10.0),
+        'jiter': package('jiter', 100_000, 20.0),
+    }}
+    flagged = build_layer.regressions(report, baseline)
+    if flagged != {'boto3': ['+150 ms import'], 'httpx': ['+293 KB zipped'], 'jiter': ['new']}:
+        print(f"❌ Regressions: {flagged}")
+        return False
+    if build_layer.regressions(baseline, baseline):
+        print("❌ Unchanged report flagged")
+        return False
+    print("   ✅ size growth, import slowdowns beyond machine speed and new packages are flagged")
+
+    print("\n🎉 The layer builds slim and reproducible, and says when it gets worse!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_build_layer()
+    sys.exit(0 if success else 1)
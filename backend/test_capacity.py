@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test DynamoDB consumed-capacity accounting.
+Drives the scheduler handler against moto and checks that RCU/WCU land on
+the right route and helper, and that one EMF metrics line is emitted per pair.
+
+Usage:
+  python test_capacity.py
+"""
+
+import os
+import io
+import sys
+import json
+import contextlib
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['CHANGE_FEED'] = 'off'
+
+from moto import mock_aws
+import boto3
+
+TEST_DATE = '2099-04-01'
+
+
+def create_schedule_table() -> None:
+    boto3.client('dynamodb', region_name='us-east-1').create_table(
+        TableName='Repairs_Schedule',
+        KeySchema=[
+            {'AttributeName': 'schedule_date', 'KeyType': 'HASH'},
+            {'AttributeName': 'slot_time', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'schedule_date', 'AttributeType': 'S'},
+            {'AttributeName': 'slot_time', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST',
+    )
+
+
+def availability_event(date: str) -> dict:
+    return {'requestContext': {'http': {'method': 'GET'}}, 'queryStringParameters': {'date': date}}
+
+
+def test_capacity() -> bool:
+    print("🧪 Testing consumed-capacity accounting...\n")
+    with mock_aws():
+        create_schedule_table()
+
+        import capacity
+        import storage
+        import scheduler
+        storage.set_backend(None)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            response = scheduler.handler(availability_event(TEST_DATE), None)
+        rows = {(row['route'], row['helper']): row for row in capacity.meter.snapshot()}
+
+        # TEST 1: status and attribution
+        if response['statusCode'] != 200:
+            print(f"❌ Scheduler returned {response}")
+            return False
+        seeding = rows.get(('scheduler GET availability', 'ensure_schedule_seeded'))
+        reading = rows.get(('scheduler GET availability', 'get_schedule_for_date'))
+        if not seeding or seeding['calls'] != 8 or seeding['wcu'] <= 0 or seeding['rcu'] != 0:
+            print(f"❌ Seeding capacity not attributed: {rows}")
+            return False
+        if not reading or reading['calls'] != 1 or reading['rcu'] <= 0 or reading['wcu'] != 0:
+            print(f"❌ Schedule query capacity not attributed: {rows}")
+            return False
+        print(f"   ✅ attribution (seed {seeding['wcu']:.1f} WCU / 8 puts, query {reading['rcu']:.1f} RCU)")
+
+        # TEST 2: one EMF line per route/helper
+        lines = [json.loads(line) for line in output.getvalue().splitlines() if line.startswith('{"_aws"')]
+        if len(lines) != len(rows) or any(line['_aws']['CloudWatchMetrics'][0]['Namespace'] != 'LINDA' for line in lines):
+            print(f"❌ Expected {len(rows)} EMF lines, got {lines}")
+            return False
+        print(f"   ✅ {len(lines)} EMF metric lines")
+
+        # TEST 3: meter resets per invocation
+        with contextlib.redirect_stdout(io.StringIO()):
+            scheduler.handler(availability_event(TEST_DATE), None)
+        totals = capacity.meter.totals()
+        if totals['calls'] != 9:
+            print(f"❌ Second invocation carried over usage: {totals}")
+            return False
+        print("   ✅ per-invocation reset")
+        storage.set_backend(None)
+
+    print("\n🎉 Consumed capacity is accounted per route and helper!")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_capacity() else 1)
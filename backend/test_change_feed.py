@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test the change feed and the warm caches it invalidates.
+Two WarmCache instances stand in for two Lambda containers sharing one feed:
+a write through one must be seen by the other on its next version check,
+well before the cache TTL. Runs fully offline on the memory storage engine.
+
+Usage:
+  python test_change_feed.py
+  python test_change_feed.py --feeds memory,sqlite
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+import storage
+import utils
+import change_feed
+
+TEST_DATE = '2099-03-01'
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Change feed / warm cache test")
+    parser.add_argument('--feeds', default='memory,sqlite', help="Comma-separated feeds to test")
+    return parser.parse_args()
+
+
+def run_feed(feed: change_feed.ChangeFeed) -> bool:
+    # TEST 1: publish bumps a per-key version; unknown keys are omitted
+    first = feed.publish(storage.SCHEDULE_TABLE, [TEST_DATE, TEST_DATE])
+    second = feed.publish(storage.SCHEDULE_TABLE, [TEST_DATE])
+    name = change_feed.feed_key(storage.SCHEDULE_TABLE, TEST_DATE)
+    versions = feed.current_versions([name, change_feed.feed_key(storage.SCHEDULE_TABLE, '2099-12-31')])
+    if first != {name: 1} or second != {name: 2} or versions != {name: 2}:
+        print(f"❌ Versions wrong: {first} {second} {versions}")
+        return False
+    print("   ✅ publish / current_versions")
+
+    # TEST 2: a write in one container invalidates the other within the check interval
+    storage.set_backend(storage.MemoryBackend())
+    change_feed.set_feed(feed)
+    # Default TTL: the cache is on unless WARM_CACHE_TTL_SECONDS=0 opts out
+    container_a = change_feed.WarmCache(check_seconds=0.05)
+    container_b = change_feed.WarmCache(check_seconds=0.05)
+    try:
+        utils.warm_cache = container_a
+        before = utils.get_available_slots(TEST_DATE)
+        utils.get_available_slots(TEST_DATE)
+        if container_a.hits != 1 or container_a.misses != 1:
+            print(f"❌ Warm cache not used: {container_a.hits} hits, {container_a.misses} misses")
+            return False
+
+        utils.warm_cache = container_b
+        utils.create_booking('+19045550100', 'screen', 'iPhone 15', TEST_DATE, before[0])
+
+        utils.warm_cache = container_a
+        time.sleep(0.06)
+        after = utils.get_available_slots(TEST_DATE)
+        if before[0] in after:
+            print(f"❌ Container A served a stale schedule: {after}")
+            return False
+        print("   ✅ cross-container invalidation before TTL")
+
+        # TEST 3: state edits propagate the same way
+        utils.get_brandon_state()
+        utils.warm_cache = container_b
+        utils.update_brandon_state({'status': 'gym', 'notes': 'back at 4'})
+        utils.warm_cache = container_a
+        time.sleep(0.06)
+        if utils.get_brandon_state().get('status') != 'gym':
+            print("❌ Container A served a stale Brandon state")
+            return False
+        print("   ✅ state invalidation")
+    finally:
+        utils.warm_cache = change_feed.WarmCache()
+        change_feed.set_feed(None)
+        storage.set_backend(None)
+    return True
+
+
+def run_stream_handler() -> bool:
+    # TEST 4: stream records collapse to one bump per partition (plus the schedule's aggregate)
+    feed = change_feed.MemoryChangeFeed()
+    change_feed.set_feed(feed)
+    arn = f"arn:aws:dynamodb:us-east-1:000000000000:table/{storage.SCHEDULE_TABLE}/stream/2099-01-01T00:00:00.000"
+    record = {'eventSourceARN': arn, 'dynamodb': {'Keys': {'schedule_date': {'S': TEST_DATE}, 'slot_time': {'S': '9:00 AM'}}}}
+    try:
+        result = change_feed.stream_handler({'Records': [record, record, {'eventSourceARN': 'arn:other'}]}, None)
+    finally:
+        change_feed.set_feed(None)
+    if result != {'published': 2} or feed.versions != {change_feed.feed_key(storage.SCHEDULE_TABLE, TEST_DATE): 1,
+                                                        change_feed.feed_key(storage.SCHEDULE_TABLE, change_feed.ANY_KEY): 1}:
+        print(f"❌ Stream handler published {result} / {feed.versions}")
+        return False
+    print("   ✅ stream handler")
+    return True
+
+
+def test_change_feed(feeds: str = 'memory,sqlite') -> bool:
+    print("🧪 Testing change feed...\n")
+    tmp_dir = tempfile.mkdtemp(prefix='linda_feed_')
+
+    for kind in [name.strip() for name in feeds.split(',') if name.strip()]:
+        print("=" * 60)
+        print(f"FEED: {kind}")
+        print("=" * 60)
+        if kind == 'sqlite':
+            feed = change_feed.SQLiteChangeFeed(os.path.join(tmp_dir, 'feed.db'))
+        else:
+            feed = change_feed.create_feed(kind)
+        if not run_feed(feed):
+            print(f"\n❌ {kind} feed failed")
+            return False
+        print()
+
+    if not run_stream_handler():
+        return False
+
+    print("\n🎉 Change feed keeps warm caches fresh!")
+    return True
+
+
+if __name__ == "__main__":
+    cli = parse_args()
+    success = test_change_feed(cli.feeds)
+    sys.exit(0 if success else 1)
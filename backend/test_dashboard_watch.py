@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test the dashboard long-poll (state_manager GET ?watch=1).
+A watch with the current cursor blocks until Brandon's state, the tenant's
+bookings or its leads change (including leads only the frontend writes, seen
+through the leads table's stream), then answers within a poll tick with what changed;
+with no change it times out empty. Each tick is one change-feed version
+read. Runs offline on the memory engine and memory change feed.
+
+Usage:
+  python test_dashboard_watch.py
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+ADMIN_KEY = 'test-admin-key'
+os.environ['ADMIN_API_KEY'] = ADMIN_KEY
+
+import change_feed
+import state_manager
+import storage
+import tenancy
+import utils
+
+TEST_DATE = '2099-08-01'
+
+
+class CountingFeed(change_feed.MemoryChangeFeed):
+    """Memory feed that counts version reads."""
+
+    reads = 0
+
+    def current_versions(self, feed_keys: list[str]) -> dict[str, int]:
+        self.reads += 1
+        return super().current_versions(feed_keys)
+
+
+def watch(cursor: str | None = None, timeout: float | None = None, headers: dict | None = None) -> tuple[int, dict]:
+    params = {'watch': '1'}
+    if cursor is not None:
+        params['cursor'] = cursor
+    if timeout is not None:
+        params['timeout'] = str(timeout)
+    headers = {'X-Linda-Admin-Key': ADMIN_KEY, **(headers or {})}
+    response = state_manager.handler({'httpMethod': 'GET', 'headers': headers, 'queryStringParameters': params}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def after(delay: float, write) -> threading.Thread:
+    def run():
+        time.sleep(delay)
+        write()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_dashboard_watch() -> bool:
+    print("🧪 Testing the dashboard long-poll...\n")
+    feed = CountingFeed()
+    storage.set_backend(storage.MemoryBackend())
+    change_feed.set_feed(feed)
+    tenancy.configure_tenants({'riverside': {}})
+
+    try:
+        # TEST 1: no cursor answers at once; an unchanged cursor waits out the timeout
+        status, body = watch()
+        cursor = body.get('cursor')
+        if status != 200 or cursor != '0.0.0' or body['changed'] != ['state', 'bookings', 'leads']:
+            print(f"❌ First watch returned {status} {body}")
+            return False
+        feed.reads = 0
+        start = time.monotonic()
+        status, body = watch(cursor, timeout=1)
+        waited = time.monotonic() - start
+        if body['changed'] != [] or body['cursor'] != cursor or not 1 <= waited < 1.5 or feed.reads > 4:
+            print(f"❌ Idle watch: {body} after {waited:.2f}s with {feed.reads} reads")
+            return False
+        print(f"   ✅ idle watch times out empty ({feed.reads} version reads)")
+
+        # TEST 2: a state change wakes the watcher within a tick and brings the state
+        writer = after(0.2, lambda: utils.update_brandon_state_fields({'status': 'lunch'}))
+        start = time.monotonic()
+        status, body = watch(cursor, timeout=10)
+        latency = time.monotonic() - start - 0.2
+        writer.join()
+        if body['changed'] != ['state'] or body['state'].get('status') != 'lunch' or latency >= 1:
+            print(f"❌ State change watch: {body} ({latency:.2f}s)")
+            return False
+        cursor = body['cursor']
+        print(f"   ✅ state change delivered in {latency * 1000:.0f} ms")
+
+        # TEST 3: a booking wakes it too; another shop's booking does not
+        def book_riverside():
+            with tenancy.tenant_scope('riverside'):
+                utils.create_booking('+19045550100', 'screen', 'iPhone 15', TEST_DATE, '9:00 AM')
+        writer = after(0.1, book_riverside)
+        status, body = watch(cursor, timeout=0.6)
+        writer.join()
+        if body['changed'] != []:
+            print(f"❌ Another tenant's booking woke the watcher: {body}")
+            return False
+        writer = after(0.2, lambda: utils.create_booking('+19045550101', 'battery', 'Pixel 8', TEST_DATE, '9:00 AM'))
+        status, body = watch(cursor, timeout=10)
+        writer.join()
+        if body['changed'] != ['bookings', 'leads'] or 'state' in body:
+            print(f"❌ Booking watch: {body}")
+            return False
+        print("   ✅ bookings wake only their own shop's watchers")
+
+        # TEST 4: stream-fed feeds bump the aggregate too; bad cursors are rejected
+        _, riverside = watch(headers={'X-Linda-Tenant': 'riverside'})
+        change_feed.stream_handler({'Records': [{
+            'eventSourceARN': f'arn:aws:dynamodb:us-east-1:1:table/{storage.SCHEDULE_TABLE}/stream/1',
+            'dynamodb': {'Keys': {'schedule_date': {'S': f'riverside#{TEST_DATE}'}}},
+        }]}, None)
+        status, body = watch(riverside['cursor'], timeout=1, headers={'X-Linda-Tenant': 'riverside'})
+        if body.get('changed') != ['bookings']:
+            print(f"❌ Stream change not seen by the watcher: {body}")
+            return False
+        if watch('3.x.1')[0] != 400 or watch('1.2')[0] != 400 or watch('1.2.3.4')[0] != 400:
+            print("❌ Malformed cursor accepted")
+            return False
+        print("   ✅ stream_handler feeds watchers; malformed cursors rejected")
+
+        # TEST 5: leads wake the watcher, whether a Lambda or only the frontend wrote them
+        _, body = watch()
+        cursor = body['cursor']
+        lead_id = utils.create_lead('+19045550102', 'callback', 'Unknown Device', TEST_DATE, '5:00 PM')
+        status, body = watch(cursor, timeout=10)
+        if body['changed'] != ['leads']:
+            print(f"❌ New lead watch: {body}")
+            return False
+        cursor = body['cursor']
+        utils.transition_lead_status(lead_id, 'checked_in')
+        status, body = watch(cursor, timeout=10)
+        if body['changed'] != ['leads']:
+            print(f"❌ Lead status watch: {body}")
+            return False
+        cursor = body['cursor']
+        change_feed.stream_handler({'Records': [{
+            'eventSourceARN': f'arn:aws:dynamodb:us-east-1:1:table/{storage.REPAIRS_LEAD_LOG_TABLE}/stream/1',
+            'dynamodb': {'Keys': {'lead_id': {'S': 'LEAD-FROM-NEXTJS'}, 'timestamp': {'N': '1'}}},
+        }]}, None)
+        status, body = watch(cursor, timeout=1)
+        if body['changed'] != ['leads']:
+            print(f"❌ Frontend-written lead not seen by the watcher: {body}")
+            return False
+        print("   ✅ new and updated leads wake the watcher, from any writer")
+    finally:
+        storage.set_backend(None)
+        change_feed.set_feed(None)
+        tenancy.configure_tenants({})
+
+    print("\n🎉 The dashboard hears about changes instead of polling for them!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_dashboard_watch()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the compact lead format.
+Checks pack/unpack round-trips, that legacy items read unchanged, and that
+the DynamoDB backend (moto) stores compact items while date scans, phone
+history and get_lead() return the same long-named leads for both formats.
+
+Usage:
+  python test_lead_format.py
+"""
+
+import os
+import sys
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['CHANGE_FEED'] = 'off'
+
+from moto import mock_aws
+import boto3
+
+from ddb_codec import LEAD_CODEC
+from lead_format import Lead, pack_lead, unpack_lead
+
+TEST_DATE = '2099-05-01'
+LEGACY_LEAD = {
+    'lead_id': 'LEAD-1771000000-abc123', 'timestamp': 1771000000, 'phone': '+19045550100',
+    'repair_type': 'screen', 'device': 'iPhone 15', 'appointment_date': TEST_DATE,
+    'appointment_time': '10:00 AM', 'status': 'booked', 'lead_type': 'appointment',
+    'created_at': 1771000000, 'notes': 'cracked corner',
+}
+
+
+def create_leads_table() -> None:
+    boto3.client('dynamodb', region_name='us-east-1').create_table(
+        TableName='Repairs_Lead_Log',
+        KeySchema=[
+            {'AttributeName': 'lead_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'lead_id', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'N'},
+            {'AttributeName': 'phone', 'AttributeType': 'S'},
+            {'AttributeName': 'created_at', 'AttributeType': 'N'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'phone-created_at-index',
+            'KeySchema': [
+                {'AttributeName': 'phone', 'KeyType': 'HASH'},
+                {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        }],
+        BillingMode='PAY_PER_REQUEST',
+    )
+
+
+def test_lead_format() -> bool:
+    print("🧪 Testing compact lead format...\n")
+
+    # TEST 1: round-trip, short names on the wire, legacy items untouched
+    packed = pack_lead(LEGACY_LEAD)
+    if unpack_lead(packed) != LEGACY_LEAD or 'appointment_date' in packed or packed.get('ap') != f'{TEST_DATE} 10:00 AM':
+        print(f"❌ Pack/unpack wrong: {packed}")
+        return False
+    if unpack_lead(dict(LEGACY_LEAD)) != LEGACY_LEAD or LEAD_CODEC.decode(LEAD_CODEC.encode(packed)) != LEGACY_LEAD:
+        print("❌ Legacy or wire round-trip wrong")
+        return False
+    print("   ✅ pack/unpack round-trip")
+
+    # TEST 2: typed accessors read either format
+    for item in (LEGACY_LEAD, packed):
+        lead = Lead.from_item(item)
+        if lead.appointment_time != '10:00 AM' or lead.repair_type != 'screen' or lead.extra != {'notes': 'cracked corner'}:
+            print(f"❌ Lead accessors wrong for {item}: {lead}")
+            return False
+    if Lead.from_item(packed).to_item() != LEGACY_LEAD:
+        print("❌ Lead.to_item() did not restore the long-named item")
+        return False
+    print("   ✅ typed accessors")
+
+    # TEST 3: DynamoDB stores compact items and reads both formats alike
+    with mock_aws():
+        create_leads_table()
+
+        import storage
+        import utils
+        storage.set_backend(None)
+        storage.get_backend().client.put_item(TableName='Repairs_Lead_Log', Item=LEAD_CODEC.encode(LEGACY_LEAD))
+        new_id = utils.create_lead('+19045550100', 'battery', 'Pixel 8', TEST_DATE, '2:00 PM')
+
+        raw = boto3.client('dynamodb', region_name='us-east-1').query(
+            TableName='Repairs_Lead_Log',
+            KeyConditionExpression='lead_id = :lead_id',
+            ExpressionAttributeValues={':lead_id': {'S': new_id}},
+        )['Items'][0]
+        if raw.get('fv') != {'N': '2'} or 'appointment_date' not in utils.get_lead(new_id) or 'repair_type' in raw:
+            print(f"❌ create_lead did not store a compact item: {raw}")
+            return False
+
+        by_date = sorted(lead['lead_id'] for lead in utils.query_leads_for_date(TEST_DATE))
+        history = utils.get_customer_history('+19045550100')['leads']
+        if by_date != sorted([LEGACY_LEAD['lead_id'], new_id]) or len(history) != 2 \
+                or any('ap' in lead or 'fv' in lead for lead in history):
+            print(f"❌ Mixed-format reads wrong: {by_date} / {history}")
+            return False
+        if utils.query_leads_for_date('2099-05-1') or utils.query_leads_for_date('2099-05-01 2'):
+            print("❌ Date filter matched a partial date")
+            return False
+        storage.set_backend(None)
+    print("   ✅ compact writes, mixed-format date scan and phone history")
+
+    print("\n🎉 Compact leads read like the originals!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_lead_format()
+    sys.exit(0 if success else 1)
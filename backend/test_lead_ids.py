@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for LINDA lead ID generation.
+Generates millions of IDs across processes and threads, then checks
+global uniqueness, per-process monotonicity, time-range decoding and throughput.
+
+Usage:
+  python test_lead_ids.py
+  python test_lead_ids.py --processes 8 --per-process 500000 --threads 4
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from multiprocessing import get_context
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+from lead_ids import LEAD_ID_PREFIX, new_lead_id, lead_id_created_at, lead_id_bounds
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stress test lead ID generation")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 4, help="Worker processes (simulated containers)")
+    parser.add_argument('--per-process', type=int, default=500_000, help="IDs generated per process")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per process (concurrent invocations)")
+    return parser.parse_args()
+
+
+def generate_in_process(args: tuple) -> tuple[list[str], float, bool]:
+    """Worker: generate IDs on several threads; return IDs, elapsed seconds, monotonic flag."""
+    count, threads = args
+    per_thread = count // threads
+    results: list[list[str]] = [[] for _ in range(threads)]
+
+    def work(slot: int) -> None:
+        out = results[slot]
+        for _ in range(per_thread):
+            out.append(new_lead_id())
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=work, args=(slot,)) for slot in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    # Each thread's sequence must be strictly increasing (shared generator state)
+    monotonic = all(
+        all(ids[i] < ids[i + 1] for i in range(len(ids) - 1))
+        for ids in results
+    )
+    return [lead_id for ids in results for lead_id in ids], elapsed, monotonic
+
+
+def test_lead_ids(processes: int = 2, per_process: int = 100_000, threads: int = 2) -> bool:
+    print("🧪 Testing lead ID generation...\n")
+    print(f"Processes: {processes} | IDs per process: {per_process:,} | threads per process: {threads}\n")
+
+    # ===============================================================
+    # TEST 1: Format + timestamp decoding
+    # ===============================================================
+    print("=" * 60)
+    print("TEST 1: Format and embedded creation time")
+    print("=" * 60)
+
+    before = datetime.now(timezone.utc) - timedelta(milliseconds=1)
+    sample = new_lead_id()
+    after = datetime.now(timezone.utc) + timedelta(milliseconds=1)
+    created_at = lead_id_created_at(sample)
+
+    print(f"   sample: {sample}")
+    print(f"   created_at: {created_at}")
+    if not sample.startswith(LEAD_ID_PREFIX) or len(sample) != len(LEAD_ID_PREFIX) + 26:
+        print("❌ Unexpected ID format")
+        return False
+    if created_at is None or not (before <= created_at <= after):
+        print("❌ Embedded timestamp does not match generation time")
+        return False
+    if lead_id_created_at('LEAD-20260211-140000-123') is not None:
+        print("❌ Legacy IDs should not decode to a timestamp")
+        return False
+    print("✅ Format verification: PASS")
+
+    # ===============================================================
+    # TEST 2: Time-range bounds
+    # ===============================================================
+    print("\n" + "=" * 60)
+    print("TEST 2: Range bounds by creation time")
+    print("=" * 60)
+
+    low, high = lead_id_bounds(before, after)
+    print(f"   bounds: {low} .. {high}")
+    if not (low <= sample <= high):
+        print("❌ Sample ID falls outside its creation-time bounds")
+        return False
+    later_low, _ = lead_id_bounds(after + timedelta(seconds=1), after + timedelta(seconds=2))
+    if sample >= later_low:
+        print("❌ Later range should sort after sample")
+        return False
+    print("✅ Range verification: PASS")
+
+    # ===============================================================
+    # TEST 3: Multi-process, multi-thread uniqueness + throughput
+    # ===============================================================
+    print("\n" + "=" * 60)
+    print("TEST 3: Concurrent generation across processes")
+    print("=" * 60)
+
+    ctx = get_context('fork') if hasattr(os, 'fork') else get_context('spawn')
+    start = time.perf_counter()
+    with ctx.Pool(processes) as pool:
+        results = pool.map(generate_in_process, [(per_process, threads)] * processes)
+    wall = time.perf_counter() - start
+
+    seen = set()
+    total = 0
+    for ids, elapsed, monotonic in results:
+        total += len(ids)
+        seen.update(ids)
+        if not monotonic:
+            print("❌ Per-thread sequence was not strictly increasing")
+            return False
+
+    per_process_rates = [len(ids) / elapsed for ids, elapsed, _ in results]
+    print(f"   generated: {total:,}")
+    print(f"   unique:    {len(seen):,}")
+    print(f"   wall time: {wall:.2f}s ({total / wall:,.0f} IDs/s aggregate incl. transfer)")
+    print(f"   per-process rate: min {min(per_process_rates):,.0f} / max {max(per_process_rates):,.0f} IDs/s")
+
+    if len(seen) != total:
+        print(f"❌ Uniqueness verification: FAIL ({total - len(seen)} collisions)")
+        return False
+    print("✅ Uniqueness verification: PASS")
+
+    print("\n🎉 Lead ID generation is unique, monotonic and time-sortable!")
+    return True
+
+
+if __name__ == "__main__":
+    cli = parse_args()
+    success = test_lead_ids(cli.processes, cli.per_process, cli.threads)
+    sys.exit(0 if success else 1)
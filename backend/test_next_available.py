@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test the earliest-available-slot search.
+next_available() finds the first openings across days from the taken-slots
+index: a month of fully booked days costs one index read and no per-day
+schedule reads, expired holds count as open, and each tenant only sees its
+own bookings. Without a start, the search begins at the shop's current time,
+so slots already under way are never offered. Also covers the scheduler's
+GET ?view=next. Runs offline on the memory engine.
+
+Usage:
+  python test_next_available.py
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+import scheduler
+import storage
+import tenancy
+import utils
+
+START = date(2099, 6, 1)
+BOOKED_DAYS = 30
+
+
+class CountingBackend(storage.MemoryBackend):
+    """Memory engine that counts index pages and per-day schedule reads."""
+
+    index_reads = 0
+    schedule_reads = 0
+
+    def query_taken_slots(self, start_at: str, limit: int, start_key: dict | None = None,
+                          queue: str = storage.TAKEN_QUEUE) -> tuple[list[dict], dict | None]:
+        self.index_reads += 1
+        return super().query_taken_slots(start_at, limit, start_key, queue=queue)
+
+    def query_schedule(self, date: str) -> list[dict]:
+        self.schedule_reads += 1
+        return super().query_schedule(date)
+
+
+def day(offset: int) -> str:
+    return (START + timedelta(days=offset)).isoformat()
+
+
+def test_next_available() -> bool:
+    print("🧪 Testing next-available search...\n")
+    engine = CountingBackend()
+    storage.set_backend(engine)
+    tenancy.configure_tenants({'riverside': {'slots': ['10:00 AM', '11:00 AM']}})
+    now_ts = int(time.time())
+
+    try:
+        for offset in range(BOOKED_DAYS):
+            engine.seed_slots(day(offset), utils.DEFAULT_DAILY_SLOTS, now_ts)
+            for slot_time in utils.DEFAULT_DAILY_SLOTS:
+                engine.reserve_slot(day(offset), slot_time, {'lead_id': f'LEAD-{offset}-{slot_time}'}, now_ts)
+
+        # TEST 1: a month of fully booked days costs one index read
+        openings = utils.next_available(3, START.isoformat())
+        expected = [{'date': day(BOOKED_DAYS), 'time': slot_time} for slot_time in utils.DEFAULT_DAILY_SLOTS[:3]]
+        if openings != expected or engine.index_reads != 1 or engine.schedule_reads != 0:
+            print(f"❌ Got {openings} with {engine.index_reads} index / {engine.schedule_reads} schedule reads")
+            return False
+        page_size = utils.NEXT_AVAILABLE_PAGE_SIZE
+        utils.NEXT_AVAILABLE_PAGE_SIZE = 100
+        try:
+            paged = utils.next_available(3, START.isoformat())
+        finally:
+            utils.NEXT_AVAILABLE_PAGE_SIZE = page_size
+        if paged != expected:
+            print(f"❌ Paged search returned {paged}")
+            return False
+        print("   ✅ skips fully booked days without reading them")
+
+        # TEST 2: holds, releases and start times
+        open_day = day(BOOKED_DAYS)
+        utils.hold_slot(open_day, '9:00 AM', '+19045550100')
+        utils.create_booking('+19045550101', 'screen', 'iPhone 15', open_day, '10:00 AM')
+        engine.hold_slot(open_day, '11:00 AM', '+19045550102', now_ts - 1, now_ts - 120)
+        engine.release_slot(day(0), '4:00 PM', 'LEAD-0-4:00 PM', now_ts)
+        if utils.next_available(2, START.isoformat()) != [{'date': day(0), 'time': '4:00 PM'},
+                                                          {'date': open_day, 'time': '11:00 AM'}]:
+            print("❌ Released slot or expired hold not offered")
+            return False
+        if utils.next_available(1, open_day, holder='+19045550100') != [{'date': open_day, 'time': '9:00 AM'}] or \
+                utils.next_available(1, open_day, '2:00 PM') != [{'date': open_day, 'time': '2:00 PM'}]:
+            print("❌ Holder's own hold or start time ignored")
+            return False
+        print("   ✅ holds, releases and start times respected")
+
+        # TEST 3: tenants only see their own bookings and slots
+        with tenancy.tenant_scope('riverside'):
+            riverside = utils.next_available(2, START.isoformat())
+        if riverside != [{'date': day(0), 'time': '10:00 AM'}, {'date': day(0), 'time': '11:00 AM'}]:
+            print(f"❌ Riverside search saw another shop: {riverside}")
+            return False
+        print("   ✅ searches are tenant-scoped")
+
+        # TEST 4: scheduler GET ?view=next
+        response = scheduler.handler({'httpMethod': 'GET', 'headers': {}, 'queryStringParameters': {
+            'view': 'next', 'date': START.isoformat(), 'count': '1'}}, None)
+        body = json.loads(response['body'])
+        if response['statusCode'] != 200 or body['openings'] != [{'date': day(0), 'time': '4:00 PM'}]:
+            print(f"❌ GET ?view=next returned {response['statusCode']} {body}")
+            return False
+        for params in ({'count': '0'}, {'date': 'tomorrow'}, {'time': '25:00'}):
+            response = scheduler.handler({'httpMethod': 'GET', 'headers': {},
+                                          'queryStringParameters': {'view': 'next', **params}}, None)
+            if response['statusCode'] != 400:
+                print(f"❌ Invalid {params} accepted")
+                return False
+        print("   ✅ scheduler route")
+
+        # TEST 5: no start means now at the shop; slots already under way are skipped
+        clock_day = day(BOOKED_DAYS + 5)
+        zone = ZoneInfo(utils.BUSINESS_TIME_ZONE)
+        after_first = datetime.fromisoformat(f'{clock_day}T09:00:30').replace(tzinfo=zone)
+        on_first = after_first.replace(second=0)
+        late = after_first.replace(hour=16, minute=5)
+        if utils.next_available(2, now=after_first) != [{'date': clock_day, 'time': '10:00 AM'},
+                                                        {'date': clock_day, 'time': '11:00 AM'}]:
+            print(f"❌ Offered a slot that already started: {utils.next_available(2, now=after_first)}")
+            return False
+        if utils.next_available(1, now=on_first) != [{'date': clock_day, 'time': '9:00 AM'}] or \
+                utils.next_available(1, START.isoformat(), now=after_first)[0]['time'] != '10:00 AM' or \
+                utils.next_available(1, now=late) != [{'date': day(BOOKED_DAYS + 6), 'time': '9:00 AM'}]:
+            print("❌ Start not clamped to the shop clock")
+            return False
+        print("   ✅ past slots are never offered")
+    finally:
+        storage.set_backend(None)
+        tenancy.configure_tenants({})
+
+    print("\n🎉 'When's your next opening?' takes one read!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_next_available()
+    sys.exit(0 if success else 1)
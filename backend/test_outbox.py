@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test the transactional outbox.
+create_booking commits the lead with its side-effect records and returns
+without running them; the drainer delivers them later, retries failures with
+backoff, gives up after OUTBOX_MAX_ATTEMPTS (keeping the record), never
+delivers a leased record twice, applies a redelivered profile update only
+once, survives a failed completion without dropping the rest of the batch,
+and runs from both the stream and the scheduled sweep. Runs offline on the
+memory engine.
+
+Usage:
+  python test_outbox.py
+"""
+
+import os
+import sys
+import time
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+import outbox
+import storage
+import utils
+
+TEST_DATE = '2099-09-01'
+NOW = 4_000_000_000
+
+
+class FailingLeadWrites(storage.MemoryBackend):
+    """Memory engine whose lead + outbox transaction always fails."""
+
+    def put_lead_with_outbox(self, item: dict, records: list[dict]) -> None:
+        raise ConnectionError('transaction cancelled')
+
+
+def pending(engine: storage.MemoryBackend) -> list[dict]:
+    return sorted(engine.outbox.values(), key=lambda record: record['created_at'])
+
+
+def test_outbox() -> bool:
+    print("🧪 Testing the transactional outbox...\n")
+    engine = storage.MemoryBackend()
+    storage.set_backend(engine)
+    calls = {'flaky': 0, 'broken': 0}
+
+    @outbox.effect('flaky')
+    def flaky(payload, outbox_id):
+        calls['flaky'] += 1
+        if calls['flaky'] < payload['succeed_on']:
+            raise ConnectionError('notification service down')
+
+    @outbox.effect('broken')
+    def broken(payload, outbox_id):
+        calls['broken'] += 1
+        raise ValueError('bad payload')
+
+    try:
+        # TEST 1: the booking commits its side effects and returns before they run
+        lead_id = utils.create_booking('+19045550100', 'screen', 'iPhone 15', TEST_DATE, '9:00 AM', quoted_price=120)
+        records = pending(engine)
+        if [(record['effect'], record['lead_id']) for record in records] != [('customer_profile', lead_id)] or \
+                utils.get_customer_profile('+19045550100') is not None:
+            print(f"❌ Booking did not defer its side effect: {records}")
+            return False
+        if outbox.drain_outbox() != {'delivered': 1, 'retried': 0, 'failed': 0, 'skipped': 0} or engine.outbox:
+            print("❌ Drain did not deliver the booking's record")
+            return False
+        profile = utils.get_customer_profile('+19045550100') or {}
+        if profile.get('visit_count') != 1 or profile.get('lifetime_value') != 120:
+            print(f"❌ Delivered profile update wrong: {profile}")
+            return False
+        print("   ✅ booking returns on commit, drainer applies the profile update")
+
+        # TEST 2: a failed lead write leaves no record and frees the slot
+        storage.set_backend(FailingLeadWrites())
+        try:
+            utils.create_booking('+19045550101', 'battery', 'Pixel 8', TEST_DATE, '10:00 AM')
+            print("❌ Booking succeeded without its lead")
+            return False
+        except ConnectionError:
+            pass
+        failed_engine = storage.get_engine()
+        if failed_engine.outbox or '10:00 AM' not in utils.get_available_slots(TEST_DATE):
+            print("❌ Failed booking left an outbox record or a reserved slot")
+            return False
+        storage.set_backend(engine)
+        print("   ✅ no side effects without a committed lead")
+
+        # TEST 3: failures back off and retry until delivered
+        record = outbox.outbox_record('flaky', {'succeed_on': 3}, now_ts=NOW)
+        storage.get_backend().put_lead_with_outbox({'lead_id': 'LEAD-FLAKY', 'timestamp': NOW}, [record])
+        first = outbox.drain_outbox(now_ts=NOW)
+        early = outbox.drain_outbox(now_ts=NOW + outbox.retry_delay(1) - 1)
+        second = outbox.drain_outbox(now_ts=NOW + outbox.retry_delay(1))
+        third = outbox.drain_outbox(now_ts=NOW + outbox.retry_delay(1) + outbox.retry_delay(2))
+        if (first['retried'], sum(early.values()), second['retried'], third['delivered']) != (1, 0, 1, 1) or \
+                calls['flaky'] != 3 or engine.outbox:
+            print(f"❌ Retry schedule wrong: {first} {early} {second} {third}")
+            return False
+        print("   ✅ failed side effects retried with exponential backoff")
+
+        # TEST 4: permanent failures are kept off the queue with their error
+        max_attempts = outbox.OUTBOX_MAX_ATTEMPTS
+        outbox.OUTBOX_MAX_ATTEMPTS = 2
+        try:
+            record = outbox.outbox_record('broken', {}, now_ts=NOW)
+            storage.get_backend().put_lead_with_outbox({'lead_id': 'LEAD-BROKEN', 'timestamp': NOW}, [record])
+            outbox.drain_outbox(now_ts=NOW)
+            final = outbox.drain_outbox(now_ts=NOW + outbox.retry_delay(1))
+        finally:
+            outbox.OUTBOX_MAX_ATTEMPTS = max_attempts
+        dead = engine.outbox.get(record['outbox_id'], {})
+        if final['failed'] != 1 or 'outbox_queue' in dead or dead.get('attempts') != 2 or \
+                'bad payload' not in dead.get('last_error', '') or engine.due_outbox(NOW + 10 ** 6, 10):
+            print(f"❌ Dead record wrong: {final} {dead}")
+            return False
+        engine.complete_outbox(record['outbox_id'])
+        print("   ✅ records that keep failing are kept for inspection")
+
+        # TEST 5: a record leased by another drainer is skipped until the lease lapses
+        calls['flaky'] = 0
+        record = outbox.outbox_record('flaky', {'succeed_on': 1}, now_ts=NOW)
+        storage.get_backend().put_lead_with_outbox({'lead_id': 'LEAD-LEASED', 'timestamp': NOW}, [record])
+        engine.claim_outbox(record['outbox_id'], NOW, NOW + outbox.OUTBOX_LEASE_SECONDS)
+        held = outbox.drain_outbox([record['outbox_id']], now_ts=NOW + 1)
+        lapsed = outbox.drain_outbox(now_ts=NOW + outbox.OUTBOX_LEASE_SECONDS)
+        if held['skipped'] != 1 or lapsed['delivered'] != 1 or calls['flaky'] != 1:
+            print(f"❌ Lease not honored: {held} {lapsed}")
+            return False
+        print("   ✅ leased records delivered once")
+
+        # TEST 6: the Lambda drains stream inserts and scheduled sweeps
+        first_id = utils.create_booking('+19045550102', 'battery', 'Pixel 8', TEST_DATE, '11:00 AM')
+        stream_event = {'Records': [
+            {'eventName': 'INSERT', 'dynamodb': {'Keys': {'outbox_id': {'S': record_id}}}}
+            for record_id in list(engine.outbox)
+        ] + [{'eventName': 'REMOVE', 'dynamodb': {'Keys': {'outbox_id': {'S': 'gone'}}}}]}
+        streamed = outbox.drain_handler(stream_event, None)
+        utils.create_booking('+19045550103', 'battery', 'Pixel 8', TEST_DATE, '12:00 PM')
+        swept = outbox.drain_handler({'source': 'aws.events'}, None)
+        if streamed['delivered'] != 1 or swept['delivered'] != 1 or engine.outbox or \
+                (utils.get_customer_profile('+19045550102') or {}).get('visit_count') != 1 or not first_id:
+            print(f"❌ Handler drained {streamed} / {swept}")
+            return False
+        print("   ✅ drain_handler serves the stream and the schedule")
+
+        # TEST 7: a completion failure keeps the batch going, and the redelivery is a no-op
+        phones = ['+19045550104', '+19045550105']
+        for index, phone in enumerate(phones):
+            utils.create_booking(phone, 'screen', 'iPhone 15', TEST_DATE, f'{index + 1}:00 PM', quoted_price=100)
+        stuck_id = pending(engine)[0]['outbox_id']
+        complete = engine.complete_outbox
+
+        def flaky_complete(outbox_id: str) -> None:
+            if outbox_id == stuck_id:
+                raise ConnectionError('throttled')
+            complete(outbox_id)
+
+        engine.complete_outbox = flaky_complete
+        try:
+            batch = outbox.drain_outbox()
+        finally:
+            del engine.complete_outbox
+        redelivered = outbox.drain_outbox(now_ts=int(time.time()) + outbox.OUTBOX_LEASE_SECONDS + 1)
+        profiles = [utils.get_customer_profile(phone) or {} for phone in phones]
+        if batch['delivered'] != 2 or redelivered['delivered'] != 1 or engine.outbox or \
+                [(profile.get('visit_count'), profile.get('lifetime_value')) for profile in profiles] != [(1, 100)] * 2:
+            print(f"❌ Redelivery wrong: {batch} {redelivered} {profiles}")
+            return False
+        print("   ✅ failed completions are retried safely without double-counting")
+    finally:
+        storage.set_backend(None)
+        outbox._effects.pop('flaky', None)
+        outbox._effects.pop('broken', None)
+
+    print("\n🎉 Booking side effects are committed with the lead and delivered reliably!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_outbox()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the consolidated API router (deploy_all.py --layout single).
+/scheduler and /state reach their handlers without importing the dispatcher,
+route modules load once and share the warm storage engine, unknown paths get
+404, and each invocation logs one EMF line with ColdStart set only on the
+first. Runs offline on the memory engine.
+
+Usage:
+  python test_router.py
+"""
+
+import io
+import os
+import sys
+import json
+import contextlib
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+ADMIN_KEY = 'test-admin-key'
+os.environ['ADMIN_API_KEY'] = ADMIN_KEY
+
+import router
+import storage
+import utils
+
+
+def call(path: str, method: str = 'GET', params: dict | None = None, body: dict | None = None) -> tuple[int, dict, list[dict]]:
+    """Invoke the router like a Function URL; returns status, body and the router's EMF lines."""
+    event = {
+        'rawPath': path,
+        'requestContext': {'http': {'method': method}},
+        'headers': {'x-linda-admin-key': ADMIN_KEY},
+        'queryStringParameters': params,
+        'body': json.dumps(body) if body is not None else '',
+    }
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        response = router.handler(event, None)
+    lines = [json.loads(line) for line in out.getvalue().splitlines() if line.startswith('{')]
+    metrics = [line for line in lines if line.get('Function') == 'api']
+    return response['statusCode'], json.loads(response['body']), metrics
+
+
+def test_router() -> bool:
+    print("🧪 Testing the consolidated API router...\n")
+    storage.set_backend(storage.MemoryBackend())
+    router.ROUTER_METRICS_ENABLED = True
+
+    try:
+        # TEST 1: scheduler and state routes load lazily, without the dispatcher
+        status, body, metrics = call('/scheduler', params={'date': '2099-01-01'})
+        if status != 200 or 'scheduler' not in sys.modules:
+            print(f"❌ /scheduler returned {status} {body}")
+            return False
+        if len(metrics) != 1 or metrics[0]['Route'] != 'scheduler' or metrics[0]['ColdStart'] != 1:
+            print(f"❌ First invocation metrics: {metrics}")
+            return False
+        status, body, metrics = call('/state/', 'POST', body={'status': 'lunch'})
+        if status != 200 or body['state']['status'] != 'lunch' or metrics[0]['ColdStart'] != 0:
+            print(f"❌ /state returned {status} {body} {metrics}")
+            return False
+        if 'dispatcher' in sys.modules:
+            print("❌ The dispatcher (and its OpenAI client) loaded for admin routes")
+            return False
+        print("   ✅ routes load on first use; the dispatcher stays unloaded")
+
+        # TEST 2: warm routes share one engine and reuse their loaded handlers
+        loaded = dict(router._handlers)
+        status, body, _ = call('/state')
+        if body['state'].get('status') != 'lunch' or utils.get_brandon_state().get('status') != 'lunch':
+            print(f"❌ Routes did not share the storage engine: {body}")
+            return False
+        if router._handlers != loaded:
+            print("❌ Route handlers reloaded on a warm call")
+            return False
+        print("   ✅ warm routes share the engine and loaded handlers")
+
+        # TEST 3: unknown paths
+        for path in ('/', '/admin', '/schedulers'):
+            status, body, _ = call(path)
+            if status != 404 or '/scheduler' not in body['message']:
+                print(f"❌ {path} returned {status} {body}")
+                return False
+        print("   ✅ unknown paths get 404")
+    finally:
+        storage.set_backend(None)
+
+    print("\n🎉 One function serves every API route!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_router()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test conditional GETs on the scheduler availability endpoint.
+Responses carry an ETag versioned from the date's schedule rows, a short
+Cache-Control and CORS max-age; If-None-Match with the current tag gets an
+empty 304, and any booking (or degraded storage) changes the tag.
+Runs offline on the memory engine.
+
+Usage:
+  python test_scheduler_cache.py
+"""
+
+import os
+import sys
+import json
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+import scheduler
+import storage
+import utils
+from availability_snapshots import AvailabilitySnapshots
+
+TEST_DATE = '2099-10-01'
+
+
+class FlakySchedule(storage.MemoryBackend):
+    """Memory engine whose schedule reads fail while down is set."""
+
+    down = False
+
+    def query_schedule(self, date: str) -> list[dict]:
+        if self.down:
+            raise ConnectionError('storage unreachable')
+        return super().query_schedule(date)
+
+
+def get(date: str, headers: dict | None = None) -> dict:
+    return scheduler.handler({
+        'httpMethod': 'GET',
+        'headers': headers or {},
+        'queryStringParameters': {'date': date},
+    }, None)
+
+
+def test_scheduler_cache() -> bool:
+    print("🧪 Testing conditional GETs on availability...\n")
+    engine = FlakySchedule()
+    storage.set_backend(engine)
+    utils.availability_snapshots = AvailabilitySnapshots(path=None)
+
+    try:
+        # TEST 1: 200 with ETag and cache headers, 304 with no body on a matching If-None-Match
+        first = get(TEST_DATE)
+        etag = first['headers'].get('ETag', '')
+        if first['statusCode'] != 200 or not etag.startswith('"') or \
+                first['headers'].get('Cache-Control') != f'public, max-age={scheduler.AVAILABILITY_MAX_AGE_SECONDS}' or \
+                first['headers'].get('Access-Control-Max-Age') != str(utils.CORS_MAX_AGE_SECONDS):
+            print(f"❌ First response headers wrong: {first['headers']}")
+            return False
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            repeat = get(TEST_DATE, {'if-none-match': header})
+            if repeat['statusCode'] != 304 or repeat['body'] != '' or repeat['headers'].get('ETag') != etag:
+                print(f"❌ If-None-Match {header} returned {repeat['statusCode']}")
+                return False
+        if get(TEST_DATE, {'If-None-Match': '"other"'})['statusCode'] != 200:
+            print("❌ Mismatched tag got a 304")
+            return False
+        print("   ✅ ETag, Cache-Control and 304 revalidation")
+
+        # TEST 2: a booking changes the tag; other dates keep theirs
+        other_etag = get('2099-10-02')['headers']['ETag']
+        utils.create_booking('+19045550100', 'screen', 'iPhone 15', TEST_DATE, '9:00 AM')
+        changed = get(TEST_DATE, {'If-None-Match': etag})
+        if changed['statusCode'] != 200 or changed['headers']['ETag'] == etag or \
+                '9:00 AM' in json.loads(changed['body'])['available_slots'] or \
+                get('2099-10-02', {'If-None-Match': other_etag})['statusCode'] != 304:
+            print("❌ Booking did not change exactly its date's tag")
+            return False
+        print("   ✅ writes change the date's version")
+
+        # TEST 3: degraded answers are tagged differently and must be revalidated
+        live_etag = changed['headers']['ETag']
+        engine.down = True
+        degraded = get(TEST_DATE, {'If-None-Match': live_etag})
+        if degraded['statusCode'] != 200 or degraded['headers']['ETag'] == live_etag or \
+                degraded['headers']['Cache-Control'] != 'no-cache':
+            print(f"❌ Degraded response reused the live tag: {degraded['headers']}")
+            return False
+        print("   ✅ stale availability never matches a live tag")
+    finally:
+        storage.set_backend(None)
+        utils.availability_snapshots = AvailabilitySnapshots()
+
+    print("\n🎉 Repeated availability polls cost almost nothing!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_scheduler_cache()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test state_manager's versioned writes through the handler.
+POST/PUT and DELETE (reset) both bump the state version, so a client still
+holding a version from before a reset gets 409 instead of overwriting newer
+state, and DELETE honours If-Match too. The open-lead queue and lead status
+changes are served here, and the public scheduler serves no lead data at all
+(not the queue, status changes or a phone's history, which it pages instead). Every admin route
+needs the shared admin key: without it a request gets 401, with a wrong one
+403. Runs offline on the memory engine.
+
+Usage:
+  python test_state_manager.py
+"""
+
+import os
+import sys
+import json
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+ADMIN_KEY = 'test-admin-key'
+os.environ['ADMIN_API_KEY'] = ADMIN_KEY
+
+import scheduler
+import state_manager
+import storage
+import utils
+
+TEST_DATE = '2099-10-01'
+
+
+def call(method: str, body: dict | None = None, headers: dict | None = None, params: dict | None = None,
+         module=state_manager, admin_key: str | None = ADMIN_KEY) -> tuple[int, dict]:
+    if admin_key is not None:
+        headers = {'X-Linda-Admin-Key': admin_key, **(headers or {})}
+    response = module.handler({
+        'httpMethod': method,
+        'headers': headers or {},
+        'queryStringParameters': params,
+        'body': json.dumps(body) if body is not None else '',
+    }, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def test_state_manager() -> bool:
+    print("🧪 Testing versioned state writes...\n")
+    storage.set_backend(storage.MemoryBackend())
+
+    try:
+        # TEST 1: a reset bumps the version instead of starting over at 0
+        status, body = call('POST', {'status': 'lunch', 'version': 0})
+        stale = body['state']['version']
+        status, body = call('POST', {'notes': 'back at 1', 'version': stale})
+        before_reset = body['state']['version']
+        status, body = call('DELETE')
+        if status != 200 or body['state']['status'] != 'available' or body['state']['version'] != before_reset + 1:
+            print(f"❌ Reset returned {status} {body}")
+            return False
+        print("   ✅ DELETE is a versioned write")
+
+        # TEST 2: versions read before the reset are stale afterwards
+        for version in (0, stale):
+            status, body = call('POST', {'status': 'gym', 'version': version})
+            if status != 409 or body['state']['status'] != 'available':
+                print(f"❌ Stale version {version} after a reset returned {status} {body}")
+                return False
+        print("   ✅ stale versions get 409 after a reset")
+
+        # TEST 3: DELETE honours If-Match
+        current = before_reset + 1
+        status, body = call('DELETE', headers={'If-Match': f'"{stale}"'})
+        if status != 409 or body['state']['version'] != current:
+            print(f"❌ Stale If-Match reset returned {status} {body}")
+            return False
+        status, body = call('DELETE', headers={'If-Match': f'"{current}"'})
+        if status != 200 or body['state']['version'] != current + 1:
+            print(f"❌ Current If-Match reset returned {status} {body}")
+            return False
+        if call('DELETE', headers={'If-Match': 'latest'})[0] != 400:
+            print("❌ Malformed If-Match accepted")
+            return False
+        print("   ✅ DELETE honours If-Match")
+
+        # TEST 4: the bench's lead routes are admin-only
+        lead_id = utils.create_booking('+19045550100', 'screen', 'iPhone 15', TEST_DATE, '9:00 AM')
+        status, body = call('GET', params={'view': 'open'})
+        if status != 200 or [lead['lead_id'] for lead in body['leads']] != [lead_id]:
+            print(f"❌ Open queue returned {status} {body}")
+            return False
+        status, body = call('PUT', {'lead_id': lead_id, 'status': 'cancelled', 'expected_status': 'booked'})
+        if status != 200 or body['lead']['status'] != 'cancelled' or \
+                '9:00 AM' not in utils.get_available_slots(TEST_DATE) or utils.get_brandon_state()['status'] != 'available':
+            print(f"❌ Lead status PUT returned {status} {body}")
+            return False
+        if call('PUT', {'lead_id': lead_id, 'status': 'checked_in', 'expected_status': 'booked'})[0] != 409:
+            print("❌ Stale lead transition accepted")
+            return False
+        other_id = utils.create_booking('+19045550101', 'battery', 'Pixel 8', TEST_DATE, '10:00 AM')
+        status, body = call('PUT', {'lead_id': other_id, 'status': 'cancelled'}, module=scheduler)
+        open_status, open_body = call('GET', params={'view': 'open'}, module=scheduler)
+        if status != 405 or open_status == 200 or 'leads' in open_body or \
+                utils.get_lead(other_id)['status'] != 'booked':
+            print(f"❌ Scheduler still serves lead routes: PUT {status} {body}, GET {open_status} {open_body}")
+            return False
+        print("   ✅ lead queue and status changes are served only by the admin API")
+
+        # TEST 5: a phone's history is paged by the admin API, never by the scheduler
+        for params in ({'phone': '+19045550101'}, {'phone': '+19045550101', 'limit': '10'}):
+            status, body = call('GET', params=params, module=scheduler)
+            if status == 200 or 'leads' in body or '+19045550101' in json.dumps(body):
+                print(f"❌ Scheduler served history for {params}: {status} {body}")
+                return False
+        third_id = utils.create_booking('+19045550101', 'screen', 'Pixel 8', TEST_DATE, '11:00 AM')
+        pages, token = [], None
+        while True:
+            status, body = call('GET', params={'phone': '(904) 555-0101', 'limit': '1', 'page_token': token})
+            if status != 200 or body['phone'] != '+19045550101':
+                print(f"❌ Admin history returned {status} {body}")
+                return False
+            pages.append([lead['lead_id'] for lead in body['leads']])
+            token = body['next_page_token']
+            if not token:
+                break
+        if [lead_id for page in pages for lead_id in page] != [third_id, other_id] or any(len(page) > 1 for page in pages):
+            print(f"❌ History pages: {pages}")
+            return False
+        for params in ({'phone': '+19045550101', 'limit': '0'}, {'phone': '+19045550101', 'page_token': 'garbage'}):
+            if call('GET', params=params)[0] != 400:
+                print(f"❌ Bad history request accepted: {params}")
+                return False
+        print("   ✅ customer history is paged by the admin API, not the public scheduler")
+
+        # TEST 6: without the admin key nothing is read or changed
+        requests = [
+            ('GET', None, None),
+            ('GET', None, {'view': 'open'}),
+            ('GET', None, {'lead_id': other_id}),
+            ('GET', None, {'phone': '+19045550101'}),
+            ('GET', None, {'watch': '1'}),
+            ('POST', {'status': 'closed'}, None),
+            ('PUT', {'lead_id': other_id, 'status': 'cancelled'}, None),
+            ('DELETE', None, None),
+        ]
+        for method, body, params in requests:
+            for admin_key, expected in ((None, 401), ('', 401), ('wrong-key', 403)):
+                status, response = call(method, body, params=params, admin_key=admin_key)
+                if status != expected or set(response) != {'status', 'message'}:
+                    print(f"❌ {method} {params or body} with admin key {admin_key!r} returned {status} {response}")
+                    return False
+        if utils.get_lead(other_id)['status'] != 'booked' or utils.get_brandon_state()['status'] != 'available':
+            print("❌ An unauthenticated request changed data")
+            return False
+        state_manager.ADMIN_API_KEY = ''
+        try:
+            unconfigured = call('GET', admin_key='')[0], call('GET')[0]
+        finally:
+            state_manager.ADMIN_API_KEY = ADMIN_KEY
+        if unconfigured != (401, 403) or call('OPTIONS', admin_key=None)[0] != 200:
+            print(f"❌ Unconfigured key or preflight handled wrong: {unconfigured}")
+            return False
+        print("   ✅ unauthenticated requests get 401, wrong keys 403")
+    finally:
+        storage.set_backend(None)
+
+    print("\n🎉 Resets can no longer reopen the door to lost updates, and leads stay behind the admin API!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_state_manager()
+    sys.exit(0 if success else 1)
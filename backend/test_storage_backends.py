@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Contract test for LINDA storage backends.
+Runs the same state / lead / schedule checks (including conditional-write
+races) against each engine, then drives utils.create_booking through it.
+memory and sqlite run fully offline; add dynamodb to hit live tables.
+
+Usage:
+  python test_storage_backends.py
+  python test_storage_backends.py --backends memory,sqlite,dynamodb
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+import outbox
+import storage
+import utils
+
+TEST_DATE = '2099-01-15'
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Storage backend contract test")
+    parser.add_argument('--backends', default='memory,sqlite', help="Comma-separated engines to test")
+    parser.add_argument('--racers', type=int, default=16, help="Threads racing for one slot")
+    return parser.parse_args()
+
+
+def run_contract(backend: storage.StorageBackend, racers: int) -> bool:
+    now_ts = int(time.time())
+    slots = utils.DEFAULT_DAILY_SLOTS
+
+    # TEST 1: state round-trip
+    backend.put_state({'state_id': 'TEST', 'status': 'gym', 'updated_at': now_ts})
+    state = backend.get_state('TEST')
+    if not state or state.get('status') != 'gym':
+        print(f"❌ State round-trip failed: {state}")
+        return False
+    print("   ✅ state put/get")
+
+    # TEST 2: seeding is idempotent and never resets a booked slot
+    backend.seed_slots(TEST_DATE, slots, now_ts)
+    if not backend.reserve_slot(TEST_DATE, slots[0], {'lead_id': 'LEAD-A', 'phone': '+1'}, now_ts):
+        print("❌ First reservation should succeed")
+        return False
+    backend.seed_slots(TEST_DATE, slots, now_ts)
+    rows = backend.query_schedule(TEST_DATE)
+    booked = [row for row in rows if row['slot_time'] == slots[0]]
+    if len(rows) != len(slots) or not booked or booked[0].get('status') != 'booked':
+        print(f"❌ Re-seeding changed the schedule: {rows}")
+        return False
+    print("   ✅ seed idempotent")
+
+    # TEST 3: conditional reserve
+    if backend.reserve_slot(TEST_DATE, slots[0], {'lead_id': 'LEAD-B'}, now_ts):
+        print("❌ Double booking was allowed")
+        return False
+    if backend.reserve_slot(TEST_DATE, '11:11 PM', {'lead_id': 'LEAD-C'}, now_ts):
+        print("❌ Reserving an unseeded slot was allowed")
+        return False
+    print("   ✅ reserve condition")
+
+    # TEST 4: conditional release
+    def first_slot() -> dict:
+        return [row for row in backend.query_schedule(TEST_DATE) if row['slot_time'] == slots[0]][0]
+
+    backend.release_slot(TEST_DATE, slots[0], 'LEAD-B', now_ts)
+    if first_slot().get('lead_id') != 'LEAD-A':
+        print("❌ Release by another lead_id freed the slot")
+        return False
+    backend.release_slot(TEST_DATE, slots[0], 'LEAD-A', now_ts)
+    released = first_slot()
+    if released.get('status') != 'available' or 'lead_id' in released:
+        print(f"❌ Release by owner did not free the slot: {released}")
+        return False
+    print("   ✅ release condition")
+
+    # TEST 5: race for one slot
+    winners = []
+    barrier = threading.Barrier(racers)
+
+    def race(index: int) -> None:
+        barrier.wait()
+        if backend.reserve_slot(TEST_DATE, slots[1], {'lead_id': f'LEAD-R{index}'}, now_ts):
+            winners.append(index)
+
+    threads = [threading.Thread(target=race, args=(index,)) for index in range(racers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if len(winners) != 1:
+        print(f"❌ Expected exactly one race winner, got {len(winners)}")
+        return False
+    print(f"   ✅ {racers}-way race: one winner")
+
+    # TEST 6: leads
+    backend.put_lead({'lead_id': 'LEAD-X', 'timestamp': now_ts, 'appointment_date': TEST_DATE, 'phone': '+1'})
+    backend.put_lead({'lead_id': 'LEAD-Y', 'timestamp': now_ts, 'appointment_date': '2099-01-16', 'phone': '+1'})
+    leads = backend.scan_leads_by_date(TEST_DATE)
+    if [lead['lead_id'] for lead in leads] != ['LEAD-X']:
+        print(f"❌ Lead scan by date returned {leads}")
+        return False
+    backend.put_lead({'lead_id': 'LEAD-X', 'timestamp': now_ts + 5, 'appointment_date': TEST_DATE, 'phone': '+1'})
+    if [lead['timestamp'] for lead in backend.get_lead_items('LEAD-X')] != [now_ts, now_ts + 5] \
+            or backend.get_lead_items('LEAD-NONE'):
+        print(f"❌ Lead items by ID returned {backend.get_lead_items('LEAD-X')}")
+        return False
+    print("   ✅ lead put/scan/get by ID")
+
+    # TEST 7: phone history, newest first, paginated
+    for offset in range(5):
+        backend.put_lead({'lead_id': f'LEAD-H{offset}', 'timestamp': now_ts + offset, 'created_at': now_ts + offset,
+                          'phone': '+19045559999', 'appointment_date': TEST_DATE})
+    first_page, last_key = backend.query_leads_by_phone('+19045559999', 3)
+    second_page, end_key = backend.query_leads_by_phone('+19045559999', 3, last_key)
+    ids = [lead['lead_id'] for lead in first_page + second_page]
+    if ids != ['LEAD-H4', 'LEAD-H3', 'LEAD-H2', 'LEAD-H1', 'LEAD-H0'] or end_key is not None:
+        print(f"❌ Phone history pages returned {ids} (end key {end_key})")
+        return False
+    print("   ✅ phone history pagination")
+
+    # TEST 8: holds block others, yield to their holder, and lapse without a sweeper
+    hold_slot_time = slots[2]
+    if not backend.hold_slot(TEST_DATE, hold_slot_time, '+1A', now_ts + 60, now_ts):
+        print("❌ Hold on an available slot failed")
+        return False
+    if backend.hold_slot(TEST_DATE, hold_slot_time, '+1B', now_ts + 60, now_ts) or \
+            backend.reserve_slot(TEST_DATE, hold_slot_time, {'lead_id': 'LEAD-B'}, now_ts, holder='+1B'):
+        print("❌ Another conversation took a live hold")
+        return False
+    if not backend.hold_slot(TEST_DATE, hold_slot_time, '+1B', now_ts + 120, now_ts + 61):
+        print("❌ Expired hold was not treated as free")
+        return False
+    if not backend.reserve_slot(TEST_DATE, hold_slot_time, {'lead_id': 'LEAD-H'}, now_ts + 62, holder='+1B'):
+        print("❌ Holder could not convert its hold")
+        return False
+    converted = [row for row in backend.query_schedule(TEST_DATE) if row['slot_time'] == hold_slot_time][0]
+    if converted.get('status') != 'booked' or 'hold_id' in converted:
+        print(f"❌ Hold not converted cleanly: {converted}")
+        return False
+    print("   ✅ slot holds")
+
+    # TEST 9: versioned state updates
+    first = backend.update_state('VERSIONED', {'status': 'gym'}, now_ts, expected_version=0)
+    second = backend.update_state('VERSIONED', {'notes': 'back at 5'}, now_ts, expected_version=first['version'])
+    try:
+        backend.update_state('VERSIONED', {'status': 'shop'}, now_ts, expected_version=first['version'])
+        print("❌ Stale version was accepted")
+        return False
+    except storage.VersionConflict as conflict:
+        if (conflict.current or {}).get('version') != second['version']:
+            print(f"❌ Conflict did not carry the current state: {conflict.current}")
+            return False
+    if second.get('status') != 'gym' or second.get('notes') != 'back at 5' or second['version'] != 2:
+        print(f"❌ Versioned merge produced {second}")
+        return False
+    print("   ✅ versioned state updates")
+
+    # TEST 10: batched events and ADD counters
+    backend.put_events([{'event_id': f'EVT-{index:03d}', 'event_type': 'upsell', 'timestamp': now_ts}
+                        for index in range(30)])
+    backend.add_counters('2099-01-15', {'upsell_offered': 2, 'upsell_items': {'case'}}, {'dimension': 'day'}, now_ts)
+    backend.add_counters('2099-01-15', {'upsell_offered': 1, 'upsell_items': {'screen protector'}}, {'dimension': 'day'}, now_ts)
+    counters = backend.get_counters(['2099-01-15', '2099-01-16'])
+    day = counters.get('2099-01-15', {})
+    if list(counters) != ['2099-01-15'] or day.get('upsell_offered') != 3 or \
+            sorted(day.get('upsell_items', [])) != ['case', 'screen protector']:
+        print(f"❌ Counters returned {counters}")
+        return False
+    print("   ✅ sales events and counters")
+
+    # TEST 11: conditional status transitions and the sparse open-leads queue
+    for offset, open_at in enumerate(['2099-01-15T14:00', '2099-01-15T09:00']):
+        backend.put_lead({'lead_id': f'LEAD-O{offset}', 'timestamp': now_ts, 'status': 'booked',
+                          'open_queue': storage.OPEN_QUEUE, 'open_at': open_at})
+    backend.put_lead({'lead_id': 'LEAD-O2', 'timestamp': now_ts, 'status': 'picked_up'})
+    queue, _ = backend.query_open_leads(10)
+    if [lead['lead_id'] for lead in queue] != ['LEAD-O1', 'LEAD-O0']:
+        print(f"❌ Open queue returned {queue}")
+        return False
+    moved = backend.transition_lead('LEAD-O0', 'booked', 'checked_in', True, now_ts + 1)
+    try:
+        backend.transition_lead('LEAD-O0', 'booked', 'cancelled', False, now_ts + 2)
+        print("❌ Transition from a stale status succeeded")
+        return False
+    except storage.LeadStatusConflict as conflict:
+        if (conflict.current or {}).get('status') != 'checked_in':
+            print(f"❌ Conflict carried {conflict.current}")
+            return False
+    backend.transition_lead('LEAD-O1', 'booked', 'cancelled', False, now_ts + 2)
+    queue, _ = backend.query_open_leads(10)
+    if moved.get('status_updated_at') != now_ts + 1 or [lead['lead_id'] for lead in queue] != ['LEAD-O0'] \
+            or backend.transition_lead('LEAD-NONE', 'booked', 'cancelled', False, now_ts) is not None:
+        print(f"❌ Transitions left queue {queue}")
+        return False
+    print("   ✅ lead status transitions and open queue")
+
+    # TEST 12: customer profiles accumulate ADD deltas, keep the latest SET attributes, apply an ID once
+    if backend.get_profile('+19045550999') is not None:
+        print("❌ Unknown phone has a profile")
+        return False
+    backend.update_profile('+19045550999', {'visit_count': 1, 'slot#10:00 AM': 1, 'lifetime_value': 89.5},
+                           {'last_device': 'iPhone 13'}, now_ts)
+    backend.update_profile('+19045550999', {'visit_count': 1, 'lifetime_value': 20}, {'last_device': 'iPhone 15'}, now_ts + 1)
+    applied = [
+        backend.update_profile('+19045550999', {'visit_count': 1}, {}, now_ts + 2, applied_id=applied_id)
+        for applied_id in ('OB-A', 'OB-A', 'OB-B')
+    ]
+    profile = backend.get_profile('+19045550999') or {}
+    if applied != [True, False, True] or profile.get(storage.PROFILE_APPLIED_FIELD) not in ({'OB-A', 'OB-B'}, ['OB-A', 'OB-B']):
+        print(f"❌ Applied-once profile updates returned {applied} {profile}")
+        return False
+    if profile.get('visit_count') != 4 or profile.get('lifetime_value') != 109.5 or \
+            profile.get('last_device') != 'iPhone 15' or profile.get('slot#10:00 AM') != 1:
+        print(f"❌ Profile returned {profile}")
+        return False
+    print("   ✅ customer profiles")
+
+    # TEST 13: a lead and its outbox records commit together; due records are claimed once
+    records = [{'outbox_id': f'OB-{index}', 'effect': 'noop', 'payload': {'n': index}, 'outbox_queue': storage.OUTBOX_QUEUE,
+                'next_attempt_at': now_ts - index, 'attempts': 0, 'created_at': now_ts} for index in range(2)]
+    backend.put_lead_with_outbox({'lead_id': 'LEAD-OB', 'timestamp': now_ts, 'status': 'booked'}, records)
+    try:
+        backend.put_lead_with_outbox({'lead_id': 'LEAD-OB-DUP', 'timestamp': now_ts}, records[:1])
+        print("❌ Duplicate outbox record accepted")
+        return False
+    except ValueError:
+        pass
+    if not backend.get_lead_items('LEAD-OB') or backend.get_lead_items('LEAD-OB-DUP') or \
+            [record['outbox_id'] for record in backend.due_outbox(now_ts, 10)] != ['OB-1', 'OB-0']:
+        print("❌ Lead/outbox transaction not all-or-nothing")
+        return False
+    claimed = backend.claim_outbox('OB-0', now_ts, now_ts + 60)
+    if (claimed or {}).get('payload') != {'n': 0} or backend.claim_outbox('OB-0', now_ts, now_ts + 60) is not None:
+        print(f"❌ Outbox claim returned {claimed}")
+        return False
+    backend.fail_outbox('OB-0', 'boom', now_ts + 30, now_ts)
+    backend.fail_outbox('OB-1', 'boom', None, now_ts)
+    backend.complete_outbox('OB-1')
+    retried = backend.claim_outbox('OB-0', now_ts + 30, now_ts + 90) or {}
+    if backend.due_outbox(now_ts + 29, 10) or retried.get('attempts') != 1 or retried.get('last_error') != 'boom' or \
+            backend.claim_outbox('OB-1', now_ts + 30, now_ts + 90) is not None:
+        print(f"❌ Outbox retry/complete left {retried}")
+        return False
+    print("   ✅ transactional outbox")
+
+    # TEST 14: multi-slot bookings commit together or name every taken slot
+    backend.seed_slots('2099-01-20', ['9:00 AM', '10:00 AM', '11:00 AM'], now_ts)
+    backend.reserve_slot('2099-01-20', '10:00 AM', {'lead_id': 'LEAD-TAKEN'}, now_ts)
+
+    def booking(time: str, suffix: str) -> dict:
+        return {'date': '2099-01-20', 'time': time, 'fields': {'lead_id': f'LEAD-B{suffix}'},
+                'lead': {'lead_id': f'LEAD-B{suffix}', 'timestamp': now_ts, 'status': 'booked'},
+                'outbox': [{'outbox_id': f'OB-B{suffix}', 'effect': 'noop', 'outbox_queue': storage.OUTBOX_QUEUE,
+                            'next_attempt_at': now_ts, 'attempts': 0, 'created_at': now_ts}]}
+    try:
+        backend.book_slots([booking('9:00 AM', '1'), booking('10:00 AM', '2'), booking('12:00 PM', '3')], now_ts)
+        print("❌ Batch with taken slots was booked")
+        return False
+    except storage.SlotConflict as conflict:
+        if conflict.indexes != [1, 2]:
+            print(f"❌ SlotConflict named {conflict.indexes}")
+            return False
+    if backend.get_lead_items('LEAD-B1') or backend.claim_outbox('OB-B1', now_ts, now_ts + 1) is not None or \
+            {slot['slot_time']: slot['status'] for slot in backend.query_schedule('2099-01-20')}['9:00 AM'] != 'available':
+        print("❌ Failed batch wrote something")
+        return False
+    backend.book_slots([booking('9:00 AM', '1'), booking('11:00 AM', '3')], now_ts)
+    statuses = {slot['slot_time']: slot.get('lead_id') for slot in backend.query_schedule('2099-01-20')}
+    if statuses != {'9:00 AM': 'LEAD-B1', '10:00 AM': 'LEAD-TAKEN', '11:00 AM': 'LEAD-B3'} or \
+            not backend.get_lead_items('LEAD-B3') or backend.claim_outbox('OB-B3', now_ts, now_ts + 1) is None:
+        print(f"❌ Batch booking left {statuses}")
+        return False
+    print("   ✅ multi-slot booking transactions")
+
+    # TEST 15: booked and held slots (only) are in the taken-slots index, in slot order, paged
+    backend.seed_slots('2099-12-30', ['9:00 AM', '10:00 AM', '2:00 PM'], now_ts)
+    backend.seed_slots('2099-12-31', ['9:00 AM'], now_ts)
+    backend.reserve_slot('2099-12-30', '2:00 PM', {'lead_id': 'LEAD-T1'}, now_ts)
+    backend.hold_slot('2099-12-31', '9:00 AM', 'holder', now_ts + 60, now_ts)
+    backend.reserve_slot('2099-12-30', '9:00 AM', {'lead_id': 'LEAD-T2'}, now_ts)
+    backend.release_slot('2099-12-30', '9:00 AM', 'LEAD-T2', now_ts)
+    first, last_key = backend.query_taken_slots('2099-12-30', 1)
+    rest, end_key = backend.query_taken_slots('2099-12-30', 10, last_key)
+    batch, _ = backend.query_taken_slots('2099-01-20', 3)
+    if [(slot['slot_at'], slot['status']) for slot in first + rest] != \
+            [('2099-12-30T14:00', 'booked'), ('2099-12-31T09:00', 'held')] or end_key is not None or \
+            [slot['slot_at'] for slot in batch] != ['2099-01-20T09:00', '2099-01-20T10:00', '2099-01-20T11:00']:
+        print(f"❌ Taken-slots index returned {first + rest} / {batch}")
+        return False
+    print("   ✅ taken-slots index")
+    return True
+
+
+def run_helpers(backend: storage.StorageBackend) -> bool:
+    """Drive the utils helpers end to end and time them."""
+    storage.set_backend(backend)
+    try:
+        date = '2099-02-01'
+        start = time.perf_counter()
+        lead_id = utils.create_booking('+19045550000', 'screen', 'iPhone 14', date, '2:00 PM')
+        booking_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        available = utils.get_available_slots(date)
+        availability_ms = (time.perf_counter() - start) * 1000
+
+        if '2:00 PM' in available or len(available) != len(utils.DEFAULT_DAILY_SLOTS) - 1:
+            print(f"❌ Booked slot still offered: {available}")
+            return False
+        try:
+            utils.create_booking('+19045550001', 'battery', 'Pixel 8', date, '2:00 PM')
+            print("❌ Second booking of the same slot succeeded")
+            return False
+        except ValueError:
+            pass
+        if [lead['lead_id'] for lead in utils.query_leads_for_date(date)] != [lead_id]:
+            print("❌ query_leads_for_date did not return the booking")
+            return False
+        history = utils.get_customer_history('(904) 555-0000')
+        if history['phone'] != '+19045550000' or [lead['lead_id'] for lead in history['leads']] != [lead_id]:
+            print(f"❌ Customer history lookup failed: {history}")
+            return False
+
+        if lead_id not in [lead['lead_id'] for lead in utils.get_open_leads()['leads']]:
+            print("❌ New booking missing from the open queue")
+            return False
+        try:
+            utils.transition_lead_status(lead_id, 'ready')
+            print("❌ Skipped lifecycle step was allowed")
+            return False
+        except ValueError:
+            pass
+        utils.transition_lead_status(lead_id, 'cancelled', from_status='booked')
+        if lead_id in [lead['lead_id'] for lead in utils.get_open_leads()['leads']] or \
+                '2:00 PM' not in utils.get_available_slots(date):
+            print("❌ Cancelled booking still queued or still holding its slot")
+            return False
+
+        utils.record_upsell('Screen Protector', True, '(904) 555-0000', price=15)
+        utils.record_upsell('case', False, '+19045550000')
+        utils.record_discount(10, 'repeat_customer', True, '+19045550000')
+        if utils.flush_sales_events() != 3 or utils.flush_sales_events() != 0:
+            print("❌ Sales events not flushed exactly once")
+            return False
+        today = time.strftime('%Y-%m-%d', time.gmtime())
+        rollup = utils.get_sales_rollup(today, today, breakdown=True)
+        if rollup['totals']['upsell_offered'] != 2 or rollup['totals']['upsell_accepted'] != 1 or \
+                rollup['totals']['discount_approved'] != 1 or \
+                rollup['upsell_items'].get('screen protector', {}).get('upsell_accepted') != 1:
+            print(f"❌ Sales rollup returned {rollup}")
+            return False
+        if outbox.drain_outbox()['delivered'] != 1:
+            print("❌ Booking side effect not delivered from the outbox")
+            return False
+        profile = utils.get_customer_profile('(904) 555-0000') or {}
+        if profile.get('visit_count') != 1 or profile.get('last_device') != 'iPhone 14' or \
+                profile.get('lifetime_value') != 15 or profile.get('upsell_offered') != 2 or \
+                profile.get('discount_approved') != 1 or utils.preferred_profile_times(profile) != ('2:00 PM', 'Sun'):
+            print(f"❌ Customer profile returned {profile}")
+            return False
+        print(f"   ✅ utils helpers (create_booking {booking_ms:.2f} ms, get_available_slots {availability_ms:.2f} ms)")
+        return True
+    finally:
+        storage.set_backend(None)
+
+
+def test_storage_backends(backends: str = 'memory,sqlite', racers: int = 16) -> bool:
+    print("🧪 Testing storage backends...\n")
+    tmp_dir = tempfile.mkdtemp(prefix='linda_storage_')
+
+    for kind in [name.strip() for name in backends.split(',') if name.strip()]:
+        print("=" * 60)
+        print(f"BACKEND: {kind}")
+        print("=" * 60)
+        backend = storage.create_backend(kind, sqlite_path=os.path.join(tmp_dir, 'linda.db'))
+        if not run_contract(backend, racers) or not run_helpers(backend):
+            print(f"\n❌ {kind} backend failed")
+            return False
+        print()
+
+    print("🎉 All storage backends honor the same contract!")
+    return True
+
+
+if __name__ == "__main__":
+    cli = parse_args()
+    success = test_storage_backends(cli.backends, cli.racers)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test multi-shop tenancy.
+Checks tenant resolution (Twilio number, API header), that two shops sharing
+one engine see only their own state, schedule, leads and profiles (stored
+under '<tenant>#' keys, default tenant unprefixed), and that each shop's
+warm cache ignores the other's writes. Runs offline on the memory engine.
+
+Usage:
+  python test_tenancy.py
+"""
+
+import os
+import sys
+import json
+
+# Add lambda directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lambda'))
+
+os.environ['TWILIO_PHONE_NUMBER'] = '+19045550000'
+
+import change_feed
+import outbox
+import storage
+import tenancy
+import utils
+
+TEST_DATE = '2099-04-01'
+RIVERSIDE_SLOTS = ['10:00 AM', '11:00 AM', '12:00 PM']
+
+
+def test_tenancy() -> bool:
+    print("🧪 Testing multi-shop tenancy...\n")
+    tenancy.configure_tenants({'riverside': {'numbers': ['(904) 555-0100'], 'slots': RIVERSIDE_SLOTS}})
+    engine = storage.MemoryBackend()
+    storage.set_backend(engine)
+    change_feed.set_feed(change_feed.MemoryChangeFeed())
+    utils.warm_cache = change_feed.WarmCache(ttl_seconds=300, check_seconds=0)
+    utils._tenant_caches['riverside'] = change_feed.WarmCache(ttl_seconds=300, check_seconds=0)
+
+    try:
+        # TEST 1: resolution from the texted number and the API header
+        if tenancy.tenant_for_number('+19045550100') != 'riverside' or \
+                tenancy.tenant_for_number('904-555-0000') != tenancy.DEFAULT_TENANT or \
+                tenancy.tenant_for_number('+13125550199') != tenancy.DEFAULT_TENANT:
+            print("❌ Twilio number resolution wrong")
+            return False
+        if tenancy.tenant_from_headers({'X-Linda-Tenant': 'Riverside'}) != 'riverside' or \
+                tenancy.tenant_from_headers({}) != tenancy.DEFAULT_TENANT:
+            print("❌ Header resolution wrong")
+            return False
+        try:
+            tenancy.tenant_from_headers({'x-linda-tenant': 'nowhere'})
+            print("❌ Unknown tenant accepted")
+            return False
+        except tenancy.UnknownTenant:
+            pass
+        print("   ✅ tenant resolution")
+
+        # TEST 2: same phone, date and slot in both shops, no crosstalk
+        booked = {}
+        for tenant in (tenancy.DEFAULT_TENANT, 'riverside'):
+            with tenancy.tenant_scope(tenant):
+                utils.update_brandon_state({'status': f'at {tenant}'})
+                booked[tenant] = utils.create_booking('+19045551234', 'screen', 'iPhone 15', TEST_DATE, '10:00 AM')
+        outbox.drain_outbox()  # profile updates are delivered in the tenant that booked
+        for tenant, other in ((tenancy.DEFAULT_TENANT, 'riverside'), ('riverside', tenancy.DEFAULT_TENANT)):
+            with tenancy.tenant_scope(tenant):
+                seen = {
+                    'state': utils.get_brandon_state()['status'],
+                    'date': [lead['lead_id'] for lead in utils.query_leads_for_date(TEST_DATE)],
+                    'history': [lead['lead_id'] for lead in utils.get_customer_history('+19045551234')['leads']],
+                    'open': [lead['lead_id'] for lead in utils.get_open_leads()['leads']],
+                    'visits': (utils.get_customer_profile('+19045551234') or {}).get('visit_count'),
+                }
+                if seen != {'state': f'at {tenant}', 'date': [booked[tenant]], 'history': [booked[tenant]],
+                            'open': [booked[tenant]], 'visits': 1} or utils.get_lead(booked[other]) is not None:
+                    print(f"❌ {tenant} saw {seen}")
+                    return False
+        print("   ✅ state, schedule, leads, open queue and profiles isolated")
+
+        # TEST 3: keys on disk carry the tenant prefix, the default tenant's do not
+        riverside_lead = next(lead for (lead_id, _), lead in engine.leads.items() if lead_id.startswith('riverside#'))
+        if sorted(engine.schedule) != [TEST_DATE, f'riverside#{TEST_DATE}'] or \
+                sorted(engine.states) != ['CURRENT', 'riverside#CURRENT'] or \
+                riverside_lead['phone'] != 'riverside#+19045551234' or riverside_lead['open_queue'] != 'riverside#OPEN':
+            print(f"❌ Stored keys wrong: {sorted(engine.schedule)} {sorted(engine.states)} {riverside_lead}")
+            return False
+        with tenancy.tenant_scope('riverside'):
+            if [slot['slot_time'] for slot in utils.get_schedule_for_date(TEST_DATE)] != RIVERSIDE_SLOTS:
+                print("❌ Riverside did not get its own slot list")
+                return False
+        print("   ✅ tenant-prefixed keys and per-tenant slots")
+
+        # TEST 4: one shop's writes leave the other's warm cache alone
+        utils.get_available_slots('2099-04-02')
+        before = utils.warm_cache.hits, utils.warm_cache.misses
+        with tenancy.tenant_scope('riverside'):
+            utils.create_booking('+19045559999', 'battery', 'Pixel 8', '2099-04-02', '11:00 AM')
+            utils.update_brandon_state({'status': 'busy'})
+        utils.get_available_slots('2099-04-02')
+        utils.get_brandon_state()
+        if utils.warm_cache.misses != before[1] or utils.warm_cache.hits != before[0] + 2:
+            print(f"❌ Riverside writes invalidated the default cache: {before} -> "
+                  f"{(utils.warm_cache.hits, utils.warm_cache.misses)}")
+            return False
+        print("   ✅ warm caches scoped per tenant")
+
+        # TEST 5: API handlers take the tenant from X-Linda-Tenant
+        import scheduler
+        response = scheduler.handler({
+            'httpMethod': 'GET',
+            'headers': {'X-Linda-Tenant': 'riverside'},
+            'queryStringParameters': {'date': '2099-04-03'},
+        }, None)
+        unknown = scheduler.handler({
+            'httpMethod': 'GET',
+            'headers': {'X-Linda-Tenant': 'nowhere'},
+            'queryStringParameters': {'date': '2099-04-03'},
+        }, None)
+        if response['statusCode'] != 200 or json.loads(response['body']).get('available_slots') != RIVERSIDE_SLOTS \
+                or unknown['statusCode'] != 400:
+            print(f"❌ Scheduler tenancy wrong: {response['body']} / {unknown['statusCode']}")
+            return False
+        print("   ✅ scheduler resolves the tenant header")
+    finally:
+        tenancy.set_tenant(tenancy.DEFAULT_TENANT)
+        tenancy.configure_tenants({})
+        storage.set_backend(None)
+        change_feed.set_feed(None)
+        utils.warm_cache = change_feed.WarmCache()
+        utils._tenant_caches.clear()
+
+    print("\n🎉 Shops share a deployment without sharing data!")
+    return True
+
+
+if __name__ == "__main__":
+    success = test_tenancy()
+    sys.exit(0 if success else 1)
@@ -1,9 +1,11 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getBrandonState, updateBrandonState, type BrandonState } from '@/lib/dynamodb'
+import { getBrandonState, updateBrandonState, StateVersionConflict, type BrandonState } from '@/lib/dynamodb'
 import { KNOWN_AGENT_CONFIG_DEFAULTS, type AgentConfigKey } from '@/lib/agentConfig'
 
 interface AgentConfigUpdateBody {
   updates?: Record<string, string | number | boolean>
+  // State version the client last read; omitted = unconditional write
+  version?: number
 }
 
 function coerceToString(value: string | number | boolean): string {
@@ -67,13 +69,20 @@ export async function PUT(req: NextRequest) {
       stateUpdates[key] = coerceToString(value) as never
     }
 
-    await updateBrandonState(stateUpdates)
+    const updated = await updateBrandonState(stateUpdates, body.version)
 
     return NextResponse.json({
       status: 'success',
       updated_keys: validEntries.map(([key]) => key),
+      version: updated.version,
     })
   } catch (error: unknown) {
+    if (error instanceof StateVersionConflict) {
+      return NextResponse.json(
+        { status: 'error', message: error.message, state: error.current },
+        { status: 409 },
+      )
+    }
     console.error('PUT /api/agent-config error:', error)
     return NextResponse.json(
       { status: 'error', message: 'Failed to update agent config' },
@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getBrandonState, updateBrandonState } from '@/lib/dynamodb'
+import { getBrandonState, updateBrandonState, StateVersionConflict } from '@/lib/dynamodb'
 
 // ---------------------------------------------------------------------------
 // Types
@@ -23,6 +23,21 @@ interface StateUpdateBody {
   operational_hours_enabled?: boolean
   operational_open_time?: string | null
   operational_close_time?: string | null
+  // Version the client last read; omitted = unconditional write
+  version?: number | string
+}
+
+/** Version the client last read, from body 'version' or an If-Match header (mirrors state_manager). */
+function expectedVersion(req: NextRequest, body: StateUpdateBody): number | undefined {
+  const raw = body.version ?? req.headers.get('if-match') ?? undefined
+  if (raw === undefined || raw === '') {
+    return undefined
+  }
+  const version = Number(String(raw).trim().replace(/^"|"$/g, ''))
+  if (!Number.isInteger(version)) {
+    throw new RangeError('version must be an integer')
+  }
+  return version
 }
 
 // ---------------------------------------------------------------------------
@@ -52,6 +67,15 @@ export async function GET() {
 export async function POST(req: NextRequest) {
   try {
     const body = (await req.json()) as StateUpdateBody
+    let version: number | undefined
+    try {
+      version = expectedVersion(req, body)
+    } catch (error: unknown) {
+      return NextResponse.json(
+        { status: 'error', message: (error as Error).message },
+        { status: 400 },
+      )
+    }
 
     const updated = await updateBrandonState({
       status: body.status,
@@ -71,13 +95,19 @@ export async function POST(req: NextRequest) {
       operational_hours_enabled: body.operational_hours_enabled,
       operational_open_time: body.operational_open_time,
       operational_close_time: body.operational_close_time,
-    })
+    }, version)
 
     return NextResponse.json({
       status: 'success',
       state: updated,
     })
   } catch (error: unknown) {
+    if (error instanceof StateVersionConflict) {
+      return NextResponse.json(
+        { status: 'error', message: error.message, state: error.current },
+        { status: 409 },
+      )
+    }
     console.error('POST /api/state error:', error)
     return NextResponse.json(
       { status: 'error', message: 'Failed to update state in DynamoDB' },
@@ -0,0 +1,44 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+// ---------------------------------------------------------------------------
+// GET /api/watch?cursor=...  —  long-poll for dashboard changes
+//
+// Proxies the admin API's GET ?watch=1 (backend state_manager), which answers
+// as soon as the state, bookings or leads move past the cursor, or after its
+// timeout with nothing changed. The admin key stays on the server.
+// ---------------------------------------------------------------------------
+
+export async function GET(req: NextRequest) {
+  const baseUrl  = process.env.STATE_MANAGER_URL
+  const adminKey = process.env.LINDA_ADMIN_API_KEY
+  if (!baseUrl || !adminKey) {
+    return NextResponse.json(
+      { status: 'error', message: 'STATE_MANAGER_URL and LINDA_ADMIN_API_KEY are not configured' },
+      { status: 503 },
+    )
+  }
+
+  const url = new URL(baseUrl)
+  url.searchParams.set('watch', '1')
+  const cursor = req.nextUrl.searchParams.get('cursor')
+  if (cursor) url.searchParams.set('cursor', cursor)
+
+  try {
+    const res = await fetch(url, {
+      headers: { 'X-Linda-Admin-Key': adminKey },
+      cache: 'no-store',
+      signal: req.signal,
+    })
+    const body = await res.json()
+    return NextResponse.json(body, {
+      status: res.status,
+      headers: { 'Cache-Control': 'no-store' },
+    })
+  } catch (error: unknown) {
+    console.error('GET /api/watch error:', error)
+    return NextResponse.json(
+      { status: 'error', message: 'Admin API unreachable' },
+      { status: 502 },
+    )
+  }
+}
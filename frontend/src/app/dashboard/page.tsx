@@ -39,6 +39,7 @@ import {
 } from 'lucide-react'
 import ChatLogOverlay from '@/components/ChatLogOverlay'
 import AgentPromptControlPanel from '@/components/AgentPromptControlPanel'
+import type { BrandonState } from '@/lib/dynamodb'
 
 type DashboardTab = 'brandon' | 'leads' | 'landing' | 'agent'
 type StatusMode = 'working' | 'gym' | 'driving' | 'break' | 'sleeping' | 'custom'
@@ -334,6 +335,8 @@ export default function DashboardPage() {
   const hasLoadedInitialStateRef = useRef(false)
   const autoSaveTimeoutRef = useRef<ReturnType<typeof setTimeout> | null>(null)
   const isSavingRef = useRef(false)
+  // State version last read or written; saves are conditional on it (409 = someone else saved first)
+  const stateVersionRef = useRef<number | undefined>(undefined)
   const serviceEditorRef = useRef<HTMLTextAreaElement | null>(null)
 
   const DEFAULT_SERVICE_LINES = [
@@ -464,19 +467,92 @@ export default function DashboardPage() {
   }, [])
 
   useEffect(() => {
+    const controller = new AbortController()
     const fetchLeads = async () => {
       try {
-        const res  = await fetch('/api/leads', { cache: 'no-store' })
+        const res  = await fetch('/api/leads', { cache: 'no-store', signal: controller.signal })
         if (!res.ok) return
         const data = await res.json() as { status: string; leads: Lead[] }
         if (data.status === 'success' && Array.isArray(data.leads)) setLeads(data.leads)
       } catch { /* silent */ } finally { setLeadsLoading(false) }
     }
-    fetchLeads()
-    const iv = setInterval(fetchLeads, 15_000)
-    return () => clearInterval(iv)
+    const pause = (ms: number) => new Promise(resolve => setTimeout(resolve, ms))
+
+    // Long-poll /api/watch and refetch only when bookings or leads change; while
+    // the watch is unavailable, fall back to refetching every 15 s
+    const watchLeads = async () => {
+      let cursor: string | null = null
+      while (!controller.signal.aborted) {
+        try {
+          const res = await fetch(
+            cursor ? `/api/watch?cursor=${encodeURIComponent(cursor)}` : '/api/watch',
+            { cache: 'no-store', signal: controller.signal },
+          )
+          if (res.status === 400) {
+            // Cursor from an older backend; take a fresh one
+            cursor = null
+            continue
+          }
+          if (!res.ok) throw new Error(`watch returned ${res.status}`)
+          const data = await res.json() as { cursor: string; changed: string[] }
+          // No cursor yet: read after taking one, so nothing written in between is missed
+          if (!cursor || data.changed.some(name => name === 'bookings' || name === 'leads')) await fetchLeads()
+          cursor = data.cursor
+        } catch {
+          if (controller.signal.aborted) return
+          await fetchLeads()
+          await pause(15_000)
+        }
+      }
+    }
+    watchLeads()
+    return () => controller.abort()
   }, [])
 
+  // Fill the form from a saved state; agent_shared_tone is source of truth for persona
+  const applyLoadedState = (s: BrandonState, agentTone: string) => {
+    stateVersionRef.current = s.version ?? 0
+    const normalizedVoice = normalizeVoiceName(typeof s.voice === 'string' ? s.voice : undefined)
+    const loadedWhatWeFixItems = parseWhatWeFixItems(s.what_we_fix_items)
+    if (s.status && s.status in STATUS_OPTIONS) setCurrentStatus(s.status as StatusMode)
+    if (s.notes)    setNotes(s.notes)
+    if (typeof s.operational_hours_enabled === 'boolean') {
+      setOperationalHoursEnabled(s.operational_hours_enabled)
+    }
+    if (typeof s.operational_open_time === 'string' && s.operational_open_time.trim().length > 0) {
+      setOperationalOpenTime(s.operational_open_time)
+    }
+    if (typeof s.operational_close_time === 'string' && s.operational_close_time.trim().length > 0) {
+      setOperationalCloseTime(s.operational_close_time)
+    }
+    setConfig(prev => ({
+      ...prev,
+      voice:          normalizedVoice      || prev.voice,
+      assistantName:  s.assistant_name     || prev.assistantName,
+      // agent_shared_tone is source of truth; fall back to state.persona
+      persona:        agentTone            || s.persona || prev.persona,
+      specialInfo:    s.special_info       || '',
+      greeting:       s.greeting           || prev.greeting,
+      servicesBlock:  s.services_block     || prev.servicesBlock,
+      serviceLines:   (() => {
+        const raw = s.services_block as string | undefined
+        if (!raw) return prev.serviceLines
+        // Stored as newline-separated lines (with optional leading dash+space)
+        const parsed = raw.split('\n')
+          .map((l: string) => l.replace(/^[-\s]+/, '').trim())
+          .filter((l: string) => l.length > 0 && !l.startsWith('SERVICES &'))
+        return parsed.length > 0 ? parsed : prev.serviceLines
+      })(),
+      maxDiscount:    s.max_discount      !== undefined ? s.max_discount      : prev.maxDiscount,
+      aiAnswersCalls: s.ai_answers_calls  !== undefined ? s.ai_answers_calls  : prev.aiAnswersCalls,
+      aiAnswersSms:   s.ai_answers_sms    !== undefined ? s.ai_answers_sms    : prev.aiAnswersSms,
+      autoUpsell:     s.auto_upsell       !== undefined ? s.auto_upsell       : prev.autoUpsell,
+    }))
+    if (loadedWhatWeFixItems) {
+      setWhatWeFixItems(loadedWhatWeFixItems)
+    }
+  }
+
   useEffect(() => {
     const load = async () => {
       try {
@@ -491,46 +567,7 @@ export default function DashboardPage() {
         const agentTone = (agentData?.values?.agent_shared_tone as string | undefined) ?? ''
 
         if (stateData?.status === 'success' && stateData.state) {
-          const s = stateData.state
-          const normalizedVoice = normalizeVoiceName(typeof s.voice === 'string' ? s.voice : undefined)
-          const loadedWhatWeFixItems = parseWhatWeFixItems(s.what_we_fix_items)
-          if (s.status && s.status in STATUS_OPTIONS) setCurrentStatus(s.status as StatusMode)
-          if (s.notes)    setNotes(s.notes)
-          if (typeof s.operational_hours_enabled === 'boolean') {
-            setOperationalHoursEnabled(s.operational_hours_enabled)
-          }
-          if (typeof s.operational_open_time === 'string' && s.operational_open_time.trim().length > 0) {
-            setOperationalOpenTime(s.operational_open_time)
-          }
-          if (typeof s.operational_close_time === 'string' && s.operational_close_time.trim().length > 0) {
-            setOperationalCloseTime(s.operational_close_time)
-          }
-          setConfig(prev => ({
-            ...prev,
-            voice:          normalizedVoice      || prev.voice,
-            assistantName:  s.assistant_name     || prev.assistantName,
-            // agent_shared_tone is source of truth; fall back to state.persona
-            persona:        agentTone            || s.persona || prev.persona,
-            specialInfo:    s.special_info       || '',
-            greeting:       s.greeting           || prev.greeting,
-            servicesBlock:  s.services_block     || prev.servicesBlock,
-            serviceLines:   (() => {
-              const raw = s.services_block as string | undefined
-              if (!raw) return prev.serviceLines
-              // Stored as newline-separated lines (with optional leading dash+space)
-              const parsed = raw.split('\n')
-                .map((l: string) => l.replace(/^[-\s]+/, '').trim())
-                .filter((l: string) => l.length > 0 && !l.startsWith('SERVICES &'))
-              return parsed.length > 0 ? parsed : prev.serviceLines
-            })(),
-            maxDiscount:    s.max_discount      !== undefined ? s.max_discount      : prev.maxDiscount,
-            aiAnswersCalls: s.ai_answers_calls  !== undefined ? s.ai_answers_calls  : prev.aiAnswersCalls,
-            aiAnswersSms:   s.ai_answers_sms    !== undefined ? s.ai_answers_sms    : prev.aiAnswersSms,
-            autoUpsell:     s.auto_upsell       !== undefined ? s.auto_upsell       : prev.autoUpsell,
-          }))
-          if (loadedWhatWeFixItems) {
-            setWhatWeFixItems(loadedWhatWeFixItems)
-          }
+          applyLoadedState(stateData.state as BrandonState, agentTone)
         }
       } catch { /* silent */ }
       finally {
@@ -546,6 +583,18 @@ export default function DashboardPage() {
     setStatusSaved(false)
   }
 
+  // Someone else saved first: show their state instead of overwriting it
+  const reloadConflictingState = async (res: Response, silent: boolean) => {
+    const data = await res.json() as { state?: BrandonState }
+    if (data.state) {
+      applyLoadedState(data.state, data.state.agent_shared_tone ?? '')
+    }
+    if (!silent) {
+      alert('Settings were changed elsewhere. The latest version has been loaded — review and save again.')
+    }
+    console.warn('Dashboard save skipped: state changed elsewhere')
+  }
+
   const handleSaveStatus = async (silent = false) => {
     if (isSavingRef.current) {
       return
@@ -555,39 +604,53 @@ export default function DashboardPage() {
     setStatusSaving(true)
     setStatusSaved(false)
     try {
-      // Save Brandon state and sync agent_shared_tone in parallel
-      const [stateRes] = await Promise.all([
-        fetch('/api/state', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
-            status:           currentStatus,
-            notes,
-            special_info:     config.specialInfo,
-            voice:            config.voice,
-            assistant_name:   config.assistantName,
-            persona:          config.persona,
-            greeting:         config.greeting,
-            max_discount:     config.maxDiscount,
-            ai_answers_calls: config.aiAnswersCalls,
-            ai_answers_sms:   config.aiAnswersSms,
-            auto_upsell:      config.autoUpsell,
-            operational_hours_enabled: operationalHoursEnabled,
-            operational_open_time: operationalHoursEnabled ? operationalOpenTime : null,
-            operational_close_time: operationalHoursEnabled ? operationalCloseTime : null,
-            services_block:   'SERVICES & PRICING (approximate — always say "starting at"):\n' +
-                              config.serviceLines.map(l => `- ${l}`).join('\n'),
-            what_we_fix_items: JSON.stringify(whatWeFixItems),
-          }),
-        }),
-        // Keep agent_shared_tone in sync — it is the source of truth for persona/tone
-        fetch('/api/agent-config', {
-          method: 'PUT',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ updates: { agent_shared_tone: config.persona } }),
+      // Save Brandon state, then sync agent_shared_tone; both are conditional on the
+      // version this dashboard last saw, so another editor's save is not overwritten
+      const stateRes = await fetch('/api/state', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          version:          stateVersionRef.current,
+          status:           currentStatus,
+          notes,
+          special_info:     config.specialInfo,
+          voice:            config.voice,
+          assistant_name:   config.assistantName,
+          persona:          config.persona,
+          greeting:         config.greeting,
+          max_discount:     config.maxDiscount,
+          ai_answers_calls: config.aiAnswersCalls,
+          ai_answers_sms:   config.aiAnswersSms,
+          auto_upsell:      config.autoUpsell,
+          operational_hours_enabled: operationalHoursEnabled,
+          operational_open_time: operationalHoursEnabled ? operationalOpenTime : null,
+          operational_close_time: operationalHoursEnabled ? operationalCloseTime : null,
+          services_block:   'SERVICES & PRICING (approximate — always say "starting at"):\n' +
+                            config.serviceLines.map(l => `- ${l}`).join('\n'),
+          what_we_fix_items: JSON.stringify(whatWeFixItems),
         }),
-      ])
+      })
+      if (stateRes.status === 409) {
+        await reloadConflictingState(stateRes, silent)
+        return
+      }
       if (!stateRes.ok) throw new Error('Failed to save state')
+      const saved = await stateRes.json() as { state: BrandonState }
+      stateVersionRef.current = saved.state.version
+
+      // Keep agent_shared_tone in sync — it is the source of truth for persona/tone
+      const agentRes = await fetch('/api/agent-config', {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ updates: { agent_shared_tone: config.persona }, version: stateVersionRef.current }),
+      })
+      if (agentRes.status === 409) {
+        await reloadConflictingState(agentRes, silent)
+        return
+      }
+      if (!agentRes.ok) throw new Error('Failed to save agent config')
+      const agentSaved = await agentRes.json() as { version?: number }
+      stateVersionRef.current = agentSaved.version ?? stateVersionRef.current
       setStatusSaved(true)
       setTimeout(() => setStatusSaved(false), 3000)
     } catch (error) {
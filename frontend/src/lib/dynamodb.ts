@@ -76,6 +76,16 @@ export interface BrandonState {
   operational_open_time?: string | null
   operational_close_time?: string | null
   updated_at: number
+  // Bumped by every write (here and in state_manager); send it back to make a write conditional
+  version?: number
+}
+
+/** A conditional state write lost to a newer one; `current` is the state that won. */
+export class StateVersionConflict extends Error {
+  constructor(public current: BrandonState) {
+    super('State was changed by someone else. Review the current state and retry.')
+    this.name = 'StateVersionConflict'
+  }
 }
 
 export interface OperationalHoursConfig {
@@ -98,6 +108,9 @@ export interface RepairLead {
   source?: string
   notes?: string                                       // optional context / callback reason
   created_at: number
+  status_updated_at?: number
+  open_queue?: string                                  // set only while open: keys the open-leads index
+  open_at?: string                                     // sortable appointment, 'YYYY-MM-DDTHH:MM'
 }
 
 export interface ChatLogMessage {
@@ -131,13 +144,15 @@ export async function getBrandonState(): Promise<BrandonState> {
     )
 
     if (result.Item) {
-      return result.Item as BrandonState
+      // Items written before versioning are version 0
+      return { version: 0, ...(result.Item as BrandonState) }
     }
 
     // Return default if no state exists
     return {
       state_id: 'CURRENT',
       status: 'available',
+      version: 0,
       notes: 'Default state',
       updated_at: Math.floor(Date.now() / 1000),
     }
@@ -180,19 +195,32 @@ export async function updateBrandonState(
     | 'operational_hours_enabled'
     | 'operational_open_time'
     | 'operational_close_time'
-  >>
+  >>,
+  expectedVersion?: number,
 ): Promise<BrandonState> {
   const updatedAt = Math.floor(Date.now() / 1000)
 
   const updateEntries = Object.entries(updates).filter(([, value]) => value !== undefined)
 
+  // Same versioning as update_state() in backend/lambda/storage.py
   const expressionAttributeNames: Record<string, string> = {
     '#updated_at': 'updated_at',
+    '#version': 'version',
   }
   const expressionAttributeValues: Record<string, unknown> = {
     ':updated_at': updatedAt,
+    ':zero': 0,
+    ':one': 1,
+  }
+  const setExpressions: string[] = [
+    '#updated_at = :updated_at',
+    '#version = if_not_exists(#version, :zero) + :one',
+  ]
+  let conditionExpression: string | undefined
+  if (expectedVersion !== undefined) {
+    expressionAttributeValues[':expected'] = expectedVersion
+    conditionExpression = '(attribute_not_exists(#version) AND :expected = :zero) OR #version = :expected'
   }
-  const setExpressions: string[] = ['#updated_at = :updated_at']
 
   for (const [key, value] of updateEntries) {
     const nameKey = `#${key}`
@@ -202,16 +230,25 @@ export async function updateBrandonState(
     setExpressions.push(`${nameKey} = ${valueKey}`)
   }
 
-  const result: UpdateCommandOutput = await docClient.send(
-    new UpdateCommand({
-      TableName: STATE_TABLE,
-      Key: { state_id: 'CURRENT' },
-      UpdateExpression: `SET ${setExpressions.join(', ')}`,
-      ExpressionAttributeNames: expressionAttributeNames,
-      ExpressionAttributeValues: expressionAttributeValues,
-      ReturnValues: 'ALL_NEW',
-    })
-  )
+  let result: UpdateCommandOutput
+  try {
+    result = await docClient.send(
+      new UpdateCommand({
+        TableName: STATE_TABLE,
+        Key: { state_id: 'CURRENT' },
+        UpdateExpression: `SET ${setExpressions.join(', ')}`,
+        ConditionExpression: conditionExpression,
+        ExpressionAttributeNames: expressionAttributeNames,
+        ExpressionAttributeValues: expressionAttributeValues,
+        ReturnValues: 'ALL_NEW',
+      })
+    )
+  } catch (error) {
+    if (error instanceof Error && error.name === 'ConditionalCheckFailedException') {
+      throw new StateVersionConflict(await getBrandonState())
+    }
+    throw error
+  }
 
   if (result.Attributes) {
     return result.Attributes as BrandonState
@@ -224,6 +261,16 @@ export async function updateBrandonState(
 // Lead / Booking Operations
 // ---------------------------------------------------------------------------
 
+// Mirrors open_lead_sort_key() in backend/lambda/utils.py
+function openLeadSortKey(date: string, time: string): string {
+  const match = time.trim().match(/^(\d{1,2}):(\d{2})\s*(AM|PM)$/i)
+  if (!match) {
+    return date
+  }
+  const hour = (Number.parseInt(match[1], 10) % 12) + (match[3].toUpperCase() === 'PM' ? 12 : 0)
+  return `${date}T${hour.toString().padStart(2, '0')}:${match[2]}`
+}
+
 export async function createLead(
   phone: string,
   repairType: string,
@@ -241,7 +288,11 @@ export async function createLead(
   const prefix = leadType === 'callback' ? 'CALLBACK' : leadType === 'on_site' ? 'ONSITE' : 'LEAD'
   const leadId = `${prefix}-${unixNow}-${random}`
 
+  // Appointments and on-site jobs join the bench queue (sparse open-leads index); callbacks do not
+  const openFields = leadType === 'callback' ? {} : { open_queue: 'OPEN', open_at: openLeadSortKey(date, time) }
+
   const lead: RepairLead = {
+    ...openFields,
     lead_id: leadId,
     timestamp: unixNow,
     phone,
@@ -268,16 +319,47 @@ export async function createLead(
   return leadId
 }
 
+// Backend-written leads use a compact format (fv = 2): short attribute names and
+// appointment date/time packed into `ap` as "YYYY-MM-DD h:MM AM". Mirrors
+// backend/lambda/lead_format.py; items without `fv` are already long-named.
+const COMPACT_LEAD_NAMES: Record<string, string> = {
+  rt: 'repair_type',
+  dv: 'device',
+  st: 'status',
+  lt: 'lead_type',
+  cn: 'customer_name',
+  src: 'source',
+  nt: 'notes',
+}
+
+export function expandLeadItem(item: Record<string, unknown>): RepairLead {
+  if (!('fv' in item)) {
+    return item as unknown as RepairLead
+  }
+  const lead: Record<string, unknown> = {}
+  for (const [name, value] of Object.entries(item)) {
+    if (name === 'fv') continue
+    if (name === 'ap' && typeof value === 'string') {
+      const separator = value.indexOf(' ')
+      lead.appointment_date = separator === -1 ? value : value.slice(0, separator)
+      if (separator !== -1) lead.appointment_time = value.slice(separator + 1)
+      continue
+    }
+    lead[COMPACT_LEAD_NAMES[name] ?? name] = value
+  }
+  return lead as unknown as RepairLead
+}
+
 export async function queryLeadsForDate(date: string): Promise<RepairLead[]> {
   const result: ScanCommandOutput = await docClient.send(
     new ScanCommand({
       TableName: REPAIRS_TABLE,
-      FilterExpression: 'appointment_date = :date',
-      ExpressionAttributeValues: { ':date': date },
+      FilterExpression: 'appointment_date = :date OR ap = :date OR begins_with(ap, :prefix)',
+      ExpressionAttributeValues: { ':date': date, ':prefix': `${date} ` },
     })
   )
 
-  return (result.Items ?? []) as RepairLead[]
+  return (result.Items ?? []).map(expandLeadItem)
 }
 
 export async function getAllLeads(): Promise<RepairLead[]> {
@@ -290,7 +372,7 @@ export async function getAllLeads(): Promise<RepairLead[]> {
     })
   )
 
-  const allLeads = (result.Items ?? []) as RepairLead[]
+  const allLeads = (result.Items ?? []).map(expandLeadItem)
   
   // Deduplicate by lead_id, keeping only the most recent (highest timestamp)
   const leadMap = new Map<string, RepairLead>()